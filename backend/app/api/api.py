@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import users, campaigns, strategic_mind, creative_spark, transparent_mentor, learning_loop, achievements
+from app.api.endpoints import users, campaigns, strategic_mind, creative_spark, transparent_mentor, learning_loop, achievements, jobs
 from app.api.api_integrations import router as api_integrations_router
 
 
@@ -13,4 +13,5 @@ api_router.include_router(strategic_mind.router, prefix="/strategic-mind", tags=
 api_router.include_router(creative_spark.router, prefix="/creative-spark", tags=["creative-spark"])
 api_router.include_router(transparent_mentor.router, prefix="/transparent-mentor", tags=["transparent-mentor"])
 api_router.include_router(learning_loop.router, prefix="/learning-loop", tags=["learning-loop"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
 api_router.include_router(api_integrations_router, prefix="/api-integrations", tags=["api-integrations"])
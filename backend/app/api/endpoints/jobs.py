@@ -0,0 +1,106 @@
+from typing import Any, List, Dict, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.api.endpoints.users import get_current_active_user
+from app.database import get_db
+from app.core.jobs import job_queue
+from app.core.jobs.handlers import JOB_HANDLERS, USER_JOB_TYPES
+
+
+router = APIRouter()
+
+
+def _get_owned_job(db: Session, job_id: int, current_user: User):
+    """
+    الحصول على مهمة يملكها المستخدم (أو أي مهمة للمشرف)
+    """
+    job = job_queue.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="المهمة غير موجودة")
+    if job.created_by != current_user.id and not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="ليس لديك صلاحية للوصول إلى هذه المهمة")
+    return job
+
+
+@router.post("", response_model=Dict[str, Any], status_code=202)
+def create_job(
+    job_type: str = Body(..., embed=True),
+    payload: Dict[str, Any] = Body({}, embed=True),
+    priority: int = Body(0, embed=True),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    إضافة مهمة تحليل ثقيلة إلى الطابور بدلاً من تنفيذها داخل الطلب
+    """
+    if job_type not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"نوع مهمة غير مدعوم: {job_type}")
+    if job_type not in USER_JOB_TYPES and not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="ليس لديك صلاحية لإنشاء هذا النوع من المهام")
+
+    # أولوية المستخدمين العاديين لا تتجاوز أولوية مهام النظام الافتراضية
+    if not current_user.is_superuser:
+        priority = min(priority, 0)
+
+    job = job_queue.enqueue(db, job_type, payload, priority=priority, created_by=current_user.id)
+    return job_queue.to_dict(job)
+
+
+@router.get("/stats", response_model=Dict[str, Any])
+def get_job_stats(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    إحصائيات الطابور: عدد المهام حسب الحالة وعمر أقدم مهمة تنتظر عاملاً
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="ليس لديك صلاحية لعرض إحصائيات المهام")
+
+    return job_queue.stats(db)
+
+
+@router.get("", response_model=List[Dict[str, Any]])
+def list_jobs(
+    status: Optional[str] = Query(None, title="حالة المهمة"),
+    limit: int = Query(50, ge=1, le=500, title="عدد المهام"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    الحصول على مهام المستخدم (كل المهام للمشرف)
+    """
+    created_by = None if current_user.is_superuser else current_user.id
+    jobs = job_queue.list_jobs(db, status=status, created_by=created_by, limit=limit)
+    return [job_queue.to_dict(job) for job in jobs]
+
+
+@router.get("/{job_id}", response_model=Dict[str, Any])
+def get_job(
+    job_id: int = Path(..., title="معرف المهمة"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    حالة المهمة ونتيجتها عند انتهائها
+    """
+    return job_queue.to_dict(_get_owned_job(db, job_id, current_user))
+
+
+@router.post("/{job_id}/cancel", response_model=Dict[str, Any])
+def cancel_job(
+    job_id: int = Path(..., title="معرف المهمة"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    إلغاء مهمة لم يبدأ تنفيذها بعد
+    """
+    job = _get_owned_job(db, job_id, current_user)
+    if not job_queue.cancel(db, job_id):
+        raise HTTPException(status_code=409, detail="لا يمكن إلغاء مهمة بدأ تنفيذها أو انتهت")
+
+    db.refresh(job)
+    return job_queue.to_dict(job)
@@ -1,5 +1,6 @@
 from typing import Any, List, Dict, Optional
-from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query
 from sqlalchemy.orm import Session
 
 from app.models.user import User
@@ -7,6 +8,16 @@ from app.models.campaign import Campaign, Recommendation
 from app.api.endpoints.users import get_current_active_user
 from app.database import get_db
 from app.core.learning_loop import FeedbackProcessor, ModelUpdater
+from app.core.learning_loop.model_updater import queue_incremental_update
+from app.core.learning_loop.event_buffer import event_buffer
+from app.core.learning_loop.prediction_log import compare_experiment
+from app.core.strategic_mind.model_experiments import EXPERIMENT_MODES, experiment_router
+from app.core.strategic_mind.feature_drift import drift_monitor, drift_report
+from app.core.strategic_mind.model_registry import model_registry
+from app.models.experiment import ModelExperiment
+from app.models.knowledge_base import MLModel
+from app.core.jobs import job_queue
+from app.config import settings
 
 
 router = APIRouter()
@@ -42,6 +53,10 @@ def save_recommendation_feedback(
     
     # حفظ التغذية الراجعة
     success = feedback_processor.save_recommendation_feedback(recommendation_id, feedback_data)
+
+    # تحديث النموذج تدريجياً في طابور المهام عند تراكم دفعة كاملة من التقييمات الجديدة
+    if success and "rating" in feedback_data:
+        queue_incremental_update(db, recommendation.recommendation_type)
     
     return {"success": success}
 
@@ -92,9 +107,45 @@ def collect_user_interactions(
     return {"success": success}
 
 
+@router.post("/events", response_model=Dict[str, Any], status_code=202)
+def collect_events(
+    events: List[Any] = Body(..., embed=True),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    استقبال دفعة من أحداث التفاعل والتغذية الراجعة. تُكتب الأحداث إلى قاعدة البيانات على دفعات
+    في الخلفية، ويتم رفض الطلب بـ 503 إذا كان المخزن المؤقت ممتلئاً
+    """
+    if len(events) > settings.EVENT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"عدد الأحداث في الطلب الواحد يجب ألا يتجاوز {settings.EVENT_BATCH_MAX_SIZE}"
+        )
+    
+    # إنشاء معالج التغذية الراجعة
+    feedback_processor = FeedbackProcessor(db)
+    
+    return feedback_processor.collect_events(current_user.id, events)
+
+
+@router.get("/events/stats", response_model=Dict[str, Any])
+def get_event_buffer_stats(
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    إحصائيات مخزن الأحداث المؤقت في هذه العملية
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="ليس لديك صلاحية للوصول إلى هذه البيانات")
+    
+    return event_buffer.stats()
+
+
 @router.get("/analyze-feedback-trends", response_model=Dict[str, Any])
 def analyze_feedback_trends(
     days: int = 30,
+    bucket: str = Query("day", title="فترة التجميع (day أو week)"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ) -> Any:
@@ -105,39 +156,47 @@ def analyze_feedback_trends(
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="ليس لديك صلاحية للوصول إلى هذه البيانات")
     
+    if bucket not in ("day", "week"):
+        raise HTTPException(status_code=400, detail="فترة التجميع يجب أن تكون day أو week")
+    
     # إنشاء معالج التغذية الراجعة
     feedback_processor = FeedbackProcessor(db)
     
     # تحليل اتجاهات التغذية الراجعة
-    trends = feedback_processor.analyze_feedback_trends(days)
+    trends = feedback_processor.analyze_feedback_trends(days, bucket)
     
     return trends
 
 
-@router.post("/update-model", response_model=Dict[str, Any])
+@router.post("/update-model", response_model=Dict[str, Any], status_code=202)
 def update_model(
     model_type: str,
     update_params: Optional[Dict[str, Any]] = None,
+    priority: int = Query(0, title="أولوية المهمة"),
+    force: bool = Query(False, title="ترقية النموذج المعاد تدريبه إذا تعذرت مقارنته بالنموذج الحالي"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ) -> Any:
     """
-    تحديث نموذج التعلم الآلي بناءً على التغذية الراجعة
+    تحديث نموذج التعلم الآلي بناءً على التغذية الراجعة. يتم التحديث في طابور المهام الخلفية،
+    ويمكن متابعة حالته من /jobs/{job_id}
     """
     # التحقق من صلاحيات المستخدم
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="ليس لديك صلاحية لتحديث النماذج")
     
-    # إنشاء محدث النماذج
-    model_updater = ModelUpdater(db)
-    
-    # تحديث النموذج
-    result = model_updater.update_model(model_type, update_params)
+    # طلب تحديث بدون معاملات خاصة لا يتكرر إذا كان تحديث آخر لنفس النموذج في الطابور
+    job = job_queue.enqueue(
+        db, "update_model", {"model_type": model_type, "update_params": update_params, "force": force},
+        priority=priority, created_by=current_user.id,
+        dedupe_key=None if update_params or force else f"update_model:{model_type}"
+    )
     
-    if not result["success"]:
-        raise HTTPException(status_code=400, detail=result["error"])
-    
-    return result
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"{settings.API_V1_STR}/jobs/{job.id}"
+    }
 
 
 @router.post("/schedule-model-update", response_model=Dict[str, Any])
@@ -160,4 +219,171 @@ def schedule_model_update(
     # جدولة تحديث النموذج
     result = model_updater.schedule_model_update(model_type, schedule)
     
-    return result
\ No newline at end of file
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["error"])
+    
+    return result
+
+
+def _experiment_response(experiment: ModelExperiment) -> Dict[str, Any]:
+    return {
+        "id": experiment.id,
+        "model_type": experiment.model_type,
+        "candidate_model_id": experiment.candidate_model_id,
+        "mode": experiment.mode,
+        "fraction": experiment.fraction,
+        "status": experiment.status,
+        "started_at": experiment.started_at,
+        "stopped_at": experiment.stopped_at
+    }
+
+
+@router.post("/experiments", response_model=Dict[str, Any], status_code=201)
+def start_model_experiment(
+    candidate_model_id: int = Query(..., title="معرف الإصدار المرشح في ml_models"),
+    mode: str = Query("shadow", title="shadow أو split"),
+    fraction: float = Query(0.1, title="نسبة الطلبات (shadow) أو المستخدمين (split)"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    بدء تجربة لإصدار مرشح من نموذج مقابل الإصدار النشط: تقييم في الخلفية (shadow)
+    أو تقسيم المستخدمين بين الإصدارين (split)
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="ليس لديك صلاحية لتحديث النماذج")
+
+    if mode not in EXPERIMENT_MODES:
+        raise HTTPException(status_code=400, detail="نوع التجربة يجب أن يكون shadow أو split")
+    if not 0 < fraction <= 1:
+        raise HTTPException(status_code=400, detail="النسبة يجب أن تكون أكبر من 0 ولا تتجاوز 1")
+
+    candidate = db.query(MLModel).filter(MLModel.id == candidate_model_id).first()
+    if not candidate:
+        raise HTTPException(status_code=404, detail="النموذج غير موجود")
+    if candidate.is_active:
+        raise HTTPException(status_code=400, detail="النموذج المرشح هو الإصدار النشط بالفعل")
+
+    running = db.query(ModelExperiment).filter(
+        ModelExperiment.model_type == candidate.model_type,
+        ModelExperiment.status == "running"
+    ).first()
+    if running:
+        raise HTTPException(status_code=409, detail=f"توجد تجربة جارية على هذا النموذج ({running.id})")
+
+    experiment = ModelExperiment(
+        model_type=candidate.model_type,
+        candidate_model_id=candidate.id,
+        mode=mode,
+        fraction=fraction,
+        status="running",
+        created_by=current_user.id
+    )
+    db.add(experiment)
+    db.commit()
+    db.refresh(experiment)
+
+    # العمليات الأخرى تبدأ التجربة عند مزامنتها التالية
+    experiment_router.sync(db, force=True)
+
+    return _experiment_response(experiment)
+
+
+@router.get("/experiments", response_model=Dict[str, Any])
+def list_model_experiments(
+    status: Optional[str] = Query(None, title="running أو stopped"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    تجارب الإصدارات المرشحة، مع حالة الموزع في هذه العملية
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="ليس لديك صلاحية للوصول إلى هذه البيانات")
+
+    query = db.query(ModelExperiment)
+    if status:
+        query = query.filter(ModelExperiment.status == status)
+    experiments = query.order_by(ModelExperiment.id.desc()).all()
+
+    return {
+        "experiments": [_experiment_response(experiment) for experiment in experiments],
+        "router": experiment_router.stats()
+    }
+
+
+@router.post("/experiments/{experiment_id}/stop", response_model=Dict[str, Any])
+def stop_model_experiment(
+    experiment_id: int = Path(..., title="معرف التجربة"),
+    promote: bool = Query(False, title="تفعيل الإصدار المرشح بدلاً من الإصدار النشط"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    إيقاف تجربة، مع تفعيل الإصدار المرشح اختيارياً
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="ليس لديك صلاحية لتحديث النماذج")
+
+    experiment = db.query(ModelExperiment).filter(ModelExperiment.id == experiment_id).first()
+    if not experiment:
+        raise HTTPException(status_code=404, detail="التجربة غير موجودة")
+    if experiment.status != "running":
+        raise HTTPException(status_code=400, detail="التجربة متوقفة بالفعل")
+
+    experiment.status = "stopped"
+    experiment.stopped_at = datetime.utcnow()
+
+    if promote:
+        candidate = db.query(MLModel).filter(MLModel.id == experiment.candidate_model_id).first()
+        if not candidate:
+            raise HTTPException(status_code=404, detail="النموذج غير موجود")
+        db.query(MLModel).filter(
+            MLModel.model_type == experiment.model_type,
+            MLModel.is_active == True
+        ).update({MLModel.is_active: False}, synchronize_session=False)
+        candidate.is_active = True
+
+    db.commit()
+
+    experiment_router.sync(db, force=True)
+    if promote:
+        model_registry.sync_active_models(db, force=True)
+
+    return _experiment_response(experiment)
+
+
+@router.get("/experiments/{experiment_id}/report", response_model=Dict[str, Any])
+def get_model_experiment_report(
+    experiment_id: int = Path(..., title="معرف التجربة"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    مقارنة زمن ودقة الإصدارين في تجربة مع الأداء الفعلي المسجل للحملات
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="ليس لديك صلاحية للوصول إلى هذه البيانات")
+
+    experiment = db.query(ModelExperiment).filter(ModelExperiment.id == experiment_id).first()
+    if not experiment:
+        raise HTTPException(status_code=404, detail="التجربة غير موجودة")
+
+    return compare_experiment(db, experiment)
+
+
+@router.get("/drift", response_model=Dict[str, Any])
+def get_feature_drift(
+    model_type: str = Query(..., title="نوع النموذج"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    انحراف توزيع الميزات في طلبات التنبؤ عن بيانات تدريب الإصدار النشط، مع حالة المراقب في هذه العملية
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="ليس لديك صلاحية للوصول إلى هذه البيانات")
+
+    report = drift_report(db, model_type)
+    report["monitor"] = drift_monitor.stats()
+    return report
@@ -7,7 +7,14 @@ from app.models.campaign import Campaign
 from app.models.knowledge_base import KnowledgeRule, MLModel
 from app.api.endpoints.users import get_current_active_user
 from app.database import get_db
-from app.core.strategic_mind import DynamicKnowledgeBase, HybridInferenceEngine
+from app.config import settings
+from app.core.strategic_mind import DynamicKnowledgeBase, get_inference_engine
+from app.core.strategic_mind.model_registry import model_registry
+from app.core.strategic_mind.prediction_cache import prediction_cache
+from app.core.strategic_mind.batch_dispatcher import batch_dispatcher
+from app.core.strategic_mind.inference_client import inference_client
+from app.core import cpu_tasks
+from app.utils.process_pool import process_pool
 from app import schemas
 
 
@@ -23,10 +30,6 @@ def predict_ctr(
     """
     التنبؤ بمعدل النقر إلى الظهور (CTR) للحملة
     """
-    print(f"🔍 DEBUG: predict_ctr endpoint called")
-    print(f"🔍 DEBUG: campaign_data: {campaign_data}")
-    print(f"🔍 DEBUG: current_user: {current_user.id if current_user else 'None'}")
-
     # التحقق من وجود الحملة إذا تم تحديد معرف الحملة
     if "campaign_id" in campaign_data:
         campaign = db.query(Campaign).filter(
@@ -35,16 +38,14 @@ def predict_ctr(
         ).first()
 
         if not campaign:
-            print(f"❌ DEBUG: Campaign not found")
             raise HTTPException(status_code=404, detail="الحملة غير موجودة")
 
     # إنشاء محرك الاستدلال
-    inference_engine = HybridInferenceEngine(db)
+    inference_engine = get_inference_engine(db)
 
     # التنبؤ بمعدل النقر إلى الظهور
-    prediction = inference_engine.predict_ctr(campaign_data)
+    prediction = inference_engine.predict_ctr(campaign_data, user_id=current_user.id)
 
-    print(f"✅ DEBUG: prediction result: {prediction}")
     return prediction
 
 
@@ -68,10 +69,10 @@ def predict_roi(
             raise HTTPException(status_code=404, detail="الحملة غير موجودة")
     
     # إنشاء محرك الاستدلال
-    inference_engine = HybridInferenceEngine(db)
+    inference_engine = get_inference_engine(db)
     
     # التنبؤ بالعائد على الاستثمار
-    prediction = inference_engine.predict_roi(campaign_data)
+    prediction = inference_engine.predict_roi(campaign_data, user_id=current_user.id)
     
     return prediction
 
@@ -96,7 +97,7 @@ def recommend_channels(
             raise HTTPException(status_code=404, detail="الحملة غير موجودة")
     
     # إنشاء محرك الاستدلال
-    inference_engine = HybridInferenceEngine(db)
+    inference_engine = get_inference_engine(db)
     
     # توصية بقنوات التسويق
     recommendations = inference_engine.recommend_channels(campaign_data)
@@ -104,6 +105,156 @@ def recommend_channels(
     return recommendations
 
 
+@router.post("/predict-ctr/batch", response_model=List[Dict[str, Any]])
+def predict_ctr_batch(
+    campaigns: List[Any],
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    التنبؤ بمعدل النقر إلى الظهور (CTR) لمجموعة من الحملات دفعة واحدة
+    """
+    errors = _validate_batch_campaigns(campaigns, current_user, db)
+    return _run_batch(campaigns, errors, "predict_ctr_batch")
+
+
+@router.post("/predict-roi/batch", response_model=List[Dict[str, Any]])
+def predict_roi_batch(
+    campaigns: List[Any],
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    التنبؤ بالعائد على الاستثمار (ROI) لمجموعة من الحملات دفعة واحدة
+    """
+    errors = _validate_batch_campaigns(campaigns, current_user, db)
+    return _run_batch(campaigns, errors, "predict_roi_batch")
+
+
+@router.post("/recommend-channels/batch", response_model=List[Dict[str, Any]])
+def recommend_channels_batch(
+    campaigns: List[Any],
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    توصية بقنوات التسويق لمجموعة من الحملات دفعة واحدة
+    """
+    errors = _validate_batch_campaigns(campaigns, current_user, db)
+    return _run_batch(campaigns, errors, "recommend_channels_batch")
+
+
+def _validate_batch_campaigns(campaigns: List[Any], current_user: User, db: Session) -> Dict[int, str]:
+    """
+    التحقق من حجم الدفعة وملكية الحملات، وإرجاع أخطاء العناصر غير الصالحة حسب موقعها
+    """
+    if len(campaigns) > settings.MAX_BATCH_PREDICTION_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"عدد الحملات يتجاوز الحد الأقصى ({settings.MAX_BATCH_PREDICTION_SIZE})"
+        )
+
+    campaign_ids = {
+        campaign["campaign_id"] for campaign in campaigns
+        if isinstance(campaign, dict) and isinstance(campaign.get("campaign_id"), int)
+    }
+    owned_ids = set()
+    if campaign_ids:
+        owned_ids = {
+            row.id for row in db.query(Campaign.id).filter(
+                Campaign.id.in_(campaign_ids),
+                Campaign.user_id == current_user.id
+            )
+        }
+
+    errors = {}
+    for index, campaign in enumerate(campaigns):
+        if not isinstance(campaign, dict):
+            errors[index] = "بيانات الحملة يجب أن تكون كائناً"
+        elif "campaign_id" in campaign and campaign["campaign_id"] not in owned_ids:
+            errors[index] = "الحملة غير موجودة"
+    return errors
+
+
+def _run_batch(campaigns: List[Any], errors: Dict[int, str], method: str) -> List[Dict[str, Any]]:
+    """
+    تشغيل التنبؤ الدفعي (في مجمع العمليات إذا كان مفعلاً) على العناصر الصالحة فقط
+    ودمج النتائج مع الأخطاء حسب الموقع الأصلي
+    """
+    valid_indices = [index for index in range(len(campaigns)) if index not in errors]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(campaigns)
+
+    batch_results = []
+    if valid_indices:
+        batch_results = process_pool.run(cpu_tasks.predict_batch, method, [campaigns[index] for index in valid_indices])
+    for index, result in zip(valid_indices, batch_results):
+        result["index"] = index
+        results[index] = result
+
+    for index, error in errors.items():
+        results[index] = {"index": index, "success": False, "error": error, "rule_matches": []}
+
+    return results
+
+
+@router.get("/models/loaded", response_model=Dict[str, Any])
+def get_loaded_models(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    الحصول على إصدارات النماذج المحملة حالياً في هذه العملية
+    """
+    model_registry.sync_active_models(db)
+    return model_registry.loaded_versions()
+
+
+@router.get("/prediction-cache/stats", response_model=Dict[str, Any])
+def get_prediction_cache_stats(
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    الحصول على إحصائيات ذاكرة نتائج التنبؤ في هذه العملية
+    """
+    return prediction_cache.stats()
+
+
+@router.get("/inference-batching/stats", response_model=Dict[str, Any])
+def get_inference_batching_stats(
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    الحصول على إحصائيات موزع دفعات التنبؤ في هذه العملية
+    """
+    return batch_dispatcher.stats()
+
+
+@router.get("/process-pool/stats", response_model=Dict[str, Any])
+def get_process_pool_stats(
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    الحصول على إحصائيات مجمع عمليات المعالجة الثقيلة
+    """
+    return process_pool.stats()
+
+
+@router.get("/inference-server/stats", response_model=Dict[str, Any])
+def get_inference_server_stats(
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    الحصول على إحصائيات عميل خادم الاستدلال في هذه العملية وإحصائيات الخادم نفسه
+    """
+    stats = {"client": inference_client.stats(), "server": None}
+    if inference_client.enabled:
+        try:
+            stats["server"] = inference_client.call("stats")
+        except Exception as e:
+            stats["server"] = {"error": str(e)}
+    return stats
+
+
 @router.get("/knowledge-rules", response_model=List[Dict[str, Any]])
 def get_knowledge_rules(
     rule_type: Optional[str] = None,
@@ -183,7 +334,7 @@ def update_from_feedback(
     تحديث النماذج بناءً على التغذية الراجعة
     """
     # إنشاء محرك الاستدلال
-    inference_engine = HybridInferenceEngine(db)
+    inference_engine = get_inference_engine(db)
     
     # تحديث النماذج
     success = inference_engine.update_from_feedback(feedback_data)
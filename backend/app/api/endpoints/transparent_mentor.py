@@ -1,10 +1,14 @@
 from typing import Any, Dict, List
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.api.endpoints.users import get_current_active_user
 from app.database import get_db
 from app.core.creative_spark import TransparentMentor, TextGenerator
+from app.config import settings
+from app.core import cpu_tasks
+from app.core.transparent_mentor import DecisionExplainer
+from app.utils.process_pool import process_pool
 
 router = APIRouter()
 
@@ -13,41 +17,29 @@ router = APIRouter()
 def explain_content_generation(
     campaign_data: Dict[str, Any],
     content_type: str = "ad_copy",
-    current_user=Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user=Depends(get_current_active_user)
 ) -> Any:
     """
     شرح كيفية توليد المحتوى واتخاذ القرارات
     """
-    transparent_mentor = TransparentMentor(db)
-
-    # توليد المحتوى أولاً
-    ad_copies = transparent_mentor.generate_content(campaign_data, content_type)
-
-    # تفسير عملية التوليد لكل نسخة محتوى
-    explanations = [
-        transparent_mentor.explain_content_generation(campaign_data, ad_copy)
-        for ad_copy in ad_copies
-    ]
-
-    return {
-        "content_results": ad_copies,
-        "explanations": explanations,
-        "summary": {
-            "total_results": len(ad_copies),
-            "sources_used": list({r.get("source") for r in ad_copies}),
-            "avg_confidence": sum([r.get("confidence", 0) for r in ad_copies]) / len(ad_copies) if ad_copies else 0
-        }
-    }
+    return process_pool.run(cpu_tasks.explain_content_generation, campaign_data, content_type)
 
 
 @router.post("/explain-prediction", response_model=List[Dict[str, Any]])
-def explain_prediction(prediction_data: Any, model_type: str, db: Session = Depends(get_db)):
+def explain_prediction(prediction_data: Any = Body(...), model_type: str = Query("ctr"), db: Session = Depends(get_db)):
     mentor = TransparentMentor(db)
     
     # التأكد من نوع البيانات
     if isinstance(prediction_data, list):
         prediction_data = prediction_data[0]
+
+    # مساهمات الميزات الفعلية من النموذج إذا كان محملاً وقابلاً للتفسير
+    try:
+        attributed = DecisionExplainer(db).explain_predictions([prediction_data], model_type)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if attributed is not None:
+        return attributed[0]["explanation"]
     
     # استخدام دالة موجودة لتفسير التنبؤات
     explanation = mentor._analyze_confidence_factors(prediction_data)
@@ -56,6 +48,29 @@ def explain_prediction(prediction_data: Any, model_type: str, db: Session = Depe
     return explanation
 
 
+@router.post("/explain-prediction/batch", response_model=List[Dict[str, Any]])
+def explain_predictions_batch(
+    predictions_data: List[Dict[str, Any]],
+    model_type: str = Query("ctr", description="نوع التنبؤ"),
+    current_user=Depends(get_current_active_user)
+) -> Any:
+    """
+    تفسير مجموعة تنبؤات دفعة واحدة بمساهمات الميزات (القيمة الأساسية + مساهمة كل ميزة = التنبؤ)
+    """
+    if len(predictions_data) > settings.MAX_BATCH_PREDICTION_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"عدد العناصر يتجاوز الحد الأقصى ({settings.MAX_BATCH_PREDICTION_SIZE})"
+        )
+    try:
+        results = process_pool.run(cpu_tasks.explain_predictions, predictions_data, model_type)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if results is None:
+        raise HTTPException(status_code=404, detail="لا يوجد نموذج محمل قابل للتفسير لهذا النوع")
+    return results
+
+
 @router.post("/generate-alternative-scenarios", response_model=List[Dict[str, Any]])
 def generate_alternative_scenarios(
     base_data: Dict[str, Any],
@@ -96,3 +111,43 @@ def generate_alternative_scenarios(
                 })
 
     return scenarios[:num_scenarios]
+
+
+@router.post("/scenario-sweep", response_model=Dict[str, Any])
+def sweep_scenarios(
+    sweep_data: Dict[str, Any],
+    max_results: int = Query(20, ge=1, le=500, description="أقصى عدد من السيناريوهات المثلى"),
+    current_user=Depends(get_current_active_user)
+) -> Any:
+    """
+    مسح سيناريوهات "ماذا لو" على نطاقات الميزانية وتوزيع القنوات والمدة ونوع المحتوى
+    """
+    base_data = sweep_data.get("base", {})
+    ranges = sweep_data.get("ranges", {})
+
+    try:
+        return process_pool.run(cpu_tasks.sweep_scenarios, base_data, ranges, max_results)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid scenario ranges: {str(e)}")
+
+
+@router.post("/partial-dependence", response_model=Dict[str, Any])
+def partial_dependence(
+    curve_data: Dict[str, Any],
+    model_type: str = Query("ctr", description="نوع التنبؤ (ctr أو roi)"),
+    grid_points: int = Query(None, ge=2, le=200, description="عدد قيم الشبكة لكل حقل"),
+    include_ice: bool = Query(True, description="إرجاع منحنى كل حملة (ICE)"),
+    current_user=Depends(get_current_active_user)
+) -> Any:
+    """
+    منحنيات الاعتماد الجزئي (PD) وICE: كيف يتغير التنبؤ عند تغيير الميزانية أو المدة أو الفئة العمرية
+    """
+    campaigns = curve_data.get("campaigns") or [curve_data.get("base", {})]
+    fields = curve_data.get("features")
+    ranges = curve_data.get("ranges", {})
+
+    try:
+        return process_pool.run(cpu_tasks.partial_dependence, campaigns, model_type, fields, ranges,
+                                grid_points, include_ice)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid curve request: {str(e)}")
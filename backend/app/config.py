@@ -38,6 +38,114 @@ class Settings(BaseSettings):
 
     # إعدادات نماذج التعلم الآلي
     ML_MODELS_PATH: str = os.getenv("ML_MODELS_PATH", "./ml_models")
+    # مخزن ملفات النماذج المعنون بالمحتوى (فارغ = ML_MODELS_PATH/artifacts): عدد الإصدارات المحتفظ بها لكل نوع دائماً،
+    # مدة الاحتفاظ بالإصدارات الأقدم منها، وفتح مصفوفات النماذج بـ mmap عند تحميلها للاستدلال
+    ARTIFACT_STORE_DIR: str = os.getenv("ARTIFACT_STORE_DIR", "")
+    ARTIFACT_KEEP_VERSIONS: int = int(os.getenv("ARTIFACT_KEEP_VERSIONS", "5"))
+    ARTIFACT_RETENTION_DAYS: float = float(os.getenv("ARTIFACT_RETENTION_DAYS", "30"))
+    ARTIFACT_MMAP_LOAD: bool = os.getenv("ARTIFACT_MMAP_LOAD", "true").lower() == "true"
+    # أقل فترة (بالثواني) بين مزامنتين لسجل النماذج مع جدول ml_models
+    MODEL_REGISTRY_REFRESH_SECONDS: float = float(os.getenv("MODEL_REGISTRY_REFRESH_SECONDS", "5"))
+    # تجارب الإصدارات المرشحة: أقل فترة بين مزامنتين مع جدول model_experiments، وعدد خيوط تقييم المرشح
+    # في الخلفية (وضع shadow) وأقصى عدد تقييمات معلقة قبل إسقاط الجديدة، وسعة مخزن سجلات التنبؤ
+    MODEL_EXPERIMENT_REFRESH_SECONDS: float = float(os.getenv("MODEL_EXPERIMENT_REFRESH_SECONDS", "5"))
+    MODEL_SHADOW_WORKERS: int = int(os.getenv("MODEL_SHADOW_WORKERS", "1"))
+    MODEL_SHADOW_MAX_PENDING: int = int(os.getenv("MODEL_SHADOW_MAX_PENDING", "256"))
+    PREDICTION_LOG_BUFFER_CAPACITY: int = int(os.getenv("PREDICTION_LOG_BUFFER_CAPACITY", "20000"))
+    # مراقبة انحراف الميزات في طلبات التنبؤ مقارنة ببيانات تدريب الإصدار النشط: نسبة الطلبات المراقبة،
+    # وفترة كتابة الملخصات إلى قاعدة البيانات وفترة فحص الانحراف (بالثواني)، ونافذة المقارنة (بالساعات)،
+    # وعدد فترات مدرج الميزات الرقمية، وحد PSI وأقل عدد طلبات لاعتبار النموذج منحرفاً،
+    # وإعادة التدريب الكامل تلقائياً عند الانحراف مع أقل فترة (بالساعات) بين إعادتين لنفس النموذج
+    ENABLE_FEATURE_DRIFT: bool = os.getenv("ENABLE_FEATURE_DRIFT", "true").lower() == "true"
+    DRIFT_SAMPLE_RATE: float = float(os.getenv("DRIFT_SAMPLE_RATE", "1.0"))
+    DRIFT_FLUSH_SECONDS: float = float(os.getenv("DRIFT_FLUSH_SECONDS", "60"))
+    DRIFT_CHECK_SECONDS: float = float(os.getenv("DRIFT_CHECK_SECONDS", "600"))
+    DRIFT_WINDOW_HOURS: float = float(os.getenv("DRIFT_WINDOW_HOURS", "24"))
+    DRIFT_HISTOGRAM_BINS: int = int(os.getenv("DRIFT_HISTOGRAM_BINS", "10"))
+    DRIFT_PSI_THRESHOLD: float = float(os.getenv("DRIFT_PSI_THRESHOLD", "0.25"))
+    DRIFT_MIN_OBSERVATIONS: int = int(os.getenv("DRIFT_MIN_OBSERVATIONS", "1000"))
+    DRIFT_AUTO_RETRAIN: bool = os.getenv("DRIFT_AUTO_RETRAIN", "true").lower() == "true"
+    DRIFT_RETRAIN_COOLDOWN_HOURS: float = float(os.getenv("DRIFT_RETRAIN_COOLDOWN_HOURS", "24"))
+    # أقل فترة (بالثواني) بين استعلامين عن إصدار مجموعة القواعد من قاعدة البيانات
+    RULES_VERSION_POLL_SECONDS: float = float(os.getenv("RULES_VERSION_POLL_SECONDS", "1"))
+    # الحد الأقصى لعدد الحملات في طلب تنبؤ دفعي واحد
+    MAX_BATCH_PREDICTION_SIZE: int = int(os.getenv("MAX_BATCH_PREDICTION_SIZE", "10000"))
+    # أقصى عدد صفوف يُقيّم بمصفوفات الأشجار المسطحة بدلاً من model.predict (0 لتعطيلها)، لكل نوع مجموعة:
+    # الغابات العشوائية أبطأ في sklearn فتبقى المصفوفات أسرع لدفعات أكبر من التعزيز التدرجي والشجرة الواحدة
+    FLAT_ENSEMBLE_MAX_ROWS_FOREST: int = int(os.getenv("FLAT_ENSEMBLE_MAX_ROWS_FOREST", "256"))
+    FLAT_ENSEMBLE_MAX_ROWS_BOOSTING: int = int(os.getenv("FLAT_ENSEMBLE_MAX_ROWS_BOOSTING", "16"))
+    # إرفاق مساهمات الميزات (TreeSHAP) بتنبؤات النماذج، والحد الأقصى لحجم جدول المساهمات المحسوب مسبقاً لكل نموذج
+    ENABLE_PREDICTION_ATTRIBUTIONS: bool = os.getenv("ENABLE_PREDICTION_ATTRIBUTIONS", "true").lower() == "true"
+    ATTRIBUTION_TABLE_MAX_MB: float = float(os.getenv("ATTRIBUTION_TABLE_MAX_MB", "32"))
+    # التعلم التدريجي من التغذية الراجعة: حجم الدفعة، عدد الأشجار المضافة لكل دفعة،
+    # أقصى عدد أشجار للنموذج، وأقصى عدد تغذيات راجعة يستهلكها تحديث واحد
+    ENABLE_INCREMENTAL_LEARNING: bool = os.getenv("ENABLE_INCREMENTAL_LEARNING", "true").lower() == "true"
+    INCREMENTAL_BATCH_SIZE: int = int(os.getenv("INCREMENTAL_BATCH_SIZE", "32"))
+    INCREMENTAL_TREES_PER_BATCH: int = int(os.getenv("INCREMENTAL_TREES_PER_BATCH", "5"))
+    INCREMENTAL_MAX_TREES: int = int(os.getenv("INCREMENTAL_MAX_TREES", "200"))
+    INCREMENTAL_MAX_SAMPLES: int = int(os.getenv("INCREMENTAL_MAX_SAMPLES", "2000"))
+    # استقبال أحداث التفاعل على دفعات: أقصى عدد أحداث في الذاكرة قبل رفض الطلبات (503)،
+    # وحجم/مهلة الكتابة المجمعة إلى قاعدة البيانات، وأقصى عدد أحداث في طلب واحد
+    EVENT_BUFFER_CAPACITY: int = int(os.getenv("EVENT_BUFFER_CAPACITY", "50000"))
+    EVENT_FLUSH_SIZE: int = int(os.getenv("EVENT_FLUSH_SIZE", "500"))
+    EVENT_FLUSH_INTERVAL_MS: float = float(os.getenv("EVENT_FLUSH_INTERVAL_MS", "1000"))
+    EVENT_BATCH_MAX_SIZE: int = int(os.getenv("EVENT_BATCH_MAX_SIZE", "1000"))
+    # بناء بيانات التدريب من قاعدة البيانات: حجم الدفعة المقروءة، أقصى عدد صفوف (الأحدث) لإعادة التدريب الكاملة،
+    # عدد الصفوف الذي تُكتب بعده مصفوفة الميزات في ملف mmap مؤقت، وحجم كل جزء عند التصدير ومجلد التصدير
+    TRAINING_CHUNK_SIZE: int = int(os.getenv("TRAINING_CHUNK_SIZE", "5000"))
+    TRAINING_MAX_ROWS: int = int(os.getenv("TRAINING_MAX_ROWS", "1000000"))
+    TRAINING_MEMMAP_ROWS: int = int(os.getenv("TRAINING_MEMMAP_ROWS", "250000"))
+    TRAINING_SHARD_ROWS: int = int(os.getenv("TRAINING_SHARD_ROWS", "100000"))
+    TRAINING_DATA_DIR: str = os.getenv("TRAINING_DATA_DIR", "./training_data")
+    # تقييم إعادة التدريب الكاملة قبل الترقية: طريقة التقسيم (time أو kfold)، عدد الأجزاء، عدد العمليات المتوازية (-1 = كل الأنوية)،
+    # أقل تحسن نسبي في MSE مطلوب لترقية المنافس، وأقل عدد صفوف للتقييم (أقل من ذلك يُرقّى دون تقييم)
+    MODEL_EVALUATION_SCHEME: str = os.getenv("MODEL_EVALUATION_SCHEME", "time")
+    MODEL_EVALUATION_FOLDS: int = int(os.getenv("MODEL_EVALUATION_FOLDS", "5"))
+    MODEL_EVALUATION_N_JOBS: int = int(os.getenv("MODEL_EVALUATION_N_JOBS", "-1"))
+    MODEL_PROMOTION_MIN_IMPROVEMENT: float = float(os.getenv("MODEL_PROMOTION_MIN_IMPROVEMENT", "0.0"))
+    MODEL_EVALUATION_MIN_ROWS: int = int(os.getenv("MODEL_EVALUATION_MIN_ROWS", "50"))
+    # البحث عن إعدادات النماذج عند تدريبها (off، random أو halving): الميزانية الزمنية، عدد المرشحين، عدد العمليات (0 = كل الأنوية)،
+    # عدد التجارب دون تحسن قبل الإيقاف المبكر (random فقط)، ونسبة بيانات التحقق
+    MODEL_SEARCH_MODE: str = os.getenv("MODEL_SEARCH_MODE", "off")
+    MODEL_SEARCH_BUDGET_SECONDS: float = float(os.getenv("MODEL_SEARCH_BUDGET_SECONDS", "600"))
+    MODEL_SEARCH_CANDIDATES: int = int(os.getenv("MODEL_SEARCH_CANDIDATES", "24"))
+    MODEL_SEARCH_WORKERS: int = int(os.getenv("MODEL_SEARCH_WORKERS", "0"))
+    MODEL_SEARCH_PATIENCE: int = int(os.getenv("MODEL_SEARCH_PATIENCE", "8"))
+    MODEL_SEARCH_VALIDATION_FRACTION: float = float(os.getenv("MODEL_SEARCH_VALIDATION_FRACTION", "0.2"))
+    # طابور المهام الخلفية: مدة إيجار المهمة (يجددها العامل أثناء التنفيذ)، فترة الاستطلاع، إعادة المحاولة والاحتفاظ
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", "2"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF_SECONDS: float = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "30"))
+    JOB_RETRY_MAX_BACKOFF_SECONDS: float = float(os.getenv("JOB_RETRY_MAX_BACKOFF_SECONDS", "3600"))
+    JOB_RETENTION_DAYS: float = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+    # مشاركة النماذج بين عمال الخادم: "mmap" لفتح مصفوفات الأشجار المصدّرة (.npy) بـ mmap، أو "none"
+    MODEL_SHARING_MODE: str = os.getenv("MODEL_SHARING_MODE", "none").lower()
+    # تجميع طلبات التنبؤ المتزامنة في دفعة واحدة (نافذة الانتظار بالمللي ثانية وأقصى حجم للدفعة)
+    ENABLE_MICRO_BATCHING: bool = os.getenv("ENABLE_MICRO_BATCHING", "false").lower() == "true"
+    MICRO_BATCH_WINDOW_MS: float = float(os.getenv("MICRO_BATCH_WINDOW_MS", "2"))
+    MICRO_BATCH_MAX_SIZE: int = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+    MICRO_BATCH_TIMEOUT_SECONDS: float = float(os.getenv("MICRO_BATCH_TIMEOUT_SECONDS", "5"))
+    # الحد الأقصى لعدد السيناريوهات في مسح "ماذا لو" واحد
+    SCENARIO_SWEEP_MAX_SIZE: int = int(os.getenv("SCENARIO_SWEEP_MAX_SIZE", "50000"))
+    # منحنيات الاعتماد الجزئي (PD/ICE): عدد قيم الشبكة الافتراضي، أقصى عدد تنبؤات للطلب، وحجم الذاكرة المؤقتة
+    PARTIAL_DEPENDENCE_GRID_POINTS: int = int(os.getenv("PARTIAL_DEPENDENCE_GRID_POINTS", "20"))
+    PARTIAL_DEPENDENCE_MAX_ROWS: int = int(os.getenv("PARTIAL_DEPENDENCE_MAX_ROWS", "200000"))
+    PARTIAL_DEPENDENCE_CACHE_SIZE: int = int(os.getenv("PARTIAL_DEPENDENCE_CACHE_SIZE", "256"))
+    # مجمع عمليات لمهام المعالجة الثقيلة (التنبؤ الدفعي، التفسير، مسح السيناريوهات)
+    ENABLE_PROCESS_POOL: bool = os.getenv("ENABLE_PROCESS_POOL", "false").lower() == "true"
+    PROCESS_POOL_WORKERS: int = int(os.getenv("PROCESS_POOL_WORKERS", "2"))
+    # عدد المهام التي تنتظر عاملاً متاحاً قبل رفض الطلبات الجديدة بـ 503
+    PROCESS_POOL_MAX_PENDING: int = int(os.getenv("PROCESS_POOL_MAX_PENDING", "8"))
+    PROCESS_POOL_TIMEOUT_SECONDS: float = float(os.getenv("PROCESS_POOL_TIMEOUT_SECONDS", "30"))
+    PROCESS_POOL_START_METHOD: str = os.getenv("PROCESS_POOL_START_METHOD", "spawn")
+    # مقبس Unix لخادم الاستدلال المحلي (فارغ = التنبؤ داخل عمال الـ API)
+    INFERENCE_SERVER_SOCKET: str = os.getenv("INFERENCE_SERVER_SOCKET", "")
+    INFERENCE_SERVER_THREADS: int = int(os.getenv("INFERENCE_SERVER_THREADS", "4"))
+    INFERENCE_CLIENT_POOL_SIZE: int = int(os.getenv("INFERENCE_CLIENT_POOL_SIZE", "2"))
+    INFERENCE_CLIENT_TIMEOUT_SECONDS: float = float(os.getenv("INFERENCE_CLIENT_TIMEOUT_SECONDS", "5"))
+    # استخدام محرك محلي عند تعذر الوصول إلى خادم الاستدلال
+    INFERENCE_SERVER_FALLBACK: bool = os.getenv("INFERENCE_SERVER_FALLBACK", "true").lower() == "true"
 
     # إعدادات CORS
     CORS_ORIGINS: List[str] = [
@@ -53,11 +161,16 @@ class Settings(BaseSettings):
 
     # إعدادات التخزين المؤقت (Cache)
     CACHE_DURATION_HOURS: int = int(os.getenv("CACHE_DURATION_HOURS", "24"))
+    # ذاكرة نتائج التنبؤ داخل العملية (عدد المدخلات الأقصى، 0 لتعطيل التخزين)
+    ENABLE_PREDICTION_CACHE: bool = os.getenv("ENABLE_PREDICTION_CACHE", "true").lower() == "true"
+    PREDICTION_CACHE_SIZE: int = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
     REDIS_URL: Optional[str] = os.getenv("REDIS_URL", None)
 
     # إعدادات مراقبة الأداء
     ENABLE_PERFORMANCE_MONITORING: bool = os.getenv("ENABLE_PERFORMANCE_MONITORING", "false").lower() == "true"
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # نسبة استدعاءات التنبؤ التي تُسجل كسطر JSON منظم (0 لتعطيل، 1 للكل)
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
 
     # إعدادات معالجة البيانات
     MAX_TREND_KEYWORDS: int = int(os.getenv("MAX_TREND_KEYWORDS", "10"))
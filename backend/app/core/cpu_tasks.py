@@ -0,0 +1,92 @@
+"""
+مهام المعالجة الثقيلة التي يتم تنفيذها في مجمع العمليات (app.utils.process_pool).
+كل مهمة دالة على مستوى الوحدة تفتح جلسة قاعدة بيانات خاصة بها في عملية العامل،
+ومدخلاتها ومخرجاتها بيانات بسيطة قابلة للتسلسل.
+"""
+from typing import Dict, Any, List, Optional
+
+from app.database import SessionLocal
+from app.core.strategic_mind import get_inference_engine
+from app.core.creative_spark import TransparentMentor
+from app.core.transparent_mentor import DecisionExplainer
+
+
+# دوال التنبؤ الدفعي المسموح تشغيلها في العمال
+_BATCH_METHODS = ("predict_ctr_batch", "predict_roi_batch", "recommend_channels_batch")
+
+
+def predict_batch(method: str, campaigns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    تنبؤ دفعي بمحرك الاستدلال الهجين (أو خادم الاستدلال إذا كان مفعلاً)
+    """
+    if method not in _BATCH_METHODS:
+        raise ValueError(f"Unknown batch method: {method}")
+    db = SessionLocal()
+    try:
+        return getattr(get_inference_engine(db), method)(campaigns)
+    finally:
+        db.close()
+
+
+def explain_content_generation(campaign_data: Dict[str, Any], content_type: str) -> Dict[str, Any]:
+    """
+    توليد المحتوى ثم تفسير عملية التوليد لكل نسخة
+    """
+    db = SessionLocal()
+    try:
+        transparent_mentor = TransparentMentor(db)
+
+        # توليد المحتوى أولاً
+        ad_copies = transparent_mentor.generate_content(campaign_data, content_type)
+
+        # تفسير عملية التوليد لكل نسخة محتوى
+        explanations = [
+            transparent_mentor.explain_content_generation(campaign_data, ad_copy)
+            for ad_copy in ad_copies
+        ]
+    finally:
+        db.close()
+
+    return {
+        "content_results": ad_copies,
+        "explanations": explanations,
+        "summary": {
+            "total_results": len(ad_copies),
+            "sources_used": list({r.get("source") for r in ad_copies}),
+            "avg_confidence": sum([r.get("confidence", 0) for r in ad_copies]) / len(ad_copies) if ad_copies else 0
+        }
+    }
+
+
+def explain_predictions(predictions_data: List[Dict[str, Any]], model_type: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    تفسير مجموعة تنبؤات بمساهمات الميزات
+    """
+    db = SessionLocal()
+    try:
+        return DecisionExplainer(db).explain_predictions(predictions_data, model_type)
+    finally:
+        db.close()
+
+
+def sweep_scenarios(base_data: Dict[str, Any], ranges: Dict[str, Any], max_results: int) -> Dict[str, Any]:
+    """
+    مسح سيناريوهات "ماذا لو"
+    """
+    db = SessionLocal()
+    try:
+        return DecisionExplainer(db).sweep_scenarios(base_data, ranges, max_results)
+    finally:
+        db.close()
+
+
+def partial_dependence(campaigns: List[Dict[str, Any]], model_type: str, fields: Optional[List[str]],
+                       ranges: Dict[str, Any], grid_points: Optional[int], include_ice: bool) -> Dict[str, Any]:
+    """
+    منحنيات الاعتماد الجزئي وICE
+    """
+    db = SessionLocal()
+    try:
+        return DecisionExplainer(db).partial_dependence(campaigns, model_type, fields, ranges, grid_points, include_ice)
+    finally:
+        db.close()
@@ -0,0 +1,2 @@
+from app.core.jobs.cron import CronSchedule
+from app.core.jobs.queue import JobQueue, job_queue
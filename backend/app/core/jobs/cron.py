@@ -0,0 +1,102 @@
+from typing import List, Set
+from datetime import datetime, timedelta
+
+
+# اختصارات شائعة لتعبيرات cron
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+# (أدنى قيمة، أعلى قيمة) لكل حقل: الدقيقة، الساعة، يوم الشهر، الشهر، يوم الأسبوع (0 و7 = الأحد)
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_field(spec: str, low: int, high: int) -> Set[int]:
+    """
+    تحليل حقل واحد: * أو قيم مفصولة بفواصل، مع نطاقات (a-b) وخطوات (*/n أو a-b/n)
+    """
+    values: Set[int] = set()
+    for part in spec.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Invalid cron step: {spec}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron value out of range {low}-{high}: {spec}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    تعبير cron من خمسة حقول (دقيقة ساعة يوم_الشهر شهر يوم_الأسبوع) بنفس دلالات cron:
+    إذا تم تقييد يوم الشهر ويوم الأسبوع معاً يكفي تطابق أحدهما
+    """
+    __slots__ = ("expression", "minutes", "hours", "days", "months", "weekdays", "_any_day", "_any_weekday")
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = CRON_ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression}")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, _FIELD_RANGES)
+        )
+        # يوم الأسبوع 7 يعني الأحد أيضاً (بعد توسيع النطاقات والقوائم، مثل 1-7 أو 5,7)
+        self.weekdays = {weekday % 7 for weekday in self.weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        # datetime: الاثنين = 0، وفي cron: الأحد = 0
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday
+        if self._any_weekday:
+            return day
+        return day or weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        أول موعد مطابق بعد الوقت المحدد (بدقة الدقيقة)
+        """
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                # أول يوم من الشهر التالي
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never matches: {self.expression}")
+
+    def upcoming(self, moment: datetime, count: int = 3) -> List[datetime]:
+        """
+        المواعيد القادمة (للعرض)
+        """
+        runs = []
+        for _ in range(count):
+            moment = self.next_after(moment)
+            runs.append(moment)
+        return runs
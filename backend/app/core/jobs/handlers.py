@@ -0,0 +1,128 @@
+"""
+أنواع المهام الخلفية: كل نوع دالة تستقبل مدخلات المهمة (payload) وتعيد نتيجة قابلة للتسلسل.
+الاستثناء PermanentJobError (أو أخطاء المدخلات ValueError/KeyError/TypeError) يعني أن إعادة
+المحاولة لن تفيد، وأي استثناء آخر يعيد المهمة إلى الطابور بعد تأخير متزايد حتى الحد الأقصى للمحاولات.
+"""
+from typing import Dict, Any, Callable
+from datetime import datetime
+import os
+
+from app.config import settings
+from app.database import SessionLocal
+from app.core import cpu_tasks
+from app.core.learning_loop import ModelUpdater
+from app.core.learning_loop.model_updater import update_from_new_feedback
+from app.core.learning_loop.training_data import TrainingDataBuilder
+
+
+class PermanentJobError(Exception):
+    """
+    فشل نهائي لا تفيد معه إعادة المحاولة (مدخلات غير صالحة، نموذج غير موجود...)
+    """
+
+
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+# أنواع المهام التي يمكن لأي مستخدم إنشاؤها (الباقي للمشرفين فقط)
+USER_JOB_TYPES = ("sweep_scenarios", "partial_dependence", "explain_predictions", "predict_batch")
+
+
+def job_handler(job_type: str) -> Callable:
+    """
+    تسجيل دالة كمنفذ لنوع مهمة
+    """
+    def register(fn: Callable[[Dict[str, Any]], Any]) -> Callable[[Dict[str, Any]], Any]:
+        JOB_HANDLERS[job_type] = fn
+        return fn
+    return register
+
+
+@job_handler("update_model")
+def update_model(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    تحديث نموذج من التغذية الراجعة (تدريجياً أو بإعادة تدريب كاملة)
+    """
+    db = SessionLocal()
+    try:
+        result = ModelUpdater(db).update_model(
+            payload["model_type"], payload.get("update_params"), payload.get("full_retrain", False),
+            payload.get("force", False)
+        )
+    finally:
+        db.close()
+    if not result["success"]:
+        raise PermanentJobError(result["error"])
+    return result
+
+
+@job_handler("incremental_update")
+def incremental_update(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    تحديث تدريجي إذا تراكمت دفعة كاملة من التغذية الراجعة الجديدة
+    """
+    result = update_from_new_feedback(payload["model_type"])
+    return result if result is not None else {"success": False, "skipped": True}
+
+
+@job_handler("export_training_data")
+def export_training_data(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    تصدير بيانات تدريب نموذج كأجزاء .npy مع manifest للتدريب خارج الخادم
+    """
+    model_type = payload["model_type"]
+    directory = payload.get("directory") or os.path.join(
+        settings.TRAINING_DATA_DIR, model_type, datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    )
+    db = SessionLocal()
+    try:
+        manifest = TrainingDataBuilder(db).write_shards(
+            model_type, directory, payload.get("shard_rows"), payload.get("max_rows")
+        )
+    finally:
+        db.close()
+    return {
+        "directory": directory,
+        "rows": manifest["rows"],
+        "shards": len(manifest["shards"]),
+        "skipped": manifest["skipped"],
+        "fingerprint": manifest["fingerprint"],
+        "unseen_categories": manifest["unseen_categories"]
+    }
+
+
+@job_handler("gc_model_artifacts")
+def gc_model_artifacts(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    حذف ملفات النماذج القديمة من مخزن النماذج (النماذج النشطة محمية)
+    """
+    db = SessionLocal()
+    try:
+        result = ModelUpdater(db).collect_artifacts()
+    finally:
+        db.close()
+    if result is None:
+        raise RuntimeError("Failed to collect model artifacts")
+    return result
+
+
+@job_handler("sweep_scenarios")
+def sweep_scenarios(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return cpu_tasks.sweep_scenarios(payload.get("base", {}), payload.get("ranges", {}), payload.get("max_results", 20))
+
+
+@job_handler("partial_dependence")
+def partial_dependence(payload: Dict[str, Any]) -> Dict[str, Any]:
+    campaigns = payload.get("campaigns") or [payload.get("base", {})]
+    return cpu_tasks.partial_dependence(campaigns, payload.get("model_type", "ctr"), payload.get("features"),
+                                        payload.get("ranges", {}), payload.get("grid_points"),
+                                        payload.get("include_ice", True))
+
+
+@job_handler("explain_predictions")
+def explain_predictions(payload: Dict[str, Any]) -> Any:
+    return cpu_tasks.explain_predictions(payload["predictions"], payload.get("model_type", "ctr"))
+
+
+@job_handler("predict_batch")
+def predict_batch(payload: Dict[str, Any]) -> Any:
+    return cpu_tasks.predict_batch(payload["method"], payload["campaigns"])
@@ -0,0 +1,296 @@
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import random
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.job import Job, JobSchedule
+from .cron import CronSchedule
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+def utcnow() -> datetime:
+    return datetime.utcnow()
+
+
+class JobQueue:
+    """
+    طابور مهام دائم في قاعدة البيانات (SQLite أو غيرها) يشترك فيه الـ API والعمال:
+    - الاختيار بالأولوية ثم موعد التشغيل، والحجز بتحديث شرطي واحد حتى لا يأخذ عاملان نفس المهمة
+    - إيجار (lease) يجدده العامل أثناء التنفيذ؛ إذا توقف العامل تعود المهمة للطابور بعد انتهائه
+    - إعادة المحاولة بتأخير أسي عند الفشل حتى الحد الأقصى للمحاولات
+    - جداول cron تنشئ مهمة عند كل موعد
+    """
+
+    def __init__(self, lease_seconds: float = None, backoff_seconds: float = None, max_backoff_seconds: float = None):
+        """
+        تهيئة الطابور
+        """
+        self.lease_seconds = settings.JOB_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.backoff_seconds = settings.JOB_RETRY_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+        self.max_backoff_seconds = settings.JOB_RETRY_MAX_BACKOFF_SECONDS if max_backoff_seconds is None else max_backoff_seconds
+
+    def enqueue(self, db: Session, job_type: str, payload: Dict[str, Any] = None, priority: int = 0,
+                max_attempts: int = None, run_after: datetime = None, dedupe_key: str = None,
+                created_by: int = None, schedule_id: int = None) -> Job:
+        """
+        إضافة مهمة إلى الطابور. إذا كان dedupe_key محدداً ولمهمة نشطة نفس المفتاح يتم إرجاعها بدلاً من إنشاء مهمة جديدة
+        """
+        if dedupe_key:
+            existing = db.query(Job).filter(
+                Job.dedupe_key == dedupe_key,
+                Job.status.in_(ACTIVE_STATUSES)
+            ).first()
+            if existing:
+                return existing
+
+        job = Job(
+            job_type=job_type,
+            payload=payload or {},
+            status=JOB_QUEUED,
+            priority=priority,
+            attempts=0,
+            max_attempts=settings.JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts,
+            run_after=run_after or utcnow(),
+            dedupe_key=dedupe_key,
+            created_by=created_by,
+            schedule_id=schedule_id
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def claim(self, db: Session, worker_id: str) -> Optional[Job]:
+        """
+        حجز المهمة التالية الجاهزة (أو مهمة انتهى إيجار عاملها) لهذا العامل
+        """
+        now = utcnow()
+        self._fail_exhausted_leases(db, now)
+        claimable = or_(
+            and_(Job.status == JOB_QUEUED, Job.run_after <= now),
+            and_(Job.status == JOB_RUNNING, Job.lease_expires_at < now)
+        )
+        candidates = db.query(Job.id).filter(claimable).order_by(
+            Job.priority.desc(), Job.run_after, Job.id
+        ).limit(8).all()
+
+        for (job_id,) in candidates:
+            # التحديث الشرطي ذري: إذا سبقه عامل آخر لا يتم تعديل أي صف
+            claimed = db.query(Job).filter(Job.id == job_id, claimable).update({
+                Job.status: JOB_RUNNING,
+                Job.worker_id: worker_id,
+                Job.attempts: Job.attempts + 1,
+                Job.started_at: now,
+                Job.lease_expires_at: now + timedelta(seconds=self.lease_seconds)
+            }, synchronize_session=False)
+            db.commit()
+            if claimed:
+                return db.get(Job, job_id)
+        return None
+
+    def heartbeat(self, db: Session, job_id: int, worker_id: str) -> bool:
+        """
+        تجديد إيجار مهمة قيد التنفيذ؛ False إذا لم تعد المهمة لهذا العامل
+        """
+        renewed = db.query(Job).filter(
+            Job.id == job_id, Job.worker_id == worker_id, Job.status == JOB_RUNNING
+        ).update({Job.lease_expires_at: utcnow() + timedelta(seconds=self.lease_seconds)}, synchronize_session=False)
+        db.commit()
+        return bool(renewed)
+
+    def complete(self, db: Session, job_id: int, worker_id: str, result: Any) -> bool:
+        """
+        تسجيل نجاح المهمة (يتم تجاهله إذا انتقلت المهمة لعامل آخر)
+        """
+        return self._finish(db, job_id, worker_id, {
+            Job.status: JOB_SUCCEEDED,
+            Job.result: result,
+            Job.error: None
+        })
+
+    def fail(self, db: Session, job_id: int, worker_id: str, error: str, retry: bool = True) -> bool:
+        """
+        تسجيل فشل المهمة: إعادتها للطابور بتأخير متزايد إذا بقيت محاولات، وإلا فشل نهائي
+        """
+        job = db.get(Job, job_id)
+        if job is None:
+            return False
+        if retry and job.attempts < job.max_attempts:
+            return self._finish(db, job_id, worker_id, {
+                Job.status: JOB_QUEUED,
+                Job.error: error,
+                Job.run_after: utcnow() + timedelta(seconds=self.backoff(job.attempts)),
+                Job.finished_at: None
+            })
+        return self._finish(db, job_id, worker_id, {Job.status: JOB_FAILED, Job.error: error})
+
+    def backoff(self, attempts: int) -> float:
+        """
+        التأخير قبل المحاولة التالية: يتضاعف مع كل محاولة حتى الحد الأقصى، مع تفاوت عشوائي
+        حتى لا تعود المهام الفاشلة معاً
+        """
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** max(0, attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def cancel(self, db: Session, job_id: int) -> bool:
+        """
+        إلغاء مهمة لم تبدأ بعد
+        """
+        cancelled = db.query(Job).filter(Job.id == job_id, Job.status == JOB_QUEUED).update({
+            Job.status: JOB_CANCELLED,
+            Job.finished_at: utcnow()
+        }, synchronize_session=False)
+        db.commit()
+        return bool(cancelled)
+
+    def get(self, db: Session, job_id: int) -> Optional[Job]:
+        return db.get(Job, job_id)
+
+    def list_jobs(self, db: Session, status: str = None, created_by: int = None, limit: int = 50) -> List[Job]:
+        query = db.query(Job)
+        if status:
+            query = query.filter(Job.status == status)
+        if created_by is not None:
+            query = query.filter(Job.created_by == created_by)
+        return query.order_by(Job.id.desc()).limit(limit).all()
+
+    def stats(self, db: Session) -> Dict[str, Any]:
+        """
+        عدد المهام حسب الحالة، وعمر أقدم مهمة جاهزة تنتظر عاملاً
+        """
+        counts = dict(db.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+        oldest = db.query(func.min(Job.run_after)).filter(
+            Job.status == JOB_QUEUED, Job.run_after <= utcnow()
+        ).scalar()
+        return {
+            "by_status": {status: counts.get(status, 0) for status in ACTIVE_STATUSES + FINISHED_STATUSES},
+            "oldest_ready_seconds": (utcnow() - oldest).total_seconds() if oldest else 0,
+            "schedules": db.query(JobSchedule).filter(JobSchedule.is_active == True).count()
+        }
+
+    def add_schedule(self, db: Session, name: str, job_type: str, cron: str, payload: Dict[str, Any] = None,
+                     priority: int = 0, max_attempts: int = None) -> JobSchedule:
+        """
+        إنشاء جدول متكرر أو تحديثه إذا كان موجوداً بنفس الاسم
+        """
+        next_run_at = CronSchedule(cron).next_after(utcnow())
+        schedule = db.query(JobSchedule).filter(JobSchedule.name == name).first()
+        if schedule is None:
+            schedule = JobSchedule(name=name)
+            db.add(schedule)
+        schedule.job_type = job_type
+        schedule.payload = payload or {}
+        schedule.cron = cron
+        schedule.priority = priority
+        schedule.max_attempts = settings.JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        schedule.is_active = True
+        schedule.next_run_at = next_run_at
+        db.commit()
+        db.refresh(schedule)
+        return schedule
+
+    def enqueue_due_schedules(self, db: Session) -> int:
+        """
+        إنشاء مهمة لكل جدول حان موعده وتقديم موعده التالي. يتم تقديم الموعد بتحديث شرطي،
+        فلا ينشئ عاملان نفس المهمة مرتين. المواعيد الفائتة (توقف كل العمال) تُنفذ مرة واحدة فقط.
+        """
+        now = utcnow()
+        due = db.query(JobSchedule).filter(
+            JobSchedule.is_active == True, JobSchedule.next_run_at <= now
+        ).all()
+        enqueued = 0
+        for schedule in due:
+            try:
+                next_run_at = CronSchedule(schedule.cron).next_after(now)
+            except ValueError as e:
+                print(f"Disabling job schedule {schedule.name}: {e}")
+                schedule.is_active = False
+                db.commit()
+                continue
+            advanced = db.query(JobSchedule).filter(
+                JobSchedule.id == schedule.id, JobSchedule.next_run_at == schedule.next_run_at
+            ).update({JobSchedule.next_run_at: next_run_at, JobSchedule.last_run_at: now}, synchronize_session=False)
+            db.commit()
+            if advanced:
+                self.enqueue(db, schedule.job_type, schedule.payload, priority=schedule.priority,
+                             max_attempts=schedule.max_attempts, dedupe_key=f"schedule:{schedule.id}",
+                             schedule_id=schedule.id)
+                enqueued += 1
+        return enqueued
+
+    def purge_finished(self, db: Session, older_than_days: float = None) -> int:
+        """
+        حذف المهام المنتهية الأقدم من مدة الاحتفاظ
+        """
+        days = settings.JOB_RETENTION_DAYS if older_than_days is None else older_than_days
+        purged = db.query(Job).filter(
+            Job.status.in_(FINISHED_STATUSES),
+            Job.finished_at < utcnow() - timedelta(days=days)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return purged
+
+    def _fail_exhausted_leases(self, db: Session, now: datetime) -> None:
+        """
+        المهام التي انتهى إيجارها بعد استنفاد كل المحاولات (توقف العامل عدة مرات أثناء تنفيذها) تفشل نهائياً
+        """
+        exhausted = db.query(Job).filter(
+            Job.status == JOB_RUNNING,
+            Job.lease_expires_at < now,
+            Job.attempts >= Job.max_attempts
+        ).update({
+            Job.status: JOB_FAILED,
+            Job.error: "Worker lease expired on the last attempt",
+            Job.finished_at: now
+        }, synchronize_session=False)
+        if exhausted:
+            db.commit()
+
+    def _finish(self, db: Session, job_id: int, worker_id: str, values: Dict[Any, Any]) -> bool:
+        values.setdefault(Job.finished_at, utcnow())
+        values[Job.lease_expires_at] = None
+        finished = db.query(Job).filter(
+            Job.id == job_id, Job.worker_id == worker_id, Job.status == JOB_RUNNING
+        ).update(values, synchronize_session=False)
+        db.commit()
+        return bool(finished)
+
+    @staticmethod
+    def to_dict(job: Job) -> Dict[str, Any]:
+        """
+        حالة المهمة كما يعرضها الـ API
+        """
+        def iso(value: Optional[datetime]) -> Optional[str]:
+            return value.isoformat() if value else None
+
+        return {
+            "id": job.id,
+            "job_type": job.job_type,
+            "status": job.status,
+            "priority": job.priority,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+            "run_after": iso(job.run_after),
+            "created_at": iso(job.created_at),
+            "started_at": iso(job.started_at),
+            "finished_at": iso(job.finished_at),
+            "schedule_id": job.schedule_id,
+            "result": job.result,
+            "error": job.error
+        }
+
+
+# إنشاء instance عام
+job_queue = JobQueue()
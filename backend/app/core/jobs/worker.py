@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+عامل المهام الخلفية: عملية منفصلة عن خادم الـ API تأخذ المهام من الطابور في قاعدة البيانات
+وتنفذها واحدة تلو الأخرى، وتنشئ مهام جداول cron عند مواعيدها.
+
+يمكن تشغيل عدة عمال على نفس قاعدة البيانات؛ كل مهمة يحجزها عامل واحد بإيجار يجدده أثناء
+التنفيذ، وإذا توقف العامل تعود المهمة للطابور بعد انتهاء الإيجار.
+
+التشغيل من مجلد backend:
+    python -m app.core.jobs.worker
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import date, datetime
+from typing import Any, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.database import SessionLocal
+from .handlers import JOB_HANDLERS, PermanentJobError
+from .queue import JobQueue, job_queue
+
+
+def _serializable(value: Any) -> Any:
+    """
+    تحويل نتيجة المهمة إلى بيانات JSON (أنواع numpy والتواريخ)
+    """
+    def default(item: Any) -> Any:
+        if isinstance(item, np.generic):
+            return item.item()
+        if isinstance(item, np.ndarray):
+            return item.tolist()
+        if isinstance(item, (datetime, date)):
+            return item.isoformat()
+        return str(item)
+    return json.loads(json.dumps(value, default=default))
+
+
+class JobWorker:
+    """
+    حلقة العامل: جداول cron، ثم حجز مهمة وتنفيذها مع تجديد الإيجار في خيط منفصل
+    """
+
+    def __init__(self, worker_id: str = None, poll_seconds: float = None, queue: JobQueue = None):
+        """
+        تهيئة العامل
+        """
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_seconds = settings.JOB_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.queue = queue or job_queue
+        self.stop_event = threading.Event()
+        self.processed = 0
+        self._last_purge = 0.0
+
+    def run(self) -> None:
+        """
+        تنفيذ المهام حتى الإيقاف (SIGTERM/SIGINT ينتظر انتهاء المهمة الحالية)
+        """
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.stop_event.set())
+        print(f"🛠️ Job worker {self.worker_id} started (poll every {self.poll_seconds}s)")
+        while not self.stop_event.is_set():
+            try:
+                worked = self.run_once()
+            except Exception as e:
+                # قاعدة البيانات مشغولة أو غير متاحة مؤقتاً
+                print(f"Error in job worker loop: {e}")
+                worked = False
+            if not worked:
+                self.stop_event.wait(self.poll_seconds)
+        print(f"Job worker {self.worker_id} stopped after {self.processed} jobs")
+
+    def run_once(self) -> bool:
+        """
+        دورة واحدة: إنشاء مهام الجداول المستحقة ثم تنفيذ مهمة واحدة إن وجدت
+        """
+        db = SessionLocal()
+        try:
+            self.queue.enqueue_due_schedules(db)
+            self._purge(db)
+            job = self.queue.claim(db, self.worker_id)
+            if job is None:
+                return False
+            job_id, job_type, payload = job.id, job.job_type, job.payload or {}
+        finally:
+            db.close()
+
+        self.execute(job_id, job_type, payload)
+        self.processed += 1
+        return True
+
+    def execute(self, job_id: int, job_type: str, payload: Any) -> None:
+        """
+        تنفيذ مهمة محجوزة وتسجيل نتيجتها
+        """
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, stop_heartbeat),
+                                     name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        start = time.perf_counter()
+        result: Optional[Any] = None
+        error: Optional[str] = None
+        retry = True
+        try:
+            handler = JOB_HANDLERS.get(job_type)
+            if handler is None:
+                raise PermanentJobError(f"Unknown job type: {job_type}")
+            result = _serializable(handler(payload))
+        except (PermanentJobError, ValueError, KeyError, TypeError) as e:
+            error, retry = f"{type(e).__name__}: {e}", False
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+
+        db = SessionLocal()
+        try:
+            if error is None:
+                recorded = self.queue.complete(db, job_id, self.worker_id, result)
+            else:
+                recorded = self.queue.fail(db, job_id, self.worker_id, error, retry=retry)
+        finally:
+            db.close()
+        status = "ok" if error is None else f"error ({error})"
+        print(f"Job {job_id} ({job_type}) finished in {time.perf_counter() - start:.2f}s: {status}"
+              + ("" if recorded else " [lease lost, result discarded]"))
+
+    def _heartbeat(self, job_id: int, stop: threading.Event) -> None:
+        """
+        تجديد الإيجار كل ثلث مدته حتى انتهاء المهمة
+        """
+        while not stop.wait(self.queue.lease_seconds / 3):
+            db = SessionLocal()
+            try:
+                if not self.queue.heartbeat(db, job_id, self.worker_id):
+                    print(f"Lost the lease on job {job_id}")
+                    return
+            except Exception as e:
+                print(f"Error renewing job lease: {e}")
+            finally:
+                db.close()
+
+    def _purge(self, db) -> None:
+        """
+        حذف المهام المنتهية القديمة مرة كل ساعة
+        """
+        if time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+        self.queue.purge_finished(db)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maestro background job worker")
+    parser.add_argument("--worker-id", default=None)
+    parser.add_argument("--poll", type=float, default=None, help="Seconds between polls when the queue is empty")
+    parser.add_argument("--once", action="store_true", help="Run at most one job and exit")
+    args = parser.parse_args()
+
+    # إنشاء جداول الطابور إذا بدأ العامل قبل خادم الـ API
+    from app.database import Base, engine
+    import app.models  # noqa: F401
+    Base.metadata.create_all(bind=engine)
+
+    worker = JobWorker(args.worker_id, args.poll)
+    if args.once:
+        worker.run_once()
+    else:
+        worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,6 @@
 from app.core.learning_loop.feedback import FeedbackProcessor
 from app.core.learning_loop.model_updater import ModelUpdater
+from app.core.learning_loop.model_evaluation import ModelEvaluator
+from app.core.learning_loop.incremental_learner import IncrementalLearner, incremental_learner
+from app.core.learning_loop.rollups import rebuild_feedback_rollups, sync_feedback_rollups
+from app.core.learning_loop.training_data import TrainingDataBuilder, load_shards
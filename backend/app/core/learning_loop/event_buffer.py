@@ -0,0 +1,235 @@
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import threading
+import time
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.campaign import Recommendation
+from app.models.interaction import UserInteraction
+from app.utils.metrics import metrics
+from .model_updater import queue_incremental_update
+
+
+class EventBufferFullError(RuntimeError):
+    """
+    المخزن المؤقت للأحداث ممتلئ (قاعدة البيانات لا تواكب معدل الاستقبال)
+    """
+
+
+class EventBuffer:
+    """
+    مخزن مؤقت في الذاكرة لأحداث التفاعل والتغذية الراجعة يكتبها خيط واحد إلى قاعدة البيانات
+    على دفعات: عند تجمع EVENT_FLUSH_SIZE حدثاً أو بعد EVENT_FLUSH_INTERVAL_MS من أقدم حدث.
+    - الأحداث تُسجل في user_interactions بإدخال مجمع واحد لكل دفعة
+    - أحداث feedback تُطبق أيضاً على التوصيات في نفس المعاملة (تحديث الإحصائيات المجمعة معها)
+    - عند امتلاء المخزن يتم رفض الدفعة الجديدة كاملة بدلاً من استهلاك الذاكرة بلا حد
+    - إذا فشلت الكتابة تعود الدفعة إلى بداية المخزن وتُعاد المحاولة
+    - close() عند إيقاف الخادم يكتب كل ما تبقى قبل الخروج
+    المخازن المشتقة تعيد تعريف _persist وأسماء المقاييس وخيط الكتابة.
+    """
+
+    thread_name = "maestro-event-writer"
+    metric_prefix = "event"
+
+    def __init__(self, capacity: int = None, flush_size: int = None, flush_interval_ms: float = None):
+        """
+        تهيئة المخزن (يبدأ خيط الكتابة عند أول حدث)
+        """
+        self.capacity = settings.EVENT_BUFFER_CAPACITY if capacity is None else capacity
+        self.flush_size = max(1, settings.EVENT_FLUSH_SIZE if flush_size is None else flush_size)
+        self.flush_interval = (settings.EVENT_FLUSH_INTERVAL_MS if flush_interval_ms is None else flush_interval_ms) / 1000.0
+        self._events: List[Dict[str, Any]] = []
+        self._oldest_at = 0.0
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.accepted = 0
+        self.written = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.errors = 0
+
+    def add(self, events: List[Dict[str, Any]]) -> int:
+        """
+        إضافة دفعة أحداث (كلها أو لا شيء). ترفع EventBufferFullError إذا لم يتسع لها المخزن
+        """
+        if not events:
+            return 0
+        self._ensure_worker()
+        with self._cond:
+            if self._closed:
+                raise EventBufferFullError("Event buffer is closed")
+            if len(self._events) + self._in_flight + len(events) > self.capacity:
+                self.rejected += len(events)
+                metrics.increment(f"{self.metric_prefix}s_rejected_total", len(events))
+                raise EventBufferFullError("Event buffer is full")
+            if not self._events:
+                self._oldest_at = time.monotonic()
+            self._events.extend(events)
+            self.accepted += len(events)
+            if len(self._events) >= self.flush_size:
+                self._cond.notify()
+        return len(events)
+
+    def flush(self) -> int:
+        """
+        كتابة كل الأحداث المعلقة الآن (من خيط المستدعي)
+        """
+        written = 0
+        while True:
+            batch = self._take(wait=False)
+            if not batch:
+                return written
+            count = self._write_batch(batch)
+            if not count:
+                return written
+            written += count
+
+    def close(self, timeout: float = 30.0) -> None:
+        """
+        إيقاف استقبال الأحداث وكتابة ما تبقى منها (عند إيقاف الخادم)
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        إحصائيات المخزن في هذه العملية
+        """
+        with self._cond:
+            pending = len(self._events) + self._in_flight
+        return {
+            "capacity": self.capacity,
+            "flush_size": self.flush_size,
+            "flush_interval_ms": self.flush_interval * 1000.0,
+            "pending": pending,
+            "accepted": self.accepted,
+            "written": self.written,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "mean_flush_size": self.written / self.flushes if self.flushes else 0,
+            "errors": self.errors,
+            "writer_alive": self._thread is not None and self._thread.is_alive()
+        }
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if not self._closed and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                self._thread.start()
+
+    def _take(self, wait: bool) -> List[Dict[str, Any]]:
+        """
+        أخذ الدفعة التالية من المخزن؛ مع wait ينتظر حتى تكتمل الدفعة أو تنتهي مهلة أقدم حدث
+        """
+        with self._cond:
+            if wait:
+                while not self._closed:
+                    if len(self._events) >= self.flush_size:
+                        break
+                    if self._events:
+                        remaining = self._oldest_at + self.flush_interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+            batch = self._events[:self.flush_size]
+            del self._events[:len(batch)]
+            self._in_flight += len(batch)
+            self._oldest_at = time.monotonic()
+            return batch
+
+    def _run(self) -> None:
+        """
+        حلقة خيط الكتابة حتى الإغلاق (close() تكتب ما يتبقى بعدها)
+        """
+        while True:
+            batch = self._take(wait=True)
+            if not batch:
+                return
+            if not self._write_batch(batch):
+                if self._closed:
+                    return
+                # قاعدة البيانات غير متاحة مؤقتاً: انتظار قبل المحاولة التالية
+                time.sleep(min(1.0, self.flush_interval))
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> int:
+        """
+        كتابة دفعة في معاملة واحدة؛ عند الفشل تعود الأحداث إلى بداية المخزن
+        """
+        start = time.perf_counter()
+        try:
+            with self._write_lock:
+                self._persist(batch)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error writing {self.metric_prefix} batch: {e}")
+            with self._cond:
+                self._events[:0] = batch
+                self._in_flight -= len(batch)
+            return 0
+
+        with self._cond:
+            self._in_flight -= len(batch)
+        self.written += len(batch)
+        self.flushes += 1
+        metrics.observe(f"{self.metric_prefix}_flush_size", len(batch))
+        metrics.observe(f"{self.metric_prefix}_flush_seconds", time.perf_counter() - start)
+        return len(batch)
+
+    def _persist(self, batch: List[Dict[str, Any]]) -> None:
+        db = SessionLocal()
+        try:
+            received_at = datetime.utcnow()
+            db.execute(insert(UserInteraction), [{
+                "user_id": event["user_id"],
+                "event_type": event["type"],
+                "campaign_id": event.get("campaign_id"),
+                "recommendation_id": event.get("recommendation_id"),
+                "payload": event.get("payload"),
+                "occurred_at": event.get("occurred_at") or received_at,
+                "received_at": received_at
+            } for event in batch])
+
+            # تطبيق التغذية الراجعة بالترتيب (الأحدث يكتب فوق الأقدم) عبر الـ ORM لتحديث الإحصائيات المجمعة
+            feedback = [event for event in batch if event["type"] == "feedback"]
+            rated_types = set()
+            if feedback:
+                ids = {event["recommendation_id"] for event in feedback}
+                recommendations = {
+                    rec.id: rec for rec in db.query(Recommendation).filter(Recommendation.id.in_(ids)).all()
+                }
+                for event in feedback:
+                    rec = recommendations.get(event["recommendation_id"])
+                    if rec is None:
+                        continue
+                    if "is_applied" in event:
+                        rec.is_applied = event["is_applied"]
+                    if "rating" in event:
+                        rec.feedback = event["rating"]
+                        rated_types.add(rec.recommendation_type)
+            db.commit()
+
+            for model_type in rated_types:
+                try:
+                    queue_incremental_update(db, model_type)
+                except Exception as e:
+                    print(f"Error queueing incremental update: {e}")
+        finally:
+            db.close()
+
+
+# إنشاء instance عام
+event_buffer = EventBuffer()
@@ -1,8 +1,10 @@
 from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from app.models.campaign import Recommendation
+from app.models.campaign import Campaign, Recommendation
+from app.models.feedback_rollup import FeedbackRollup
 
 class FeedbackProcessor:
     """
@@ -30,7 +32,7 @@ class FeedbackProcessor:
 
     def get_recommendation_feedback_stats(self, campaign_id: Optional[int] = None) -> Dict[str, Any]:
         """
-        الحصول على إحصائيات التغذية الراجعة للتوصيات
+        الحصول على إحصائيات التغذية الراجعة للتوصيات (من جدول الإحصائيات المجمعة)
         """
         stats = {
             "total_recommendations": 0,
@@ -41,63 +43,138 @@ class FeedbackProcessor:
         }
 
         if self.db:
-            query = self.db.query(Recommendation)
+            query = self.db.query(
+                FeedbackRollup.recommendation_type,
+                func.sum(FeedbackRollup.total),
+                func.sum(FeedbackRollup.applied),
+                func.sum(FeedbackRollup.rated),
+                func.sum(FeedbackRollup.rating_sum)
+            )
             if campaign_id:
-                query = query.filter(Recommendation.campaign_id == campaign_id)
-            recommendations = query.all()
+                query = query.filter(FeedbackRollup.campaign_id == campaign_id)
+            rows = query.group_by(FeedbackRollup.recommendation_type).all()
 
-            stats["total_recommendations"] = len(recommendations)
-
-            applied_count = 0
-            feedback_count = 0
             total_rating = 0
-            type_stats = {}
+            for rec_type, total, applied, rated, rating_sum in rows:
+                stats["total_recommendations"] += total
+                stats["applied_recommendations"] += applied
+                stats["feedback_received"] += rated
+                total_rating += rating_sum
+                stats["by_type"][rec_type] = {
+                    "total": total,
+                    "applied": applied,
+                    "feedback_received": rated,
+                    "average_rating": rating_sum / rated if rated > 0 else 0
+                }
 
-            for rec in recommendations:
-                if rec.is_applied:
-                    applied_count += 1
-                if rec.feedback:
-                    feedback_count += 1
-                    total_rating += rec.feedback
-
-                rec_type = rec.recommendation_type
-                if rec_type not in type_stats:
-                    type_stats[rec_type] = {
-                        "total": 0,
-                        "applied": 0,
-                        "feedback_received": 0,
-                        "average_rating": 0
-                    }
-
-                type_stats[rec_type]["total"] += 1
-                if rec.is_applied:
-                    type_stats[rec_type]["applied"] += 1
-                if rec.feedback:
-                    type_stats[rec_type]["feedback_received"] += 1
-                    type_stats[rec_type]["average_rating"] += rec.feedback
-
-            stats["applied_recommendations"] = applied_count
-            stats["feedback_received"] = feedback_count
+            feedback_count = stats["feedback_received"]
             stats["average_rating"] = total_rating / feedback_count if feedback_count > 0 else 0
 
-            for rec_type, type_data in type_stats.items():
-                if type_data["feedback_received"] > 0:
-                    type_data["average_rating"] = type_data["average_rating"] / type_data["feedback_received"]
-
-            stats["by_type"] = type_stats
-
         return stats
 
     def collect_user_interactions(self, user_id: int, interaction_data: Dict[str, Any]) -> bool:
         """
-        جمع تفاعلات المستخدم مع النظام (يمكن تخزينها لاحقًا في DB)
+        جمع تفاعل واحد للمستخدم مع النظام (يُكتب على دفعات عبر مخزن الأحداث)
+        """
+        event = {key: interaction_data[key] for key in ("campaign_id", "recommendation_id", "occurred_at")
+                 if key in interaction_data}
+        event["type"] = interaction_data.get("type") or interaction_data.get("event_type") or "interaction"
+        event["payload"] = {key: value for key, value in interaction_data.items()
+                            if key not in ("type", "event_type", "campaign_id", "recommendation_id", "occurred_at")}
+        return self.collect_events(user_id, [event])["accepted"] == 1
+
+    def collect_events(self, user_id: int, events: List[Any]) -> Dict[str, Any]:
+        """
+        التحقق من دفعة أحداث تفاعل وتغذية راجعة وإضافتها إلى مخزن الأحداث.
+        الأحداث غير الصالحة أو التي تشير إلى حملات/توصيات لا يملكها المستخدم تُرفض وحدها
+        """
+        # الاستيراد هنا لأن مخزن الأحداث يعتمد على model_updater الذي يستورد هذا الملف
+        from app.core.learning_loop.event_buffer import event_buffer
+
+        valid = []
+        rejected = []
+        for index, event in enumerate(events):
+            try:
+                valid.append((index, self._normalize_event(user_id, event)))
+            except (ValueError, TypeError) as e:
+                rejected.append({"index": index, "error": str(e)})
+
+        owned_recommendations = set()
+        owned_campaigns = set()
+        if self.db and valid:
+            recommendation_ids = {event["recommendation_id"] for _, event in valid if event.get("recommendation_id")}
+            campaign_ids = {event["campaign_id"] for _, event in valid if event.get("campaign_id")}
+            if recommendation_ids:
+                owned_recommendations = {rec_id for (rec_id,) in self.db.query(Recommendation.id).join(
+                    Campaign, Campaign.id == Recommendation.campaign_id
+                ).filter(Recommendation.id.in_(recommendation_ids), Campaign.user_id == user_id).all()}
+            if campaign_ids:
+                owned_campaigns = {campaign_id for (campaign_id,) in self.db.query(Campaign.id).filter(
+                    Campaign.id.in_(campaign_ids), Campaign.user_id == user_id
+                ).all()}
+
+        accepted = []
+        for index, event in valid:
+            if event.get("recommendation_id") and event["recommendation_id"] not in owned_recommendations:
+                rejected.append({"index": index, "error": "التوصية غير موجودة"})
+            elif event.get("campaign_id") and event["campaign_id"] not in owned_campaigns:
+                rejected.append({"index": index, "error": "الحملة غير موجودة"})
+            else:
+                accepted.append(event)
+
+        event_buffer.add(accepted)
+        return {
+            "accepted": len(accepted),
+            "rejected": sorted(rejected, key=lambda item: item["index"])
+        }
+
+    @staticmethod
+    def _normalize_event(user_id: int, event: Any) -> Dict[str, Any]:
+        """
+        تحويل حدث وارد إلى الصيغة المخزنة في المخزن المؤقت
         """
-        return True
+        if not isinstance(event, dict):
+            raise ValueError("يجب أن يكون الحدث كائن JSON")
+        event_type = event.get("type")
+        if not isinstance(event_type, str) or not event_type or len(event_type) > 64:
+            raise ValueError("نوع الحدث مطلوب")
 
-    def analyze_feedback_trends(self, days: int = 30) -> Dict[str, Any]:
+        normalized = {"user_id": user_id, "type": event_type}
+        for key in ("campaign_id", "recommendation_id"):
+            if event.get(key) is not None:
+                if isinstance(event[key], bool) or not isinstance(event[key], int):
+                    raise ValueError(f"{key} يجب أن يكون رقماً صحيحاً")
+                normalized[key] = event[key]
+        if "rating" in event:
+            rating = event["rating"]
+            if isinstance(rating, bool) or not isinstance(rating, int) or not 1 <= rating <= 5:
+                raise ValueError("التقييم يجب أن يكون رقماً صحيحاً من 1 إلى 5")
+            normalized["rating"] = rating
+        if "is_applied" in event:
+            if not isinstance(event["is_applied"], bool):
+                raise ValueError("is_applied يجب أن تكون true أو false")
+            normalized["is_applied"] = event["is_applied"]
+        if event_type == "feedback":
+            if "recommendation_id" not in normalized or not ("rating" in normalized or "is_applied" in normalized):
+                raise ValueError("حدث feedback يتطلب recommendation_id و rating أو is_applied")
+        if event.get("occurred_at"):
+            occurred_at = datetime.fromisoformat(str(event["occurred_at"]).replace("Z", "+00:00"))
+            if occurred_at.tzinfo is not None:
+                occurred_at = occurred_at.astimezone(timezone.utc).replace(tzinfo=None)
+            normalized["occurred_at"] = occurred_at
+        payload = event.get("payload") or {}
+        if not isinstance(payload, dict):
+            raise ValueError("payload يجب أن يكون كائن JSON")
+        # حفظ التقييم مع الحدث في السجل أيضاً
+        payload = {**payload, **{key: normalized[key] for key in ("rating", "is_applied") if key in normalized}}
+        normalized["payload"] = payload or None
+        return normalized
+
+    def analyze_feedback_trends(self, days: int = 30, bucket: str = "day") -> Dict[str, Any]:
         """
         تحليل اتجاهات التغذية الراجعة على مدار فترة زمنية
-        بدون أي بيانات افتراضية
+        بدون أي بيانات افتراضية. التجميع يومي أو أسبوعي (يبدأ الأسبوع يوم الاثنين)
+        حسب تاريخ إنشاء التوصية
         """
         trends = {
             "rating_trend": [],
@@ -108,51 +185,48 @@ class FeedbackProcessor:
         }
 
         if self.db:
-            start_date = datetime.now() - timedelta(days=days)
-            recommendations = self.db.query(Recommendation).filter(
-                Recommendation.created_at >= start_date
-            ).all()
-
-            if recommendations:
-                weekly_data = {}
-                for rec in recommendations:
-                    week_start = rec.created_at.replace(hour=0, minute=0, second=0, microsecond=0)
-                    week_key = week_start.strftime("%Y-%m-%d")
-
-                    if week_key not in weekly_data:
-                        weekly_data[week_key] = {
-                            "total_recommendations": 0,
-                            "applied_recommendations": 0,
-                            "total_rating": 0,
-                            "rated_recommendations": 0
-                        }
-
-                    weekly_data[week_key]["total_recommendations"] += 1
-                    if rec.is_applied:
-                        weekly_data[week_key]["applied_recommendations"] += 1
-                    if rec.feedback:
-                        weekly_data[week_key]["total_rating"] += rec.feedback
-                        weekly_data[week_key]["rated_recommendations"] += 1
-
-                for week_key, data in sorted(weekly_data.items()):
-                    avg_rating = data["total_rating"] / data["rated_recommendations"] if data["rated_recommendations"] > 0 else 0
-                    app_rate = data["applied_recommendations"] / data["total_recommendations"] if data["total_recommendations"] > 0 else 0
+            start_date = (datetime.now() - timedelta(days=days)).date()
+            rows = self.db.query(
+                FeedbackRollup.day,
+                func.sum(FeedbackRollup.total),
+                func.sum(FeedbackRollup.applied),
+                func.sum(FeedbackRollup.rated),
+                func.sum(FeedbackRollup.rating_sum)
+            ).filter(
+                FeedbackRollup.day >= start_date
+            ).group_by(FeedbackRollup.day).all()
+
+            if rows:
+                bucket_data = {}
+                for day, total, applied, rated, rating_sum in rows:
+                    if bucket == "week":
+                        day = day - timedelta(days=day.weekday())
+                    data = bucket_data.setdefault(day.strftime("%Y-%m-%d"), [0, 0, 0, 0.0])
+                    data[0] += total
+                    data[1] += applied
+                    data[2] += rated
+                    data[3] += rating_sum
+
+                for bucket_key, (total, applied, rated, rating_sum) in sorted(bucket_data.items()):
+                    avg_rating = rating_sum / rated if rated > 0 else 0
+                    app_rate = applied / total if total > 0 else 0
                     trends["rating_trend"].append({
-                        "date": week_key,
+                        "date": bucket_key,
                         "average_rating": round(avg_rating, 2)
                     })
                     trends["application_rate_trend"].append({
-                        "date": week_key,
+                        "date": bucket_key,
                         "application_rate": round(app_rate, 2)
                     })
 
-                total_rating = sum(rec.feedback for rec in recommendations if rec.feedback)
-                rated_count = sum(1 for rec in recommendations if rec.feedback)
-                applied_count = sum(1 for rec in recommendations if rec.is_applied)
+                total_count = sum(data[0] for data in bucket_data.values())
+                applied_count = sum(data[1] for data in bucket_data.values())
+                rated_count = sum(data[2] for data in bucket_data.values())
+                total_rating = sum(data[3] for data in bucket_data.values())
 
-                trends["total_feedback"] = len(recommendations)
+                trends["total_feedback"] = total_count
                 trends["average_rating"] = round(total_rating / rated_count, 2) if rated_count > 0 else 0
-                trends["application_rate"] = round(applied_count / len(recommendations), 2) if recommendations else 0
+                trends["application_rate"] = round(applied_count / total_count, 2) if total_count > 0 else 0
 
         return trends
 
@@ -177,4 +251,40 @@ class FeedbackProcessor:
                     "created_at": rec.created_at.isoformat()
                 })
 
-        return feedback_data
\ No newline at end of file
+        return feedback_data
+
+    def get_feedback_since(self, model_type: str, after_id: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        التغذية الراجعة على التوصيات بعد معرف معين بترتيب وصولها (للتحديث التدريجي)
+        """
+        feedback_data = []
+
+        if self.db:
+            recommendations = self.db.query(Recommendation).filter(
+                Recommendation.recommendation_type == model_type,
+                Recommendation.feedback.isnot(None),
+                Recommendation.id > after_id
+            ).order_by(Recommendation.id).limit(limit).all()
+
+            for rec in recommendations:
+                feedback_data.append({
+                    "recommendation_id": rec.id,
+                    "recommendation_data": rec.recommendation_data,
+                    "is_applied": rec.is_applied,
+                    "rating": rec.feedback,
+                    "created_at": rec.created_at.isoformat()
+                })
+
+        return feedback_data
+
+    def count_feedback_since(self, model_type: str, after_id: int = 0) -> int:
+        """
+        عدد التغذيات الراجعة بعد معرف معين
+        """
+        if not self.db:
+            return 0
+        return self.db.query(Recommendation).filter(
+            Recommendation.recommendation_type == model_type,
+            Recommendation.feedback.isnot(None),
+            Recommendation.id > after_id
+        ).count()
@@ -0,0 +1,104 @@
+from typing import Dict, Any, Optional
+import threading
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+from app.config import settings
+
+
+class IncrementalLearner:
+    """
+    تحديث النماذج تدريجياً بدفعات صغيرة من التغذية الراجعة بدلاً من إعادة التدريب الكامل:
+    - النماذج التي تدعم partial_fit يتم تحديثها مباشرة بكل دفعة
+    - الغابات العشوائية: تُضاف أشجار جديدة مدربة على الدفعة (warm_start) وتُحذف الأقدم عند
+      تجاوز الحد، فتبقى المعرفة السابقة في الأشجار القديمة
+    - التعزيز التدريجي: تُضاف مراحل جديدة تصحح أخطاء النموذج الحالي على الدفعة حتى الحد الأقصى
+    الميزات دائماً بمخطط الميزات الثابت (FeatureSchema) الذي يستخدمه التدريب والخدمة.
+    """
+
+    def __init__(self, batch_size: int = None, trees_per_batch: int = None, max_trees: int = None):
+        """
+        تهيئة المتعلم التدريجي
+        """
+        self.batch_size = max(1, settings.INCREMENTAL_BATCH_SIZE if batch_size is None else batch_size)
+        self.trees_per_batch = max(1, settings.INCREMENTAL_TREES_PER_BATCH if trees_per_batch is None else trees_per_batch)
+        self.max_trees = settings.INCREMENTAL_MAX_TREES if max_trees is None else max_trees
+        self._locks: Dict[str, threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+
+    def strategy(self, model: Any) -> Optional[str]:
+        """
+        طريقة التحديث التدريجي المناسبة للنموذج (None إذا كان يحتاج إعادة تدريب كاملة)
+        """
+        if hasattr(model, "partial_fit"):
+            return "partial_fit"
+        if isinstance(model, RandomForestRegressor):
+            return "forest_warm_start"
+        if isinstance(model, GradientBoostingRegressor) and model.n_estimators_ + self.trees_per_batch <= self.max_trees:
+            return "boosting_warm_start"
+        return None
+
+    def update(self, model: Any, X: np.ndarray, y: np.ndarray) -> str:
+        """
+        تحديث النموذج بدفعة واحدة (يتم تعديل النموذج نفسه) وإرجاع الطريقة المستخدمة
+        """
+        strategy = self.strategy(model)
+        if strategy == "partial_fit":
+            model.partial_fit(X, y)
+        elif strategy == "forest_warm_start":
+            model.set_params(warm_start=True, n_estimators=len(model.estimators_) + self.trees_per_batch)
+            model.fit(X, y)
+            if len(model.estimators_) > self.max_trees:
+                # نافذة منزلقة: الاحتفاظ بأحدث الأشجار فقط
+                model.estimators_ = model.estimators_[-self.max_trees:]
+                model.n_estimators = self.max_trees
+        elif strategy == "boosting_warm_start":
+            model.set_params(warm_start=True, n_estimators=model.n_estimators_ + self.trees_per_batch)
+            model.fit(X, y)
+        else:
+            raise ValueError(f"{type(model).__name__} cannot be updated incrementally")
+        return strategy
+
+    def consume(self, model: Any, X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+        """
+        تحديث النموذج بكل الدفعات الكاملة من البيانات بالترتيب. يتم تقييم كل دفعة قبل التدريب
+        عليها (تقييم تتابعي)، فتكون المقاييس على بيانات لم يرها النموذج بعد.
+        الصفوف المتبقية (أقل من دفعة كاملة) لا تُستهلك وتبقى للتحديث التالي.
+        """
+        batches = len(y) // self.batch_size
+        consumed = batches * self.batch_size
+        errors = np.empty(consumed)
+        strategies = set()
+        for batch in range(batches):
+            rows = slice(batch * self.batch_size, (batch + 1) * self.batch_size)
+            errors[rows] = y[rows] - model.predict(X[rows])
+            if self.strategy(model) is None:
+                # وصل التعزيز التدريجي إلى الحد الأقصى للمراحل
+                consumed = rows.start
+                errors = errors[:consumed]
+                break
+            strategies.add(self.update(model, X[rows], y[rows]))
+
+        metrics: Dict[str, Any] = {"batches": consumed // self.batch_size, "samples": consumed,
+                                   "strategies": sorted(strategies)}
+        if consumed:
+            target = y[:consumed]
+            total = np.sum((target - target.mean()) ** 2)
+            metrics.update({
+                "mse": float(np.mean(errors ** 2)),
+                "mae": float(np.mean(np.abs(errors))),
+                "r2": float(1 - np.sum(errors ** 2) / total) if total > 0 else 0.0
+            })
+        return metrics
+
+    def lock(self, model_type: str) -> threading.RLock:
+        """
+        قفل لكل نوع نموذج حتى لا يعمل تحديثان لنفس النموذج في نفس العملية
+        """
+        with self._locks_guard:
+            return self._locks.setdefault(model_type, threading.RLock())
+
+
+# إنشاء instance عام
+incremental_learner = IncrementalLearner()
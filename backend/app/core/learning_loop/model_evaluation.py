@@ -0,0 +1,175 @@
+from typing import Dict, Any, List, Optional, Tuple
+import copy
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import KFold, TimeSeriesSplit
+
+from app.config import settings
+
+
+def make_challenger(champion: Any) -> Any:
+    """
+    نسخة من النموذج الحالي للتدريب عليها دون المساس به: النماذج التدريجية (partial_fit) تكمل
+    من حالتها الحالية، والباقي بنفس المعاملات دون تدريب
+    """
+    if hasattr(champion, "partial_fit"):
+        return copy.deepcopy(champion)
+    challenger = clone(champion)
+    if getattr(challenger, "warm_start", False):
+        # نموذج سبق تحديثه تدريجياً: التدريب من الصفر وليس إضافة أشجار
+        challenger.set_params(warm_start=False)
+    return challenger
+
+
+def fit_challenger(challenger: Any, X: np.ndarray, y: np.ndarray, update_params: Dict[str, Any] = None) -> Any:
+    if hasattr(challenger, "partial_fit"):
+        challenger.partial_fit(X, y)
+    else:
+        challenger.fit(X, y, **(update_params or {}))
+    return challenger
+
+
+def regression_scores(y: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+    """
+    mse وmae وr2 لمجموعة تقييم
+    """
+    errors = y - y_pred
+    total = np.sum((y - np.mean(y)) ** 2)
+    return {
+        "mse": float(np.mean(errors ** 2)),
+        "mae": float(np.mean(np.abs(errors))),
+        "r2": float(1 - np.sum(errors ** 2) / total) if total > 0 else 0.0
+    }
+
+
+def _evaluate_fold(champion: Any, X: np.ndarray, y: np.ndarray, train: np.ndarray, test: np.ndarray,
+                   unseen: Optional[np.ndarray], update_params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    تدريب المنافس على جزء التدريب وتقييمه على جزء التقييم، ومقارنته بالنموذج الحالي (كما هو منشور)
+    على صفوف جزء التقييم التي لم يُدرَّب عليها النموذج الحالي (head_to_head)، وعلى كل صفوف الجزء (all_rows)
+    """
+    challenger = fit_challenger(make_challenger(champion), X[train], y[train], update_params)
+    predictions = challenger.predict(X[test])
+    result = {"challenger": regression_scores(y[test], predictions), "head_to_head": None, "all_rows": None}
+
+    try:
+        champion_predictions = champion.predict(X[test])
+    except Exception:
+        # النموذج الحالي لا يقبل هذه الميزات (مخطط قديم)
+        return result
+    result["all_rows"] = (y[test], predictions, champion_predictions)
+
+    rows = np.arange(len(test)) if unseen is None else np.flatnonzero(unseen[test])
+    if len(rows):
+        result["head_to_head"] = (y[test[rows]], predictions[rows], champion_predictions[rows])
+    return result
+
+
+def _pool(pairs: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return tuple(np.concatenate([pair[index] for pair in pairs]) for index in range(3))
+
+
+def _mean_scores(fold_scores: List[Dict[str, float]]) -> Dict[str, Any]:
+    return {
+        "mse": float(np.mean([scores["mse"] for scores in fold_scores])),
+        "mae": float(np.mean([scores["mae"] for scores in fold_scores])),
+        "r2": float(np.mean([scores["r2"] for scores in fold_scores])),
+        "fold_mse": [round(scores["mse"], 6) for scores in fold_scores]
+    }
+
+
+class ModelEvaluator:
+    """
+    تقييم نموذج منافس (challenger) مقابل النموذج الحالي (champion) على أجزاء تقييم لم يُدرَّب عليها المنافس:
+    - time: تقسيم زمني متوسع (TimeSeriesSplit)، كل جزء يُقيَّم بنموذج مدرب على ما قبله فقط
+    - kfold: تقسيم عشوائي ثابت البذرة إلى k أجزاء
+    الأجزاء تُنفذ بالتوازي (joblib). قرار الترقية يقارن النموذجين على نفس الصفوف من أجزاء التقييم،
+    مع استبعاد الصفوف التي دُرب عليها النموذج الحالي حتى لا تُقارن دقته عليها بدقة المنافس على بيانات جديدة.
+    إذا دُرب النموذج الحالي على كل الصفوف (بعد التحديثات التدريجية) تتم المقارنة على أحدث جزء تقييم
+    (أو كل الأجزاء في kfold)، وهي مقارنة لصالح النموذج الحالي. لا يُرقّى المنافس دون مقارنة إلا مع force.
+    """
+
+    def __init__(self, scheme: str = None, folds: int = None, n_jobs: int = None, min_improvement: float = None):
+        """
+        تهيئة المقيّم
+        """
+        self.scheme = (settings.MODEL_EVALUATION_SCHEME if scheme is None else scheme).lower()
+        if self.scheme not in ("time", "kfold"):
+            raise ValueError(f"Unknown evaluation scheme: {self.scheme}")
+        self.folds = max(2, settings.MODEL_EVALUATION_FOLDS if folds is None else folds)
+        self.n_jobs = settings.MODEL_EVALUATION_N_JOBS if n_jobs is None else n_jobs
+        self.min_improvement = settings.MODEL_PROMOTION_MIN_IMPROVEMENT if min_improvement is None else min_improvement
+
+    def splits(self, rows: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        أجزاء (التدريب، التقييم) للصفوف المرتبة زمنياً
+        """
+        splitter = TimeSeriesSplit(n_splits=self.folds) if self.scheme == "time" else \
+            KFold(n_splits=self.folds, shuffle=True, random_state=42)
+        return list(splitter.split(np.empty((rows, 1))))
+
+    def compare(self, champion: Any, X: np.ndarray, y: np.ndarray, update_params: Dict[str, Any] = None,
+                champion_seen: np.ndarray = None, force: bool = False) -> Dict[str, Any]:
+        """
+        مقارنة المنافس بالنموذج الحالي وقرار الترقية. champion_seen: قناع الصفوف التي دُرب عليها النموذج الحالي.
+        force: ترقية المنافس إذا تعذرت المقارنة (بيانات قليلة أو نموذج حالي لا يقبل الميزات)
+        """
+        rows = len(y)
+        if rows < max(settings.MODEL_EVALUATION_MIN_ROWS, self.folds + 1):
+            return {
+                "scheme": self.scheme,
+                "rows": rows,
+                "skipped": True,
+                "promoted": force,
+                "reason": f"Not enough rows for holdout evaluation ({rows})"
+                          + ("; promoted by force" if force else "; keeping the current model")
+            }
+
+        start = time.perf_counter()
+        unseen = None if champion_seen is None else ~np.asarray(champion_seen, dtype=bool)
+        results = Parallel(n_jobs=self.n_jobs)(
+            delayed(_evaluate_fold)(champion, X, y, train, test, unseen, update_params)
+            for train, test in self.splits(rows)
+        )
+        challenger = _mean_scores([result["challenger"] for result in results])
+
+        # مقارنة مباشرة على كل صفوف التقييم المشتركة من كل الأجزاء، وإلا على أحدث جزء تقييم
+        head_to_head = [result["head_to_head"] for result in results if result["head_to_head"] is not None]
+        compared_on = "unseen_rows"
+        if not head_to_head:
+            compared_on = "latest_fold" if self.scheme == "time" else "all_folds"
+            candidates = results[-1:] if self.scheme == "time" else results
+            head_to_head = [result["all_rows"] for result in candidates if result["all_rows"] is not None]
+        champion_scores = None
+        if head_to_head:
+            y_true, challenger_pred, champion_pred = _pool(head_to_head)
+            challenger["compared"] = regression_scores(y_true, challenger_pred)
+            champion_scores = regression_scores(y_true, champion_pred)
+            champion_scores["rows"] = len(y_true)
+            champion_scores["compared_on"] = compared_on
+
+        if champion_scores is None:
+            promoted = force
+            reason = ("No evaluation rows the current model can be compared on"
+                      + ("; promoted by force" if force else "; keeping the current model"))
+        else:
+            threshold = champion_scores["mse"] * (1 - self.min_improvement)
+            promoted = challenger["compared"]["mse"] <= threshold
+            reason = (f"Challenger MSE {challenger['compared']['mse']:.6f} "
+                      f"{'<=' if promoted else '>'} champion {champion_scores['mse']:.6f}"
+                      + (f" x (1 - {self.min_improvement})" if self.min_improvement else "")
+                      + f" on {champion_scores['rows']} holdout rows ({compared_on})")
+
+        return {
+            "scheme": self.scheme,
+            "folds": self.folds,
+            "rows": rows,
+            "challenger": challenger,
+            "champion": champion_scores,
+            "promoted": promoted,
+            "reason": reason,
+            "evaluation_seconds": time.perf_counter() - start
+        }
@@ -1,13 +1,23 @@
 from typing import Dict, Any, List, Optional, Tuple
 import numpy as np
-import pandas as pd
 import joblib
-import os
-from datetime import datetime
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
 
+from app.database import SessionLocal
+from app.models.job import Job
 from app.models.knowledge_base import MLModel
 from app.core.learning_loop.feedback import FeedbackProcessor
+from app.core.learning_loop.incremental_learner import incremental_learner
+from app.core.learning_loop.model_evaluation import ModelEvaluator, make_challenger
+from app.core.learning_loop.training_data import TrainingDataBuilder
+from app.core.strategic_mind.model_registry import model_registry
+from app.core.strategic_mind.feature_schema import get_schema
+from app.core.strategic_mind.artifact_store import artifact_store, collect_garbage
+from app.core.strategic_mind.feature_drift import build_reference, drift_report
+from app.core.jobs.queue import job_queue
 from app.config import settings
 
 
@@ -23,9 +33,14 @@ class ModelUpdater:
         self.db = db
         self.feedback_processor = FeedbackProcessor(db)
     
-    def update_model(self, model_type: str, update_params: Dict[str, Any] = None) -> Dict[str, Any]:
+    def update_model(self, model_type: str, update_params: Dict[str, Any] = None,
+                     full_retrain: bool = False, force: bool = False) -> Dict[str, Any]:
         """
-        تحديث نموذج التعلم الآلي بناءً على التغذية الراجعة
+        تحديث نموذج التعلم الآلي بناءً على التغذية الراجعة:
+        تدريجياً بالتغذية الراجعة الجديدة فقط إذا كان النموذج يدعم ذلك، وإلا بإعادة تدريب كاملة
+        لا يحل محل النموذج الحالي إلا إذا تفوق عليه في التقييم الخارجي (holdout).
+        full_retrain: إعادة تدريب كاملة حتى لو أمكن التحديث التدريجي (مثلاً عند انحراف الميزات)
+        force: ترقية المنافس إذا تعذرت مقارنته بالنموذج الحالي
         """
         # التحقق من وجود النموذج
         if self.db:
@@ -37,162 +52,269 @@ class ModelUpdater:
             if not model:
                 return {"success": False, "error": "Model not found"}
             
-            # الحصول على بيانات التغذية الراجعة
-            feedback_data = self.feedback_processor.get_feedback_for_model_update(model_type)
-            
-            if not feedback_data:
-                return {"success": False, "error": "No feedback data available"}
-            
-            # تحضير البيانات للتدريب
-            X, y = self._prepare_training_data(feedback_data, model_type)
-            
-            if X is None or y is None:
-                return {"success": False, "error": "Failed to prepare training data"}
-            
             # تحميل النموذج الحالي
             try:
                 current_model = joblib.load(model.model_path)
             except Exception as e:
                 return {"success": False, "error": f"Failed to load model: {str(e)}"}
+
+            # النموذج المدرب بترميز مختلف للميزات لا يُحدَّث تدريجياً، بل يعاد تدريبه كاملاً
+            schema = get_schema(model_type)
+            trained_vocabulary = (model.performance_metrics or {}).get("feature_vocabulary")
+            same_vocabulary = schema is None or trained_vocabulary in (None, schema.fingerprint())
+
+            if (settings.ENABLE_INCREMENTAL_LEARNING and not update_params and not full_retrain and same_vocabulary
+                    and incremental_learner.strategy(current_model) is not None):
+                with incremental_learner.lock(model_type):
+                    return self._update_incrementally(model, current_model)
             
-            # تحديث النموذج
-            try:
-                updated_model = self._update_model_with_data(current_model, X, y, update_params)
-            except Exception as e:
-                return {"success": False, "error": f"Failed to update model: {str(e)}"}
-            
-            # حفظ النموذج المحدث
-            new_version = self._increment_version(model.version)
-            new_model_path = os.path.join(
-                os.path.dirname(model.model_path),
-                f"{model_type}_{new_version}.joblib"
-            )
-            
-            try:
-                joblib.dump(updated_model, new_model_path)
-            except Exception as e:
-                return {"success": False, "error": f"Failed to save updated model: {str(e)}"}
-            
-            # تقييم النموذج المحدث
-            performance_metrics = self._evaluate_model(updated_model, X, y)
+            # بناء بيانات التدريب من أحدث التغذية الراجعة على دفعات (البيانات الكبيرة تُكتب في ملف mmap مؤقت)
+            with tempfile.TemporaryDirectory(prefix="maestro-training-") as spill_dir:
+                try:
+                    data = TrainingDataBuilder(self.db).build(model_type, settings.TRAINING_MAX_ROWS, spill_dir)
+                except Exception as e:
+                    print(f"Error preparing training data: {str(e)}")
+                    return {"success": False, "error": "Failed to prepare training data"}
+                
+                if not data["rows"]:
+                    return {"success": False, "error": "No feedback data available"}
+                X, y = data["X"], data["y"]
+                
+                # تقييم المنافس مقابل النموذج الحالي على أجزاء لم يُدرَّب عليها (بالتوازي)،
+                # باستثناء التغذية الراجعة التي دخلت في تدريب النموذج الحالي من المقارنة
+                trained_until = ((model.performance_metrics or {}).get("incremental") or {}).get("last_feedback_id")
+                champion_seen = data["ids"] <= trained_until if trained_until else None
+                try:
+                    evaluation = ModelEvaluator().compare(current_model, X, y, update_params, champion_seen, force)
+                except Exception as e:
+                    print(f"Error evaluating challenger model: {str(e)}")
+                    return {"success": False, "error": f"Failed to evaluate model: {str(e)}"}
+                
+                # تدريب المنافس على كل البيانات (نسخة، فالنموذج الحالي يبقى كما هو إذا لم يُرقَّ)
+                try:
+                    start = time.perf_counter()
+                    updated_model = self._update_model_with_data(make_challenger(current_model), X, y, update_params)
+                    training_seconds = time.perf_counter() - start
+                except Exception as e:
+                    return {"success": False, "error": f"Failed to update model: {str(e)}"}
+                
+                # مقاييس الإصدار من التقييم الخارجي، وإلا (بيانات قليلة) على بيانات التدريب نفسها
+                if evaluation.get("skipped"):
+                    performance_metrics = self._evaluate_model(updated_model, X, y)
+                else:
+                    performance_metrics = {
+                        name: evaluation["challenger"][name] for name in ("mse", "mae", "r2")
+                    }
+                
+                # توزيع الميزات في بيانات التدريب (تُقارن به الطلبات لاكتشاف الانحراف)
+                if schema is not None:
+                    performance_metrics["feature_reference"] = build_reference(schema, X, data["unseen_categories"])
             
-            # إنشاء نموذج جديد في قاعدة البيانات
-            new_model = MLModel(
-                name=f"{model.name} (v{new_version})",
-                description=f"Updated version of {model.name} based on user feedback",
-                model_type=model_type,
-                model_path=new_model_path,
-                features=model.features,
-                performance_metrics=performance_metrics,
-                version=new_version,
-                is_active=True
+            evaluation["min_improvement"] = settings.MODEL_PROMOTION_MIN_IMPROVEMENT
+            performance_metrics["evaluation"] = evaluation
+            performance_metrics["training_seconds"] = training_seconds
+            performance_metrics["training_data"] = {
+                "rows": data["rows"],
+                "skipped": data["skipped"],
+                "unseen_categories": data["unseen_categories"]
+            }
+            # التحديثات التدريجية التالية تبدأ بعد آخر تغذية راجعة دخلت في التدريب الكامل
+            performance_metrics["incremental"] = {
+                "last_feedback_id": int(data["ids"][-1]),
+                "samples_seen": 0,
+                "updates": 0,
+                "strategies": []
+            }
+            saved = self._save_version(model, updated_model, performance_metrics, promote=evaluation["promoted"])
+            if saved["success"]:
+                saved["promoted"] = evaluation["promoted"]
+                saved["reason"] = evaluation["reason"]
+            return saved
+        
+        return {"success": False, "error": "Database not available"}
+
+    def _update_incrementally(self, model: MLModel, current_model: Any) -> Dict[str, Any]:
+        """
+        استهلاك التغذية الراجعة التي وصلت بعد آخر تحديث بدفعات صغيرة وتحديث النموذج بها
+        دون إعادة تدريبه من الصفر
+        """
+        model_type = model.model_type
+        state = dict((model.performance_metrics or {}).get("incremental") or {})
+        feedback_data = self.feedback_processor.get_feedback_since(
+            model_type, state.get("last_feedback_id", 0), settings.INCREMENTAL_MAX_SAMPLES
+        )
+        if len(feedback_data) < incremental_learner.batch_size:
+            return {
+                "success": False,
+                "error": f"Not enough new feedback for an incremental update "
+                         f"({len(feedback_data)}/{incremental_learner.batch_size})"
+            }
+
+        X, y = self._prepare_training_data(feedback_data, model_type)
+        if X is None or y is None:
+            return {"success": False, "error": "Failed to prepare training data"}
+
+        try:
+            start = time.perf_counter()
+            result = incremental_learner.consume(current_model, X, y)
+            training_seconds = time.perf_counter() - start
+        except Exception as e:
+            return {"success": False, "error": f"Failed to update model: {str(e)}"}
+        if not result["samples"]:
+            return {"success": False, "error": "Model cannot take more incremental updates; run a full retrain"}
+
+        # مؤشر آخر تغذية راجعة مستهلكة ينتقل مع كل إصدار حتى لا تُستهلك مرتين
+        state.update({
+            "last_feedback_id": feedback_data[result["samples"] - 1]["recommendation_id"],
+            "samples_seen": state.get("samples_seen", 0) + result["samples"],
+            "updates": state.get("updates", 0) + result["batches"],
+            "strategies": result["strategies"]
+        })
+        performance_metrics = {
+            "mse": result.get("mse", 0.0),
+            "mae": result.get("mae", 0.0),
+            "r2": result.get("r2", 0.0),
+            "training_seconds": training_seconds,
+            "incremental": state
+        }
+        saved = self._save_version(model, current_model, performance_metrics)
+        if saved["success"]:
+            saved["consumed_feedback"] = result["samples"]
+            saved["pending_feedback"] = len(feedback_data) - result["samples"]
+        return saved
+
+    def _save_version(self, model: MLModel, updated_model: Any, performance_metrics: Dict[str, Any],
+                      promote: bool = True) -> Dict[str, Any]:
+        """
+        حفظ النموذج المحدث كإصدار جديد نشط ونشره في سجل النماذج؛ مع promote=False يُحفظ كمنافس
+        غير نشط للمراجعة ويبقى النموذج الحالي دون تغيير
+        """
+        model_type = model.model_type
+        # بصمة مفردات الترميز التي دُرب بها هذا الإصدار
+        performance_metrics["feature_vocabulary"] = get_schema(model_type).fingerprint()
+        # التحديث التدريجي لا يغير بيانات التدريب الأساسية: ملخص توزيعها ينتقل مع الإصدار
+        reference = (model.performance_metrics or {}).get("feature_reference")
+        if reference and "feature_reference" not in performance_metrics:
+            performance_metrics["feature_reference"] = reference
+
+        # حفظ النموذج المحدث في مخزن الملفات (اسم الملف بصمة محتواه، فلا يُكتب فوق ملف إصدار آخر)
+        new_version = self._increment_version(model.version)
+        if not promote:
+            # المنافس المرفوض لا يأخذ رقم الإصدار التالي، فقد يُرقّى منافس لاحق به؛ والمنافسون المتتالون
+            # على نفس الإصدار النشط يأخذون أرقاماً متزايدة (1.0.2-challenger.1، 1.0.2-challenger.2، ...)
+            rejected = self.db.query(MLModel).filter(
+                MLModel.model_type == model_type,
+                MLModel.version.like(f"{new_version}-challenger.%")
+            ).count()
+            new_version = f"{new_version}-challenger.{rejected + 1}"
+        
+        try:
+            artifact = artifact_store.put(
+                model_type, updated_model, get_schema(model_type).feature_names, version=new_version,
+                metadata={"promoted": promote}
             )
-            
-            # تعطيل النموذج القديم
+        except Exception as e:
+            return {"success": False, "error": f"Failed to save updated model: {str(e)}"}
+        new_model_path = artifact["path"]
+        
+        # إنشاء نموذج جديد في قاعدة البيانات
+        new_model = MLModel(
+            name=f"{model.name} (v{new_version})",
+            description=f"Updated version of {model.name} based on user feedback",
+            model_type=model_type,
+            model_path=new_model_path,
+            features=get_schema(model_type).feature_names,
+            performance_metrics=performance_metrics,
+            version=new_version,
+            is_active=promote
+        )
+        
+        # تعطيل النموذج القديم
+        if promote:
             model.is_active = False
-            
-            # حفظ التغييرات في قاعدة البيانات
-            self.db.add(new_model)
-            self.db.commit()
-            
+        
+        # حفظ التغييرات في قاعدة البيانات
+        self.db.add(new_model)
+        self.db.commit()
+        
+        if not promote:
             return {
                 "success": True,
                 "model_id": new_model.id,
                 "version": new_version,
+                "active_version": model.version,
                 "performance_metrics": performance_metrics
             }
         
-        return {"success": False, "error": "Database not available"}
+        # نشر الإصدار الجديد في سجل النماذج المشترك دون إعادة تحميله من القرص
+        model_registry.publish(
+            model_type,
+            updated_model,
+            features=new_model.features,
+            metadata={
+                "name": new_model.name,
+                "version": new_version,
+                "performance": performance_metrics
+            },
+            version=new_version,
+            path=new_model_path
+        )
+        self.collect_artifacts()
+        
+        return {
+            "success": True,
+            "model_id": new_model.id,
+            "version": new_version,
+            "performance_metrics": performance_metrics
+        }
+
+    def collect_artifacts(self) -> Optional[Dict[str, Any]]:
+        """
+        حذف ملفات الإصدارات القديمة من مخزن النماذج حسب سياسة الاحتفاظ، مع حماية النماذج النشطة
+        """
+        try:
+            return collect_garbage(self.db, artifact_store)
+        except Exception as e:
+            print(f"Error collecting model artifacts: {str(e)}")
+            return None
+
+    def pending_feedback(self, model_type: str) -> int:
+        """
+        عدد التغذيات الراجعة التي لم يستهلكها النموذج النشط بعد
+        """
+        if not self.db:
+            return 0
+        model = self.db.query(MLModel).filter(
+            MLModel.model_type == model_type,
+            MLModel.is_active == True
+        ).first()
+        if not model:
+            return 0
+        state = (model.performance_metrics or {}).get("incremental") or {}
+        return self.feedback_processor.count_feedback_since(model_type, state.get("last_feedback_id", 0))
     
     def _prepare_training_data(self, feedback_data: List[Dict[str, Any]], model_type: str) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
         """
         تحضير بيانات التدريب من التغذية الراجعة
+        يتم الترميز بنفس مخطط الميزات الذي يستخدمه محرك الاستدلال عند الخدمة
         """
         try:
-            # تحويل بيانات التغذية الراجعة إلى DataFrame
-            df = pd.DataFrame(feedback_data)
-            
-            # استخراج الميزات والأهداف بناءً على نوع النموذج
-            if model_type == "ctr_prediction":
-                # استخراج الميزات من بيانات التوصية
-                features = []
-                for data in df["recommendation_data"]:
-                    # استخراج الميزات ذات الصلة
-                    feature_dict = {}
-                    if "campaign" in data:
-                        feature_dict["industry"] = data["campaign"].get("industry", "unknown")
-                        feature_dict["channel"] = data["campaign"].get("channel", "unknown")
-                        feature_dict["audience_age"] = data["campaign"].get("audience_age", 0)
-                        feature_dict["budget"] = data["campaign"].get("budget", 0)
-                    features.append(feature_dict)
-                
-                features_df = pd.DataFrame(features)
-                
-                # تحويل الميزات النصية إلى متغيرات وهمية
-                features_df = pd.get_dummies(features_df, columns=["industry", "channel"])
-                
-                # استخدام التقييم كهدف
-                y = df["rating"].values
-                
-                # تحويل الميزات إلى مصفوفة
-                X = features_df.values
-                
-                return X, y
-            
-            elif model_type == "roi_prediction":
-                # استخراج الميزات من بيانات التوصية
-                features = []
-                for data in df["recommendation_data"]:
-                    # استخراج الميزات ذات الصلة
-                    feature_dict = {}
-                    if "campaign" in data:
-                        feature_dict["industry"] = data["campaign"].get("industry", "unknown")
-                        feature_dict["channel"] = data["campaign"].get("channel", "unknown")
-                        feature_dict["budget"] = data["campaign"].get("budget", 0)
-                        feature_dict["duration"] = data["campaign"].get("duration", 0)
-                    features.append(feature_dict)
-                
-                features_df = pd.DataFrame(features)
-                
-                # تحويل الميزات النصية إلى متغيرات وهمية
-                features_df = pd.get_dummies(features_df, columns=["industry", "channel"])
-                
-                # استخدام التقييم كهدف
-                y = df["rating"].values
-                
-                # تحويل الميزات إلى مصفوفة
-                X = features_df.values
-                
-                return X, y
-            
-            elif model_type == "channel_recommendation":
-                # استخراج الميزات من بيانات التوصية
-                features = []
-                for data in df["recommendation_data"]:
-                    # استخراج الميزات ذات الصلة
-                    feature_dict = {}
-                    if "campaign" in data:
-                        feature_dict["industry"] = data["campaign"].get("industry", "unknown")
-                        feature_dict["audience_age"] = data["campaign"].get("audience_age", 0)
-                        feature_dict["budget"] = data["campaign"].get("budget", 0)
-                    features.append(feature_dict)
-                
-                features_df = pd.DataFrame(features)
-                
-                # تحويل الميزات النصية إلى متغيرات وهمية
-                features_df = pd.get_dummies(features_df, columns=["industry"])
-                
-                # استخدام التقييم كهدف
-                y = df["rating"].values
-                
-                # تحويل الميزات إلى مصفوفة
-                X = features_df.values
-                
-                return X, y
-            
-            else:
+            schema = get_schema(model_type)
+            if schema is None:
                 # نوع نموذج غير معروف
                 return None, None
+
+            # استخراج بيانات الحملة من بيانات التوصية
+            campaigns = [
+                (data["recommendation_data"] or {}).get("campaign") or {}
+                for data in feedback_data
+            ]
+            X = schema.encode_batch(campaigns)
+
+            # استخدام التقييم كهدف
+            y = np.asarray([data["rating"] for data in feedback_data], dtype=float)
+
+            return X, y
         
         except Exception as e:
             print(f"Error preparing training data: {str(e)}")
@@ -213,6 +335,9 @@ class ModelUpdater:
             else:
                 # إعادة تدريب النموذج بالكامل
                 # يمكن دمج البيانات القديمة والجديدة هنا إذا لزم الأمر
+                if getattr(model, "warm_start", False):
+                    # نموذج سبق تحديثه تدريجياً: إعادة التدريب من الصفر وليس إضافة أشجار
+                    model.set_params(warm_start=False)
                 if update_params:
                     model.fit(X, y, **update_params)
                 else:
@@ -256,6 +381,9 @@ class ModelUpdater:
         زيادة رقم إصدار النموذج
         """
         try:
+            # منافس تمت ترقيته لاحقاً (عبر تجربة): الإصدار التالي يُبنى على رقمه الأساسي
+            version = version.split("-challenger")[0]
+
             # تقسيم الإصدار إلى أجزاء
             parts = version.split(".")
             
@@ -274,16 +402,100 @@ class ModelUpdater:
     
     def schedule_model_update(self, model_type: str, schedule: Dict[str, Any]) -> Dict[str, Any]:
         """
-        جدولة تحديث النموذج
+        جدولة تحديث النموذج في طابور المهام: "cron" لتحديث متكرر (مثلاً "0 3 * * 0" كل أحد الساعة 3 UTC)
+        أو "run_at" (تاريخ ISO) لتحديث واحد في وقت محدد. ينفذ التحديث عامل المهام الخلفية.
         """
-        # هذه الدالة يمكن أن تجدول تحديث النموذج في وقت محدد
-        # مثل تحديث النموذج كل أسبوع أو عند توفر عدد معين من التغذيات الراجعة
-        
-        # هذا مثال بسيط، يمكن توسيعه حسب احتياجات المشروع
-        
-        # نعيد معلومات الجدولة
-        return {
+        payload = {"model_type": model_type, "update_params": schedule.get("update_params")}
+        try:
+            if schedule.get("cron"):
+                job_schedule = job_queue.add_schedule(
+                    self.db, f"update_model:{model_type}", "update_model", schedule["cron"], payload,
+                    priority=schedule.get("priority", 0)
+                )
+                return {
+                    "success": True,
+                    "model_type": model_type,
+                    "schedule": schedule,
+                    "schedule_id": job_schedule.id,
+                    "next_update": job_schedule.next_run_at.isoformat()
+                }
+            if schedule.get("run_at"):
+                run_at = datetime.fromisoformat(schedule["run_at"])
+                if run_at.tzinfo is not None:
+                    run_at = run_at.astimezone(timezone.utc).replace(tzinfo=None)
+                job = job_queue.enqueue(self.db, "update_model", payload, priority=schedule.get("priority", 0),
+                                        run_after=run_at)
+                return {
+                    "success": True,
+                    "model_type": model_type,
+                    "schedule": schedule,
+                    "job_id": job.id,
+                    "next_update": job.run_after.isoformat()
+                }
+        except ValueError as e:
+            return {"success": False, "error": f"جدولة غير صالحة: {e}"}
+        return {"success": False, "error": "يجب تحديد cron أو run_at للجدولة"}
+
+
+def update_from_new_feedback(model_type: str) -> Optional[Dict[str, Any]]:
+    """
+    تحديث النموذج تدريجياً إذا تراكمت دفعة كاملة من التغذية الراجعة الجديدة
+    (تنفذها مهمة incremental_update في طابور المهام). يتم تجاهل الطلب إذا كان تحديث آخر
+    لنفس النموذج قيد التنفيذ، فالتغذية الراجعة تبقى للتحديث التالي.
+    """
+    if not settings.ENABLE_INCREMENTAL_LEARNING:
+        return None
+    lock = incremental_learner.lock(model_type)
+    if not lock.acquire(blocking=False):
+        return None
+    db = SessionLocal()
+    try:
+        updater = ModelUpdater(db)
+        if updater.pending_feedback(model_type) < incremental_learner.batch_size:
+            return None
+        result = updater.update_model(model_type)
+        if not result["success"]:
+            print(f"Incremental update of {model_type} skipped: {result['error']}")
+        return result
+    except Exception as e:
+        print(f"Error in incremental model update: {e}")
+        return None
+    finally:
+        db.close()
+        lock.release()
+
+
+def queue_incremental_update(db: Session, model_type: str) -> bool:
+    """
+    إضافة مهمة تحديث تدريجي إلى الطابور إذا تراكمت دفعة كاملة من التقييمات الجديدة
+    (مهمة واحدة نشطة لكل نموذج)
+    """
+    if not settings.ENABLE_INCREMENTAL_LEARNING:
+        return False
+    if ModelUpdater(db).pending_feedback(model_type) < incremental_learner.batch_size:
+        return False
+    job_queue.enqueue(db, "incremental_update", {"model_type": model_type},
+                      dedupe_key=f"incremental_update:{model_type}")
+    return True
+
+
+def queue_drift_retrain(db: Session, model_type: str) -> Dict[str, Any]:
+    """
+    فحص انحراف الميزات للإصدار النشط وإضافة مهمة إعادة تدريب كاملة إلى الطابور إذا تجاوز الحد
+    (مهمة واحدة على الأكثر لكل نموذج خلال DRIFT_RETRAIN_COOLDOWN_HOURS)
+    """
+    report = drift_report(db, model_type)
+    if report["status"] != "drifted" or not settings.DRIFT_AUTO_RETRAIN:
+        return report
+
+    dedupe_key = f"drift_retrain:{model_type}"
+    cutoff = datetime.utcnow() - timedelta(hours=settings.DRIFT_RETRAIN_COOLDOWN_HOURS)
+    recent = db.query(Job).filter(Job.dedupe_key == dedupe_key, Job.run_after >= cutoff).first()
+    if recent is None:
+        recent = job_queue.enqueue(db, "update_model", {
             "model_type": model_type,
-            "schedule": schedule,
-            "next_update": datetime.now().isoformat()
-        }
+            "full_retrain": True,
+            "reason": f"Feature drift score {report['score']:.3f} >= {report['threshold']}"
+        }, dedupe_key=dedupe_key)
+    report["retrain_job_id"] = recent.id
+    return report
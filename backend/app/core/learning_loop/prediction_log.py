@@ -0,0 +1,138 @@
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.experiment import ModelExperiment, PredictionLog
+from app.models.knowledge_base import CampaignPerformance
+from .event_buffer import EventBuffer
+
+
+class PredictionLogBuffer(EventBuffer):
+    """
+    مخزن مؤقت لسجلات تنبؤات التجارب، يُكتب إلى prediction_logs بإدخال مجمع واحد لكل دفعة
+    """
+
+    thread_name = "maestro-prediction-log-writer"
+    metric_prefix = "prediction_log"
+
+    def __init__(self, capacity: int = None, flush_size: int = None, flush_interval_ms: float = None):
+        super().__init__(
+            settings.PREDICTION_LOG_BUFFER_CAPACITY if capacity is None else capacity,
+            flush_size, flush_interval_ms
+        )
+
+    def _persist(self, batch: List[Dict[str, Any]]) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(insert(PredictionLog), batch)
+            db.commit()
+        finally:
+            db.close()
+
+
+def _latency_summary(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    latencies = np.asarray(values, dtype=float)
+    return {
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+
+def _error_summary(predictions: List[float], actuals: List[float]) -> Optional[Dict[str, float]]:
+    if not predictions:
+        return None
+    errors = np.asarray(predictions, dtype=float) - np.asarray(actuals, dtype=float)
+    return {
+        "rows": len(errors),
+        "mse": float(np.mean(errors ** 2)),
+        "mae": float(np.mean(np.abs(errors))),
+        "bias": float(np.mean(errors))
+    }
+
+
+def compare_experiment(db: Session, experiment: ModelExperiment) -> Dict[str, Any]:
+    """
+    مقارنة تنبؤات التجربة بالأداء الفعلي للحملات: لكل حملة يُستخدم آخر قياس في campaign_performance
+    بنفس اسم المقياس. في وضع shadow يُقارن الإصداران على نفس الطلبات، وفي وضع split يُقارن كل فريق
+    على الطلبات التي خدمها. الزمن يشمل كل الطلبات المسجلة، والدقة الطلبات التي لحملتها قياس فعلي فقط.
+    """
+    logs = db.query(
+        PredictionLog.arm, PredictionLog.campaign_id, PredictionLog.metric_name,
+        PredictionLog.served_prediction, PredictionLog.served_latency_ms,
+        PredictionLog.candidate_prediction, PredictionLog.candidate_latency_ms
+    ).filter(PredictionLog.experiment_id == experiment.id).all()
+
+    # آخر قياس فعلي لكل (حملة، مقياس) من الحملات الموجودة في السجل
+    campaign_ids = {log.campaign_id for log in logs if log.campaign_id is not None}
+    actuals: Dict[tuple, float] = {}
+    if campaign_ids:
+        latest = db.query(
+            CampaignPerformance.campaign_id, CampaignPerformance.metric_name,
+            func.max(CampaignPerformance.metric_date).label("metric_date")
+        ).filter(CampaignPerformance.campaign_id.in_(campaign_ids)).group_by(
+            CampaignPerformance.campaign_id, CampaignPerformance.metric_name
+        ).subquery()
+        rows = db.query(
+            CampaignPerformance.campaign_id, CampaignPerformance.metric_name, CampaignPerformance.metric_value
+        ).join(latest, (CampaignPerformance.campaign_id == latest.c.campaign_id)
+               & (CampaignPerformance.metric_name == latest.c.metric_name)
+               & (CampaignPerformance.metric_date == latest.c.metric_date)).all()
+        for campaign_id, metric_name, metric_value in rows:
+            if metric_value is not None:
+                actuals[(campaign_id, metric_name)] = metric_value
+
+    arms: Dict[str, Dict[str, List[float]]] = {}
+
+    def arm(name: str) -> Dict[str, List[float]]:
+        return arms.setdefault(name, {"latency": [], "predictions": [], "actuals": [], "requests": 0})
+
+    for log in logs:
+        actual = actuals.get((log.campaign_id, log.metric_name))
+        served = arm(log.arm)
+        served["requests"] += 1
+        if log.served_latency_ms is not None:
+            served["latency"].append(log.served_latency_ms)
+        if actual is not None and log.served_prediction is not None:
+            served["predictions"].append(log.served_prediction)
+            served["actuals"].append(actual)
+        if log.candidate_prediction is not None:
+            # تنبؤ المرشح في الخلفية على نفس الطلب
+            shadow = arm("candidate")
+            shadow["requests"] += 1
+            if log.candidate_latency_ms is not None:
+                shadow["latency"].append(log.candidate_latency_ms)
+            if actual is not None:
+                shadow["predictions"].append(log.candidate_prediction)
+                shadow["actuals"].append(actual)
+
+    return {
+        "experiment_id": experiment.id,
+        "model_type": experiment.model_type,
+        "mode": experiment.mode,
+        "fraction": experiment.fraction,
+        "status": experiment.status,
+        "logged_requests": len(logs),
+        "campaigns_with_actuals": len({campaign_id for campaign_id, _ in actuals}),
+        "arms": {
+            name: {
+                "requests": values["requests"],
+                "latency": _latency_summary(values["latency"]),
+                "accuracy": _error_summary(values["predictions"], values["actuals"])
+            }
+            for name, values in arms.items()
+        },
+        "generated_at": datetime.utcnow().isoformat()
+    }
+
+
+# إنشاء instance عام
+prediction_log_buffer = PredictionLogBuffer()
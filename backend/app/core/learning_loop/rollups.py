@@ -0,0 +1,160 @@
+"""
+صيانة جدول feedback_rollups: كل flush يضيف أو يعدل أو يحذف توصيات يطبق الفرق على صف
+(الحملة، نوع التوصية، اليوم) المقابل داخل نفس المعاملة، فتبقى الإحصائيات متسقة مع جدول
+التوصيات أياً كان المسار الذي كتب عليه. عند بدء الخادم يتم التحقق من تطابق المجاميع
+وإعادة بناء الجدول بـ GROUP BY واحد إذا اختلفت (قاعدة بيانات قديمة أو كتابة خارج التطبيق).
+"""
+from typing import Dict, Any, Optional, Tuple
+from datetime import date, datetime
+
+from sqlalchemy import Date, and_, case, cast, delete, event, func, insert, select, update
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from app.models.campaign import Recommendation
+from app.models.feedback_rollup import FeedbackRollup
+
+
+# الحقول التي تؤثر على الإحصائيات المجمعة
+_TRACKED_FIELDS = ("campaign_id", "recommendation_type", "created_at", "is_applied", "feedback")
+
+BucketKey = Tuple[Optional[int], Optional[str], date]
+
+
+def _bucket_day(created_at: Optional[datetime]) -> date:
+    # التوصيات الجديدة لم تُقرأ قيمة created_at الافتراضية من قاعدة البيانات بعد (CURRENT_TIMESTAMP بتوقيت UTC)
+    return (created_at or datetime.utcnow()).date()
+
+
+def _contribution(values: Dict[str, Any]) -> Tuple[BucketKey, Tuple[int, int, int, float]]:
+    """
+    مساهمة توصية واحدة في صف الإحصائيات: (المفتاح، (العدد، المطبقة، المقيّمة، مجموع التقييم))
+    """
+    rating = values["feedback"]
+    key = (values["campaign_id"], values["recommendation_type"], _bucket_day(values["created_at"]))
+    return key, (1, 1 if values["is_applied"] else 0, 0 if rating is None else 1, float(rating or 0))
+
+
+def _current_values(recommendation: Recommendation, loaded_only: bool = False) -> Dict[str, Any]:
+    if loaded_only:
+        state = sa_inspect(recommendation).dict
+        return {name: state.get(name) for name in _TRACKED_FIELDS}
+    return {name: getattr(recommendation, name) for name in _TRACKED_FIELDS}
+
+
+def _previous_values(recommendation: Recommendation) -> Dict[str, Any]:
+    """
+    قيم الحقول قبل التعديل الحالي (من سجل تغييرات الـ ORM)
+    """
+    attrs = sa_inspect(recommendation).attrs
+    values = {}
+    for name in _TRACKED_FIELDS:
+        history = attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif history.unchanged:
+            values[name] = history.unchanged[0]
+        else:
+            values[name] = getattr(recommendation, name)
+    return values
+
+
+def _accumulate(deltas: Dict[BucketKey, list], values: Dict[str, Any], sign: int) -> None:
+    key, contribution = _contribution(values)
+    bucket = deltas.setdefault(key, [0, 0, 0, 0.0])
+    for i, value in enumerate(contribution):
+        bucket[i] += sign * value
+
+
+@event.listens_for(Session, "after_flush")
+def _update_rollups(session: Session, flush_context) -> None:
+    """
+    تطبيق تغييرات التوصيات في هذا الـ flush على جدول الإحصائيات المجمعة
+    """
+    deltas: Dict[BucketKey, list] = {}
+    for obj in session.new:
+        if isinstance(obj, Recommendation):
+            _accumulate(deltas, _current_values(obj, loaded_only=True), 1)
+    for obj in session.dirty:
+        if isinstance(obj, Recommendation):
+            attrs = sa_inspect(obj).attrs
+            if any(attrs[name].history.has_changes() for name in _TRACKED_FIELDS):
+                _accumulate(deltas, _previous_values(obj), -1)
+                _accumulate(deltas, _current_values(obj), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Recommendation):
+            _accumulate(deltas, _previous_values(obj), -1)
+
+    if not deltas:
+        return
+    connection = session.connection()
+    table = FeedbackRollup.__table__
+    for (campaign_id, recommendation_type, day), (total, applied, rated, rating_sum) in deltas.items():
+        if not (total or applied or rated or rating_sum):
+            continue
+        bucket = and_(
+            table.c.campaign_id == campaign_id,
+            table.c.recommendation_type == recommendation_type,
+            table.c.day == day
+        )
+        updated = connection.execute(update(table).where(bucket).values(
+            total=table.c.total + total,
+            applied=table.c.applied + applied,
+            rated=table.c.rated + rated,
+            rating_sum=table.c.rating_sum + rating_sum
+        )).rowcount
+        if not updated:
+            connection.execute(insert(table).values(
+                campaign_id=campaign_id, recommendation_type=recommendation_type, day=day,
+                total=total, applied=applied, rated=rated, rating_sum=rating_sum
+            ))
+        elif total < 0:
+            connection.execute(delete(table).where(bucket, table.c.total <= 0))
+
+
+def rebuild_feedback_rollups(db: Session) -> int:
+    """
+    إعادة بناء جدول الإحصائيات المجمعة بالكامل من جدول التوصيات
+    """
+    created_at = func.coalesce(Recommendation.created_at, func.current_timestamp())
+    # CAST(... AS DATE) في SQLite يعيد السنة فقط كرقم
+    day = func.date(created_at) if db.get_bind().dialect.name == "sqlite" else cast(created_at, Date)
+    aggregated = select(
+        Recommendation.campaign_id,
+        Recommendation.recommendation_type,
+        day,
+        func.count(Recommendation.id),
+        func.coalesce(func.sum(case((Recommendation.is_applied == True, 1), else_=0)), 0),
+        func.count(Recommendation.feedback),
+        func.coalesce(func.sum(Recommendation.feedback), 0)
+    ).group_by(Recommendation.campaign_id, Recommendation.recommendation_type, day)
+
+    db.execute(delete(FeedbackRollup))
+    db.execute(insert(FeedbackRollup).from_select(
+        ["campaign_id", "recommendation_type", "day", "total", "applied", "rated", "rating_sum"], aggregated
+    ))
+    db.commit()
+    return db.query(FeedbackRollup).count()
+
+
+def sync_feedback_rollups(db: Session) -> bool:
+    """
+    التحقق من تطابق مجاميع الجدول المجمع مع جدول التوصيات وإعادة بنائه عند الاختلاف
+    """
+    expected = db.query(
+        func.count(Recommendation.id),
+        func.coalesce(func.sum(case((Recommendation.is_applied == True, 1), else_=0)), 0),
+        func.count(Recommendation.feedback),
+        func.coalesce(func.sum(Recommendation.feedback), 0)
+    ).one()
+    actual = db.query(
+        func.coalesce(func.sum(FeedbackRollup.total), 0),
+        func.coalesce(func.sum(FeedbackRollup.applied), 0),
+        func.coalesce(func.sum(FeedbackRollup.rated), 0),
+        func.coalesce(func.sum(FeedbackRollup.rating_sum), 0)
+    ).one()
+    if tuple(int(v) for v in expected) == tuple(int(v) for v in actual):
+        return False
+    buckets = rebuild_feedback_rollups(db)
+    print(f"Rebuilt feedback rollups: {expected[0]} recommendations in {buckets} buckets")
+    return True
@@ -0,0 +1,235 @@
+"""
+بناء بيانات التدريب من التغذية الراجعة في قاعدة البيانات على دفعات (yield_per) دون تحميل كل الصفوف:
+كل دفعة تُرمَّز بمخطط الميزات المشترك مع الخدمة مباشرة في مصفوفة float32 محجوزة مسبقاً
+(في الذاكرة، أو ملف .npy مفتوح بـ mmap للبيانات الكبيرة)، أو تُكتب كأجزاء (shards) على القرص
+مع ملف manifest يحفظ مفردات الترميز وبصمتها حتى لا تُخلط بيانات بترميزين مختلفين.
+"""
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from datetime import datetime
+import json
+import os
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.campaign import Recommendation
+from app.core.strategic_mind.feature_schema import FEATURE_DTYPE, FeatureSchema, get_schema
+
+
+MANIFEST_FILE = "manifest.json"
+
+# أقصى عدد قيم غير معروفة مختلفة تُحفظ لكل حقل في التقرير
+_MAX_UNSEEN_VALUES = 20
+
+
+def _merge_unseen(total: Dict[str, Dict[str, int]], chunk: Dict[str, Dict[str, int]]) -> None:
+    for field, counts in chunk.items():
+        merged = total.setdefault(field, {})
+        for value, count in counts.items():
+            if value in merged or len(merged) < _MAX_UNSEEN_VALUES:
+                merged[value] = merged.get(value, 0) + count
+
+
+class TrainingDataBuilder:
+    """
+    قراءة التغذية الراجعة المقيّمة لنوع نموذج بترتيب المعرفات وترميزها على دفعات
+    """
+
+    def __init__(self, db: Session, chunk_size: int = None):
+        """
+        تهيئة المنشئ
+        """
+        self.db = db
+        self.chunk_size = max(1, settings.TRAINING_CHUNK_SIZE if chunk_size is None else chunk_size)
+
+    def schema(self, model_type: str) -> FeatureSchema:
+        schema = get_schema(model_type)
+        if schema is None:
+            raise ValueError(f"No feature schema for model type: {model_type}")
+        return schema
+
+    def _query(self, model_type: str, after_id: int = 0, max_rows: int = None):
+        """
+        الصفوف المطلوبة بترتيب تصاعدي؛ مع max_rows يتم أخذ أحدث الصفوف فقط
+        """
+        query = self.db.query(
+            Recommendation.id, Recommendation.recommendation_data, Recommendation.feedback
+        ).filter(
+            Recommendation.recommendation_type == model_type,
+            Recommendation.feedback.isnot(None),
+            Recommendation.id > after_id
+        )
+        if max_rows:
+            # معرف أقدم صف ضمن أحدث max_rows صفاً
+            boundary = query.with_entities(Recommendation.id).order_by(
+                Recommendation.id.desc()
+            ).offset(max_rows - 1).limit(1).scalar()
+            if boundary is not None:
+                query = query.filter(Recommendation.id >= boundary)
+        return query.order_by(Recommendation.id)
+
+    def count(self, model_type: str, after_id: int = 0, max_rows: int = None) -> int:
+        return self._query(model_type, after_id, max_rows).count()
+
+    def iter_chunks(self, model_type: str, after_id: int = 0, max_rows: int = None) -> Iterator[Dict[str, Any]]:
+        """
+        دفعات مرمّزة: {"ids", "X", "y", "skipped", "unseen_categories"} بحجم chunk_size صف على الأكثر
+        """
+        schema = self.schema(model_type)
+        ids: List[int] = []
+        campaigns: List[Dict[str, Any]] = []
+        ratings: List[float] = []
+        for rec_id, data, rating in self._query(model_type, after_id, max_rows).yield_per(self.chunk_size):
+            ids.append(rec_id)
+            campaigns.append((data or {}).get("campaign") or {})
+            ratings.append(rating)
+            if len(ids) >= self.chunk_size:
+                yield self._encode_chunk(schema, ids, campaigns, ratings)
+                ids, campaigns, ratings = [], [], []
+        if ids:
+            yield self._encode_chunk(schema, ids, campaigns, ratings)
+
+    def build(self, model_type: str, max_rows: int = None, spill_dir: str = None) -> Dict[str, Any]:
+        """
+        مصفوفة تدريب كاملة (X, y). إذا زاد عدد الصفوف عن TRAINING_MEMMAP_ROWS وتم تحديد spill_dir
+        تُكتب X في ملف .npy مفتوح بـ mmap بدلاً من الذاكرة
+        """
+        schema = self.schema(model_type)
+        rows = self.count(model_type, max_rows=max_rows)
+        if spill_dir and rows > settings.TRAINING_MEMMAP_ROWS:
+            X = np.lib.format.open_memmap(
+                os.path.join(spill_dir, f"{model_type}_X.npy"), mode="w+", dtype=FEATURE_DTYPE,
+                shape=(rows, schema.width)
+            )
+        else:
+            X = schema.empty(rows)
+        y = np.empty(rows, dtype=float)
+        ids = np.empty(rows, dtype=np.int64)
+
+        filled = 0
+        skipped = 0
+        unseen: Dict[str, Dict[str, int]] = {}
+        for chunk in self.iter_chunks(model_type, max_rows=max_rows):
+            # صفوف أضيفت بعد العد تنتظر البناء التالي
+            size = min(len(chunk["ids"]), rows - filled)
+            X[filled:filled + size] = chunk["X"][:size]
+            y[filled:filled + size] = chunk["y"][:size]
+            ids[filled:filled + size] = chunk["ids"][:size]
+            filled += size
+            skipped += chunk["skipped"]
+            _merge_unseen(unseen, chunk["unseen_categories"])
+            if filled >= rows:
+                break
+
+        return {
+            "X": X[:filled],
+            "y": y[:filled],
+            "ids": ids[:filled],
+            "rows": filled,
+            "skipped": skipped,
+            "fingerprint": schema.fingerprint(),
+            "unseen_categories": unseen
+        }
+
+    def write_shards(self, model_type: str, directory: str, shard_rows: int = None,
+                     max_rows: int = None) -> Dict[str, Any]:
+        """
+        كتابة بيانات التدريب كأجزاء X-00000.npy وy-00000.npy وids-00000.npy مع manifest.json
+        (يُكتب الـ manifest أخيراً، فالمجلد بدونه غير مكتمل)
+        """
+        schema = self.schema(model_type)
+        shard_rows = max(1, settings.TRAINING_SHARD_ROWS if shard_rows is None else shard_rows)
+        os.makedirs(directory, exist_ok=True)
+
+        shards: List[Dict[str, Any]] = []
+        pending: List[Dict[str, Any]] = []
+        pending_rows = 0
+        skipped = 0
+        unseen: Dict[str, Dict[str, int]] = {}
+
+        def flush() -> None:
+            index = len(shards)
+            X = np.concatenate([chunk["X"] for chunk in pending])
+            y = np.concatenate([chunk["y"] for chunk in pending])
+            ids = np.concatenate([chunk["ids"] for chunk in pending])
+            names = {kind: f"{kind}-{index:05d}.npy" for kind in ("X", "y", "ids")}
+            np.save(os.path.join(directory, names["X"]), X)
+            np.save(os.path.join(directory, names["y"]), y)
+            np.save(os.path.join(directory, names["ids"]), ids)
+            shards.append({**names, "rows": len(ids), "first_id": int(ids[0]), "last_id": int(ids[-1])})
+
+        for chunk in self.iter_chunks(model_type, max_rows=max_rows):
+            skipped += chunk["skipped"]
+            _merge_unseen(unseen, chunk["unseen_categories"])
+            if not len(chunk["ids"]):
+                continue
+            pending.append(chunk)
+            pending_rows += len(chunk["ids"])
+            if pending_rows >= shard_rows:
+                flush()
+                pending, pending_rows = [], 0
+        if pending:
+            flush()
+
+        manifest = {
+            "model_type": model_type,
+            "created_at": datetime.utcnow().isoformat(),
+            "feature_names": schema.feature_names,
+            "vocabulary": schema.vocabulary(),
+            "fingerprint": schema.fingerprint(),
+            "rows": sum(shard["rows"] for shard in shards),
+            "skipped": skipped,
+            "unseen_categories": unseen,
+            "shards": shards
+        }
+        tmp_path = os.path.join(directory, f"{MANIFEST_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+        return manifest
+
+    def _encode_chunk(self, schema: FeatureSchema, ids: List[int], campaigns: List[Dict[str, Any]],
+                      ratings: List[float]) -> Dict[str, Any]:
+        """
+        ترميز دفعة؛ إذا فشل ترميزها كاملة يتم ترميز الصفوف واحداً واحداً وتخطي الصفوف التالفة
+        """
+        skipped = 0
+        try:
+            X = schema.encode_batch(campaigns)
+        except Exception:
+            keep = []
+            X = schema.empty(len(campaigns))
+            for row, campaign in enumerate(campaigns):
+                try:
+                    schema.encode_into(X, len(keep), campaign)
+                    keep.append(row)
+                except Exception:
+                    skipped += 1
+            X = X[:len(keep)]
+            ids = [ids[row] for row in keep]
+            ratings = [ratings[row] for row in keep]
+            campaigns = [campaigns[row] for row in keep]
+        return {
+            "ids": np.asarray(ids, dtype=np.int64),
+            "X": X,
+            "y": np.asarray(ratings, dtype=float),
+            "skipped": skipped,
+            "unseen_categories": schema.unseen_categories(campaigns)
+        }
+
+
+def load_shards(directory: str, model_type: str = None, mmap: bool = True) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    قراءة أجزاء بيانات التدريب (X, y) بالترتيب، بعد التحقق من أن مفرداتها تطابق مخطط الميزات الحالي
+    """
+    with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    model_type = model_type or manifest["model_type"]
+    schema = get_schema(model_type)
+    if schema is None or schema.fingerprint() != manifest["fingerprint"]:
+        raise ValueError(f"Training shards in {directory} were encoded with a different feature vocabulary")
+    mmap_mode = "r" if mmap else None
+    for shard in manifest["shards"]:
+        yield (np.load(os.path.join(directory, shard["X"]), mmap_mode=mmap_mode),
+               np.load(os.path.join(directory, shard["y"]), mmap_mode=mmap_mode))
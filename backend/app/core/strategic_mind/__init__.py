@@ -1,2 +1,4 @@
 from app.core.strategic_mind.knowledge_base import DynamicKnowledgeBase
 from app.core.strategic_mind.inference_engine import HybridInferenceEngine
+from app.core.strategic_mind.model_registry import ModelRegistry, model_registry
+from app.core.strategic_mind.inference_client import RemoteInferenceEngine, get_inference_engine
@@ -0,0 +1,283 @@
+"""
+مخزن ملفات النماذج المعنون بالمحتوى: كل نموذج يُحفظ باسم بصمة sha256 لمحتواه ({digest}.joblib)
+فلا يُكتب فوق ملف قد يقرأه عامل آخر، والنموذج المتطابق يُحفظ مرة واحدة فقط.
+- الكتابة في ملف مؤقت في نفس المجلد ثم os.replace، فيرى القارئ الملف كاملاً أو لا يراه
+- joblib بدون ضغط (التحميل دون فك ضغط، والمصفوفات تُفتح بـ mmap للقراءة فقط)، مع تصدير الأشجار
+  كمصفوفات في مجلد {digest}.flat بجانبه كما في بقية النماذج
+- manifest.json يسجل إصدارات كل نوع نموذج بترتيب إنشائها مع قائمة ميزاتها، ويُحدَّث بكتابة ذرية مع قفل ملف
+- أنواع النماذج مسجلة تحت مساحة مالكها ("db/ctr" لمحدث النماذج، "file/ctr" لـ MLModelManager)، لأن لكل مالك
+  ميزاته وترميزه ولا يجوز أن يحمّل أحدهما إصدارات الآخر أو تُحسب ضمن إصداراته المحتفظ بها
+- gc() تحذف الإصدارات القديمة حسب سياسة الاحتفاظ، عدا آخر ARTIFACT_KEEP_VERSIONS إصدارات وآخر إصدار مُرقّى
+  لكل نوع والنماذج المحمية؛ collect_garbage() تحمي النماذج النشطة في ml_models (كل عمليات الحذف تمر بها)
+- المنافسون غير المُرقّين (metadata.promoted = False) يُحفظون للمراجعة لكن latest() لا تعيدهم
+"""
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import joblib
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.knowledge_base import MLModel
+from .tree_ensemble import export_ensemble, flat_model_path
+
+try:
+    import fcntl
+except ImportError:  # Windows: بدون قفل بين العمليات
+    fcntl = None
+
+
+MANIFEST_FILE = "manifest.json"
+ARTIFACT_EXTENSION = ".joblib"
+
+# مساحات الأسماء بنفس أسماء مصادر سجل النماذج (DB_SOURCE وFILE_SOURCE)
+DB_NAMESPACE = "db"
+FILE_NAMESPACE = "file"
+
+# الملفات المؤقتة تُحذف بعد هذه المدة (كتابة توقفت في منتصفها)
+_ORPHAN_GRACE_SECONDS = 3600
+
+
+def _is_digest(name: str) -> bool:
+    return len(name) == 64 and all(char in "0123456789abcdef" for char in name)
+
+
+def _promoted(entry: Dict[str, Any]) -> bool:
+    return (entry.get("metadata") or {}).get("promoted", True) is not False
+
+
+def load_artifact(path: str) -> Any:
+    """
+    تحميل نموذج محفوظ بـ joblib للاستدلال؛ المصفوفات تُفتح بـ mmap للقراءة فقط إذا كان ARTIFACT_MMAP_LOAD مفعلاً
+    """
+    if settings.ARTIFACT_MMAP_LOAD and path.endswith(ARTIFACT_EXTENSION):
+        return joblib.load(path, mmap_mode="r")
+    return joblib.load(path)
+
+
+class ArtifactStore:
+    """
+    مخزن ملفات النماذج في مجلد واحد مع manifest للإصدارات
+    """
+
+    def __init__(self, root: str = None, namespace: str = DB_NAMESPACE):
+        """
+        تهيئة المخزن (يتم إنشاء المجلد عند أول كتابة). namespace: مساحة أنواع النماذج لهذا المالك،
+        وكل المساحات تشترك في نفس الملفات والـ manifest
+        """
+        self.root = root or settings.ARTIFACT_STORE_DIR or os.path.join(settings.ML_MODELS_PATH, "artifacts")
+        self.namespace = namespace
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, f"{digest}{ARTIFACT_EXTENSION}")
+
+    def key_for(self, model_type: str) -> str:
+        return f"{self.namespace}/{model_type}"
+
+    def put(self, model_type: str, model: Any, features: List[str] = None, version: str = None,
+            metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        حفظ نموذج وتسجيله كأحدث إصدار لنوعه. يعيد مدخل الـ manifest (digest, path, version, features, ...)
+        """
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f".tmp-{os.getpid()}-{uuid.uuid4().hex}{ARTIFACT_EXTENSION}")
+        try:
+            joblib.dump(model, tmp_path, compress=0)
+            digest = self._digest(tmp_path)
+            with open(tmp_path, "rb") as f:
+                os.fsync(f.fileno())
+            size = os.path.getsize(tmp_path)
+
+            path = self.path_for(digest)
+            with self._locked():
+                if os.path.exists(path):
+                    # نفس المحتوى محفوظ مسبقاً
+                    os.remove(tmp_path)
+                else:
+                    os.replace(tmp_path, path)
+                if not os.path.isdir(flat_model_path(path)):
+                    export_ensemble(model, path)
+
+                entry = {
+                    "digest": digest,
+                    "path": path,
+                    "version": version or digest[:12],
+                    "features": list(features) if features is not None else None,
+                    "size": size,
+                    "created_at": datetime.utcnow().isoformat(),
+                    "metadata": metadata or {}
+                }
+                manifest = self._read()
+                manifest["artifacts"].setdefault(self.key_for(model_type), []).append(entry)
+                self._write(manifest)
+            return entry
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def versions(self, model_type: str) -> List[Dict[str, Any]]:
+        """
+        إصدارات نوع نموذج من الأقدم إلى الأحدث
+        """
+        return list(self._read()["artifacts"].get(self.key_for(model_type), []))
+
+    def latest(self, model_type: str) -> Optional[Dict[str, Any]]:
+        """
+        أحدث إصدار مُرقّى محفوظ لنوع نموذج وملفه موجود (المنافسون المرفوضون لا يُحمّلون)
+        """
+        for entry in reversed(self.versions(model_type)):
+            if _promoted(entry) and os.path.exists(entry["path"]):
+                return entry
+        return None
+
+    def gc(self, protected: Iterable[str] = (), keep: int = None, retention_days: float = None) -> Dict[str, Any]:
+        """
+        حذف الإصدارات الأقدم من retention_days (ARTIFACT_RETENTION_DAYS) عدا آخر keep إصدارات لكل نوع
+        وآخر إصدار مُرقّى لكل نوع والملفات المحمية، في كل المساحات، ثم حذف الملفات غير المسجلة في الـ manifest.
+        يجب تمرير مسارات النماذج النشطة في protected (أو استخدام collect_garbage)
+        """
+        keep = max(1, settings.ARTIFACT_KEEP_VERSIONS if keep is None else keep)
+        retention_days = settings.ARTIFACT_RETENTION_DAYS if retention_days is None else retention_days
+        cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+        protected_names = {os.path.basename(path) for path in protected if path}
+
+        if not os.path.isdir(self.root):
+            return {"removed_versions": 0, "removed_files": 0, "freed_bytes": 0}
+
+        removed_versions = 0
+        with self._locked():
+            manifest = self._read()
+            for model_type, entries in manifest["artifacts"].items():
+                promoted = [index for index, entry in enumerate(entries) if _promoted(entry)]
+                latest_promoted = promoted[-1] if promoted else None
+                kept = [
+                    entry for index, entry in enumerate(entries)
+                    if index >= len(entries) - keep
+                    or index == latest_promoted
+                    or entry["created_at"] >= cutoff
+                    or os.path.basename(entry["path"]) in protected_names
+                ]
+                removed_versions += len(entries) - len(kept)
+                manifest["artifacts"][model_type] = kept
+            if removed_versions:
+                self._write(manifest)
+
+            # حذف الملفات التي لم يعد يشير إليها أي إصدار (الملف الواحد قد يشترك فيه أكثر من إصدار)
+            referenced = {
+                os.path.basename(entry["path"])
+                for entries in manifest["artifacts"].values() for entry in entries
+            } | protected_names
+            removed_files, freed = self._remove_unreferenced(referenced)
+
+        return {"removed_versions": removed_versions, "removed_files": removed_files, "freed_bytes": freed}
+
+    def _remove_unreferenced(self, referenced: set) -> Tuple[int, int]:
+        removed = 0
+        freed = 0
+        now = time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            base, extension = os.path.splitext(name)
+            if not name.startswith(".tmp-") and not _is_digest(base):
+                # ليست من ملفات المخزن
+                continue
+            if name.startswith(".tmp-"):
+                # كتابة لم تكتمل (قد تكون جارية في عملية أخرى قبل أخذ القفل)
+                if now - os.path.getmtime(path) < _ORPHAN_GRACE_SECONDS:
+                    continue
+            elif extension == ARTIFACT_EXTENSION:
+                if name in referenced:
+                    continue
+            elif extension == ".flat":
+                if f"{base}{ARTIFACT_EXTENSION}" in referenced:
+                    continue
+            else:
+                continue
+            try:
+                if os.path.isdir(path):
+                    freed += sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+                    shutil.rmtree(path)
+                else:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                removed += 1
+            except OSError as e:
+                print(f"Error removing model artifact {path}: {e}")
+        return removed, freed
+
+    @staticmethod
+    def _digest(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        artifacts = manifest.setdefault("artifacts", {})
+        # manifest قديم بدون مساحات: إصدارات محدث النماذج تحمل metadata.promoted دائماً
+        for model_type in [key for key in artifacts if "/" not in key]:
+            for entry in artifacts.pop(model_type):
+                namespace = DB_NAMESPACE if "promoted" in (entry.get("metadata") or {}) else FILE_NAMESPACE
+                artifacts.setdefault(f"{namespace}/{model_type}", []).append(entry)
+        return manifest
+
+    def _write(self, manifest: Dict[str, Any]) -> None:
+        tmp_path = f"{self.manifest_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    @contextmanager
+    def _locked(self):
+        """
+        قفل حصري على الـ manifest بين العمليات (عمال الخادم وعامل المهام)
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".manifest.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def collect_garbage(db: Session = None, store: ArtifactStore = None) -> Dict[str, Any]:
+    """
+    تشغيل gc() على مخزن مع حماية ملفات كل النماذج النشطة في ml_models (المخزن مشترك بين
+    محدث النماذج وMLModelManager، فلا يُحذف ملف نموذج نشط سجله أي منهما)
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        active_paths = [path for (path,) in db.query(MLModel.model_path).filter(MLModel.is_active == True)]
+    finally:
+        if own_session:
+            db.close()
+    return (store or artifact_store).gc(protected=active_paths)
+
+
+# إنشاء instance عام
+artifact_store = ArtifactStore(namespace=DB_NAMESPACE)
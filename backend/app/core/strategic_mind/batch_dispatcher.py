@@ -0,0 +1,144 @@
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.utils.metrics import metrics
+from .model_registry import predict_rows
+
+
+# عنصر في الطابور: (مدخل النموذج من السجل، صف الميزات، المستقبل، وقت الإضافة)
+_QueuedRow = Tuple[Dict[str, Any], np.ndarray, Future, float]
+
+
+class MicroBatchDispatcher:
+    """
+    موزع تنبؤات يجمع الطلبات المتزامنة التي تصل خلال نافذة زمنية قصيرة
+    (أو حتى عدد أقصى من الصفوف) ويقيّمها باستدعاء واحد للنموذج،
+    ثم يسلّم كل مستدعٍ نتيجته عبر Future.
+    """
+
+    def __init__(self, window_ms: float = None, max_batch_size: int = None):
+        """
+        تهيئة الموزع (يبدأ خيط المعالجة عند أول طلب)
+        """
+        self.window_seconds = (settings.MICRO_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.max_batch_size = max(1, settings.MICRO_BATCH_MAX_SIZE if max_batch_size is None else max_batch_size)
+        self._queue: "queue.Queue[_QueuedRow]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.max_observed_batch = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ENABLE_MICRO_BATCHING
+
+    def predict(self, entry: Dict[str, Any], row: np.ndarray, timeout: float = None) -> Any:
+        """
+        التنبؤ لصف واحد عبر الدفعة المشتركة (ينتظر حتى تتوفر النتيجة)
+        """
+        if timeout is None:
+            timeout = settings.MICRO_BATCH_TIMEOUT_SECONDS
+        return self.submit(entry, row).result(timeout=timeout)
+
+    def submit(self, entry: Dict[str, Any], row: np.ndarray) -> Future:
+        """
+        إضافة صف ميزات إلى الطابور وإرجاع Future لنتيجته
+        """
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((entry, np.asarray(row).reshape(-1), future, time.perf_counter()))
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        إحصائيات الموزع في هذه العملية
+        """
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window_seconds * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self._queue.qsize(),
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0,
+            "max_observed_batch": self.max_observed_batch,
+            "errors": self.errors,
+            "worker_alive": self._thread is not None and self._thread.is_alive()
+        }
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="maestro-micro-batch", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """
+        حلقة خيط المعالجة: انتظار أول صف ثم تجميع ما يصل حتى انتهاء النافذة أو امتلاء الدفعة
+        """
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0][3] + self.window_seconds
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                print(f"Error in micro-batch dispatch: {e}")
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _dispatch(self, batch: List[_QueuedRow]) -> None:
+        """
+        تقييم الدفعة: استدعاء واحد لكل نموذج (قد تختلف النماذج إذا تغير السجل أثناء النافذة)
+        """
+        metrics.observe("inference_queue_depth", self._queue.qsize())
+
+        groups: Dict[int, List[_QueuedRow]] = {}
+        for item in batch:
+            groups.setdefault(id(item[0]), []).append(item)
+
+        for items in groups.values():
+            entry = items[0][0]
+            model_type = entry.get("model_type") or "unknown"
+            dispatched_at = time.perf_counter()
+            for _, _, _, queued_at in items:
+                metrics.observe("inference_batch_wait_seconds", dispatched_at - queued_at, model=model_type)
+            metrics.observe("inference_batch_size", len(items), model=model_type)
+
+            try:
+                predictions = predict_rows(entry, np.vstack([row for _, row, _, _ in items]))
+            except Exception as e:
+                self.errors += 1
+                for _, _, future, _ in items:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.rows += len(items)
+            self.max_observed_batch = max(self.max_observed_batch, len(items))
+            for (_, _, future, _), prediction in zip(items, predictions):
+                future.set_result(prediction)
+
+
+# إنشاء instance عام
+batch_dispatcher = MicroBatchDispatcher()
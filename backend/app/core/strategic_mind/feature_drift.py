@@ -0,0 +1,383 @@
+"""
+مراقبة انحراف الميزات في طلبات التنبؤ دون تخزين بيانات الطلبات:
+- عند التدريب الكامل يُحفظ ملخص لتوزيع كل ميزة في بيانات التدريب مع الإصدار (performance_metrics.feature_reference):
+  مدرج بحدود المئينات للميزات الرقمية (الميزانية، العمر...) وعدد مرات كل فئة للميزات النصية (الصناعة، القناة...)
+  مع فئة للقيم غير الموجودة في المفردات
+- كل عملية تحدّث عدادات ثابتة الحجم بنفس الحدود لكل طلب تنبؤ، وتكتبها كل DRIFT_FLUSH_SECONDS
+  كصف في feature_drift_sketches ثم تصفّرها (العدادات تُجمع بين العمليات والفترات بالجمع)
+- الانحراف لكل ميزة هو مؤشر ثبات المجتمع (PSI) بين توزيع الطلبات في آخر DRIFT_WINDOW_HOURS وتوزيع التدريب،
+  ودرجة النموذج أعلى قيمة بين ميزاته
+"""
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from bisect import bisect_right
+from datetime import datetime, timedelta
+import os
+import random
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.feature_drift import FeatureDriftSketch
+from app.models.knowledge_base import MLModel
+from .feature_schema import FeatureSchema
+
+
+# فئة القيم النصية غير الموجودة في مفردات الترميز
+UNKNOWN_CATEGORY = "__unknown__"
+
+# أقل نسبة لأي فترة عند حساب PSI (الفترات الفارغة تجعل اللوغاريتم لانهائياً)
+_PSI_FLOOR = 1e-4
+
+
+def build_reference(schema: FeatureSchema, X: np.ndarray, unseen_categories: Dict[str, Dict[str, int]] = None,
+                    bins: int = None) -> Dict[str, Any]:
+    """
+    ملخص توزيع الميزات في مصفوفة التدريب (مرمّزة بنفس المخطط). unseen_categories: القيم غير الموجودة
+    في المفردات التي رُمّزت برمز unknown، كما يعيدها TrainingDataBuilder
+    """
+    bins = max(2, settings.DRIFT_HISTOGRAM_BINS if bins is None else bins)
+    columns = []
+    for index, column in enumerate(schema.vocabulary()["columns"]):
+        values = np.asarray(X[:, index], dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if column.get("kind") == "categorical":
+            categories, positions = _categories(column)
+            counts = [0] * len(categories)
+            code_positions = {code: positions[key] for key, code in reversed(list(column["codes"].items()))}
+            for code, count in zip(*np.unique(values, return_counts=True)):
+                counts[code_positions.get(int(code), len(categories) - 1)] += int(count)
+            # القيم غير الموجودة في المفردات رُمّزت بنفس رمز إحدى الفئات: نقلها إلى فئة unknown
+            unseen = sum((unseen_categories or {}).get(column["field"], {}).values())
+            position = code_positions.get(column["unknown"])
+            if unseen and position is not None:
+                moved = min(unseen, counts[position])
+                counts[position] -= moved
+                counts[-1] += moved
+            columns.append({"name": column["name"], "kind": "categorical", "categories": categories, "counts": counts})
+        else:
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])) if len(values) else np.array([])
+            counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+            columns.append({"name": column["name"], "kind": "histogram", "edges": edges.tolist(),
+                            "counts": counts.tolist()})
+    return {
+        "fingerprint": schema.fingerprint(),
+        "rows": int(len(X)),
+        "columns": columns,
+        "created_at": datetime.utcnow().isoformat()
+    }
+
+
+def _categories(column: Dict[str, Any]) -> Tuple[List[str], Dict[str, int]]:
+    categories = list(column["codes"]) + [UNKNOWN_CATEGORY]
+    return categories, {category: position for position, category in enumerate(categories)}
+
+
+def population_stability_index(expected: Sequence[float], actual: Sequence[float]) -> float:
+    """
+    PSI بين توزيعين على نفس الفترات: أقل من 0.1 مستقر، وأكثر من 0.25 انحراف كبير
+    """
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    if expected.sum() <= 0 or actual.sum() <= 0:
+        return 0.0
+    expected = np.maximum(expected / expected.sum(), _PSI_FLOOR)
+    actual = np.maximum(actual / actual.sum(), _PSI_FLOOR)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class FeatureSketch:
+    """
+    عدادات توزيع الميزات في الطلبات لإصدار نموذج واحد، بحدود ملخص التدريب الخاص به
+    """
+
+    def __init__(self, schema: FeatureSchema, reference: Dict[str, Any]):
+        """
+        تهيئة العدادات بحجم ثابت من ملخص التدريب
+        """
+        self.schema = schema
+        vocabulary = schema.vocabulary()["columns"]
+        self._columns = []
+        for column, summary in zip(vocabulary, reference["columns"]):
+            if summary["kind"] == "categorical":
+                _, positions = _categories(column)
+                self._columns.append(("categorical", column, positions))
+            else:
+                self._columns.append(("histogram", column, summary["edges"]))
+        self._lock = threading.Lock()
+        self._counts = [[0] * len(summary["counts"]) for summary in reference["columns"]]
+        self.observations = 0
+
+    def observe(self, campaign: Dict[str, Any]) -> bool:
+        """
+        إضافة طلب واحد إلى العدادات (الطلبات التي لا يمكن ترميزها تُتجاهل)
+        """
+        try:
+            values = self.schema.encode(campaign)
+            positions = []
+            for index, (kind, column, spec) in enumerate(self._columns):
+                if kind == "categorical":
+                    value = campaign.get(column["field"], column["default"])
+                    key = value.lower() if column["lower"] and isinstance(value, str) else value
+                    positions.append(spec.get(key, len(spec) - 1))
+                else:
+                    positions.append(bisect_right(spec, float(values[index])))
+        except Exception:
+            return False
+        with self._lock:
+            for column, position in enumerate(positions):
+                self._counts[column][position] += 1
+            self.observations += 1
+        return True
+
+    def take(self) -> Tuple[int, List[List[int]]]:
+        """
+        العدادات المتراكمة منذ آخر استدعاء، مع تصفيرها
+        """
+        with self._lock:
+            observations, counts = self.observations, self._counts
+            self._counts = [[0] * len(column) for column in counts]
+            self.observations = 0
+        return observations, counts
+
+    def restore(self, observations: int, counts: List[List[int]]) -> None:
+        """
+        إعادة عدادات لم تُكتب (فشل الكتابة في قاعدة البيانات)
+        """
+        with self._lock:
+            for column, values in enumerate(counts):
+                for position, count in enumerate(values):
+                    self._counts[column][position] += count
+            self.observations += observations
+
+
+def drift_report(db: Session, model_type: str) -> Dict[str, Any]:
+    """
+    انحراف الميزات للإصدار النشط من نموذج: PSI لكل ميزة بين طلبات آخر DRIFT_WINDOW_HOURS وبيانات تدريبه
+    """
+    model = db.query(MLModel).filter(MLModel.model_type == model_type, MLModel.is_active == True).first()
+    if not model:
+        return {"model_type": model_type, "status": "no_model"}
+    report = {"model_type": model_type, "version": model.version}
+    reference = (model.performance_metrics or {}).get("feature_reference")
+    if not reference:
+        # إصدار دُرب قبل حفظ ملخص التدريب: تبدأ المراقبة بعد إعادة التدريب الكامل التالية
+        report["status"] = "no_reference"
+        return report
+
+    cutoff = datetime.utcnow() - timedelta(hours=settings.DRIFT_WINDOW_HOURS)
+    rows = db.query(FeatureDriftSketch.observations, FeatureDriftSketch.counts).filter(
+        FeatureDriftSketch.model_type == model_type,
+        FeatureDriftSketch.model_version == model.version,
+        FeatureDriftSketch.created_at >= cutoff
+    ).all()
+
+    totals = [np.zeros(len(column["counts"])) for column in reference["columns"]]
+    observations = 0
+    for row_observations, counts in rows:
+        if len(counts) != len(totals) or any(len(values) != len(total) for values, total in zip(counts, totals)):
+            continue
+        observations += row_observations
+        for total, values in zip(totals, counts):
+            total += values
+
+    columns = [
+        {"name": column["name"], "psi": population_stability_index(column["counts"], total)}
+        for column, total in zip(reference["columns"], totals)
+    ]
+    score = max((column["psi"] for column in columns), default=0.0)
+    if observations < settings.DRIFT_MIN_OBSERVATIONS:
+        status = "insufficient_data"
+    else:
+        status = "drifted" if score >= settings.DRIFT_PSI_THRESHOLD else "ok"
+    report.update({
+        "status": status,
+        "score": score,
+        "threshold": settings.DRIFT_PSI_THRESHOLD,
+        "observations": observations,
+        "min_observations": settings.DRIFT_MIN_OBSERVATIONS,
+        "window_hours": settings.DRIFT_WINDOW_HOURS,
+        "training_rows": reference.get("rows"),
+        "columns": columns
+    })
+    return report
+
+
+class DriftMonitor:
+    """
+    ملخصات الميزات في طلبات التنبؤ لهذه العملية، مع خيط يكتبها دورياً ويفحص الانحراف
+    """
+
+    def __init__(self, sample_rate: float = None, flush_seconds: float = None, check_seconds: float = None):
+        """
+        تهيئة المراقب (يبدأ خيط الكتابة مع أول ملخص)
+        """
+        self.enabled = settings.ENABLE_FEATURE_DRIFT
+        self.sample_rate = settings.DRIFT_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.flush_seconds = settings.DRIFT_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.check_seconds = settings.DRIFT_CHECK_SECONDS if check_seconds is None else check_seconds
+        self._sketches: Dict[Tuple[str, str], Optional[FeatureSketch]] = {}
+        self._model_types = set()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_check = time.monotonic()
+        self.flushes = 0
+        self.errors = 0
+
+    def observe(self, model_type: str, model: Optional[Dict[str, Any]], campaigns: Sequence[Dict[str, Any]]) -> None:
+        """
+        إضافة طلبات إلى ملخص الإصدار الذي يخدمها (مدخل من سجل النماذج)
+        """
+        if not self.enabled or model is None:
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        sketch = self._sketch(model_type, model)
+        if sketch is None:
+            return
+        for campaign in campaigns:
+            sketch.observe(campaign)
+
+    def flush(self) -> int:
+        """
+        كتابة العدادات المتراكمة كصفوف في feature_drift_sketches وحذف الصفوف الأقدم من نافذة المقارنة
+        """
+        with self._lock:
+            pending = [(key, sketch) for key, sketch in self._sketches.items() if sketch is not None]
+        deltas = []
+        for key, sketch in pending:
+            observations, counts = sketch.take()
+            if observations:
+                deltas.append((key, sketch, observations, counts))
+            else:
+                # إصدار لم يعد يخدم طلبات: يُعاد إنشاء ملخصه إذا عاد
+                with self._lock:
+                    if self._sketches.get(key) is sketch and not sketch.observations:
+                        del self._sketches[key]
+        if not deltas:
+            return 0
+
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            db.execute(insert(FeatureDriftSketch), [{
+                "model_type": model_type,
+                "model_version": version,
+                "observations": observations,
+                "counts": counts,
+                "created_at": now
+            } for (model_type, version), _, observations, counts in deltas])
+            db.query(FeatureDriftSketch).filter(
+                FeatureDriftSketch.created_at < now - timedelta(hours=settings.DRIFT_WINDOW_HOURS)
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            self.errors += 1
+            print(f"Error writing feature drift sketches: {e}")
+            for _, sketch, observations, counts in deltas:
+                sketch.restore(observations, counts)
+            return 0
+        finally:
+            db.close()
+        self.flushes += 1
+        return len(deltas)
+
+    def check(self) -> List[Dict[str, Any]]:
+        """
+        فحص الانحراف لكل نموذج راقبته هذه العملية، مع إضافة مهمة إعادة تدريب للنماذج المنحرفة
+        """
+        # حلقة التعلم تستورد هذه الحزمة، فيُستورد محدث النماذج عند الاستخدام فقط
+        from app.core.learning_loop.model_updater import queue_drift_retrain
+
+        reports = []
+        db = SessionLocal()
+        try:
+            for model_type in sorted(self._model_types):
+                try:
+                    reports.append(queue_drift_retrain(db, model_type))
+                except Exception as e:
+                    db.rollback()
+                    print(f"Error checking feature drift for {model_type}: {e}")
+        finally:
+            db.close()
+        return reports
+
+    def close(self) -> None:
+        """
+        إيقاف خيط الكتابة وكتابة ما تبقى (عند إيقاف الخادم)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.flush_seconds + 5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        إحصائيات المراقب في هذه العملية
+        """
+        with self._lock:
+            sketches = {
+                f"{model_type}:{version}": sketch.observations
+                for (model_type, version), sketch in self._sketches.items() if sketch is not None
+            }
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "pending_observations": sketches,
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "writer_alive": self._thread is not None and self._thread.is_alive()
+        }
+
+    def _sketch(self, model_type: str, model: Dict[str, Any]) -> Optional[FeatureSketch]:
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        key = (model_type, model["version"])
+        if key in self._sketches:
+            return self._sketches[key]
+
+        with self._lock:
+            if key not in self._sketches:
+                reference = model["metadata"]["performance"].get("feature_reference")
+                schema = model.get("schema")
+                # بدون ملخص تدريب، أو بمفردات ترميز مختلفة عن المخطط الحالي: لا مراقبة لهذا الإصدار
+                if reference and schema is not None and reference.get("fingerprint") == schema.fingerprint():
+                    self._sketches[key] = FeatureSketch(schema, reference)
+                    self._model_types.add(model_type)
+                    self._ensure_worker()
+                else:
+                    self._sketches[key] = None
+            return self._sketches[key]
+
+    def _reset_after_fork(self) -> None:
+        """
+        عملية فرعية (مجمع العمليات) ورثت عدادات الأب: تبدأ بعدادات فارغة حتى لا تُكتب مرتين
+        """
+        self._lock = threading.Lock()
+        self._sketches = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._pid = os.getpid()
+
+    def _ensure_worker(self) -> None:
+        # يُستدعى مع القفل
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="maestro-drift-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+            if time.monotonic() - self._last_check >= self.check_seconds:
+                self._last_check = time.monotonic()
+                self.check()
+
+
+# إنشاء instance عام
+drift_monitor = DriftMonitor()
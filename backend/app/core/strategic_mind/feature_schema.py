@@ -0,0 +1,282 @@
+from typing import Dict, Any, List, Optional, Callable, Sequence, Tuple
+from functools import lru_cache
+import hashlib
+import json
+
+import numpy as np
+
+
+# نوع بيانات الميزات المشترك بين التدريب والخدمة (أشجار sklearn تعمل بـ float32 داخلياً)
+FEATURE_DTYPE = np.float32
+
+Encoder = Callable[[Dict[str, Any]], float]
+
+INDUSTRY_CODES = {"technology": 1, "fashion": 2, "food": 3, "automotive": 4, "healthcare": 5}
+CHANNEL_CODES = {"social_media": 1, "search": 2, "display": 3, "video": 4, "email": 5}
+CONTENT_TYPE_CODES = {"video": 1, "image": 2, "text": 3, "mixed": 4}
+GOAL_CODES = {"awareness": 1, "consideration": 2, "conversion": 3}
+
+DEFAULT_AUDIENCE_AGE = [25, 45]
+
+
+class MissingFeatureError(KeyError):
+    """
+    ميزة مطلوبة غير موجودة في بيانات الحملة
+    """
+
+
+@lru_cache(maxsize=1024)
+def parse_age_range(age_range: str) -> float:
+    """
+    متوسط العمر من نطاق نصي مثل "25,45" (يتم تحليل كل نص مرة واحدة فقط)
+    """
+    age_parts = age_range.split(',')
+    if len(age_parts) >= 2:
+        return (int(age_parts[0]) + int(age_parts[1])) / 2
+    return int(age_parts[0]) if age_parts else 30
+
+
+def audience_age_average(age_range: Any) -> float:
+    """
+    متوسط الفئة العمرية من نص أو قائمة
+    """
+    if isinstance(age_range, str):
+        return parse_age_range(age_range)
+    if isinstance(age_range, list):
+        return (age_range[0] + age_range[1]) / 2 if len(age_range) >= 2 else 30
+    return 30
+
+
+def _reads(field: str, encoder: Encoder) -> Encoder:
+    """
+    تسجيل اسم الحقل الذي تقرؤه دالة الترميز (يستخدمه ترميز الشبكات)
+    """
+    encoder.field = field
+    return encoder
+
+
+def categorical(field: str, codes: Dict[str, int], default: str, unknown: int, lower: bool = True) -> Encoder:
+    """
+    ترميز حقل نصي برقم ثابت من جدول الرموز
+    """
+    if lower:
+        encoder = _reads(field, lambda campaign: codes.get(campaign.get(field, default).lower(), unknown))
+    else:
+        encoder = _reads(field, lambda campaign: codes.get(campaign.get(field, default), unknown))
+    # المفردات المستخدمة في الترميز (تُحفظ مع بيانات التدريب والنماذج)
+    encoder.vocabulary = {"kind": "categorical", "codes": dict(codes), "default": default,
+                          "unknown": unknown, "lower": lower}
+    return encoder
+
+
+def numeric(field: str, default: float, scale: float = 1) -> Encoder:
+    """
+    حقل رقمي مع قيمة افتراضية وتطبيع بالقسمة
+    """
+    encoder = _reads(field, lambda campaign: campaign.get(field, default) / scale)
+    encoder.vocabulary = {"kind": "numeric", "default": default, "scale": scale}
+    return encoder
+
+
+def audience_age(field: str = "audience_age", scale: float = 100) -> Encoder:
+    """
+    متوسط الفئة العمرية بعد التطبيع
+    """
+    encoder = _reads(field, lambda campaign: audience_age_average(campaign.get(field, DEFAULT_AUDIENCE_AGE)) / scale)
+    encoder.vocabulary = {"kind": "audience_age", "default": DEFAULT_AUDIENCE_AGE, "scale": scale}
+    return encoder
+
+
+def passthrough(field: str) -> Encoder:
+    """
+    قيمة الحقل كما هي (القيم المنطقية إلى 0/1 والنصوص إلى أرقام أو 0)
+    """
+    def encode(campaign: Dict[str, Any]) -> float:
+        if field not in campaign:
+            raise MissingFeatureError(field)
+        value = campaign[field]
+        if isinstance(value, bool):
+            return 1.0 if value else 0.0
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+        return float(value)
+    encoder = _reads(field, encode)
+    encoder.vocabulary = {"kind": "passthrough"}
+    return encoder
+
+
+class FeatureSchema:
+    """
+    مخطط ميزات مترجم لنموذج واحد: قائمة ثابتة من دوال الترميز تُطبق على الحملة
+    وتكتب مباشرة في مصفوفة float32 محجوزة مسبقاً. يستخدمه التدريب والخدمة معاً.
+    """
+    __slots__ = ("name", "feature_names", "width", "fields", "_encoders")
+
+    def __init__(self, name: str, features: Sequence[Tuple[str, Encoder]]):
+        self.name = name
+        self.feature_names: List[str] = [feature_name for feature_name, _ in features]
+        self.width = len(self.feature_names)
+        self._encoders: Tuple[Encoder, ...] = tuple(encoder for _, encoder in features)
+        # حقل الحملة الذي يقرؤه كل عمود
+        self.fields: Tuple[Optional[str], ...] = tuple(getattr(encoder, "field", None) for encoder in self._encoders)
+
+    def encode(self, campaign: Dict[str, Any]) -> np.ndarray:
+        """
+        ترميز حملة واحدة إلى متجه float32
+        """
+        return np.array([encoder(campaign) for encoder in self._encoders], dtype=FEATURE_DTYPE)
+
+    def encode_into(self, out: np.ndarray, row: int, campaign: Dict[str, Any]) -> None:
+        """
+        ترميز حملة واحدة في صف من مصفوفة محجوزة مسبقاً
+        """
+        out[row] = [encoder(campaign) for encoder in self._encoders]
+
+    def encode_batch(self, campaigns: Sequence[Dict[str, Any]], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        ترميز مجموعة من الحملات إلى مصفوفة (عدد الحملات × عدد الميزات)
+        """
+        if out is None:
+            out = np.empty((len(campaigns), self.width), dtype=FEATURE_DTYPE)
+        # الترميز عموداً عموداً يقلل عدد عمليات الكتابة في المصفوفة
+        for column, encoder in enumerate(self._encoders):
+            out[:, column] = [encoder(campaign) for campaign in campaigns]
+        return out
+
+    def encode_grid(self, base: Dict[str, Any], axes: Dict[str, Sequence[Any]]) -> np.ndarray:
+        """
+        ترميز شبكة سيناريوهات (الضرب الديكارتي لقيم المحاور) حول حملة أساسية.
+        يُرمَّز كل عمود مرة واحدة لكل قيمة من محوره ثم يُنشر على الشبكة،
+        والصفوف بترتيب المحاور كما في np.ndindex.
+        """
+        names = list(axes)
+        shape = tuple(len(axes[name]) for name in names)
+        out = np.empty(shape + (self.width,), dtype=FEATURE_DTYPE)
+        for column, (field, encoder) in enumerate(zip(self.fields, self._encoders)):
+            if field in axes:
+                position = names.index(field)
+                values = np.array([encoder({**base, field: value}) for value in axes[field]], dtype=FEATURE_DTYPE)
+                view = [1] * len(shape)
+                view[position] = shape[position]
+                out[..., column] = values.reshape(view)
+            else:
+                out[..., column] = encoder(base)
+        return out.reshape(-1, self.width)
+
+    def encode_field(self, field: str, values: Sequence[Any]) -> Tuple[List[int], np.ndarray]:
+        """
+        الأعمدة التي تقرأ حقلاً واحداً، وقيمها المرمّزة لكل قيمة من القيم (قيم × أعمدة)
+        """
+        columns = [column for column, column_field in enumerate(self.fields) if column_field == field]
+        encoded = np.array([
+            [self._encoders[column]({field: value}) for column in columns] for value in values
+        ], dtype=FEATURE_DTYPE).reshape(len(values), len(columns))
+        return columns, encoded
+
+    def vocabulary(self) -> Dict[str, Any]:
+        """
+        وصف الأعمدة وجداول رموز الحقول النصية بترتيبها الثابت (يُحفظ مع بيانات التدريب والنماذج)
+        """
+        return {
+            "schema": self.name,
+            "columns": [
+                {"name": name, "field": field, **getattr(encoder, "vocabulary", {})}
+                for name, field, encoder in zip(self.feature_names, self.fields, self._encoders)
+            ]
+        }
+
+    def fingerprint(self) -> str:
+        """
+        بصمة المفردات: تتغير إذا تغير ترتيب الأعمدة أو أي رمز، فلا تُخلط مصفوفات بترميزين مختلفين
+        """
+        encoded = json.dumps(self.vocabulary(), sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()[:16]
+
+    def unseen_categories(self, campaigns: Sequence[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+        """
+        قيم الحقول النصية غير الموجودة في المفردات (تُرمَّز برمز unknown) وعدد مرات ظهورها
+        """
+        unseen: Dict[str, Dict[str, int]] = {}
+        for field, encoder in zip(self.fields, self._encoders):
+            vocabulary = getattr(encoder, "vocabulary", {})
+            if vocabulary.get("kind") != "categorical":
+                continue
+            codes, lower = vocabulary["codes"], vocabulary["lower"]
+            for campaign in campaigns:
+                value = campaign.get(field, vocabulary["default"])
+                key = value.lower() if lower and isinstance(value, str) else value
+                if key not in codes:
+                    counts = unseen.setdefault(field, {})
+                    counts[str(value)] = counts.get(str(value), 0) + 1
+        return unseen
+
+    def empty(self, rows: int) -> np.ndarray:
+        """
+        حجز مصفوفة ميزات فارغة
+        """
+        return np.empty((rows, self.width), dtype=FEATURE_DTYPE)
+
+
+CTR_SCHEMA = FeatureSchema("ctr", [
+    ("industry_code", categorical("industry", INDUSTRY_CODES, "technology", 1)),
+    ("channel_code", categorical("channel", CHANNEL_CODES, "social_media", 1)),
+    ("budget", numeric("budget", 1000, 10000)),
+    ("audience_age_avg", audience_age()),
+])
+
+ROI_SCHEMA = FeatureSchema("roi", [
+    ("industry_code", categorical("industry", INDUSTRY_CODES, "technology", 1)),
+    ("budget", numeric("budget", 1000, 10000)),
+    ("duration", numeric("duration", 30, 90)),
+    ("content_type_code", categorical("content_type", CONTENT_TYPE_CODES, "mixed", 4, lower=False)),
+])
+
+CHANNEL_SCHEMA = FeatureSchema("channel", [
+    ("industry_code", categorical("industry", INDUSTRY_CODES, "technology", 1)),
+    ("budget", numeric("budget", 1000, 10000)),
+    ("audience_age_avg", audience_age()),
+    ("goal_code", categorical("goal", GOAL_CODES, "awareness", 1, lower=False)),
+])
+
+# أسماء الميزات المعروضة للمستخدم في تفسير التنبؤات
+FEATURE_LABELS: Dict[str, str] = {
+    "industry_code": "الصناعة",
+    "channel_code": "القناة",
+    "budget": "الميزانية",
+    "audience_age_avg": "الفئة العمرية",
+    "duration": "المدة",
+    "content_type_code": "نوع المحتوى",
+    "goal_code": "الهدف",
+}
+
+# المخططات حسب نوع النموذج (أسماء محرك الاستدلال وأسماء أنواع نماذج التحديث)
+SCHEMAS: Dict[str, FeatureSchema] = {
+    "ctr": CTR_SCHEMA,
+    "roi": ROI_SCHEMA,
+    "channel": CHANNEL_SCHEMA,
+    "ctr_prediction": CTR_SCHEMA,
+    "roi_prediction": ROI_SCHEMA,
+    "channel_recommendation": CHANNEL_SCHEMA,
+}
+
+
+def get_schema(model_type: str) -> Optional[FeatureSchema]:
+    """
+    مخطط الميزات الخاص بنوع نموذج معين
+    """
+    return SCHEMAS.get(model_type)
+
+
+@lru_cache(maxsize=64)
+def _passthrough_schema(feature_names: Tuple[str, ...]) -> FeatureSchema:
+    return FeatureSchema("passthrough", [(name, passthrough(name)) for name in feature_names])
+
+
+def schema_from_names(feature_names: Sequence[str]) -> FeatureSchema:
+    """
+    مخطط يقرأ أعمدة التدريب كما هي من بيانات الحملة (يُترجم مرة واحدة لكل قائمة ميزات)
+    """
+    return _passthrough_schema(tuple(feature_names))
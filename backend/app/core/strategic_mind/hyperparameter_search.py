@@ -0,0 +1,275 @@
+"""
+بحث عن إعدادات النموذج (hyperparameters) بميزانية زمنية على مجمع عمليات:
+- random: مرشحون عشوائيون من فضاء الإعدادات، مع إيقاف مبكر إذا لم تتحسن النتيجة بعد patience تجربة
+- halving: تقليص متتالٍ (successive halving)، كل المرشحين على جزء صغير من البيانات ثم يستمر أفضل 1/eta منهم
+  على بيانات أكثر حتى تبقى مجموعة البيانات الكاملة
+أول مرشح هو الإعداد الفائز في التشغيل السابق (إن وُجد) ثم الإعداد الافتراضي، فلا تكون النتيجة أسوأ منهما.
+كل التجارب تُقيَّم بمتوسط مربع الخطأ على نفس مجموعة التحقق. عند انتهاء الميزانية لا تبدأ تجارب جديدة
+وتُنتظر التجارب الجارية فقط.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+import json
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+from app.config import settings
+
+
+ESTIMATORS = {
+    "RandomForestRegressor": RandomForestRegressor,
+    "GradientBoostingRegressor": GradientBoostingRegressor
+}
+
+# فضاء البحث لكل نوع نموذج (قيم منفصلة قابلة للتسلسل في JSON)
+SEARCH_SPACES: Dict[str, Dict[str, List[Any]]] = {
+    "RandomForestRegressor": {
+        "n_estimators": [50, 100, 200, 300],
+        "max_depth": [4, 6, 8, 10, 14, 20, None],
+        "min_samples_leaf": [1, 2, 4, 8],
+        "max_features": [1.0, 0.5, "sqrt"]
+    },
+    "GradientBoostingRegressor": {
+        "n_estimators": [50, 100, 200, 400],
+        "max_depth": [2, 3, 4, 5, 6],
+        "learning_rate": [0.02, 0.05, 0.1, 0.2],
+        "subsample": [0.6, 0.8, 1.0],
+        "min_samples_leaf": [1, 4, 16]
+    }
+}
+
+SEARCH_MODES = ("random", "halving")
+
+# أقل عدد صفوف تدريب في أول مرحلة من التقليص المتتالي
+_MIN_HALVING_ROWS = 200
+
+# بيانات التدريب والتحقق في عملية العامل (تُنقل مرة واحدة لكل عامل عند إنشائه)
+_DATA: Dict[str, np.ndarray] = {}
+
+
+def _init_worker(X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray) -> None:
+    _DATA.update(X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val)
+
+
+def _run_trial(estimator_name: str, params: Dict[str, Any], rows: Optional[int], random_state: int) -> Dict[str, Any]:
+    """
+    تدريب مرشح واحد على أول rows صف من بيانات التدريب (مخلوطة مسبقاً) وتقييمه على مجموعة التحقق
+    """
+    start = time.perf_counter()
+    X, y = _DATA["X_train"], _DATA["y_train"]
+    if rows:
+        X, y = X[:rows], y[:rows]
+    model = ESTIMATORS[estimator_name](random_state=random_state, **params)
+    model.fit(X, y)
+    errors = _DATA["y_val"] - model.predict(_DATA["X_val"])
+    return {
+        "params": params,
+        "rows": len(y),
+        "mse": float(np.mean(errors ** 2)),
+        "seconds": time.perf_counter() - start
+    }
+
+
+class _InlineExecutor:
+    """
+    تنفيذ التجارب في العملية الحالية (عامل واحد) بنفس واجهة ProcessPoolExecutor
+    """
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        _DATA.clear()
+
+
+def _key(params: Dict[str, Any]) -> str:
+    return json.dumps(params, sort_keys=True)
+
+
+class HyperparameterSearch:
+    """
+    بحث عن أفضل إعدادات لنموذج sklearn ضمن ميزانية زمنية
+    """
+
+    def __init__(self, estimator: Any, mode: str = None, space: Dict[str, List[Any]] = None,
+                 budget_seconds: float = None, n_candidates: int = None, max_workers: int = None,
+                 patience: int = None, eta: int = 3, validation_fraction: float = None, random_state: int = 42):
+        """
+        تهيئة البحث. estimator: النموذج بالإعدادات الافتراضية (أول مرشح بعد الفائز السابق)
+        """
+        self.estimator_name = type(estimator).__name__
+        if self.estimator_name not in ESTIMATORS:
+            raise ValueError(f"No search space for estimator: {self.estimator_name}")
+        self.mode = (settings.MODEL_SEARCH_MODE if mode is None else mode).lower()
+        if self.mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {self.mode}")
+        self.space = space or SEARCH_SPACES[self.estimator_name]
+        self.base_params = {name: value for name, value in estimator.get_params().items() if name in self.space}
+        self.budget_seconds = settings.MODEL_SEARCH_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+        self.n_candidates = max(1, settings.MODEL_SEARCH_CANDIDATES if n_candidates is None else n_candidates)
+        max_workers = settings.MODEL_SEARCH_WORKERS if max_workers is None else max_workers
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.patience = settings.MODEL_SEARCH_PATIENCE if patience is None else patience
+        self.eta = max(2, eta)
+        self.validation_fraction = (settings.MODEL_SEARCH_VALIDATION_FRACTION
+                                    if validation_fraction is None else validation_fraction)
+        self.random_state = random_state
+        self._deadline = 0.0
+
+    def candidates(self, incumbent: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        المرشحون بالترتيب: الفائز السابق، الإعداد الافتراضي، ثم عينات عشوائية مختلفة من فضاء البحث
+        """
+        rng = np.random.default_rng(self.random_state)
+        names = sorted(self.space)
+        result: List[Dict[str, Any]] = []
+        seen = set()
+
+        def add(params: Dict[str, Any]) -> None:
+            if _key(params) not in seen:
+                seen.add(_key(params))
+                result.append(params)
+
+        if incumbent:
+            add({name: incumbent.get(name, self.base_params.get(name)) for name in names})
+        add({name: self.base_params.get(name) for name in names})
+        total = math.prod(len(self.space[name]) for name in names)
+        while len(result) < min(self.n_candidates, total):
+            add({name: self.space[name][rng.integers(len(self.space[name]))] for name in names})
+        return result[:self.n_candidates]
+
+    def run(self, X: np.ndarray, y: np.ndarray, incumbent: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        تشغيل البحث وإرجاع أفضل إعداد مع سجل التجارب
+        """
+        start = time.perf_counter()
+        self._deadline = start + self.budget_seconds
+        order = np.random.default_rng(self.random_state).permutation(len(y))
+        validation_rows = max(1, int(len(y) * self.validation_fraction))
+        val, train = order[:validation_rows], order[validation_rows:]
+        data = (X[train], y[train], X[val], y[val])
+        candidates = self.candidates(incumbent)
+
+        if self.max_workers > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=min(self.max_workers, len(candidates)),
+                mp_context=multiprocessing.get_context(settings.PROCESS_POOL_START_METHOD),
+                initializer=_init_worker, initargs=data
+            )
+        else:
+            _init_worker(*data)
+            executor = _InlineExecutor()
+        try:
+            if self.mode == "halving":
+                trials, best, stopped_by = self._halving(executor, candidates, len(train))
+            else:
+                trials, best, stopped_by = self._random(executor, candidates)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        if best is None:
+            raise RuntimeError("Hyperparameter search did not complete any trial")
+        return {
+            "estimator": self.estimator_name,
+            "mode": self.mode,
+            "best_params": best["params"],
+            "best_mse": best["mse"],
+            "default_mse": self._default_mse(trials, len(train)),
+            "trials": len(trials),
+            "candidates": len(candidates),
+            "stopped_by": stopped_by,
+            "training_rows": len(train),
+            "validation_rows": validation_rows,
+            "workers": self.max_workers,
+            "elapsed_seconds": time.perf_counter() - start,
+            "history": trials
+        }
+
+    def _default_mse(self, trials: List[Dict[str, Any]], rows: int) -> Optional[float]:
+        """
+        نتيجة الإعداد الافتراضي على كل بيانات التدريب (للمقارنة مع الفائز)
+        """
+        base = {name: self.base_params.get(name) for name in sorted(self.space)}
+        for trial in trials:
+            if trial["params"] == base and trial["rows"] == rows and "mse" in trial:
+                return trial["mse"]
+        return None
+
+    def _expired(self) -> bool:
+        return time.perf_counter() >= self._deadline
+
+    def _evaluate(self, executor: Any, trials: List[Tuple[Dict[str, Any], Optional[int]]],
+                  on_result=None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        تنفيذ التجارب بحد أقصى max_workers تجربة متزامنة. on_result تعيد True لإيقاف البحث مبكراً
+        """
+        results: List[Dict[str, Any]] = []
+        queue = list(trials)
+        pending = set()
+        stopped_by = None
+        while queue or pending:
+            while queue and stopped_by is None and len(pending) < self.max_workers:
+                if self._expired():
+                    stopped_by = "budget"
+                    break
+                params, rows = queue.pop(0)
+                pending.add(executor.submit(_run_trial, self.estimator_name, params, rows, self.random_state))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # إعداد غير صالح لهذه البيانات: تسجيله ومتابعة البحث
+                    results.append({"params": None, "error": str(e)})
+                    continue
+                results.append(result)
+                if on_result is not None and stopped_by is None and on_result(result):
+                    stopped_by = "patience"
+        return [result for result in results if result.get("params") is not None], stopped_by
+
+    def _random(self, executor: Any, candidates: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]], str]:
+        state = {"best": None, "since_improvement": 0}
+
+        def on_result(result: Dict[str, Any]) -> bool:
+            if state["best"] is None or result["mse"] < state["best"]["mse"]:
+                state["best"] = result
+                state["since_improvement"] = 0
+            else:
+                state["since_improvement"] += 1
+            return bool(self.patience) and state["since_improvement"] >= self.patience
+
+        trials, stopped_by = self._evaluate(executor, [(params, None) for params in candidates], on_result)
+        return trials, state["best"], stopped_by or "completed"
+
+    def _halving(self, executor: Any, candidates: List[Dict[str, Any]],
+                 train_rows: int) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]], str]:
+        rungs = max(1, int(math.log(len(candidates), self.eta)) + 1)
+        rows = max(min(_MIN_HALVING_ROWS, train_rows), int(train_rows / self.eta ** (rungs - 1)))
+        survivors = candidates
+        trials: List[Dict[str, Any]] = []
+        best = None
+        while True:
+            rung_rows = min(rows, train_rows)
+            results, stopped_by = self._evaluate(executor, [(params, rung_rows) for params in survivors])
+            trials.extend(results)
+            if not results:
+                return trials, best, stopped_by or "completed"
+            ranked = sorted(results, key=lambda result: result["mse"])
+            # النتيجة على بيانات أكثر أدق من أي نتيجة في مرحلة سابقة
+            best = ranked[0]
+            if stopped_by or rung_rows >= train_rows or len(survivors) <= 1:
+                return trials, best, stopped_by or "completed"
+            survivors = [result["params"] for result in ranked[:max(1, math.ceil(len(ranked) / self.eta))]]
+            rows *= self.eta
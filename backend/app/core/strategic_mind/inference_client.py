@@ -0,0 +1,305 @@
+from typing import Dict, Any, List, Optional
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+import itertools
+import socket
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.utils.metrics import metrics
+from .inference_protocol import ProtocolError, pack_frame, read_frame
+
+
+class InferenceServerError(RuntimeError):
+    """
+    خطأ أرجعه خادم الاستدلال أثناء تنفيذ الطلب
+    """
+
+
+class InferenceUnavailableError(InferenceServerError):
+    """
+    تعذر الوصول إلى خادم الاستدلال (المقبس غير موجود، انقطاع الاتصال، أو انتهاء المهلة)
+    """
+
+
+class _Connection:
+    """
+    اتصال واحد بخادم الاستدلال يسمح بعدة طلبات معلقة في نفس الوقت:
+    الإرسال محمي بقفل، وخيط قراءة يسلّم كل رد إلى Future الطلب حسب معرفه.
+    """
+
+    def __init__(self, socket_path: str, connect_timeout: float):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(connect_timeout)
+        try:
+            self.sock.connect(socket_path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.sock.settimeout(None)
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, Future] = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.closed = False
+        self._reader = threading.Thread(target=self._read_loop, name="inference-client-reader", daemon=True)
+        self._reader.start()
+
+    def request(self, message: Dict[str, Any]) -> Future:
+        """
+        إرسال طلب دون انتظار الرد وإرجاع Future له
+        """
+        future: Future = Future()
+        with self._pending_lock:
+            if self.closed:
+                raise InferenceUnavailableError("Connection to inference server is closed")
+            request_id = next(self._ids) & 0xFFFFFFFF
+            self._pending[request_id] = future
+        try:
+            frame = pack_frame(request_id, message)
+            with self._send_lock:
+                self.sock.sendall(frame)
+        except OSError as e:
+            self.close(e)
+            raise InferenceUnavailableError(f"Failed to send to inference server: {e}") from e
+        except Exception:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise
+        return future
+
+    def discard(self, future: Future) -> None:
+        """
+        إزالة طلب انتهت مهلته من قائمة الانتظار (يتم تجاهل رده إذا وصل لاحقاً)
+        """
+        with self._pending_lock:
+            for request_id, pending in list(self._pending.items()):
+                if pending is future:
+                    del self._pending[request_id]
+                    break
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    def _read_loop(self) -> None:
+        try:
+            while True:
+                request_id, response = read_frame(self.sock)
+                with self._pending_lock:
+                    future = self._pending.pop(request_id, None)
+                if future is not None:
+                    future.set_result(response)
+        except (OSError, ProtocolError, ValueError) as e:
+            self.close(e)
+
+    def close(self, reason: Exception = None) -> None:
+        """
+        إغلاق الاتصال وإفشال كل الطلبات المعلقة عليه
+        """
+        with self._pending_lock:
+            if self.closed:
+                return
+            self.closed = True
+            pending, self._pending = self._pending, {}
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        for future in pending.values():
+            future.set_exception(InferenceUnavailableError(f"Connection to inference server lost: {reason}"))
+
+
+class InferenceClient:
+    """
+    عميل خادم الاستدلال مع مجمع اتصالات: يتم توزيع الطلبات على الاتصالات بالتناوب،
+    وكل اتصال يحمل عدة طلبات معلقة من خيوط مختلفة (pipelining).
+    يتم فتح الاتصالات عند الحاجة وإعادة فتحها تلقائياً بعد انقطاعها.
+    """
+
+    def __init__(self, socket_path: str = None, pool_size: int = None, timeout_seconds: float = None):
+        """
+        تهيئة العميل (لا يتم الاتصال إلا عند أول طلب)
+        """
+        self.socket_path = settings.INFERENCE_SERVER_SOCKET if socket_path is None else socket_path
+        self.pool_size = max(1, settings.INFERENCE_CLIENT_POOL_SIZE if pool_size is None else pool_size)
+        self.timeout_seconds = settings.INFERENCE_CLIENT_TIMEOUT_SECONDS if timeout_seconds is None else timeout_seconds
+        self._connections: List[Optional[_Connection]] = [None] * self.pool_size
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        self.requests = 0
+        self.failures = 0
+        self.reconnects = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.socket_path)
+
+    def call(self, op: str, *args: Any, timeout: float = None) -> Any:
+        """
+        استدعاء عملية على الخادم وانتظار نتيجتها
+        """
+        return self.result(self.submit(op, *args), timeout=timeout)
+
+    def submit(self, op: str, *args: Any) -> Future:
+        """
+        إرسال طلب دون انتظار (يمكن إرسال عدة طلبات ثم جمع نتائجها)
+        """
+        connection = self._connection()
+        future = connection.request({"op": op, "args": list(args)})
+        future.connection = connection
+        future.op = op
+        future.started = time.perf_counter()
+        with self._lock:
+            self.requests += 1
+        return future
+
+    def result(self, future: Future, timeout: float = None) -> Any:
+        """
+        انتظار رد طلب أُرسل بـ submit وإرجاع النتيجة
+        """
+        if timeout is None:
+            timeout = self.timeout_seconds
+        try:
+            response = future.result(timeout=timeout)
+        except FuturesTimeoutError:
+            future.connection.discard(future)
+            self._count_failure()
+            raise InferenceUnavailableError(f"Inference server did not answer {future.op} within {timeout}s")
+        except InferenceUnavailableError:
+            self._count_failure()
+            raise
+        finally:
+            metrics.observe("remote_inference_seconds", time.perf_counter() - future.started, op=future.op)
+
+        if not response.get("ok"):
+            raise InferenceServerError(f"{response.get('type', 'Error')}: {response.get('error')}")
+        return response["result"]
+
+    def _connection(self) -> _Connection:
+        """
+        اختيار اتصال من المجمع بالتناوب (مع فتحه أو إعادة فتحه عند الحاجة)
+        """
+        if not self.enabled:
+            raise InferenceUnavailableError("Inference server socket is not configured")
+
+        slot = next(self._next) % self.pool_size
+        with self._lock:
+            connection = self._connections[slot]
+            if connection is not None and not connection.closed:
+                return connection
+            try:
+                connection = _Connection(self.socket_path, self.timeout_seconds)
+            except OSError as e:
+                self.failures += 1
+                raise InferenceUnavailableError(f"Cannot connect to inference server at {self.socket_path}: {e}") from e
+            if self._connections[slot] is not None:
+                self.reconnects += 1
+            self._connections[slot] = connection
+            return connection
+
+    def _count_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+
+    def close(self) -> None:
+        """
+        إغلاق كل اتصالات المجمع
+        """
+        with self._lock:
+            connections, self._connections = self._connections, [None] * self.pool_size
+        for connection in connections:
+            if connection is not None:
+                connection.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        إحصائيات العميل في هذه العملية
+        """
+        with self._lock:
+            open_connections = [c for c in self._connections if c is not None and not c.closed]
+            return {
+                "enabled": self.enabled,
+                "socket": self.socket_path,
+                "pool_size": self.pool_size,
+                "open_connections": len(open_connections),
+                "in_flight": sum(c.in_flight for c in open_connections),
+                "requests": self.requests,
+                "failures": self.failures,
+                "reconnects": self.reconnects
+            }
+
+
+class RemoteInferenceEngine:
+    """
+    بديل لـ HybridInferenceEngine بنفس الواجهة العامة، ينفذ التنبؤات في خادم الاستدلال.
+    عند تعذر الوصول إلى الخادم يتم استخدام محرك محلي (إذا كان INFERENCE_SERVER_FALLBACK مفعلاً).
+    """
+
+    def __init__(self, db: Session = None, client: InferenceClient = None):
+        """
+        تهيئة المحرك البعيد
+        """
+        self.db = db
+        self.client = client or inference_client
+        self._local = None
+
+    def predict_ctr(self, campaign_data: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
+        return self._call("predict_ctr", campaign_data, user_id)
+
+    def predict_ctr_batch(self, campaigns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("predict_ctr_batch", campaigns)
+
+    def predict_roi(self, campaign_data: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
+        return self._call("predict_roi", campaign_data, user_id)
+
+    def predict_roi_batch(self, campaigns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("predict_roi_batch", campaigns)
+
+    def recommend_channels(self, campaign_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self._call("recommend_channels", campaign_data)
+
+    def recommend_channels_batch(self, campaigns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("recommend_channels_batch", campaigns)
+
+    def update_from_feedback(self, feedback_data: Dict[str, Any]) -> bool:
+        return self._call("update_from_feedback", feedback_data)
+
+    def get_model_performance_report(self) -> Dict[str, Any]:
+        return self._call("get_model_performance_report")
+
+    def explain_predictions(self, campaigns: List[Dict[str, Any]], model_key: str = "ctr") -> Optional[List[Dict[str, Any]]]:
+        return self._call("explain_predictions", campaigns, model_key)
+
+    def _call(self, op: str, *args: Any) -> Any:
+        try:
+            return self.client.call(op, *args)
+        except InferenceUnavailableError as e:
+            if not settings.INFERENCE_SERVER_FALLBACK:
+                raise
+            print(f"Inference server unavailable, using local engine: {e}")
+            metrics.increment("remote_inference_fallback_total", op=op)
+            return getattr(self._local_engine(), op)(*args)
+
+    def _local_engine(self):
+        if self._local is None:
+            from .inference_engine import HybridInferenceEngine
+            self._local = HybridInferenceEngine(self.db)
+        return self._local
+
+
+def get_inference_engine(db: Session = None):
+    """
+    محرك الاستدلال المناسب: البعيد إذا كان مقبس خادم الاستدلال محدداً، وإلا المحلي
+    """
+    if inference_client.enabled:
+        return RemoteInferenceEngine(db)
+    from .inference_engine import HybridInferenceEngine
+    return HybridInferenceEngine(db)
+
+
+# إنشاء instance عام
+inference_client = InferenceClient()
@@ -1,21 +1,39 @@
 from typing import Dict, Any, List, Optional, Tuple
 import numpy as np
-import pandas as pd
 import joblib
 import os
 from sqlalchemy.orm import Session
 from datetime import datetime
+import time
 
 from app.core.strategic_mind.knowledge_base import DynamicKnowledgeBase
 from app.models.knowledge_base import MLModel
 from app.config import settings
+from app.utils.metrics import metrics, log_sampled
 from .ml_manager import ml_manager
+from .model_registry import model_registry, predict_rows
+from .model_experiments import experiment_router
+from .feature_drift import drift_monitor
+from .prediction_cache import PredictionCache, prediction_cache
+from .batch_dispatcher import batch_dispatcher
+from .tree_shap import attribution_factors
+from .feature_schema import CTR_SCHEMA, ROI_SCHEMA, CHANNEL_SCHEMA, MissingFeatureError, schema_from_names
 
 
 class HybridInferenceEngine:
     """
     محرك الاستدلال الهجين الذي يجمع بين القواعد الرمزية ونماذج التعلم الآلي
     """
+
+    # لكل نوع تنبؤ: (نوع القواعد، مفتاح النموذج، دالة استخراج الميزات)
+    _CACHE_SPECS = {
+        "ctr": ("ctr_prediction", "ctr", "_extract_ctr_features"),
+        "roi": ("roi_prediction", "roi", "_extract_roi_features"),
+        "channels": ("channel_recommendation", None, "_extract_channel_features"),
+    }
+
+    # الحقول الخام التي تعتمد عليها التنبؤات الافتراضية إضافة إلى الميزات المستخرجة
+    _HEURISTIC_FIELDS = ("industry", "channel", "budget")
     
     def __init__(self, db: Session = None):
         """
@@ -28,433 +46,848 @@ class HybridInferenceEngine:
     
     def _load_ml_models(self) -> None:
         """
-        تحميل نماذج التعلم الآلي من قاعدة البيانات
+        الحصول على نماذج التعلم الآلي من سجل النماذج المشترك
+        (يتم تحميل كل إصدار مرة واحدة فقط لكل عملية)
         """
         if self.db:
-            models = self.db.query(MLModel).filter(MLModel.is_active == True).all()
-            for model in models:
-                model_path = model.model_path
-                if os.path.exists(model_path):
-                    try:
-                        self.ml_models[model.model_type] = {
-                            "model": joblib.load(model_path),
-                            "features": model.features,
-                            "metadata": {
-                                "name": model.name,
-                                "version": model.version,
-                                "performance": model.performance_metrics
-                            }
-                        }
-                    except Exception as e:
-                        print(f"Error loading model {model.name}: {e}")
+            self.ml_models = model_registry.sync_active_models(self.db)
+            experiment_router.sync(self.db)
+        else:
+            self.ml_models = model_registry.snapshot()
     
-    def predict_ctr(self, campaign_data: Dict[str, Any]) -> Dict[str, Any]:
+    def predict_ctr(self, campaign_data: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        التنبؤ بمعدل النقر إلى الظهور (CTR) باستخدام نماذج التعلم الآلي.
+        user_id يحدد فريق المستخدم إذا كانت هناك تجربة split جارية على النموذج
+        """
+        routing = experiment_router.route("ctr", user_id)
+        # الطلبات التي يخدمها المرشح (تجربة split) تُسجل في ملخص إصداره وليس ملخص الإصدار النشط
+        served = experiment_router.served_model(self.ml_models.get("ctr"), routing)
+        drift_monitor.observe("ctr", served, (campaign_data,))
+        return self._cached_prediction(
+            "ctr", campaign_data, lambda data: self._predict_ctr(data, routing, user_id), routing
+        )
+
+    def _predict_ctr(self, campaign_data: Dict[str, Any], routing: Optional[Dict[str, Any]] = None,
+                     user_id: Optional[int] = None) -> Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]:
         """
-        التنبؤ بمعدل النقر إلى الظهور (CTR) باستخدام نماذج التعلم الآلي
+        حساب تنبؤ CTR مع القواعد المطابقة (None عند استخدام النتيجة الاحتياطية)
         """
         try:
-            print(f"🔍 DEBUG: predict_ctr called with data: {campaign_data}")
-
             # استخدام قاعدة المعرفة أولاً للتحقق من القواعد
-            rules_result = self.knowledge_base.evaluate_rules(campaign_data, "ctr_prediction")
-            print(f"🔍 DEBUG: rules_result: {rules_result}")
-
-            # إذا كانت هناك قواعد تنطبق، استخدمها
-            if rules_result:
-                ctr_values = []
-                for action in rules_result:
-                    if "actions" in action and "ctr" in action["actions"]:
-                        ctr_values.append(action["actions"]["ctr"])
-                if ctr_values:
-                    ctr_value = sum(ctr_values) / len(ctr_values)
-                    print(f"✅ DEBUG: using knowledge rules, ctr_value: {ctr_value}")
-                    return {
-                        "prediction": ctr_value if ctr_value is not None else 0.05,
-                        "confidence": 0.9,
-                        "method": "knowledge_rules",
-                        "explanation": "تم استخدام قواعد المعرفة للتنبؤ",
-                        "factors": [
-                            {"name": "الصناعة", "value": 0.3},
-                            {"name": "الميزانية", "value": 0.25},
-                            {"name": "القناة", "value": 0.2},
-                            {"name": "الفئة العمرية", "value": 0.15},
-                            {"name": "نوع المحتوى", "value": 0.1}
-                        ],
-                        "trend": [
-                            {"name": "الأسبوع 1", "value": 0.06},
-                            {"name": "الأسبوع 2", "value": 0.08},
-                            {"name": "الأسبوع 3", "value": 0.07},
-                            {"name": "الأسبوع 4", "value": 0.09}
-                        ],
-                        "benchmark": 0.05
-                    }
-
-            print("🔍 DEBUG: no rules matched, using fallback logic")
+            with self._stage("ctr", "rules"):
+                rules_result = self.knowledge_base.evaluate_rules(campaign_data, "ctr_prediction")
+
+                # إذا كانت هناك قواعد تنطبق، استخدمها
+                result = self._ctr_from_rules(rules_result)
+            if result:
+                return result, rules_result
+
             # استخدام نماذج التعلم الآلي
-            features = self._extract_ctr_features(campaign_data)
+            with self._stage("ctr", "features"):
+                features = self._extract_ctr_features(campaign_data)
 
             # استخدام نموذج CTR إذا كان متوفراً
-            ctr_model = self.ml_models.get("ctr")
+            ctr_model = experiment_router.served_model(self.ml_models.get("ctr"), routing)
             if ctr_model:
-                prediction = ctr_model["model"].predict([features])[0]
-                confidence = ctr_model["metadata"]["performance"].get("r2_score", 0.7)
-
-                return {
-                    "prediction": max(0, min(1, prediction)),  # التأكد من أن القيمة بين 0 و 1
-                    "confidence": confidence,
-                    "method": "ml_model",
-                    "explanation": f"تم استخدام نموذج {ctr_model['metadata']['name']} للتنبؤ"
-                }
+                with self._stage("ctr", "model_predict"):
+                    start = time.perf_counter()
+                    prediction = self._predict_row(ctr_model, features)
+                    latency_ms = (time.perf_counter() - start) * 1000
+                result = self._ctr_from_model(prediction, ctr_model)
+                self._attach_attributions("ctr", [result], ctr_model, features.reshape(1, -1))
+                experiment_router.record(
+                    routing, "ctr", ctr_model, result["prediction"], latency_ms, features, campaign_data, user_id,
+                    lambda value, model: self._ctr_from_model(value, model)["prediction"]
+                )
+                return result, rules_result
 
             # تنبؤ افتراضي بسيط بناءً على البيانات
-            base_ctr = 0.05  # CTR أساسي 5%
-
-            # تعديل بناءً على الصناعة
-            industry_multipliers = {
-                "technology": 1.2,
-                "fashion": 1.1,
-                "food": 0.9,
-                "automotive": 0.8,
-                "healthcare": 0.7
-            }
+            with self._stage("ctr", "heuristic"):
+                return self._heuristic_ctr(campaign_data), rules_result
 
-            industry = campaign_data.get("industry", "technology").lower()
-            multiplier = industry_multipliers.get(industry, 1.0)
+        except Exception as e:
+            print(f"Error in CTR prediction: {e}")
+            with self._stage("ctr", "fallback"):
+                return self._fallback_ctr(e), None
 
-            # تعديل بناءً على الميزانية
-            budget = campaign_data.get("budget", 1000)
-            budget_multiplier = min(1.5, budget / 1000)
+    def _predict_row(self, model: Dict[str, Any], features: np.ndarray) -> float:
+        """
+        تنبؤ النموذج لصف واحد، عبر موزع الدفعات المشترك إذا كان مفعلاً
+        """
+        if batch_dispatcher.enabled:
+            return batch_dispatcher.predict(model, features)
+        return predict_rows(model, features.reshape(1, -1))[0]
 
-            # تعديل بناءً على القناة
-            channel_multipliers = {
-                "social_media": 1.0,
-                "search": 1.3,
-                "display": 0.8,
-                "video": 1.1,
-                "email": 0.9
-            }
+    def predict_ctr_batch(self, campaigns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        التنبؤ بمعدل النقر لمجموعة من الحملات باستدعاء واحد للنموذج
+        """
+        drift_monitor.observe("ctr", self.ml_models.get("ctr"), campaigns)
+        return self._predict_batch(
+            campaigns, "ctr_prediction", "ctr",
+            self._extract_ctr_features, self._ctr_from_rules, self._ctr_from_model,
+            self._heuristic_ctr, self._fallback_ctr
+        )
+
+    def _ctr_from_rules(self, rules_result: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        بناء نتيجة CTR من القواعد المطابقة (إن وجدت قيم CTR)
+        """
+        if not rules_result:
+            return None
 
-            channel = campaign_data.get("channel", "social_media").lower()
-            channel_multiplier = channel_multipliers.get(channel, 1.0)
-
-            prediction = base_ctr * multiplier * budget_multiplier * channel_multiplier
-
-            return {
-                "prediction": max(0.01, min(0.5, prediction)),
-                "confidence": 0.6,
-                "method": "heuristic",
-                "explanation": f"تنبؤ بناءً على: الصناعة ({multiplier}x), الميزانية ({budget_multiplier:.1f}x), القناة ({channel_multiplier}x)",
-                "factors": [
-                    {"name": "الصناعة", "value": multiplier / 3.0},
-                    {"name": "الميزانية", "value": budget_multiplier / 3.0},
-                    {"name": "القناة", "value": channel_multiplier / 3.0},
-                    {"name": "الفئة العمرية", "value": 0.15},
-                    {"name": "نوع المحتوى", "value": 0.1}
-                ],
-                "trend": [
-                    {"name": "الأسبوع 1", "value": prediction * 0.8},
-                    {"name": "الأسبوع 2", "value": prediction * 0.9},
-                    {"name": "الأسبوع 3", "value": prediction * 1.1},
-                    {"name": "الأسبوع 4", "value": prediction * 1.2}
-                ],
-                "benchmark": 0.05
-            }
+        ctr_values = []
+        for action in rules_result:
+            if "actions" in action and "ctr" in action["actions"]:
+                ctr_values.append(action["actions"]["ctr"])
+        if not ctr_values:
+            return None
 
-        except Exception as e:
-            print(f"Error in CTR prediction: {e}")
-            return {
-                "prediction": 0.05,
-                "confidence": 0.3,
-                "method": "fallback",
-                "explanation": f"خطأ في التنبؤ: {str(e)}",
-                "factors": [
-                    {"name": "الصناعة", "value": 0.2},
-                    {"name": "الميزانية", "value": 0.2},
-                    {"name": "القناة", "value": 0.2},
-                    {"name": "الفئة العمرية", "value": 0.2},
-                    {"name": "نوع المحتوى", "value": 0.2}
-                ],
-                "trend": [
-                    {"name": "الأسبوع 1", "value": 0.04},
-                    {"name": "الأسبوع 2", "value": 0.05},
-                    {"name": "الأسبوع 3", "value": 0.06},
-                    {"name": "الأسبوع 4", "value": 0.05}
-                ],
-                "benchmark": 0.05
-            }
+        ctr_value = sum(ctr_values) / len(ctr_values)
+        return {
+            "prediction": ctr_value if ctr_value is not None else 0.05,
+            "confidence": 0.9,
+            "method": "knowledge_rules",
+            "explanation": "تم استخدام قواعد المعرفة للتنبؤ",
+            "factors": [
+                {"name": "الصناعة", "value": 0.3},
+                {"name": "الميزانية", "value": 0.25},
+                {"name": "القناة", "value": 0.2},
+                {"name": "الفئة العمرية", "value": 0.15},
+                {"name": "نوع المحتوى", "value": 0.1}
+            ],
+            "trend": [
+                {"name": "الأسبوع 1", "value": 0.06},
+                {"name": "الأسبوع 2", "value": 0.08},
+                {"name": "الأسبوع 3", "value": 0.07},
+                {"name": "الأسبوع 4", "value": 0.09}
+            ],
+            "benchmark": 0.05
+        }
+
+    def _ctr_from_model(self, prediction: float, ctr_model: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        بناء نتيجة CTR من تنبؤ نموذج التعلم الآلي
+        """
+        confidence = ctr_model["metadata"]["performance"].get("r2_score", 0.7)
+
+        return {
+            "prediction": max(0, min(1, float(prediction))),  # التأكد من أن القيمة بين 0 و 1
+            "confidence": confidence,
+            "method": "ml_model",
+            "explanation": f"تم استخدام نموذج {ctr_model['metadata']['name']} للتنبؤ"
+        }
+
+    def _heuristic_ctr(self, campaign_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        تنبؤ CTR افتراضي بسيط بناءً على البيانات
+        """
+        base_ctr = 0.05  # CTR أساسي 5%
+
+        # تعديل بناءً على الصناعة
+        industry_multipliers = {
+            "technology": 1.2,
+            "fashion": 1.1,
+            "food": 0.9,
+            "automotive": 0.8,
+            "healthcare": 0.7
+        }
+
+        industry = campaign_data.get("industry", "technology").lower()
+        multiplier = industry_multipliers.get(industry, 1.0)
+
+        # تعديل بناءً على الميزانية
+        budget = campaign_data.get("budget", 1000)
+        budget_multiplier = min(1.5, budget / 1000)
+
+        # تعديل بناءً على القناة
+        channel_multipliers = {
+            "social_media": 1.0,
+            "search": 1.3,
+            "display": 0.8,
+            "video": 1.1,
+            "email": 0.9
+        }
 
-    def predict_roi(self, campaign_data: Dict[str, Any]) -> Dict[str, Any]:
+        channel = campaign_data.get("channel", "social_media").lower()
+        channel_multiplier = channel_multipliers.get(channel, 1.0)
+
+        prediction = base_ctr * multiplier * budget_multiplier * channel_multiplier
+
+        return {
+            "prediction": max(0.01, min(0.5, prediction)),
+            "confidence": 0.6,
+            "method": "heuristic",
+            "explanation": f"تنبؤ بناءً على: الصناعة ({multiplier}x), الميزانية ({budget_multiplier:.1f}x), القناة ({channel_multiplier}x)",
+            "factors": [
+                {"name": "الصناعة", "value": multiplier / 3.0},
+                {"name": "الميزانية", "value": budget_multiplier / 3.0},
+                {"name": "القناة", "value": channel_multiplier / 3.0},
+                {"name": "الفئة العمرية", "value": 0.15},
+                {"name": "نوع المحتوى", "value": 0.1}
+            ],
+            "trend": [
+                {"name": "الأسبوع 1", "value": prediction * 0.8},
+                {"name": "الأسبوع 2", "value": prediction * 0.9},
+                {"name": "الأسبوع 3", "value": prediction * 1.1},
+                {"name": "الأسبوع 4", "value": prediction * 1.2}
+            ],
+            "benchmark": 0.05
+        }
+
+    def _fallback_ctr(self, error: Exception) -> Dict[str, Any]:
+        """
+        نتيجة CTR احتياطية عند حدوث خطأ
+        """
+        return {
+            "prediction": 0.05,
+            "confidence": 0.3,
+            "method": "fallback",
+            "explanation": f"خطأ في التنبؤ: {str(error)}",
+            "factors": [
+                {"name": "الصناعة", "value": 0.2},
+                {"name": "الميزانية", "value": 0.2},
+                {"name": "القناة", "value": 0.2},
+                {"name": "الفئة العمرية", "value": 0.2},
+                {"name": "نوع المحتوى", "value": 0.2}
+            ],
+            "trend": [
+                {"name": "الأسبوع 1", "value": 0.04},
+                {"name": "الأسبوع 2", "value": 0.05},
+                {"name": "الأسبوع 3", "value": 0.06},
+                {"name": "الأسبوع 4", "value": 0.05}
+            ],
+            "benchmark": 0.05
+        }
+
+    def predict_roi(self, campaign_data: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
         """
-        التنبؤ بالعائد على الاستثمار (ROI) باستخدام نماذج التعلم الآلي
+        التنبؤ بالعائد على الاستثمار (ROI) باستخدام نماذج التعلم الآلي.
+        user_id يحدد فريق المستخدم إذا كانت هناك تجربة split جارية على النموذج
+        """
+        routing = experiment_router.route("roi", user_id)
+        # الطلبات التي يخدمها المرشح (تجربة split) تُسجل في ملخص إصداره وليس ملخص الإصدار النشط
+        served = experiment_router.served_model(self.ml_models.get("roi"), routing)
+        drift_monitor.observe("roi", served, (campaign_data,))
+        return self._cached_prediction(
+            "roi", campaign_data, lambda data: self._predict_roi(data, routing, user_id), routing
+        )
+
+    def _predict_roi(self, campaign_data: Dict[str, Any], routing: Optional[Dict[str, Any]] = None,
+                     user_id: Optional[int] = None) -> Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]:
+        """
+        حساب تنبؤ ROI مع القواعد المطابقة (None عند استخدام النتيجة الاحتياطية)
         """
         try:
             # استخدام قاعدة المعرفة أولاً
-            rules_result = self.knowledge_base.evaluate_rules(campaign_data, "roi_prediction")
-
-            if rules_result:
-                roi_value = None
-                for action in rules_result:
-                    if "actions" in action and "roi" in action["actions"]:
-                        roi_value = action["actions"]["roi"]
-                        break
-                return {
-                    "prediction": roi_value if roi_value is not None else 2.0,
-                    "confidence": 0.9,
-                    "method": "knowledge_rules",
-                    "explanation": "تم استخدام قواعد المعرفة للتنبؤ"
-                }
+            with self._stage("roi", "rules"):
+                rules_result = self.knowledge_base.evaluate_rules(campaign_data, "roi_prediction")
+                result = self._roi_from_rules(rules_result)
+            if result:
+                return result, rules_result
 
             # استخدام نماذج التعلم الآلي
-            features = self._extract_roi_features(campaign_data)
+            with self._stage("roi", "features"):
+                features = self._extract_roi_features(campaign_data)
 
-            roi_model = self.ml_models.get("roi")
+            roi_model = experiment_router.served_model(self.ml_models.get("roi"), routing)
             if roi_model:
-                prediction = roi_model["model"].predict([features])[0]
-                confidence = roi_model["metadata"]["performance"].get("r2_score", 0.7)
-
-                return {
-                    "prediction": max(0, prediction),
-                    "confidence": confidence,
-                    "method": "ml_model",
-                    "explanation": f"تم استخدام نموذج {roi_model['metadata']['name']} للتنبؤ"
-                }
+                with self._stage("roi", "model_predict"):
+                    start = time.perf_counter()
+                    prediction = self._predict_row(roi_model, features)
+                    latency_ms = (time.perf_counter() - start) * 1000
+                result = self._roi_from_model(prediction, roi_model)
+                self._attach_attributions("roi", [result], roi_model, features.reshape(1, -1))
+                experiment_router.record(
+                    routing, "roi", roi_model, result["prediction"], latency_ms, features, campaign_data, user_id,
+                    lambda value, model: self._roi_from_model(value, model)["prediction"]
+                )
+                return result, rules_result
 
             # تنبؤ افتراضي بسيط
-            base_roi = 2.0  # ROI أساسي 200%
-
-            # تعديل بناءً على الصناعة
-            industry_multipliers = {
-                "technology": 1.3,
-                "fashion": 1.1,
-                "food": 0.9,
-                "automotive": 1.0,
-                "healthcare": 0.8
-            }
+            with self._stage("roi", "heuristic"):
+                return self._heuristic_roi(campaign_data), rules_result
 
-            industry = campaign_data.get("industry", "technology").lower()
-            multiplier = industry_multipliers.get(industry, 1.0)
+        except Exception as e:
+            print(f"Error in ROI prediction: {e}")
+            with self._stage("roi", "fallback"):
+                return self._fallback_roi(e), None
 
-            # تعديل بناءً على الميزانية
-            budget = campaign_data.get("budget", 1000)
-            budget_multiplier = min(2.0, 1.0 + (budget / 5000))
+    def predict_roi_batch(self, campaigns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        التنبؤ بالعائد على الاستثمار لمجموعة من الحملات باستدعاء واحد للنموذج
+        """
+        drift_monitor.observe("roi", self.ml_models.get("roi"), campaigns)
+        return self._predict_batch(
+            campaigns, "roi_prediction", "roi",
+            self._extract_roi_features, self._roi_from_rules, self._roi_from_model,
+            self._heuristic_roi, self._fallback_roi
+        )
+
+    def _roi_from_rules(self, rules_result: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        بناء نتيجة ROI من القواعد المطابقة
+        """
+        if not rules_result:
+            return None
 
-            # تعديل بناءً على القناة
-            channel_multipliers = {
-                "social_media": 1.0,
-                "search": 1.4,
-                "display": 0.7,
-                "video": 1.2,
-                "email": 0.8
-            }
+        roi_value = None
+        for action in rules_result:
+            if "actions" in action and "roi" in action["actions"]:
+                roi_value = action["actions"]["roi"]
+                break
+        return {
+            "prediction": roi_value if roi_value is not None else 2.0,
+            "confidence": 0.9,
+            "method": "knowledge_rules",
+            "explanation": "تم استخدام قواعد المعرفة للتنبؤ"
+        }
+
+    def _roi_from_model(self, prediction: float, roi_model: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        بناء نتيجة ROI من تنبؤ نموذج التعلم الآلي
+        """
+        confidence = roi_model["metadata"]["performance"].get("r2_score", 0.7)
 
-            channel = campaign_data.get("channel", "social_media").lower()
-            channel_multiplier = channel_multipliers.get(channel, 1.0)
+        return {
+            "prediction": max(0, float(prediction)),
+            "confidence": confidence,
+            "method": "ml_model",
+            "explanation": f"تم استخدام نموذج {roi_model['metadata']['name']} للتنبؤ"
+        }
 
-            prediction = base_roi * multiplier * budget_multiplier * channel_multiplier
+    def _heuristic_roi(self, campaign_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        تنبؤ ROI افتراضي بسيط
+        """
+        base_roi = 2.0  # ROI أساسي 200%
 
-            return {
-                "prediction": max(0.5, min(5.0, prediction)),
-                "confidence": 0.6,
-                "method": "heuristic",
-                "explanation": f"تنبؤ بناءً على: الصناعة ({multiplier}x), الميزانية ({budget_multiplier:.1f}x), القناة ({channel_multiplier}x)"
-            }
+        # تعديل بناءً على الصناعة
+        industry_multipliers = {
+            "technology": 1.3,
+            "fashion": 1.1,
+            "food": 0.9,
+            "automotive": 1.0,
+            "healthcare": 0.8
+        }
 
-        except Exception as e:
-            print(f"Error in ROI prediction: {e}")
-            return {
-                "prediction": 2.0,
-                "confidence": 0.3,
-                "method": "fallback",
-                "explanation": f"خطأ في التنبؤ: {str(e)}"
-            }
+        industry = campaign_data.get("industry", "technology").lower()
+        multiplier = industry_multipliers.get(industry, 1.0)
 
-    def recommend_channels(self, campaign_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        # تعديل بناءً على الميزانية
+        budget = campaign_data.get("budget", 1000)
+        budget_multiplier = min(2.0, 1.0 + (budget / 5000))
+
+        # تعديل بناءً على القناة
+        channel_multipliers = {
+            "social_media": 1.0,
+            "search": 1.4,
+            "display": 0.7,
+            "video": 1.2,
+            "email": 0.8
+        }
+
+        channel = campaign_data.get("channel", "social_media").lower()
+        channel_multiplier = channel_multipliers.get(channel, 1.0)
+
+        prediction = base_roi * multiplier * budget_multiplier * channel_multiplier
+
+        return {
+            "prediction": max(0.5, min(5.0, prediction)),
+            "confidence": 0.6,
+            "method": "heuristic",
+            "explanation": f"تنبؤ بناءً على: الصناعة ({multiplier}x), الميزانية ({budget_multiplier:.1f}x), القناة ({channel_multiplier}x)"
+        }
+
+    def _fallback_roi(self, error: Exception) -> Dict[str, Any]:
         """
-        توصية بقنوات التسويق المناسبة باستخدام نماذج التعلم الآلي
+        نتيجة ROI احتياطية عند حدوث خطأ
         """
-        try:
-            # Prepare context for rule evaluation
-            context = campaign_data.copy()
-
-            # Handle audience_age for rule evaluation
-            if "audience_age" in context:
-                age_range = context["audience_age"]
-                if isinstance(age_range, str):
-                    age_parts = age_range.split(',')
-                    if len(age_parts) >= 2:
-                        avg_age = (int(age_parts[0]) + int(age_parts[1])) / 2
-                        context["audience_age_avg"] = avg_age
-                    else:
-                        context["audience_age_avg"] = int(age_parts[0]) if age_parts else 30
-                elif isinstance(age_range, list):
-                    context["audience_age_avg"] = (age_range[0] + age_range[1]) / 2 if len(age_range) >= 2 else 30
+        return {
+            "prediction": 2.0,
+            "confidence": 0.3,
+            "method": "fallback",
+            "explanation": f"خطأ في التنبؤ: {str(error)}"
+        }
+
+    def _predict_batch(self, campaigns: List[Dict[str, Any]], rule_type: str, model_key: str,
+                       extract_features, from_rules, from_model, heuristic, fallback) -> List[Dict[str, Any]]:
+        """
+        تنفيذ التنبؤ الدفعي: تقييم القواعد لكل عنصر، ثم مصفوفة ميزات واحدة
+        واستدعاء predict واحد للنموذج، مع إرجاع الأخطاء لكل عنصر على حدة
+        """
+        start = time.perf_counter()
+        operation = f"{model_key}_batch"
+        results: List[Optional[Dict[str, Any]]] = [None] * len(campaigns)
+        pending = []  # (index, features, rules_result)
+        cache_keys: Dict[int, str] = {}
+        cached_indexes = set()
+        generation = self._cache_generation()
+
+        with self._stage(operation, "rules_and_features"):
+            self._prepare_batch(campaigns, rule_type, model_key, extract_features, from_rules,
+                                results, pending, cache_keys, cached_indexes, generation)
+
+        if pending:
+            model = self.ml_models.get(model_key)
+            if model:
+                try:
+                    with self._stage(operation, "model_predict"):
+                        # مصفوفة float32 محجوزة مسبقاً تُملأ بالمتجهات المرمزة لكل عنصر
+                        feature_matrix = np.empty((len(pending), len(pending[0][1])), dtype=np.float32)
+                        for position, (_, features, _) in enumerate(pending):
+                            feature_matrix[position] = features
+                        predictions = predict_rows(model, feature_matrix)
+                except Exception as e:
+                    print(f"Error in batch {model_key} prediction: {e}")
+                    # النتائج الاحتياطية لا تُخزن مؤقتاً
+                    for index, _, rules_result in pending:
+                        cache_keys.pop(index, None)
+                        results[index] = self._batch_item(index, fallback(e), rules_result)
+                    predictions = None
+
+                if predictions is not None:
+                    model_results = [from_model(prediction, model) for prediction in predictions]
+                    self._attach_attributions(operation, model_results, model, feature_matrix)
+                    for position, (index, _, rules_result) in enumerate(pending):
+                        results[index] = self._batch_item(index, model_results[position], rules_result)
+            else:
+                with self._stage(operation, "heuristic"):
+                    for index, _, rules_result in pending:
+                        try:
+                            results[index] = self._batch_item(index, heuristic(campaigns[index]), rules_result)
+                        except Exception as e:
+                            results[index] = self._batch_error(index, e)
+
+        self._store_batch_results(results, cache_keys, generation)
+        self._observe_batch(operation, results, cached_indexes, start)
+        return results
+
+    def _prepare_batch(self, campaigns: List[Dict[str, Any]], rule_type: str, model_key: str,
+                       extract_features, from_rules, results: List[Optional[Dict[str, Any]]],
+                       pending: List[Tuple[int, np.ndarray, List[Dict[str, Any]]]], cache_keys: Dict[int, str],
+                       cached_indexes: set, generation: Any) -> None:
+        """
+        المرور الأول على الدفعة: الذاكرة المؤقتة ثم القواعد، وتجميع العناصر التي تحتاج النموذج
+        """
+        for index, campaign_data in enumerate(campaigns):
+            try:
+                # ترميز الميزات مرة واحدة لمفتاح التخزين المؤقت ولمصفوفة النموذج
+                try:
+                    features, feature_error = extract_features(campaign_data), None
+                except Exception as e:
+                    features, feature_error = None, e
+
+                cache_key = self._prediction_cache_key(model_key, campaign_data, features) if features is not None else None
+                if cache_key:
+                    cached = prediction_cache.get(cache_key, generation)
+                    if cached is not None:
+                        results[index] = self._cached_batch_item(index, cached)
+                        cached_indexes.add(index)
+                        continue
+                    cache_keys[index] = cache_key
+
+                rules_result = self.knowledge_base.evaluate_rules(campaign_data, rule_type)
+                result = from_rules(rules_result)
+                if result:
+                    results[index] = self._batch_item(index, result, rules_result)
+                    continue
+                if feature_error is not None:
+                    raise feature_error
+                pending.append((index, features, rules_result))
+            except Exception as e:
+                results[index] = self._batch_error(index, e)
+
+    def _observe_batch(self, operation: str, results: List[Dict[str, Any]], cached_indexes: set, start: float,
+                       rule_indexes: set = frozenset()) -> None:
+        """
+        تسجيل زمن الدفعة وعدد العناصر حسب الطريقة المختارة
+        (rule_indexes: العناصر التي أنتجتها القواعد عندما لا تحمل النتيجة حقل method)
+        """
+        if not metrics.enabled:
+            return
+        metrics.observe("inference_seconds", time.perf_counter() - start, operation=operation, method="batch")
+        methods: Dict[str, int] = {}
+        for item in results:
+            if not item["success"]:
+                method = "error"
+            elif item["index"] in cached_indexes:
+                method = "cache"
+            elif isinstance(item["result"], dict):
+                method = item["result"].get("method", "unknown")
+            else:
+                method = "knowledge_rules" if item["index"] in rule_indexes else "heuristic"
+            methods[method] = methods.get(method, 0) + 1
+        for method, count in methods.items():
+            metrics.increment("inference_method_total", count, operation=operation, method=method)
 
-            # استخدام قاعدة المعرفة أولاً
-            rules_result = self.knowledge_base.evaluate_rules(context, "channel_recommendation")
+    def _batch_item(self, index: int, result: Any, rules_result: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        تغليف نتيجة عنصر ناجح في الدفعة مع القواعد المطابقة له
+        """
+        return {
+            "index": index,
+            "success": True,
+            "result": result,
+            "rule_matches": self._rule_matches(rules_result)
+        }
+
+    def _cached_batch_item(self, index: int, cached: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        تغليف نتيجة مخزنة مؤقتاً كعنصر ناجح في الدفعة
+        """
+        return {
+            "index": index,
+            "success": True,
+            "result": cached["result"],
+            "rule_matches": cached["rule_matches"]
+        }
+
+    def _batch_error(self, index: int, error: Exception) -> Dict[str, Any]:
+        """
+        تغليف خطأ عنصر في الدفعة دون إفشال الدفعة كاملة
+        """
+        return {
+            "index": index,
+            "success": False,
+            "error": str(error),
+            "rule_matches": []
+        }
+
+    def _rule_matches(self, rules_result: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        ملخص القواعد المطابقة (المعرف والاسم فقط)
+        """
+        return [
+            {"rule_id": action.get("rule_id"), "rule_name": action.get("rule_name")}
+            for action in rules_result or []
+        ]
 
-            if rules_result:
-                recommended_channels = []
-                for action in rules_result:
-                    if "recommended_channels" in action.get("actions", {}):
-                        recommended_channels.extend(action["actions"]["recommended_channels"])
-                if recommended_channels:
-                    return recommended_channels
-                else:
-                    # If no recommended channels are found in the rules, use the default logic
-                    print("No recommended channels found in rules, using default logic")
+    def _cached_prediction(self, kind: str, campaign_data: Dict[str, Any], compute,
+                           routing: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        إرجاع النتيجة المخزنة مؤقتاً إن وجدت، وإلا حسابها وتخزينها
+        (النتائج الاحتياطية الناتجة عن الأخطاء لا تُخزن).
+        مفتاح التخزين يتضمن إصدار النموذج الذي يخدم الطلب، فلا يرى فريق المرشح نتائج الإصدار النشط.
+        النتائج المخزنة لا تُسجل في التجارب ولا يقيّمها المرشح في الخلفية.
+        """
+        start = time.perf_counter()
+        cache_key = self._prediction_cache_key(kind, campaign_data, routing=routing)
+        generation = self._cache_generation()
+        if cache_key:
+            cached = prediction_cache.get(cache_key, generation)
+            if cached is not None:
+                self._observe_prediction(kind, "cache", start, campaign_data, cached["rule_matches"])
+                return cached["result"]
+
+        result, rules_result = compute(campaign_data)
+        rule_matches = self._rule_matches(rules_result)
+        if cache_key and rules_result is not None:
+            prediction_cache.set(cache_key, {
+                "result": result,
+                "rule_matches": rule_matches
+            }, generation)
+
+        self._observe_prediction(kind, self._prediction_method(result, rules_result), start, campaign_data, rule_matches)
+        return result
+
+    def _attach_attributions(self, operation: str, results: List[Dict[str, Any]], model: Dict[str, Any],
+                             feature_matrix: np.ndarray) -> None:
+        """
+        إرفاق مساهمات الميزات الفعلية (TreeSHAP) بنتائج النموذج كعوامل التنبؤ:
+        base_value + مجموع قيم العوامل = مخرج النموذج قبل القص
+        """
+        explainer = model.get("explainer")
+        if not settings.ENABLE_PREDICTION_ATTRIBUTIONS or explainer is None:
+            return
+        try:
+            with self._stage(operation, "attributions"):
+                contributions = explainer.shap_values(feature_matrix)
+        except Exception as e:
+            print(f"Error computing feature attributions: {e}")
+            return
+        for result, row, values in zip(results, feature_matrix, contributions):
+            result["factors"] = attribution_factors(model, values, row)
+            result["base_value"] = explainer.expected_value
 
-            # استخدام نماذج التعلم الآلي
-            features = self._extract_channel_features(campaign_data)
+    def explain_predictions(self, campaigns: List[Dict[str, Any]], model_key: str = "ctr") -> Optional[List[Dict[str, Any]]]:
+        """
+        مساهمات الميزات في تنبؤ النموذج لكل حملة (دفعة واحدة)،
+        أو None إذا لم يكن النموذج متوفراً أو غير قابل للتفسير
+        """
+        model = self.ml_models.get(model_key)
+        if not model or model.get("explainer") is None or model.get("schema") is None:
+            return None
 
-            # تنبؤ افتراضي بسيط
-            channels = [
-                {"channel": "social_media", "score": 0.85, "reason": "مناسب للفئة العمرية المستهدفة"},
-                {"channel": "search", "score": 0.75, "reason": "فعال للمنتجات التقنية"},
-                {"channel": "display", "score": 0.65, "reason": "تغطية واسعة للجمهور"},
-                {"channel": "video", "score": 0.70, "reason": "محتوى تفاعلي جذاب"},
-                {"channel": "email", "score": 0.55, "reason": "تكلفة منخفضة للتواصل المباشر"}
-            ]
+        explainer = model["explainer"]
+        with self._stage(f"{model_key}_explain", "features"):
+            feature_matrix = model["schema"].encode_batch(campaigns)
+        with self._stage(f"{model_key}_explain", "attributions"):
+            predictions = predict_rows(model, feature_matrix)
+            contributions = explainer.shap_values(feature_matrix)
+        return [
+            {
+                "prediction": float(prediction),
+                "base_value": explainer.expected_value,
+                "confidence": model["metadata"]["performance"].get("r2_score", 0.7),
+                "factors": attribution_factors(model, values, row)
+            }
+            for prediction, row, values in zip(predictions, feature_matrix, contributions)
+        ]
 
-            # تعديل الدرجات بناءً على البيانات
-            industry = campaign_data.get("industry", "technology").lower()
-            budget = campaign_data.get("budget", 1000)
+    def _stage(self, operation: str, stage: str):
+        """
+        مؤقت مرحلة من مراحل الاستدلال (لا يفعل شيئاً إذا كانت مراقبة الأداء معطلة)
+        """
+        return metrics.timer("inference_stage_seconds", operation=operation, stage=stage)
 
-            if industry == "technology":
-                channels[0]["score"] += 0.1  # زيادة درجة وسائل التواصل الاجتماعي
-                channels[1]["score"] += 0.15  # زيادة درجة البحث
+    def _prediction_method(self, result: Any, rules_result: Optional[List[Dict[str, Any]]]) -> str:
+        """
+        الطريقة التي أنتجت النتيجة (توصيات القنوات لا تحمل حقل method)
+        """
+        if isinstance(result, dict):
+            return result.get("method", "unknown")
+        if rules_result is None:
+            return "fallback"
+        if any("recommended_channels" in action.get("actions", {}) for action in rules_result):
+            return "knowledge_rules"
+        return "heuristic"
+
+    def _observe_prediction(self, operation: str, method: str, start: float,
+                            campaign_data: Any, rule_matches: List[Dict[str, Any]]) -> None:
+        """
+        تسجيل الزمن الكلي والطريقة المختارة، مع سجل منظم لعينة من الاستدعاءات
+        """
+        elapsed = time.perf_counter() - start
+        metrics.observe("inference_seconds", elapsed, operation=operation, method=method)
+        metrics.increment("inference_method_total", operation=operation, method=method)
+        log_sampled(
+            "prediction",
+            operation=operation,
+            method=method,
+            latency_ms=round(elapsed * 1000, 3),
+            rule_ids=[match["rule_id"] for match in rule_matches],
+            campaign_fields=sorted(campaign_data) if isinstance(campaign_data, dict) else None
+        )
+
+    def _store_batch_results(self, results: List[Dict[str, Any]], cache_keys: Dict[int, str], generation: Any) -> None:
+        """
+        تخزين نتائج الدفعة الناجحة في الذاكرة المؤقتة
+        """
+        for index, cache_key in cache_keys.items():
+            item = results[index]
+            if item and item["success"]:
+                prediction_cache.set(cache_key, {
+                    "result": item["result"],
+                    "rule_matches": item["rule_matches"]
+                }, generation)
+
+    def _cache_generation(self) -> Tuple[int, Optional[int]]:
+        """
+        جيل النماذج والقواعد الحالي؛ تغيره يبطل كل النتائج المخزنة مؤقتاً
+        """
+        return model_registry.generation, self.knowledge_base.snapshot.version
 
-            if budget > 5000:
-                channels[2]["score"] += 0.1  # زيادة درجة الإعلانات المصورة للميزانيات الكبيرة
+    def _prediction_cache_key(self, kind: str, campaign_data: Dict[str, Any],
+                              features: Optional[np.ndarray] = None,
+                              routing: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        بناء مفتاح التخزين المؤقت من الميزات المستخرجة وقيم الحقول التي تعتمد عليها
+        القواعد والتنبؤات الافتراضية، مع إصدار النموذج والقواعد.
+        يعيد None إذا كان التخزين معطلاً أو تعذر استخراج الميزات.
+        """
+        if not settings.ENABLE_PREDICTION_CACHE or not isinstance(campaign_data, dict):
+            return None
 
-            # ترتيب القنوات حسب الدرجة
-            channels.sort(key=lambda x: x["score"], reverse=True)
+        rule_type, model_key, extract_features = self._CACHE_SPECS[kind]
+        try:
+            if features is None:
+                features = getattr(self, extract_features)(campaign_data)
+            context = self._channel_context(campaign_data) if kind == "channels" else campaign_data
+        except Exception:
+            return None
 
-            return channels
+        fields = set(self.knowledge_base.get_compiled_rules().fields(rule_type))
+        fields.update(self._HEURISTIC_FIELDS)
+        model = experiment_router.served_model(self.ml_models.get(model_key), routing) if model_key else None
 
-        except Exception as e:
-            print(f"Error in channel recommendation: {e}")
-            return [
-                {"channel": "social_media", "score": 0.8, "reason": "قناة افتراضية", "confidence": 0.7},
-                {"channel": "search", "score": 0.7, "reason": "قناة افتراضية", "confidence": 0.6}
-            ]
+        return PredictionCache.make_key(
+            kind,
+            features.tolist(),
+            {field: context.get(field) for field in sorted(fields)},
+            model["version"] if model else None,
+            self.knowledge_base.snapshot.version
+        )
 
-    def _extract_ctr_features(self, campaign_data: Dict[str, Any]) -> List[float]:
+    def recommend_channels(self, campaign_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
-        استخراج الميزات لتنبؤ CTR
+        توصية بقنوات التسويق المناسبة باستخدام نماذج التعلم الآلي
         """
-        features = []
+        return self._cached_prediction("channels", campaign_data, self._recommend_channels)
 
-        # تحويل الصناعة إلى رقم
-        industry_map = {"technology": 1, "fashion": 2, "food": 3, "automotive": 4, "healthcare": 5}
-        industry = campaign_data.get("industry", "technology").lower()
-        features.append(industry_map.get(industry, 1))
+    def _recommend_channels(self, campaign_data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+        """
+        حساب توصية القنوات مع القواعد المطابقة (None عند استخدام النتيجة الاحتياطية)
+        """
+        try:
+            # استخدام قاعدة المعرفة أولاً
+            with self._stage("channels", "rules"):
+                rules_result = self.knowledge_base.evaluate_rules(self._channel_context(campaign_data), "channel_recommendation")
+                recommended_channels = self._channels_from_rules(rules_result)
+            if recommended_channels:
+                return recommended_channels, rules_result
 
-        # تحويل القناة إلى رقم
-        channel_map = {"social_media": 1, "search": 2, "display": 3, "video": 4, "email": 5}
-        channel = campaign_data.get("channel", "social_media").lower()
-        features.append(channel_map.get(channel, 1))
+            # استخدام نماذج التعلم الآلي
+            with self._stage("channels", "features"):
+                features = self._extract_channel_features(campaign_data)
 
-        # الميزانية (طبيعية)
-        budget = campaign_data.get("budget", 1000)
-        features.append(budget / 10000)  # تطبيع
-
-        # الفئة العمرية (متوسط)
-        age_range = campaign_data.get("audience_age", [25, 45])
-        if isinstance(age_range, str):
-            # إذا كانت النطاق مفصولاً بفواصل، قسمه
-            age_parts = age_range.split(',')
-            if len(age_parts) >= 2:
-                avg_age = (int(age_parts[0]) + int(age_parts[1])) / 2
-            else:
-                avg_age = int(age_parts[0]) if age_parts else 30
-        elif isinstance(age_range, list):
-            avg_age = (age_range[0] + age_range[1]) / 2 if len(age_range) >= 2 else 30
-        else:
-            avg_age = 30
-        features.append(avg_age / 100)  # تطبيع
+            # تنبؤ افتراضي بسيط
+            with self._stage("channels", "heuristic"):
+                return self._heuristic_channels(campaign_data), rules_result
 
-        return features
+        except Exception as e:
+            print(f"Error in channel recommendation: {e}")
+            with self._stage("channels", "fallback"):
+                return self._fallback_channels(), None
 
-    def _extract_roi_features(self, campaign_data: Dict[str, Any]) -> List[float]:
+    def recommend_channels_batch(self, campaigns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        استخراج الميزات لتنبؤ ROI
+        توصية بالقنوات لمجموعة من الحملات مع إرجاع الأخطاء لكل عنصر على حدة
         """
-        features = []
+        start = time.perf_counter()
+        results = []
+        cache_keys: Dict[int, str] = {}
+        cached_indexes = set()
+        rule_indexes = set()
+        generation = self._cache_generation()
+
+        for index, campaign_data in enumerate(campaigns):
+            try:
+                cache_key = self._prediction_cache_key("channels", campaign_data)
+                if cache_key:
+                    cached = prediction_cache.get(cache_key, generation)
+                    if cached is not None:
+                        results.append(self._cached_batch_item(index, cached))
+                        cached_indexes.add(index)
+                        continue
+                    cache_keys[index] = cache_key
+
+                rules_result = self.knowledge_base.evaluate_rules(self._channel_context(campaign_data), "channel_recommendation")
+                recommended_channels = self._channels_from_rules(rules_result)
+                if recommended_channels:
+                    rule_indexes.add(index)
+                else:
+                    # التحقق من صلاحية الميزات قبل التوصية الافتراضية
+                    self._extract_channel_features(campaign_data)
+                    recommended_channels = self._heuristic_channels(campaign_data)
+                results.append(self._batch_item(index, recommended_channels, rules_result))
+            except Exception as e:
+                results.append(self._batch_error(index, e))
+
+        self._store_batch_results(results, cache_keys, generation)
+        self._observe_batch("channels_batch", results, cached_indexes, start, rule_indexes)
+        return results
+
+    def _channel_context(self, campaign_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        تحضير سياق تقييم قواعد توصية القنوات
+        """
+        context = campaign_data.copy()
+
+        # Handle audience_age for rule evaluation
+        if "audience_age" in context:
+            age_range = context["audience_age"]
+            if isinstance(age_range, str):
+                age_parts = age_range.split(',')
+                if len(age_parts) >= 2:
+                    avg_age = (int(age_parts[0]) + int(age_parts[1])) / 2
+                    context["audience_age_avg"] = avg_age
+                else:
+                    context["audience_age_avg"] = int(age_parts[0]) if age_parts else 30
+            elif isinstance(age_range, list):
+                context["audience_age_avg"] = (age_range[0] + age_range[1]) / 2 if len(age_range) >= 2 else 30
 
-        # تحويل الصناعة إلى رقم
-        industry_map = {"technology": 1, "fashion": 2, "food": 3, "automotive": 4, "healthcare": 5}
-        industry = campaign_data.get("industry", "technology").lower()
-        features.append(industry_map.get(industry, 1))
+        return context
 
-        # الميزانية
+    def _channels_from_rules(self, rules_result: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        استخراج القنوات الموصى بها من القواعد المطابقة
+        """
+        recommended_channels = []
+        if rules_result:
+            for action in rules_result:
+                if "recommended_channels" in action.get("actions", {}):
+                    recommended_channels.extend(action["actions"]["recommended_channels"])
+            if not recommended_channels:
+                # If no recommended channels are found in the rules, use the default logic
+                print("No recommended channels found in rules, using default logic")
+        return recommended_channels
+
+    def _heuristic_channels(self, campaign_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        توصية افتراضية بسيطة بالقنوات
+        """
+        channels = [
+            {"channel": "social_media", "score": 0.85, "reason": "مناسب للفئة العمرية المستهدفة"},
+            {"channel": "search", "score": 0.75, "reason": "فعال للمنتجات التقنية"},
+            {"channel": "display", "score": 0.65, "reason": "تغطية واسعة للجمهور"},
+            {"channel": "video", "score": 0.70, "reason": "محتوى تفاعلي جذاب"},
+            {"channel": "email", "score": 0.55, "reason": "تكلفة منخفضة للتواصل المباشر"}
+        ]
+
+        # تعديل الدرجات بناءً على البيانات
+        industry = campaign_data.get("industry", "technology").lower()
         budget = campaign_data.get("budget", 1000)
-        features.append(budget / 10000)
 
-        # المدة الزمنية
-        duration = campaign_data.get("duration", 30)
-        features.append(duration / 90)  # تطبيع على 90 يوم
+        if industry == "technology":
+            channels[0]["score"] += 0.1  # زيادة درجة وسائل التواصل الاجتماعي
+            channels[1]["score"] += 0.15  # زيادة درجة البحث
+
+        if budget > 5000:
+            channels[2]["score"] += 0.1  # زيادة درجة الإعلانات المصورة للميزانيات الكبيرة
 
-        # نوع المحتوى
-        content_type = campaign_data.get("content_type", "mixed")
-        content_map = {"video": 1, "image": 2, "text": 3, "mixed": 4}
-        features.append(content_map.get(content_type, 4))
+        # ترتيب القنوات حسب الدرجة
+        channels.sort(key=lambda x: x["score"], reverse=True)
 
-        return features
+        return channels
 
-    def _extract_channel_features(self, campaign_data: Dict[str, Any]) -> List[float]:
+    def _fallback_channels(self) -> List[Dict[str, Any]]:
         """
-        استخراج الميزات لتوصية القنوات
+        قنوات احتياطية عند حدوث خطأ
         """
-        features = []
+        return [
+            {"channel": "social_media", "score": 0.8, "reason": "قناة افتراضية", "confidence": 0.7},
+            {"channel": "search", "score": 0.7, "reason": "قناة افتراضية", "confidence": 0.6}
+        ]
 
-        # تحويل الصناعة إلى رقم
-        industry_map = {"technology": 1, "fashion": 2, "food": 3, "automotive": 4, "healthcare": 5}
-        industry = campaign_data.get("industry", "technology").lower()
-        features.append(industry_map.get(industry, 1))
-
-        # الميزانية
-        budget = campaign_data.get("budget", 1000)
-        features.append(budget / 10000)
-
-        # الفئة العمرية
-        age_range = campaign_data.get("audience_age", [25, 45])
-        if isinstance(age_range, str):
-            # إذا كانت النطاق مفصولاً بفواصل، قسمه
-            age_parts = age_range.split(',')
-            if len(age_parts) >= 2:
-                avg_age = (int(age_parts[0]) + int(age_parts[1])) / 2
-            else:
-                avg_age = int(age_parts[0]) if age_parts else 30
-        elif isinstance(age_range, list):
-            avg_age = (age_range[0] + age_range[1]) / 2 if len(age_range) >= 2 else 30
-        else:
-            avg_age = 30
-        features.append(avg_age / 100)
+    def _extract_ctr_features(self, campaign_data: Dict[str, Any]) -> np.ndarray:
+        """
+        استخراج الميزات لتنبؤ CTR (نفس المخطط المستخدم في التدريب)
+        """
+        return CTR_SCHEMA.encode(campaign_data)
 
-        # الهدف
-        goal = campaign_data.get("goal", "awareness")
-        goal_map = {"awareness": 1, "consideration": 2, "conversion": 3}
-        features.append(goal_map.get(goal, 1))
+    def _extract_roi_features(self, campaign_data: Dict[str, Any]) -> np.ndarray:
+        """
+        استخراج الميزات لتنبؤ ROI (نفس المخطط المستخدم في التدريب)
+        """
+        return ROI_SCHEMA.encode(campaign_data)
 
-        return features
+    def _extract_channel_features(self, campaign_data: Dict[str, Any]) -> np.ndarray:
+        """
+        استخراج الميزات لتوصية القنوات (نفس المخطط المستخدم في التدريب)
+        """
+        return CHANNEL_SCHEMA.encode(campaign_data)
     
     def _prepare_features(self, data: Dict[str, Any], required_features: List[str]) -> Optional[np.ndarray]:
         """
         تحضير ميزات البيانات للنموذج
         """
         try:
-            # تحويل البيانات إلى DataFrame
-            df = pd.DataFrame([data])
-            
-            # التحقق من وجود جميع الميزات المطلوبة
-            missing_features = [f for f in required_features if f not in df.columns]
-            if missing_features:
-                print(f"Missing features: {missing_features}")
-                return None
-            
-            # اختيار الميزات المطلوبة فقط
-            X = df[required_features].values
-            return X
+            return schema_from_names(required_features).encode_batch([data])
+        except MissingFeatureError as e:
+            print(f"Missing features: {e}")
+            return None
         except Exception as e:
             print(f"Error preparing features: {e}")
             return None
@@ -0,0 +1,88 @@
+from typing import Any, Tuple
+from datetime import date, datetime
+import json
+import socket
+import struct
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# رأس كل إطار: طول الحمولة، معرف الطلب، نوع الترميز
+HEADER = struct.Struct("!IIB")
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+# أقصى حجم لحمولة إطار واحد (حماية من إطارات تالفة)
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+DEFAULT_CODEC = CODEC_MSGPACK if msgpack is not None else CODEC_JSON
+
+
+class ProtocolError(ConnectionError):
+    """
+    إطار غير صالح أو انقطاع الاتصال أثناء قراءة إطار
+    """
+
+
+def _default(value: Any) -> Any:
+    """
+    تحويل أنواع numpy والتواريخ إلى أنواع قابلة للترميز
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def encode(message: Any, codec: int = DEFAULT_CODEC) -> bytes:
+    if codec == CODEC_MSGPACK:
+        return msgpack.packb(message, default=_default, use_bin_type=True)
+    return json.dumps(message, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def decode(payload: bytes, codec: int) -> Any:
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ProtocolError("Received a msgpack frame but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    return json.loads(payload)
+
+
+def pack_frame(request_id: int, message: Any, codec: int = DEFAULT_CODEC) -> bytes:
+    """
+    ترميز رسالة في إطار واحد (رأس + حمولة)
+    """
+    payload = encode(message, codec)
+    return HEADER.pack(len(payload), request_id, codec) + payload
+
+
+def unpack_header(header: bytes) -> Tuple[int, int, int]:
+    length, request_id, codec = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame too large: {length} bytes")
+    return length, request_id, codec
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ProtocolError("Connection closed by peer")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def read_frame(sock: socket.socket) -> Tuple[int, Any]:
+    """
+    قراءة إطار كامل من مقبس متزامن وإرجاع (معرف الطلب، الرسالة)
+    """
+    length, request_id, codec = unpack_header(_recv_exact(sock, HEADER.size))
+    return request_id, decode(_recv_exact(sock, length), codec)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+خادم استدلال محلي (sidecar) يعمل كعملية واحدة طويلة العمر لكل خادم، يملك النماذج
+(MLModelManager وسجل النماذج) ولقطة القواعد، ويخدم عمال الـ API عبر مقبس Unix
+ببروتوكول إطارات ثنائي (msgpack إذا كان مثبتاً وإلا JSON).
+
+كل اتصال يقبل عدة طلبات متتالية دون انتظار الردود (pipelining)، ويتم تنفيذها
+بالتوازي في مجمع خيوط وإرسال كل رد فور جهوزه مع معرف طلبه.
+
+التشغيل من مجلد backend:
+    python -m app.core.strategic_mind.inference_server --socket /run/maestro/inference.sock
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+
+from app.config import settings
+from app.database import SessionLocal
+from app.core.learning_loop.prediction_log import prediction_log_buffer
+from .inference_engine import HybridInferenceEngine
+from .inference_protocol import HEADER, ProtocolError, decode, pack_frame, unpack_header
+from .ml_manager import ml_manager
+from .model_experiments import experiment_router
+from .feature_drift import drift_monitor
+from .model_registry import model_registry
+
+
+# دوال المحرك التي يمكن استدعاؤها عن بعد (نفس الواجهة العامة لـ HybridInferenceEngine)
+ENGINE_OPS = (
+    "predict_ctr", "predict_roi", "recommend_channels",
+    "predict_ctr_batch", "predict_roi_batch", "recommend_channels_batch",
+    "update_from_feedback", "get_model_performance_report", "explain_predictions",
+)
+
+
+class InferenceServer:
+    """
+    خادم الاستدلال عبر مقبس Unix
+    """
+
+    def __init__(self, socket_path: str, threads: int = None):
+        """
+        تهيئة الخادم
+        """
+        self.socket_path = socket_path
+        self.threads = max(1, settings.INFERENCE_SERVER_THREADS if threads is None else threads)
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self.requests_by_op: Dict[str, int] = {}
+        self._connection_tasks: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    def load_models(self) -> Dict[str, Any]:
+        """
+        تحميل نماذج الملفات والنماذج النشطة في قاعدة البيانات قبل قبول الاتصالات
+        """
+        ml_manager._load_existing_models()
+        db = SessionLocal()
+        try:
+            model_registry.sync_active_models(db, force=True)
+        finally:
+            db.close()
+        return model_registry.loaded_versions()
+
+    def handle(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        تنفيذ طلب واحد وإرجاع الرد ({"ok": True, "result": ...} أو {"ok": False, "error": ...})
+        """
+        op = message.get("op") if isinstance(message, dict) else None
+        with self._lock:
+            self.requests += 1
+            self.requests_by_op[str(op)] = self.requests_by_op.get(str(op), 0) + 1
+
+        try:
+            if op == "ping":
+                return {"ok": True, "result": "pong"}
+            if op == "stats":
+                return {"ok": True, "result": self.stats()}
+            if op not in ENGINE_OPS:
+                raise ValueError(f"Unknown operation: {op}")
+
+            db = SessionLocal()
+            try:
+                result = getattr(HybridInferenceEngine(db), op)(*message.get("args", []))
+            finally:
+                db.close()
+            return {"ok": True, "result": result}
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"Error in inference server ({op}): {e}")
+            return {"ok": False, "error": str(e), "type": type(e).__name__}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        إحصائيات الخادم
+        """
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "socket": self.socket_path,
+                "threads": self.threads,
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "connections": self.connections,
+                "requests": self.requests,
+                "errors": self.errors,
+                "requests_by_op": dict(self.requests_by_op),
+                "models": {
+                    source: {model_type: entry["version"] for model_type, entry in entries.items()}
+                    for source, entries in model_registry.loaded_versions().items()
+                }
+            }
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        قراءة الإطارات من اتصال واحد وتنفيذها بالتوازي، مع إرسال كل رد بمعرف طلبه
+        """
+        loop = asyncio.get_running_loop()
+        self._connection_tasks[asyncio.current_task()] = writer
+        with self._lock:
+            self.connections += 1
+
+        async def respond(request_id: int, codec: int, message: Any) -> None:
+            response = await loop.run_in_executor(self._executor, self.handle, message)
+            writer.write(pack_frame(request_id, response, codec))
+            await writer.drain()
+
+        tasks = set()
+        try:
+            while True:
+                length, request_id, codec = unpack_header(await reader.readexactly(HEADER.size))
+                message = decode(await reader.readexactly(length), codec)
+                task = asyncio.ensure_future(respond(request_id, codec, message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ProtocolError as e:
+            print(f"Error in inference server connection: {e}")
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+            self._connection_tasks.pop(asyncio.current_task(), None)
+            with self._lock:
+                self.connections -= 1
+
+    async def serve(self) -> None:
+        """
+        بدء الاستماع على مقبس Unix حتى الإيقاف
+        """
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        socket_dir = os.path.dirname(self.socket_path)
+        if socket_dir:
+            os.makedirs(socket_dir, exist_ok=True)
+
+        server = await asyncio.start_unix_server(self._serve_connection, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        print(f"🧠 Inference server listening on {self.socket_path} ({self.threads} threads)")
+
+        # الإيقاف عند SIGTERM أو SIGINT مع حذف ملف المقبس
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        try:
+            await stop.wait()
+        finally:
+            server.close()
+            # إغلاق الاتصالات المفتوحة بعد إنهاء الطلبات الجارية عليها
+            for writer in list(self._connection_tasks.values()):
+                writer.close()
+            await asyncio.gather(*self._connection_tasks, return_exceptions=True)
+            self._executor.shutdown(wait=False)
+            # تقييمات المرشح المعلقة وسجلات التنبؤ وملخصات الميزات التي لم تُكتب بعد
+            experiment_router.close()
+            prediction_log_buffer.close()
+            drift_monitor.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maestro local inference server")
+    parser.add_argument("--socket", default=settings.INFERENCE_SERVER_SOCKET or "/tmp/maestro-inference.sock")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    server = InferenceServer(args.socket, args.threads)
+    for source, entries in server.load_models().items():
+        for model_type, entry in entries.items():
+            print(f"Loaded {source} model {model_type} ({entry['version']})")
+    asyncio.run(server.serve())
+
+
+if __name__ == "__main__":
+    main()
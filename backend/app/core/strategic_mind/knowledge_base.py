@@ -5,6 +5,8 @@ from datetime import datetime
 
 from app.models.knowledge_base import KnowledgeRule
 from app.schemas.knowledge_base import KnowledgeRuleCreate
+from app.core.strategic_mind.rule_matcher import CompiledRuleSet, compile_conditions
+from app.core.strategic_mind.rule_snapshot import RuleSnapshot, EMPTY_SNAPSHOT, rule_snapshot_store
 
 
 class DynamicKnowledgeBase:
@@ -18,24 +20,23 @@ class DynamicKnowledgeBase:
         تهيئة قاعدة المعرفة بدون أي قواعد افتراضية.
         """
         self.db = db
-        self.rules_cache = {}
+        self.snapshot: RuleSnapshot = EMPTY_SNAPSHOT
         self._load_rules()
 
-    def _load_rules(self) -> None:
+    @property
+    def rules_cache(self):
         """
-        تحميل القواعد من قاعدة البيانات إلى الذاكرة المؤقتة
+        القواعد النشطة من اللقطة الحالية (للقراءة فقط)
+        """
+        return self.snapshot.rules
+
+    def _load_rules(self, force: bool = False) -> None:
+        """
+        الحصول على لقطة القواعد المشتركة على مستوى العملية.
+        لا يتم تحميل القواعد من قاعدة البيانات إلا إذا تغير إصدارها.
         """
         if self.db:
-            rules = self.db.query(KnowledgeRule).filter(KnowledgeRule.is_active == True)\
-                .order_by(KnowledgeRule.priority.desc()).all()
-            for rule in rules:
-                self.rules_cache[rule.id] = {
-                    "name": rule.name,
-                    "rule_type": rule.rule_type,
-                    "conditions": json.loads(rule.conditions) if rule.conditions else {},
-                    "actions": json.loads(rule.actions) if rule.actions else {},
-                    "priority": rule.priority
-                }
+            self.snapshot = rule_snapshot_store.current(self.db, force=force)
 
     def add_rule(self, rule: KnowledgeRuleCreate) -> Optional[KnowledgeRule]:
         """
@@ -52,17 +53,12 @@ class DynamicKnowledgeBase:
                 is_active=rule.is_active
             )
             self.db.add(db_rule)
+            rule_snapshot_store.bump_version(self.db)
             self.db.commit()
             self.db.refresh(db_rule)
 
-            # تحديث الذاكرة المؤقتة
-            self.rules_cache[db_rule.id] = {
-                "name": db_rule.name,
-                "rule_type": db_rule.rule_type,
-                "conditions": json.loads(db_rule.conditions) if db_rule.conditions else {},
-                "actions": json.loads(db_rule.actions) if db_rule.actions else {},
-                "priority": db_rule.priority
-            }
+            # إعادة بناء اللقطة بعد زيادة الإصدار
+            self._load_rules(force=True)
 
             return db_rule
         return None
@@ -83,57 +79,23 @@ class DynamicKnowledgeBase:
 
     def evaluate_rules(self, context: Dict[str, Any], rule_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        تقييم القواعد على سياق معين وإرجاع الإجراءات التي يجب اتخاذها
+        تقييم القواعد على سياق معين وإرجاع الإجراءات التي يجب اتخاذها.
+        يتم تقييم القواعد المرشحة فقط من الفهرس المترجم بدلاً من المرور على كل القواعد.
         """
-        actions_to_take = []
-        rules = self.get_rules(rule_type)
-
-        for rule in rules:
-            if self._evaluate_conditions(rule["conditions"], context):
-                actions_to_take.append({
-                    "rule_id": rule["id"],
-                    "rule_name": rule["name"],
-                    "actions": rule["actions"]
-                })
+        return self.get_compiled_rules().match(context, rule_type)
 
-        return actions_to_take
+    def get_compiled_rules(self) -> CompiledRuleSet:
+        """
+        الحصول على القواعد المترجمة في اللقطة الحالية (تتم الترجمة مرة واحدة لكل إصدار)
+        """
+        return self.snapshot.compiled
 
     def _evaluate_conditions(self, conditions: Dict[str, Any], context: Dict[str, Any]) -> bool:
         """
         تقييم شروط القاعدة على سياق معين
+        الشروط البسيطة تدعم المساواة والعمليات: $gte, $lte, $gt, $lt, $ne, $in, $between
         """
-        if not isinstance(conditions, dict):
-            return False
-
-        # التعامل مع الشرط البسيط
-        if "field" in conditions and "value" in conditions:
-            field = conditions["field"]
-            value = conditions["value"]
-            context_value = context.get(field)
-            if isinstance(value, dict):
-                # دعم بعض العمليات الشائعة مثل $gte, $lte
-                for op, val in value.items():
-                    if op == "$gte" and not (context_value >= val):
-                        return False
-                    if op == "$lte" and not (context_value <= val):
-                        return False
-            else:
-                if context_value != value:
-                    return False
-            return True
-
-        # التعامل مع الشروط المركبة
-        if "operator" in conditions and "conditions" in conditions:
-            operator = conditions["operator"].upper()
-            sub_conditions = conditions["conditions"]
-            if operator == "AND":
-                return all(self._evaluate_conditions(sub, context) for sub in sub_conditions)
-            elif operator == "OR":
-                return any(self._evaluate_conditions(sub, context) for sub in sub_conditions)
-            elif operator == "NOT":
-                return not self._evaluate_conditions(sub_conditions[0], context) if sub_conditions else True
-
-        return False
+        return compile_conditions(conditions)(context)
 
     def update_from_feedback(self, rule_id: int, feedback: Dict[str, Any]) -> bool:
         """
@@ -159,16 +121,11 @@ class DynamicKnowledgeBase:
                     current_actions.update(feedback["suggested_actions"])
                     db_rule.actions = json.dumps(current_actions)
 
+                rule_snapshot_store.bump_version(self.db)
                 self.db.commit()
 
-                # تحديث الذاكرة المؤقتة
-                self.rules_cache[rule_id] = {
-                    "name": db_rule.name,
-                    "rule_type": db_rule.rule_type,
-                    "conditions": json.loads(db_rule.conditions) if db_rule.conditions else {},
-                    "actions": json.loads(db_rule.actions) if db_rule.actions else {},
-                    "priority": db_rule.priority
-                }
+                # إعادة بناء اللقطة بعد زيادة الإصدار
+                self._load_rules(force=True)
                 return True
         return False
 
@@ -180,5 +137,7 @@ class DynamicKnowledgeBase:
             "rules_count": len(self.rules_cache),
             "active_rules": len([rule for rule in self.rules_cache.values() if rule.get("is_active", True)]),
             "rule_types": list(set(rule["rule_type"] for rule in self.rules_cache.values())),
+            "version": self.snapshot.version,
+            "snapshot_built_at": self.snapshot.built_at,
             "last_updated": datetime.now().isoformat()
         }
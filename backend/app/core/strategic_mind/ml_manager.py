@@ -4,6 +4,7 @@
 """
 
 import os
+import json
 import joblib
 import pickle
 import numpy as np
@@ -14,6 +15,12 @@ from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
 
+from app.config import settings
+from .model_registry import model_registry, predict_rows, FILE_SOURCE
+from .feature_schema import MissingFeatureError, schema_from_names
+from .artifact_store import ArtifactStore, FILE_NAMESPACE, collect_garbage
+from .hyperparameter_search import HyperparameterSearch
+
 
 class MLModelManager:
     """
@@ -22,29 +29,76 @@ class MLModelManager:
 
     def __init__(self, models_path: str = "./ml_models"):
         self.models_path = models_path
-        self.models = {}
+        # مساحة منفصلة في المخزن عن إصدارات محدث النماذج (ميزات وترميز مختلفان لنفس الأسماء)
+        self.artifacts = ArtifactStore(os.path.join(models_path, "artifacts"), namespace=FILE_NAMESPACE)
         self.scalers = {}
-        self.features = {}
-        self._load_existing_models()
+        # عند استخدام خادم الاستدلال تبقى النماذج في الخادم فقط (يحمّلها عند بدء تشغيله)
+        if not settings.INFERENCE_SERVER_SOCKET:
+            self._load_existing_models()
+
+    @property
+    def models(self) -> Dict[str, Any]:
+        """النماذج المحملة حالياً من سجل النماذج المشترك"""
+        return {model_type: entry["model"] for model_type, entry in model_registry.snapshot(FILE_SOURCE).items()}
+
+    @property
+    def features(self) -> Dict[str, List[str]]:
+        """ميزات النماذج المحملة حالياً من سجل النماذج المشترك"""
+        return {model_type: entry["features"] for model_type, entry in model_registry.snapshot(FILE_SOURCE).items()}
 
     def _load_existing_models(self) -> None:
-        """تحميل النماذج الموجودة من الملفات فقط"""
+        """تحميل النماذج الموجودة من الملفات فقط (مرة واحدة لكل إصدار)"""
         print("🤖 Loading ML Models...")
 
         for model_type in ["ctr", "roi", "channel"]:
+            # أحدث إصدار في مخزن النماذج، وإلا ملفات pkl القديمة
+            artifact = self.artifacts.latest(model_type)
+            if artifact is not None:
+                entry = model_registry.load(
+                    model_type, artifact["path"], artifact["version"], artifact["features"],
+                    metadata={"name": f"{model_type}_model"}, source=FILE_SOURCE
+                )
+                if entry and entry["version"] == artifact["version"]:
+                    print(f"  ✅ {model_type.upper()} Model loaded")
+                else:
+                    print(f"  ❌ Error loading {model_type} model")
+                continue
+
             model_file = f"{self.models_path}/{model_type}_model.pkl"
             feature_file = f"{self.models_path}/{model_type}_features.pkl"
 
             if os.path.exists(model_file) and os.path.exists(feature_file):
+                version = self._file_version(model_file)
+                current = model_registry.get(model_type, FILE_SOURCE)
+                if current and current["version"] == version:
+                    continue
                 try:
-                    with open(model_file, 'rb') as f:
-                        self.models[model_type] = pickle.load(f)
                     with open(feature_file, 'rb') as f:
-                        self.features[model_type] = pickle.load(f)
-                    print(f"  ✅ {model_type.upper()} Model loaded")
+                        features = pickle.load(f)
+                    # التحميل عبر السجل حتى يطبق وضع مشاركة النماذج بين العمال (MODEL_SHARING_MODE)
+                    entry = model_registry.load(
+                        model_type, model_file, version, features,
+                        metadata={"name": f"{model_type}_model"},
+                        source=FILE_SOURCE, loader=self._read_pickle
+                    )
+                    if entry and entry["version"] == version:
+                        print(f"  ✅ {model_type.upper()} Model loaded")
+                    else:
+                        print(f"  ❌ Error loading {model_type} model")
                 except Exception as e:
                     print(f"  ❌ Error loading {model_type} model: {e}")
 
+    @staticmethod
+    def _read_pickle(path: str) -> Any:
+        """قراءة نموذج محفوظ بـ pickle"""
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    @staticmethod
+    def _file_version(path: str) -> str:
+        """إصدار ملف النموذج مشتق من وقت تعديله"""
+        return str(os.stat(path).st_mtime_ns)
+
     def predict_ctr(self, campaign_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """تنبؤ CTR باستخدام النموذج الحقيقي فقط"""
         if "ctr" not in self.models:
@@ -54,8 +108,7 @@ class MLModelManager:
         if features is None:
             raise ValueError("Insufficient features for CTR prediction")
 
-        model = self.models["ctr"]
-        prediction = float(model.predict([features])[0])
+        prediction = float(predict_rows(model_registry.get("ctr", FILE_SOURCE), features)[0])
 
         return {"prediction": max(0.0, min(1.0, prediction)), "model_used": "ctr_model"}
 
@@ -70,10 +123,9 @@ class MLModelManager:
 
         # تطبيع البيانات إذا كان scaler متوفر
         if "roi" in self.scalers:
-            features = self.scalers["roi"].transform([features])[0]
+            features = self.scalers["roi"].transform(features)
 
-        model = self.models["roi"]
-        prediction = float(model.predict([features])[0])
+        prediction = float(predict_rows(model_registry.get("roi", FILE_SOURCE), features)[0])
 
         return {"prediction": max(0.0, prediction), "model_used": "roi_model"}
 
@@ -86,8 +138,7 @@ class MLModelManager:
         if features is None:
             raise ValueError("Insufficient features for channel recommendation")
 
-        model = self.models["channel"]
-        scores = model.predict([features])[0]
+        scores = predict_rows(model_registry.get("channel", FILE_SOURCE), features)[0]
 
         channels = ["facebook", "instagram", "google_ads", "twitter", "linkedin", "youtube"]
         recommendations = []
@@ -102,37 +153,48 @@ class MLModelManager:
         recommendations.sort(key=lambda x: x["score"], reverse=True)
         return recommendations[:5]
 
-    def _prepare_features(self, campaign_data: Dict[str, Any], model_type: str) -> Optional[List[float]]:
-        """تحضير ميزات الحملة من البيانات الحقيقية"""
-        if model_type not in self.features:
+    def _prepare_features(self, campaign_data: Dict[str, Any], model_type: str) -> Optional[np.ndarray]:
+        """تحضير ميزات الحملة (صف واحد float32) بمخطط النموذج المترجم"""
+        entry = model_registry.get(model_type, FILE_SOURCE)
+        if entry is None or entry["schema"] is None:
             return None
 
-        feature_values = []
-        for feature in self.features[model_type]:
-            if feature not in campaign_data:
-                return None  # إرجاع None إذا أي ميزة ناقصة
-            value = campaign_data[feature]
-            if isinstance(value, bool):
-                value = 1.0 if value else 0.0
-            elif isinstance(value, str):
-                try:
-                    value = float(value)
-                except:
-                    value = 0.0
-            feature_values.append(float(value))
-
-        return feature_values
+        try:
+            return entry["schema"].encode_batch([campaign_data])
+        except MissingFeatureError:
+            return None  # إرجاع None إذا أي ميزة ناقصة
 
     def get_model_performance(self) -> Dict[str, Any]:
         """إرجاع معلومات النماذج المحملة"""
         return {
             "loaded_models": list(self.models.keys()),
             "available_features": list(self.features.keys()),
-            "scalers_available": list(self.scalers.keys())
+            "scalers_available": list(self.scalers.keys()),
+            "loaded_versions": model_registry.loaded_versions()
         }
 
-    def train_and_save_model(self, model_type: str, training_data: pd.DataFrame, target: str) -> bool:
-        """تدريب وحفظ نموذج جديد"""
+    def search_config_path(self, model_type: str) -> str:
+        """ملف إعدادات البحث الفائزة بجانب ملف النموذج"""
+        return f"{self.models_path}/{model_type}_search.json"
+
+    def load_search_config(self, model_type: str) -> Optional[Dict[str, Any]]:
+        """الإعدادات الفائزة في آخر بحث لهذا النموذج (إن وجدت)"""
+        try:
+            with open(self.search_config_path(model_type), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_search_config(self, model_type: str, config: Dict[str, Any]) -> None:
+        """حفظ نتيجة البحث بجانب ملف النموذج (كتابة ذرية)"""
+        path = self.search_config_path(model_type)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def train_and_save_model(self, model_type: str, training_data: pd.DataFrame, target: str,
+                             search_mode: str = None) -> bool:
+        """تدريب وحفظ نموذج جديد؛ مع search_mode (أو MODEL_SEARCH_MODE) يتم البحث عن الإعدادات أولاً"""
         try:
             if model_type == "ctr":
                 model = RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42)
@@ -141,17 +203,48 @@ class MLModelManager:
             else:
                 return False
 
-            X = training_data.drop(columns=[target])
-            y = training_data[target]
+            feature_names = [column for column in training_data.columns if column != target]
+            # التدريب بنفس مخطط الميزات المستخدم عند التنبؤ
+            schema = schema_from_names(feature_names)
+            X = schema.encode_batch(training_data[feature_names].to_dict("records"))
+            y = training_data[target].to_numpy()
+
+            search = None
+            search_mode = (settings.MODEL_SEARCH_MODE if search_mode is None else search_mode).lower()
+            if search_mode != "off":
+                # البدء من الإعدادات الفائزة في آخر تدريب لنفس نوع النموذج
+                previous = self.load_search_config(model_type) or {}
+                incumbent = previous.get("best_params") if previous.get("estimator") == type(model).__name__ else None
+                search = HyperparameterSearch(model, mode=search_mode).run(X, y, incumbent)
+                model.set_params(**search["best_params"])
+                print(f"🔎 {model_type} search ({search['mode']}): {search['trials']} trials in "
+                      f"{search['elapsed_seconds']:.1f}s, validation MSE {search['best_mse']:.6f}")
             model.fit(X, y)
 
-            with open(f"{self.models_path}/{model_type}_model.pkl", "wb") as f:
-                pickle.dump(model, f)
-            with open(f"{self.models_path}/{model_type}_features.pkl", "wb") as f:
-                pickle.dump(list(X.columns), f)
+            # حفظ إصدار جديد في مخزن النماذج (ملف جديد باسم بصمته مع تصدير الأشجار كمصفوفات)
+            # بدلاً من الكتابة فوق ملف قد يقرأه عامل آخر
+            artifact = self.artifacts.put(
+                model_type, model, feature_names,
+                metadata={"search": {key: search[key] for key in ("mode", "best_params", "best_mse")}} if search else None
+            )
+            if search is not None:
+                self._save_search_config(model_type, {
+                    **search,
+                    "feature_names": feature_names,
+                    "model_version": artifact["version"],
+                    "trained_at": pd.Timestamp.utcnow().isoformat()
+                })
 
-            self.models[model_type] = model
-            self.features[model_type] = list(X.columns)
+            # نشر النموذج الجديد في السجل المشترك دفعة واحدة
+            model_registry.publish(
+                model_type, model, feature_names,
+                metadata={"name": f"{model_type}_model"},
+                version=artifact["version"], path=artifact["path"], source=FILE_SOURCE
+            )
+            try:
+                collect_garbage(store=self.artifacts)
+            except Exception as e:
+                print(f"Error collecting model artifacts: {e}")
 
             return True
         except Exception as e:
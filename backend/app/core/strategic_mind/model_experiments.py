@@ -0,0 +1,254 @@
+"""
+تجارب الإصدارات المرشحة أثناء الاستدلال (جدول model_experiments):
+- shadow: كل الطلبات يخدمها الإصدار النشط، وعينة بنسبة fraction منها يُقيّمها المرشح أيضاً في خيوط خلفية
+  بعد إرجاع الاستجابة، فلا يضيف المرشح زمناً للطلب. عند امتلاء الخيوط تُسقط التقييمات الجديدة.
+- split: المستخدمون الذين تقع بصمة (التجربة، المستخدم) لديهم تحت fraction يخدمهم المرشح طوال التجربة،
+  والباقون الإصدار النشط. الطلبات بدون مستخدم يخدمها الإصدار النشط.
+كل تنبؤ في التجربة يُسجل في prediction_logs (التنبؤان وزمن كل منهما) عبر مخزن كتابة مجمعة.
+النماذج المرشحة تُحمّل في سجل النماذج المشترك تحت المصدر "candidate".
+"""
+from typing import Dict, Any, Callable, Mapping, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import MappingProxyType
+import hashlib
+import random
+import threading
+import time
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.experiment import ModelExperiment
+from app.models.knowledge_base import MLModel
+from app.utils.metrics import metrics
+from .model_registry import model_registry, predict_rows
+
+
+CANDIDATE_SOURCE = "candidate"
+EXPERIMENT_MODES = ("shadow", "split")
+
+CHAMPION = "champion"
+CANDIDATE = "candidate"
+
+_EMPTY: Mapping[str, Dict[str, Any]] = MappingProxyType({})
+
+
+def user_bucket(experiment_id: int, user_id: int) -> float:
+    """
+    موقع ثابت للمستخدم في [0, 1) خاص بكل تجربة (نفس الفريق في كل الطلبات وكل العمليات)
+    """
+    digest = hashlib.sha1(f"{experiment_id}:{user_id}".encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+class ExperimentRouter:
+    """
+    توزيع طلبات التنبؤ بين الإصدار النشط والمرشح وتسجيل نتائجهما
+    """
+
+    def __init__(self, refresh_interval: float = None, workers: int = None, max_pending: int = None):
+        """
+        تهيئة الموزع (خيوط التقييم في الخلفية تبدأ مع أول تجربة shadow)
+        """
+        self.refresh_interval = (settings.MODEL_EXPERIMENT_REFRESH_SECONDS
+                                 if refresh_interval is None else refresh_interval)
+        self.workers = max(1, settings.MODEL_SHADOW_WORKERS if workers is None else workers)
+        self.max_pending = settings.MODEL_SHADOW_MAX_PENDING if max_pending is None else max_pending
+        self._experiments: Mapping[str, Dict[str, Any]] = _EMPTY
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self.shadow_scored = 0
+        self.dropped = 0
+
+    def experiments(self) -> Mapping[str, Dict[str, Any]]:
+        """
+        التجارب الجارية المحملة حسب نوع النموذج (للقراءة فقط)
+        """
+        return self._experiments
+
+    def sync(self, db: Session, force: bool = False) -> Mapping[str, Dict[str, Any]]:
+        """
+        مزامنة التجارب الجارية وتحميل نماذجها المرشحة، مرة واحدة على الأكثر خلال فترة التحديث
+        """
+        if db is None:
+            return self._experiments
+
+        now = time.monotonic()
+        if not force and self._last_sync and now - self._last_sync < self.refresh_interval:
+            return self._experiments
+        self._last_sync = now
+
+        try:
+            running = db.query(ModelExperiment, MLModel).join(
+                MLModel, MLModel.id == ModelExperiment.candidate_model_id
+            ).filter(ModelExperiment.status == "running").all()
+        except Exception as e:
+            print(f"Error querying model experiments: {e}")
+            return self._experiments
+
+        experiments = {}
+        for experiment, candidate in running:
+            entry = model_registry.load(
+                experiment.model_type,
+                candidate.model_path,
+                candidate.version,
+                features=candidate.features,
+                metadata={
+                    "name": candidate.name,
+                    "version": candidate.version,
+                    "performance": candidate.performance_metrics or {}
+                },
+                source=CANDIDATE_SOURCE
+            )
+            if entry is None or entry["version"] != candidate.version:
+                # تعذر تحميل ملف المرشح: التجربة متوقفة فعلياً في هذه العملية
+                continue
+            experiments[experiment.model_type] = {
+                "id": experiment.id,
+                "model_type": experiment.model_type,
+                "mode": experiment.mode,
+                "fraction": experiment.fraction,
+                "candidate": entry
+            }
+
+        for model_type in model_registry.snapshot(CANDIDATE_SOURCE):
+            if model_type not in experiments:
+                model_registry.retire(model_type, source=CANDIDATE_SOURCE)
+
+        self._experiments = MappingProxyType(experiments)
+        return self._experiments
+
+    def route(self, model_type: str, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        قرار التوجيه لطلب: الفريق الذي يخدمه (champion أو candidate) وهل يُقيّمه المرشح في الخلفية.
+        None إذا لم تكن هناك تجربة جارية لهذا النموذج.
+        """
+        experiment = self._experiments.get(model_type)
+        if experiment is None:
+            return None
+        if experiment["mode"] == "split":
+            in_candidate = user_id is not None and user_bucket(experiment["id"], user_id) < experiment["fraction"]
+            return {"experiment": experiment, "arm": CANDIDATE if in_candidate else CHAMPION, "shadow": False}
+        return {"experiment": experiment, "arm": CHAMPION, "shadow": random.random() < experiment["fraction"]}
+
+    def served_model(self, champion: Optional[Dict[str, Any]],
+                     routing: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        النموذج الذي يخدم الطلب حسب قرار التوجيه
+        """
+        if routing and routing["arm"] == CANDIDATE:
+            return routing["experiment"]["candidate"]
+        return champion
+
+    def record(self, routing: Optional[Dict[str, Any]], metric_name: str, served: Dict[str, Any],
+               prediction: float, latency_ms: float, features: np.ndarray, campaign_data: Dict[str, Any],
+               user_id: Optional[int], to_value: Callable[[float, Dict[str, Any]], float]) -> None:
+        """
+        تسجيل تنبؤ ضمن تجربة؛ في وضع shadow يُقيّم المرشح نفس الميزات في خيط خلفي قبل التسجيل.
+        to_value: تحويل ناتج النموذج إلى القيمة المقدمة للمستخدم (نفس التحويل للإصدارين)
+        """
+        if routing is None:
+            return
+        experiment = routing["experiment"]
+        if experiment["mode"] == "shadow" and not routing["shadow"]:
+            return
+
+        log = {
+            "experiment_id": experiment["id"],
+            "metric_name": metric_name,
+            "arm": routing["arm"],
+            "user_id": user_id,
+            "campaign_id": self._campaign_id(campaign_data),
+            "served_version": served["version"],
+            "served_prediction": prediction,
+            "served_latency_ms": latency_ms,
+            "created_at": datetime.utcnow()
+        }
+        if not routing["shadow"]:
+            self._write(log)
+            return
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                metrics.increment("shadow_predictions_dropped_total", model_type=experiment["model_type"])
+                return
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="maestro-shadow")
+            executor = self._executor
+        executor.submit(self._shadow, experiment, log, features, to_value)
+
+    def close(self) -> None:
+        """
+        انتظار التقييمات المعلقة في الخلفية (عند إيقاف الخادم، قبل إغلاق مخزن السجلات)
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        إحصائيات الموزع في هذه العملية
+        """
+        return {
+            "experiments": {
+                model_type: {
+                    "id": experiment["id"],
+                    "mode": experiment["mode"],
+                    "fraction": experiment["fraction"],
+                    "candidate_version": experiment["candidate"]["version"]
+                }
+                for model_type, experiment in self._experiments.items()
+            },
+            "shadow_pending": self._pending,
+            "shadow_scored": self.shadow_scored,
+            "shadow_dropped": self.dropped
+        }
+
+    def _shadow(self, experiment: Dict[str, Any], log: Dict[str, Any], features: np.ndarray,
+                to_value: Callable[[float, Dict[str, Any]], float]) -> None:
+        candidate = experiment["candidate"]
+        try:
+            start = time.perf_counter()
+            prediction = predict_rows(candidate, features.reshape(1, -1))[0]
+            log["candidate_latency_ms"] = (time.perf_counter() - start) * 1000
+            log["candidate_version"] = candidate["version"]
+            log["candidate_prediction"] = to_value(prediction, candidate)
+            self.shadow_scored += 1
+            metrics.observe("shadow_prediction_seconds", log["candidate_latency_ms"] / 1000,
+                            model_type=experiment["model_type"])
+            self._write(log)
+        except Exception as e:
+            print(f"Error in shadow prediction: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    @staticmethod
+    def _campaign_id(campaign_data: Dict[str, Any]) -> Optional[int]:
+        try:
+            return int(campaign_data["campaign_id"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _write(log: Dict[str, Any]) -> None:
+        # مخزن السجلات في حلقة التعلم (يُستورد هنا لأن حلقة التعلم تستورد هذه الحزمة)
+        from app.core.learning_loop.event_buffer import EventBufferFullError
+        from app.core.learning_loop.prediction_log import prediction_log_buffer
+
+        try:
+            prediction_log_buffer.add([log])
+        except EventBufferFullError:
+            # السجل للمقارنة فقط: لا يؤثر فقدانه على الطلب
+            pass
+
+
+# إنشاء instance عام
+experiment_router = ExperimentRouter()
@@ -0,0 +1,320 @@
+from typing import Dict, Any, List, Optional, Callable, Mapping, Tuple
+from types import MappingProxyType
+from datetime import datetime
+import gc
+import threading
+import time
+import os
+
+from sqlalchemy.orm import Session
+
+from app.models.knowledge_base import MLModel
+from app.config import settings
+from .feature_schema import FeatureSchema, get_schema, schema_from_names
+from .tree_ensemble import FlatTreeEnsemble, export_ensemble, flat_model_path
+from .artifact_store import load_artifact
+from .tree_shap import TreeExplainer
+
+
+# مصادر النماذج داخل السجل
+DB_SOURCE = "db"  # النماذج المسجلة في جدول ml_models
+FILE_SOURCE = "file"  # النماذج المحملة من ملفات pkl بواسطة MLModelManager
+
+_EMPTY: Mapping[str, Dict[str, Any]] = MappingProxyType({})
+
+# وضع مشاركة النماذج بين عمال الخادم: "none" أو "mmap"
+MMAP_SHARING = "mmap"
+
+
+class LazyModel:
+    """
+    نموذج يُقرأ من ملفه عند أول استخدام فقط.
+    في وضع المشاركة بـ mmap تكفي المصفوفات المسطحة لمعظم الطلبات، فلا يحمّل العامل
+    نسخته الخاصة من النموذج إلا إذا احتاج model.predict لدفعة كبيرة.
+    """
+    __slots__ = ("path", "_loader", "_model", "_lock")
+
+    def __init__(self, path: str, loader: Callable[[str], Any]):
+        self.path = path
+        self._loader = loader
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> Any:
+        """
+        تحميل النموذج (مرة واحدة)
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._loader(self.path)
+        return self._model
+
+    def predict(self, X: Any) -> Any:
+        return self.load().predict(X)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.load(), name)
+
+
+class ModelRegistry:
+    """
+    سجل النماذج المشترك على مستوى العملية.
+    يحمّل كل إصدار من النموذج مرة واحدة فقط، ويستبدل اللقطة كاملة عند نشر إصدار جديد
+    بحيث لا يرى القارئ قاموساً محدثاً جزئياً.
+    """
+
+    def __init__(self, refresh_interval: float = None):
+        """
+        تهيئة السجل بلقطة فارغة
+        """
+        self.refresh_interval = settings.MODEL_REGISTRY_REFRESH_SECONDS if refresh_interval is None else refresh_interval
+        self._lock = threading.Lock()
+        self._snapshot: Mapping[str, Mapping[str, Dict[str, Any]]] = MappingProxyType({})
+        self._last_sync = 0.0
+        # يزداد مع كل استبدال للقطة (يُستخدم لإبطال النتائج المخزنة مؤقتاً)
+        self.generation = 0
+
+    def snapshot(self, source: str = DB_SOURCE) -> Mapping[str, Dict[str, Any]]:
+        """
+        الحصول على اللقطة الحالية لمصدر معين (للقراءة فقط وبدون أقفال)
+        """
+        return self._snapshot.get(source, _EMPTY)
+
+    def get(self, model_type: str, source: str = DB_SOURCE) -> Optional[Dict[str, Any]]:
+        """
+        الحصول على مدخل نموذج محمل
+        """
+        return self.snapshot(source).get(model_type)
+
+    def publish(self, model_type: str, model: Any, features: Any = None, metadata: Dict[str, Any] = None,
+                version: str = None, path: str = None, source: str = DB_SOURCE) -> Dict[str, Any]:
+        """
+        نشر نموذج محمل مسبقاً في السجل واستبدال الإصدار السابق دفعة واحدة
+        """
+        entry = self._build_entry(model_type, model, features, metadata, version, path, source)
+        with self._lock:
+            self._swap(source, {model_type: entry})
+        return entry
+
+    def load(self, model_type: str, path: str, version: str, features: Any = None,
+             metadata: Dict[str, Any] = None, source: str = DB_SOURCE,
+             loader: Callable[[str], Any] = load_artifact) -> Optional[Dict[str, Any]]:
+        """
+        تحميل نموذج من ملف إذا لم يكن هذا الإصدار محملاً بالفعل
+        """
+        current = self.get(model_type, source)
+        if current and current["version"] == version and current["path"] == path:
+            return current
+
+        with self._lock:
+            # إعادة التحقق بعد الحصول على القفل لأن عملية أخرى قد تكون حملته
+            current = self.get(model_type, source)
+            if current and current["version"] == version and current["path"] == path:
+                return current
+
+            if not path or not os.path.exists(path):
+                return current
+
+            try:
+                model, flat = self._load_model(path, loader)
+            except Exception as e:
+                print(f"Error loading model {model_type} ({version}): {e}")
+                return current
+
+            entry = self._build_entry(model_type, model, features, metadata, version, path, source, flat=flat)
+            self._swap(source, {model_type: entry})
+            return entry
+
+    def retire(self, model_type: str, source: str = DB_SOURCE) -> None:
+        """
+        إزالة نموذج من السجل
+        """
+        with self._lock:
+            self._swap(source, {}, removals=[model_type])
+
+    def sync_active_models(self, db: Session, force: bool = False) -> Mapping[str, Dict[str, Any]]:
+        """
+        مزامنة النماذج النشطة في قاعدة البيانات مع السجل.
+        يتم تحميل الإصدارات الجديدة فقط، ولا تتم المزامنة أكثر من مرة خلال فترة التحديث.
+        """
+        if db is None:
+            return self.snapshot(DB_SOURCE)
+
+        now = time.monotonic()
+        if not force and self._last_sync and now - self._last_sync < self.refresh_interval:
+            return self.snapshot(DB_SOURCE)
+        self._last_sync = now
+
+        try:
+            active_models = db.query(MLModel).filter(MLModel.is_active == True).all()
+        except Exception as e:
+            print(f"Error querying active models: {e}")
+            return self.snapshot(DB_SOURCE)
+
+        active_types = set()
+        for model in active_models:
+            active_types.add(model.model_type)
+            self.load(
+                model.model_type,
+                model.model_path,
+                model.version,
+                features=model.features,
+                metadata={
+                    "name": model.name,
+                    "version": model.version,
+                    "performance": model.performance_metrics or {}
+                },
+                source=DB_SOURCE
+            )
+
+        stale_types = [model_type for model_type in self.snapshot(DB_SOURCE) if model_type not in active_types]
+        if stale_types:
+            with self._lock:
+                self._swap(DB_SOURCE, {}, removals=stale_types)
+
+        return self.snapshot(DB_SOURCE)
+
+    def loaded_versions(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        الحصول على الإصدارات المحملة حالياً لكل مصدر
+        """
+        snapshot = self._snapshot
+        return {
+            source: {
+                model_type: {
+                    "name": entry["metadata"].get("name"),
+                    "version": entry["version"],
+                    "path": entry["path"],
+                    "loaded_at": entry["loaded_at"]
+                }
+                for model_type, entry in entries.items()
+            }
+            for source, entries in snapshot.items()
+        }
+
+    @staticmethod
+    def _load_model(path: str, loader: Callable[[str], Any]) -> Tuple[Any, Optional[FlatTreeEnsemble]]:
+        """
+        تحميل النموذج ونسخته المسطحة. في وضع mmap تُفتح المصفوفات المصدّرة بجانب الملف
+        للقراءة فقط (صفحات مشتركة بين العمال)، ويتم تصديرها أولاً إن لم تكن موجودة.
+        """
+        if settings.MODEL_SHARING_MODE != MMAP_SHARING:
+            model = loader(path)
+            return model, FlatTreeEnsemble.try_from(model)
+
+        flat_path = flat_model_path(path)
+        if os.path.isdir(flat_path):
+            flat = FlatTreeEnsemble.load(flat_path, mmap_mode="r")
+            # مصفوفات صُدّرت قبل إضافة cover: إعادة التصدير حتى يمكن حساب مساهمات الميزات
+            if flat.cover is not None:
+                return LazyModel(path, loader), flat
+        model = loader(path)
+        if export_ensemble(model, path) is None:
+            # نموذج غير مدعوم أو فشل التحقق من التطابق
+            return model, FlatTreeEnsemble.try_from(model)
+        return LazyModel(path, loader), FlatTreeEnsemble.load(flat_path, mmap_mode="r")
+
+    def _build_entry(self, model_type: str, model: Any, features: Any, metadata: Optional[Dict[str, Any]],
+                     version: Optional[str], path: Optional[str], source: str,
+                     flat: Any = None) -> Dict[str, Any]:
+        """
+        بناء مدخل السجل بنفس البنية التي يستخدمها محرك الاستدلال
+        """
+        metadata = dict(metadata or {})
+        metadata.setdefault("name", model_type)
+        metadata.setdefault("version", version)
+        metadata.setdefault("performance", {})
+        if flat is None:
+            flat = FlatTreeEnsemble.try_from(model)
+        return {
+            "model": model,
+            "features": features,
+            "schema": self._schema_for(model_type, features, source),
+            # نسخة مسطحة من الأشجار لتقييم الصفوف القليلة بدون عبء sklearn (None إن لم تكن مدعومة)
+            "flat": flat,
+            # مسارات الأوراق والقيم المتوقعة لكل شجرة لحساب مساهمات الميزات (None إن لم تكن مدعومة)
+            "explainer": TreeExplainer.try_from(flat),
+            "metadata": metadata,
+            "model_type": model_type,
+            "version": version,
+            "path": path,
+            "source": source,
+            "loaded_at": datetime.now().isoformat()
+        }
+
+    @staticmethod
+    def _schema_for(model_type: str, features: Any, source: str) -> Optional[FeatureSchema]:
+        """
+        مخطط الميزات المترجم للنموذج: نماذج الملفات تقرأ أعمدة التدريب كما هي،
+        ونماذج قاعدة البيانات تستخدم مخطط نوعها المشترك مع التدريب
+        """
+        if source == FILE_SOURCE and features:
+            return schema_from_names(features)
+        return get_schema(model_type)
+
+    def _swap(self, source: str, updates: Dict[str, Dict[str, Any]], removals: List[str] = ()) -> None:
+        """
+        بناء لقطة جديدة واستبدال المرجع دفعة واحدة (يجب استدعاؤها مع القفل)
+        """
+        entries = dict(self._snapshot.get(source, {}))
+        for model_type in removals:
+            entries.pop(model_type, None)
+        entries.update(updates)
+
+        snapshot = dict(self._snapshot)
+        snapshot[source] = MappingProxyType(entries)
+        self._snapshot = MappingProxyType(snapshot)
+        self.generation += 1
+
+
+def flat_max_rows(flat: FlatTreeEnsemble) -> int:
+    """
+    أقصى عدد صفوف تكون فيه المصفوفات المسطحة أسرع من model.predict لنوع المجموعة
+    """
+    if flat.kind == "forest":
+        return settings.FLAT_ENSEMBLE_MAX_ROWS_FOREST
+    return settings.FLAT_ENSEMBLE_MAX_ROWS_BOOSTING
+
+
+def predict_rows(entry: Dict[str, Any], X: Any) -> Any:
+    """
+    التنبؤ بنموذج من السجل: المصفوفات المسطحة للدفعات الصغيرة (حسب نوع المجموعة)، وmodel.predict لما عداها
+    """
+    flat = entry.get("flat")
+    if flat is not None and len(X) <= flat_max_rows(flat):
+        return flat.predict(X)
+    return entry["model"].predict(X)
+
+
+def preload_shared_models() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    تحميل كل النماذج (الملفات والنشطة في قاعدة البيانات) في العملية الرئيسية قبل إنشاء العمال
+    (gunicorn مع preload_app)، حتى تتشارك العمال صفحات النماذج بنسخ عند الكتابة.
+    """
+    # النماذج يحمّلها خادم الاستدلال، والعمال لا يحتاجون إليها
+    if settings.INFERENCE_SERVER_SOCKET:
+        return {}
+
+    from app.database import SessionLocal, engine
+    from .ml_manager import ml_manager
+
+    db = SessionLocal()
+    try:
+        model_registry.sync_active_models(db, force=True)
+    finally:
+        db.close()
+    # لا يجوز أن ترث العمال اتصالات قاعدة البيانات المفتوحة في العملية الرئيسية
+    engine.dispose()
+    # نقل الكائنات المحملة إلى الجيل الدائم حتى لا يكتب جامع القمامة في صفحاتها بعد التفرع
+    gc.collect()
+    gc.freeze()
+    return model_registry.loaded_versions()
+
+
+# إنشاء instance عام
+model_registry = ModelRegistry()
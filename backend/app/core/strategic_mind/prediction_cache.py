@@ -0,0 +1,145 @@
+from typing import Dict, Any, Optional, Hashable
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+import threading
+import time
+
+from app.config import settings
+
+
+class PredictionCache:
+    """
+    ذاكرة مؤقتة لنتائج التنبؤ مع إخراج الأقدم استخداماً (LRU) ومدة صلاحية (TTL).
+    ترتبط المدخلات بجيل النماذج والقواعد، ويتم مسحها تلقائياً عند تقدم أي منهما. الطلبات التي تحمل
+    جيلاً أقدم من جيل الذاكرة (قرأته قبل التبديل مباشرة) لا تقرأ منها ولا تكتب فيها ولا تمسحها.
+    """
+
+    def __init__(self, max_size: int = None, ttl_seconds: float = None):
+        """
+        تهيئة الذاكرة المؤقتة
+        """
+        self.max_size = settings.PREDICTION_CACHE_SIZE if max_size is None else max_size
+        self.ttl_seconds = settings.CACHE_DURATION_HOURS * 3600 if ttl_seconds is None else ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation: Optional[Hashable] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale = 0
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """
+        بناء مفتاح ثابت من تجزئة التمثيل القانوني (JSON مرتب) للأجزاء
+        """
+        canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str, ensure_ascii=False)
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, generation: Hashable) -> Optional[Any]:
+        """
+        الحصول على نتيجة محفوظة (نسخة مستقلة) أو None
+        """
+        with self._lock:
+            if not self._check_generation(generation):
+                self.stale += 1
+                self.misses += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any, generation: Hashable) -> None:
+        """
+        حفظ نتيجة في الذاكرة المؤقتة
+        """
+        if self.max_size <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            if not self._check_generation(generation):
+                # نتيجة محسوبة بنموذج أو قواعد أقدم من المخزنة
+                self.stale += 1
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        مسح جميع المدخلات
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        إحصائيات الاستخدام
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale": self.stale,
+                "generation": str(self._generation)
+            }
+
+    def _check_generation(self, generation: Hashable) -> bool:
+        """
+        مسح كل المدخلات إذا تقدم جيل النماذج أو القواعد (يجب استدعاؤها مع القفل).
+        يعيد False إذا كان الجيل أقدم من جيل الذاكرة، فيتجاوز الطلب الذاكرة دون مسحها
+        """
+        if generation == self._generation:
+            return True
+        if self._generation is not None and _is_older(generation, self._generation):
+            return False
+        if self._entries:
+            self._entries.clear()
+            self.invalidations += 1
+        self._generation = generation
+        return True
+
+
+def _is_older(generation: Hashable, current: Hashable) -> bool:
+    """
+    هل الجيل أقدم من الحالي في أي من مكوناته (جيل سجل النماذج، إصدار القواعد)؟
+    الإصدار None (قبل أول قراءة للقواعد) أقدم من أي إصدار
+    """
+    parts = generation if isinstance(generation, tuple) else (generation,)
+    current_parts = current if isinstance(current, tuple) else (current,)
+    for part, current_part in zip(parts, current_parts):
+        if part is None and current_part is not None:
+            return True
+        if part is not None and current_part is not None and part < current_part:
+            return True
+    return False
+
+
+# إنشاء instance عام
+prediction_cache = PredictionCache()
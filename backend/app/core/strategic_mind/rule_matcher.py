@@ -0,0 +1,313 @@
+from typing import Dict, Any, List, Optional, Callable, Iterable, Tuple
+from collections.abc import Hashable
+import operator
+
+
+Matcher = Callable[[Dict[str, Any]], bool]
+
+
+def _between(context_value: Any, value: Any) -> bool:
+    low, high = value
+    return low <= context_value <= high
+
+
+def _valid_between(value: Any) -> bool:
+    return isinstance(value, (list, tuple)) and len(value) == 2
+
+
+def _contained(context_value: Any, value: Any) -> bool:
+    return context_value in value
+
+
+# العمليات المدعومة داخل قيمة الشرط البسيط: {"field": ..., "value": {"$op": ...}}
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$gte": operator.ge,
+    "$lte": operator.le,
+    "$gt": operator.gt,
+    "$lt": operator.lt,
+    "$ne": operator.ne,
+    "$in": _contained,
+    "$between": _between,
+}
+
+
+def _always(context: Dict[str, Any]) -> bool:
+    return True
+
+
+def _never(context: Dict[str, Any]) -> bool:
+    return False
+
+
+def compile_conditions(conditions: Any) -> Matcher:
+    """
+    تحويل شروط القاعدة (JSON) إلى دالة مغلقة تُقيّم السياق مباشرة دون إعادة تفسير البنية
+    """
+    if not isinstance(conditions, dict):
+        return _never
+
+    # الشرط البسيط
+    if "field" in conditions and "value" in conditions:
+        return _compile_leaf(conditions["field"], conditions["value"])
+
+    # الشروط المركبة
+    if "operator" in conditions and "conditions" in conditions:
+        operator = str(conditions["operator"]).upper()
+        sub_matchers = [compile_conditions(sub) for sub in conditions["conditions"]]
+        if operator == "AND":
+            return lambda context: all(matcher(context) for matcher in sub_matchers)
+        if operator == "OR":
+            return lambda context: any(matcher(context) for matcher in sub_matchers)
+        if operator == "NOT":
+            if not sub_matchers:
+                return _always
+            first = sub_matchers[0]
+            return lambda context: not first(context)
+
+    return _never
+
+
+def _compile_leaf(field: str, value: Any) -> Matcher:
+    """
+    تحويل شرط بسيط إلى دالة مغلقة
+    """
+    if not isinstance(value, dict):
+        return lambda context: context.get(field) == value
+
+    # العمليات غير المعروفة يتم تجاهلها كما في المفسّر الأصلي
+    checks = [(OPERATORS[op], operand) for op, operand in value.items() if op in OPERATORS]
+    if not checks:
+        return _always
+    # $between يتطلب زوجاً [الحد الأدنى، الحد الأعلى]؛ الشرط بقيمة غير صالحة لا يتحقق أبداً
+    if "$between" in value and not _valid_between(value["$between"]):
+        return _never
+
+    # المقارنة بين أنواع غير متوافقة (مثل None >= 1000) تعتبر عدم تطابق بدلاً من رفع استثناء
+    if len(checks) == 1:
+        check, operand = checks[0]
+
+        def match_one(context: Dict[str, Any]) -> bool:
+            try:
+                return bool(check(context.get(field), operand))
+            except (TypeError, ValueError):
+                return False
+        return match_one
+
+    def match_all(context: Dict[str, Any]) -> bool:
+        context_value = context.get(field)
+        try:
+            for check, operand in checks:
+                if not check(context_value, operand):
+                    return False
+        except (TypeError, ValueError):
+            return False
+        return True
+    return match_all
+
+
+# الحد الأقصى لعدد تركيبات القيم التي تُفهرس عليها قاعدة واحدة (عند الجمع بين عدة شروط $in)
+MAX_INDEX_COMBINATIONS = 64
+
+
+def index_keys(conditions: Any) -> Optional[Tuple[Tuple[str, ...], List[Tuple[Any, ...]]]]:
+    """
+    استخراج الحقول والقيم التي يمكن فهرسة القاعدة عليها: كل شروط المساواة (أو $in)
+    اللازمة لتحقق القاعدة. يعيد None إذا لم يكن هناك شرط لازم قابل للفهرسة.
+    """
+    required = _required_equalities(conditions)
+    if not required:
+        return None
+
+    # دمج الشروط المتكررة على نفس الحقل (تقاطع القيم المسموحة)
+    allowed: Dict[str, List[Any]] = {}
+    for field, values in required:
+        if field in allowed:
+            allowed[field] = [value for value in allowed[field] if value in values]
+        else:
+            allowed[field] = values
+
+    fields = tuple(sorted(allowed))
+    combinations: List[Tuple[Any, ...]] = [()]
+    for field in fields:
+        combinations = [combo + (value,) for combo in combinations for value in allowed[field]]
+        if len(combinations) > MAX_INDEX_COMBINATIONS:
+            # عدد كبير من التركيبات: الاكتفاء بالحقل الأكثر انتقائية
+            field = min(allowed, key=lambda name: len(allowed[name]))
+            return (field,), [(value,) for value in allowed[field]]
+    return fields, combinations
+
+
+def _required_equalities(conditions: Any) -> List[Tuple[str, List[Any]]]:
+    """
+    شروط المساواة/$in اللازمة لتحقق الشروط، على شكل (الحقل، القيم المسموحة)
+    """
+    if not isinstance(conditions, dict):
+        return []
+
+    if "field" in conditions and "value" in conditions:
+        field, value = conditions["field"], conditions["value"]
+        if not isinstance(value, dict):
+            return [(field, [value])] if isinstance(value, Hashable) else []
+        candidates = value.get("$in")
+        if isinstance(candidates, (list, tuple)) and all(isinstance(v, Hashable) for v in candidates):
+            return [(field, list(dict.fromkeys(candidates)))]
+        return []
+
+    if "operator" in conditions and "conditions" in conditions:
+        if str(conditions["operator"]).upper() == "AND":
+            required = []
+            for sub in conditions["conditions"]:
+                required.extend(_required_equalities(sub))
+            return required
+
+    return []
+
+
+def residual_conditions(conditions: Any, indexed_fields: Tuple[str, ...]) -> Any:
+    """
+    حذف شروط المساواة/$in على الحقول المفهرسة من الشروط، لأن البحث في الفهرس يضمن تحققها
+    """
+    if not isinstance(conditions, dict):
+        return conditions
+
+    if "field" in conditions and "value" in conditions:
+        if conditions["field"] in indexed_fields and _required_equalities(conditions):
+            value = conditions["value"]
+            if not isinstance(value, dict) or set(value) == {"$in"}:
+                return None
+        return conditions
+
+    if "operator" in conditions and "conditions" in conditions:
+        if str(conditions["operator"]).upper() == "AND":
+            remaining = [residual_conditions(sub, indexed_fields) for sub in conditions["conditions"]]
+            return {"operator": "AND", "conditions": [sub for sub in remaining if sub is not None]}
+
+    return conditions
+
+
+def referenced_fields(conditions: Any) -> List[str]:
+    """
+    الحقول التي تعتمد عليها شروط القاعدة
+    """
+    if not isinstance(conditions, dict):
+        return []
+    if "field" in conditions and "value" in conditions:
+        return [conditions["field"]]
+    fields = []
+    if "operator" in conditions and "conditions" in conditions:
+        for sub in conditions["conditions"]:
+            fields.extend(referenced_fields(sub))
+    return fields
+
+
+class CompiledRule:
+    """
+    قاعدة مترجمة مع دالة المطابقة الخاصة بها
+    """
+    __slots__ = ("rule_id", "name", "rule_type", "actions", "priority", "order", "matcher", "index_keys", "residual")
+
+    def __init__(self, rule_id: Any, rule_data: Dict[str, Any], order: int):
+        self.rule_id = rule_id
+        self.name = rule_data["name"]
+        self.rule_type = rule_data["rule_type"]
+        self.actions = rule_data["actions"]
+        self.priority = rule_data["priority"]
+        self.order = order
+        conditions = rule_data["conditions"]
+        self.matcher = compile_conditions(conditions)
+        self.index_keys = index_keys(conditions)
+        # الشروط المتبقية بعد ما يضمنه الفهرس (تُستخدم فقط عند الوصول للقاعدة عبر الفهرس)
+        residual = residual_conditions(conditions, self.index_keys[0]) if self.index_keys else conditions
+        self.residual = _always if residual is None else compile_conditions(residual)
+
+
+class _RuleGroup:
+    """
+    مجموعة قواعد (لنوع واحد أو لكل الأنواع) مع فهرس على حقول المساواة
+    """
+
+    def __init__(self):
+        self.index: Dict[Tuple[str, ...], Dict[Tuple[Any, ...], List[CompiledRule]]] = {}
+        self.unindexed: List[CompiledRule] = []
+        self.fields: set = set()
+        self.size = 0
+
+    def add(self, rule: CompiledRule, fields: List[str]) -> None:
+        self.size += 1
+        self.fields.update(fields)
+        if rule.index_keys is None:
+            self.unindexed.append((rule.order, rule.matcher, rule))
+            return
+        index_fields, combinations = rule.index_keys
+        buckets = self.index.setdefault(index_fields, {})
+        for combination in combinations:
+            buckets.setdefault(combination, []).append((rule.order, rule.residual, rule))
+
+    def candidates(self, context: Dict[str, Any]) -> List[Tuple[int, Matcher, CompiledRule]]:
+        """
+        القواعد المرشحة بترتيب الأولوية مع دالة المطابقة المناسبة لكل منها
+        """
+        candidates = list(self.unindexed)
+        for index_fields, buckets in self.index.items():
+            try:
+                hits = buckets.get(tuple([context.get(field) for field in index_fields]))
+            except TypeError:
+                # قيمة غير قابلة للتجزئة في السياق لا يمكن أن تساوي قيمة مفهرسة
+                continue
+            if hits:
+                candidates.extend(hits)
+        if len(candidates) > 1:
+            candidates.sort(key=lambda candidate: candidate[0])
+        return candidates
+
+
+class CompiledRuleSet:
+    """
+    مجموعة القواعد بعد ترجمتها مرة واحدة، مع فهرس يقلص التقييم إلى القواعد المرشحة فقط
+    """
+
+    def __init__(self, rules: Iterable[Tuple[Any, Dict[str, Any]]]):
+        """
+        ترجمة القواعد وبناء الفهارس حسب نوع القاعدة
+        """
+        # ترتيب القواعد حسب الأولوية (ترتيب ثابت يحافظ على ترتيب الإدخال عند التساوي)
+        ordered = sorted(rules, key=lambda item: item[1]["priority"], reverse=True)
+
+        self._groups: Dict[Optional[str], _RuleGroup] = {None: _RuleGroup()}
+        for order, (rule_id, rule_data) in enumerate(ordered):
+            rule = CompiledRule(rule_id, rule_data, order)
+            fields = referenced_fields(rule_data["conditions"])
+            self._groups[None].add(rule, fields)
+            self._groups.setdefault(rule.rule_type, _RuleGroup()).add(rule, fields)
+
+    def match(self, context: Dict[str, Any], rule_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        إرجاع إجراءات القواعد المطابقة للسياق بترتيب الأولوية
+        """
+        group = self._groups.get(rule_type)
+        if group is None:
+            return []
+
+        return [
+            {
+                "rule_id": rule.rule_id,
+                "rule_name": rule.name,
+                "actions": rule.actions
+            }
+            for _, matcher, rule in group.candidates(context)
+            if matcher(context)
+        ]
+
+    def size(self, rule_type: Optional[str] = None) -> int:
+        """
+        عدد القواعد المترجمة لنوع معين
+        """
+        group = self._groups.get(rule_type)
+        return group.size if group else 0
+
+    def fields(self, rule_type: Optional[str] = None) -> List[str]:
+        """
+        الحقول التي تعتمد عليها قواعد نوع معين
+        """
+        group = self._groups.get(rule_type)
+        return sorted(group.fields) if group else []
@@ -0,0 +1,119 @@
+from typing import Dict, Any, Optional, Mapping
+from types import MappingProxyType
+from datetime import datetime
+import threading
+import time
+import json
+
+from sqlalchemy.orm import Session
+
+from app.models.knowledge_base import KnowledgeRule, RuleSetVersion
+from app.core.strategic_mind.rule_matcher import CompiledRuleSet
+from app.config import settings
+
+
+# اسم عداد الإصدار الخاص بقواعد المعرفة في جدول rule_set_versions
+RULE_SET_NAME = "knowledge_rules"
+
+
+class RuleSnapshot:
+    """
+    لقطة غير قابلة للتعديل من القواعد النشطة مع نسختها المترجمة.
+    يمكن للقراء استخدامها بدون أقفال لأنها لا تتغير بعد إنشائها.
+    """
+    __slots__ = ("version", "rules", "compiled", "built_at")
+
+    def __init__(self, version: Optional[int], rules: Dict[int, Dict[str, Any]]):
+        self.version = version
+        self.rules: Mapping[int, Dict[str, Any]] = MappingProxyType(rules)
+        self.compiled = CompiledRuleSet(rules.items())
+        self.built_at = datetime.now().isoformat()
+
+
+EMPTY_SNAPSHOT = RuleSnapshot(None, {})
+
+
+class RuleSnapshotStore:
+    """
+    مخزن اللقطة الحالية للقواعد على مستوى العملية.
+    تتم إعادة البناء فقط عندما يتغير عداد الإصدار في قاعدة البيانات،
+    ويتم الاستعلام عن العداد بشكل دوري خفيف لاكتشاف تغييرات العمليات الأخرى.
+    """
+
+    def __init__(self, poll_interval: float = None):
+        self.poll_interval = settings.RULES_VERSION_POLL_SECONDS if poll_interval is None else poll_interval
+        self._snapshot = EMPTY_SNAPSHOT
+        self._lock = threading.Lock()
+        self._last_poll = 0.0
+
+    def peek(self) -> RuleSnapshot:
+        """
+        اللقطة الحالية بدون أي استعلام
+        """
+        return self._snapshot
+
+    def current(self, db: Session, force: bool = False) -> RuleSnapshot:
+        """
+        الحصول على اللقطة الحالية، مع التحقق من الإصدار إذا انقضت فترة الاستعلام
+        """
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if not force and snapshot.version is not None and now - self._last_poll < self.poll_interval:
+            return snapshot
+
+        try:
+            version = self.read_version(db)
+        except Exception as e:
+            print(f"Error reading rule set version: {e}")
+            return snapshot
+        self._last_poll = now
+
+        if version != snapshot.version:
+            snapshot = self.rebuild(db, version)
+        return snapshot
+
+    def rebuild(self, db: Session, version: int) -> RuleSnapshot:
+        """
+        إعادة بناء اللقطة من قاعدة البيانات واستبدالها دفعة واحدة
+        """
+        with self._lock:
+            # عملية أخرى قد تكون أعادت البناء أثناء انتظار القفل
+            if self._snapshot.version == version:
+                return self._snapshot
+
+            rules = {}
+            db_rules = db.query(KnowledgeRule).filter(KnowledgeRule.is_active == True)\
+                .order_by(KnowledgeRule.priority.desc()).all()
+            for rule in db_rules:
+                rules[rule.id] = {
+                    "name": rule.name,
+                    "rule_type": rule.rule_type,
+                    "conditions": json.loads(rule.conditions) if rule.conditions else {},
+                    "actions": json.loads(rule.actions) if rule.actions else {},
+                    "priority": rule.priority
+                }
+
+            self._snapshot = RuleSnapshot(version, rules)
+            return self._snapshot
+
+    @staticmethod
+    def read_version(db: Session) -> int:
+        """
+        قراءة عداد إصدار القواعد (استعلام على صف واحد)
+        """
+        version = db.query(RuleSetVersion.version).filter(RuleSetVersion.name == RULE_SET_NAME).scalar()
+        return version or 0
+
+    @staticmethod
+    def bump_version(db: Session) -> None:
+        """
+        زيادة عداد إصدار القواعد ضمن المعاملة الحالية (يقوم المستدعي بالـ commit)
+        """
+        updated = db.query(RuleSetVersion).filter(RuleSetVersion.name == RULE_SET_NAME)\
+            .update({RuleSetVersion.version: RuleSetVersion.version + 1}, synchronize_session=False)
+        if not updated:
+            db.add(RuleSetVersion(name=RULE_SET_NAME, version=1))
+
+
+# إنشاء instance عام
+rule_snapshot_store = RuleSnapshotStore()
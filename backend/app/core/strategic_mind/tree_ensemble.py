@@ -0,0 +1,305 @@
+from typing import Dict, Any, List, Optional
+import os
+import shutil
+
+import numpy as np
+
+from .feature_schema import FEATURE_DTYPE
+
+
+# أنواع النماذج المدعومة للتحويل إلى مصفوفات
+_FOREST_TYPES = ("RandomForestRegressor", "ExtraTreesRegressor")
+_BOOSTING_TYPES = ("GradientBoostingRegressor",)
+_SINGLE_TREE_TYPES = ("DecisionTreeRegressor", "ExtraTreeRegressor")
+
+# رقم إصدار صيغة ملف التصدير
+FORMAT_VERSION = 1
+
+
+class FlatTreeEnsemble:
+    """
+    مجموعة أشجار مسطحة في مصفوفات NumPy متجاورة (ميزة، حد، يسار، يمين، قيمة لكل عقدة).
+    الأوراق تشير إلى نفسها، لذلك يتم تقييم كل الصفوف وكل الأشجار معاً
+    بعدد ثابت من الخطوات يساوي أقصى عمق، بدون أي تحقق من sklearn عند كل استدعاء.
+    """
+    __slots__ = ("kind", "feature", "threshold", "left", "right", "value", "roots",
+                 "max_depth", "n_features", "n_outputs", "scale", "base", "cover")
+
+    def __init__(self, kind: str, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 right: np.ndarray, value: np.ndarray, roots: np.ndarray, max_depth: int,
+                 n_features: int, scale: float, base: np.ndarray, cover: Optional[np.ndarray] = None):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.n_outputs = value.shape[1]
+        # التنبؤ = base + scale * مجموع قيم الأوراق
+        self.scale = float(scale)
+        self.base = base
+        # عدد عينات التدريب (الموزونة) في كل عقدة، لحساب مساهمات الميزات (None في الملفات القديمة)
+        self.cover = cover
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> "FlatTreeEnsemble":
+        """
+        تحويل نموذج sklearn مدرب (غابة عشوائية، تعزيز تدرجي، أو شجرة واحدة) إلى مصفوفات
+        """
+        name = type(model).__name__
+        if name in _FOREST_TYPES:
+            trees = [estimator.tree_ for estimator in model.estimators_]
+            kind, scale = "forest", 1.0 / len(trees)
+            base = np.zeros(model.n_outputs_, dtype=np.float64)
+        elif name in _BOOSTING_TYPES:
+            if model.estimators_.shape[1] != 1:
+                raise TypeError("Only single-output gradient boosting is supported")
+            trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+            kind, scale = "boosting", model.learning_rate
+            base = np.atleast_1d(np.asarray(cls._boosting_init(model), dtype=np.float64))
+        elif name in _SINGLE_TREE_TYPES:
+            trees = [model.tree_]
+            kind, scale = "tree", 1.0
+            base = np.zeros(model.n_outputs_, dtype=np.float64)
+        else:
+            raise TypeError(f"Unsupported model type for flattening: {name}")
+
+        if not trees:
+            raise ValueError("Model has no fitted trees")
+
+        sizes = [tree.node_count for tree in trees]
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int32)
+        total = int(sum(sizes))
+        n_outputs = trees[0].value.shape[1]
+
+        feature = np.empty(total, dtype=np.int32)
+        threshold = np.empty(total, dtype=np.float64)
+        left = np.empty(total, dtype=np.int32)
+        right = np.empty(total, dtype=np.int32)
+        value = np.empty((total, n_outputs), dtype=np.float64)
+        cover = np.empty(total, dtype=np.float64)
+
+        for offset, tree in zip(offsets, trees):
+            count = tree.node_count
+            nodes = np.arange(offset, offset + count, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+            block = slice(offset, offset + count)
+
+            # الأوراق: ميزة 0 وحد لا نهائي وأبناء يشيرون للعقدة نفسها
+            feature[block] = np.where(is_leaf, 0, tree.feature)
+            threshold[block] = np.where(is_leaf, np.inf, tree.threshold)
+            left[block] = np.where(is_leaf, nodes, tree.children_left + offset)
+            right[block] = np.where(is_leaf, nodes, tree.children_right + offset)
+            value[block] = tree.value[:, :, 0]
+            cover[block] = tree.weighted_n_node_samples
+
+        return cls(
+            kind, feature, threshold, left, right, value, offsets,
+            max_depth=max(tree.max_depth for tree in trees),
+            n_features=model.n_features_in_,
+            scale=scale,
+            base=base,
+            cover=cover
+        )
+
+    @staticmethod
+    def _boosting_init(model: Any) -> Any:
+        """
+        القيمة الابتدائية لنموذج التعزيز التدرجي (ثابتة لمقدّر DummyRegressor)
+        """
+        if model.init_ == "zero":
+            return 0.0
+        return model.init_.predict(np.zeros((1, model.n_features_in_)))[0]
+
+    @classmethod
+    def try_from(cls, model: Any) -> Optional["FlatTreeEnsemble"]:
+        """
+        محاولة التحويل؛ يعيد None للنماذج غير المدعومة أو غير المدربة
+        """
+        try:
+            return cls.from_sklearn(model)
+        except Exception:
+            return None
+
+    def predict(self, X: Any) -> np.ndarray:
+        """
+        التنبؤ لصف واحد أو مصفوفة صفوف (نفس شكل مخرجات model.predict)
+        """
+        X = np.asarray(X, dtype=FEATURE_DTYPE)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features}")
+
+        leaves = self.apply(X)
+        totals = self.value[leaves].sum(axis=1)  # (صفوف، مخرجات)
+        predictions = self.base + self.scale * totals
+        return predictions[:, 0] if self.n_outputs == 1 else predictions
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        فهرس الورقة لكل صف وكل شجرة (صفوف × أشجار)
+        """
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.roots.shape[0]))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    @property
+    def n_trees(self) -> int:
+        return self.roots.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        حجم المصفوفات في الذاكرة بالبايت
+        """
+        return sum(array.nbytes for array in self.to_arrays().values())
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        المصفوفات والبيانات الوصفية بصيغة قابلة للحفظ
+        """
+        arrays = {
+            "format_version": np.array(FORMAT_VERSION),
+            "kind": np.array(self.kind),
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "value": self.value,
+            "roots": self.roots,
+            "max_depth": np.array(self.max_depth),
+            "n_features": np.array(self.n_features),
+            "scale": np.array(self.scale),
+            "base": self.base,
+        }
+        if self.cover is not None:
+            arrays["cover"] = self.cover
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Any) -> "FlatTreeEnsemble":
+        """
+        إعادة البناء من المصفوفات المحفوظة
+        """
+        if int(arrays["format_version"]) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported flat ensemble format: {int(arrays['format_version'])}")
+        return cls(
+            str(arrays["kind"]), arrays["feature"], arrays["threshold"], arrays["left"],
+            arrays["right"], arrays["value"], arrays["roots"],
+            max_depth=int(arrays["max_depth"]),
+            n_features=int(arrays["n_features"]),
+            scale=float(arrays["scale"]),
+            base=arrays["base"],
+            cover=arrays["cover"] if "cover" in arrays else None
+        )
+
+    def save(self, path: str) -> str:
+        """
+        حفظ المجموعة كمجلد من ملفات npy (ملف لكل مصفوفة) حتى يمكن فتحها بـ mmap
+        ومشاركة صفحاتها بين العمليات
+        """
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name, array in self.to_arrays().items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array, allow_pickle=False)
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return path
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = None) -> "FlatTreeEnsemble":
+        """
+        تحميل مجموعة محفوظة؛ مع mmap_mode="r" تُقرأ مصفوفات العقد من الملفات مباشرة
+        وتتشارك العمليات نفس الصفحات في الذاكرة
+        """
+        if not os.path.isdir(path):
+            # صيغة npz السابقة (بدون mmap)
+            with np.load(path, allow_pickle=False) as arrays:
+                return cls.from_arrays({name: arrays[name] for name in arrays.files})
+
+        arrays = {}
+        for file_name in os.listdir(path):
+            name, extension = os.path.splitext(file_name)
+            if extension != ".npy":
+                continue
+            array = np.load(os.path.join(path, file_name), mmap_mode=mmap_mode, allow_pickle=False)
+            # القيم المفردة (النوع، العمق، ...) تُنسخ إلى الذاكرة
+            arrays[name] = array if array.ndim else np.array(array)
+        return cls.from_arrays(arrays)
+
+
+def flat_model_path(model_path: str) -> str:
+    """
+    مسار مجلد المصفوفات المصدّرة بجانب ملف النموذج
+    """
+    return os.path.splitext(model_path)[0] + ".flat"
+
+
+def check_parity(model: Any, flat: FlatTreeEnsemble, X: Optional[np.ndarray] = None, n_samples: int = 1000,
+                 rtol: float = 1e-9, atol: float = 1e-9, seed: int = 0) -> Dict[str, Any]:
+    """
+    مقارنة تنبؤات المصفوفات مع model.predict على عينة (عشوائية إذا لم تُحدد)
+    """
+    if X is None:
+        rng = np.random.default_rng(seed)
+        X = _parity_samples(flat, n_samples, rng)
+    X = np.asarray(X, dtype=FEATURE_DTYPE)
+
+    expected = np.asarray(model.predict(X), dtype=np.float64)
+    actual = flat.predict(X)
+    difference = np.abs(expected - actual)
+    mismatches = int(np.sum(~np.isclose(expected, actual, rtol=rtol, atol=atol)))
+    return {
+        "rows": int(X.shape[0]),
+        "mismatches": mismatches,
+        "max_abs_diff": float(difference.max()) if difference.size else 0.0,
+        "passed": mismatches == 0
+    }
+
+
+def _parity_samples(flat: FlatTreeEnsemble, n_samples: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    عينات تغطي مجال حدود الأشجار لكل ميزة، مع قيم الحدود نفسها لاختبار حالة المساواة
+    """
+    X = np.empty((n_samples, flat.n_features), dtype=FEATURE_DTYPE)
+    internal = np.isfinite(flat.threshold)
+    for column in range(flat.n_features):
+        thresholds = flat.threshold[internal & (flat.feature == column)]
+        if thresholds.size == 0:
+            X[:, column] = rng.normal(size=n_samples)
+            continue
+        low, high = thresholds.min(), thresholds.max()
+        margin = max(high - low, 1.0) * 0.1
+        X[:, column] = rng.uniform(low - margin, high + margin, size=n_samples)
+        # ربع العينات على قيم الحدود تماماً
+        exact = rng.random(n_samples) < 0.25
+        X[exact, column] = rng.choice(thresholds, size=int(exact.sum())).astype(FEATURE_DTYPE)
+    return X
+
+
+def export_ensemble(model: Any, model_path: str, verify: bool = True) -> Optional[str]:
+    """
+    تصدير نموذج مدرب إلى مجلد مصفوفات بجانب ملف النموذج بعد التحقق من التطابق.
+    يعيد مسار المجلد، أو None إذا كان النموذج غير مدعوم أو فشل التحقق.
+    """
+    flat = FlatTreeEnsemble.try_from(model)
+    if flat is None:
+        return None
+    if verify:
+        parity = check_parity(model, flat)
+        if not parity["passed"]:
+            print(f"Flat ensemble parity check failed for {model_path}: {parity}")
+            return None
+    return flat.save(flat_model_path(model_path))
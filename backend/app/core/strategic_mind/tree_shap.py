@@ -0,0 +1,268 @@
+from typing import Dict, Any, List, Optional
+from math import factorial
+
+import numpy as np
+
+from app.config import settings
+from .feature_schema import FEATURE_DTYPE, FEATURE_LABELS
+from .tree_ensemble import FlatTreeEnsemble
+
+
+# أقصى حجم تقريبي للمصفوفات المؤقتة لكل دفعة صفوف أثناء حساب المساهمات
+_CHUNK_BYTES = 32 * 2 ** 20
+
+
+class TreeExplainer:
+    """
+    حساب مساهمات الميزات (قيم Shapley حسب مسارات الأشجار، TreeSHAP) لمجموعة أشجار مسطحة.
+
+    يتم عند التحميل تحويل كل ورقة إلى مسارها: لكل ميزة على المسار المجال الذي يجب أن تقع
+    فيه قيمتها، ونسبة عينات التدريب التي تمر بنفس الفرع (cover). عند التفسير تكون
+    قيمة الورقة لمجموعة ميزات S هي قيمتها × نسبة الوصول، ومساهمة كل ميزة على المسار
+    تُحسب من معاملات كثيرة الحدود ∏(z + o·t) بزمن O(أوراق × عمق²)، لكل الصفوف معاً.
+    """
+    __slots__ = ("n_features", "path_feature", "path_low", "path_high", "path_zero",
+                 "leaf_value", "leaf_tree", "tree_expected", "expected_value", "_weights", "_table")
+
+    def __init__(self, n_features: int, path_feature: np.ndarray, path_low: np.ndarray, path_high: np.ndarray,
+                 path_zero: np.ndarray, leaf_value: np.ndarray, leaf_tree: np.ndarray,
+                 tree_expected: np.ndarray, base: float):
+        self.n_features = int(n_features)
+        # (أوراق × طول المسار): الميزة، حدود المجال (low, high]، ونسبة العينات المارة
+        self.path_feature = path_feature
+        self.path_low = path_low
+        self.path_high = path_high
+        self.path_zero = path_zero
+        self.leaf_value = leaf_value
+        self.leaf_tree = leaf_tree
+        # القيمة المتوقعة لكل شجرة (بعد المقياس)، ومتوسط تنبؤ النموذج على بيانات التدريب
+        self.tree_expected = tree_expected
+        self.expected_value = float(base + tree_expected.sum())
+        depth = path_feature.shape[1]
+        # وزن Shapley لمجموعة بحجم k من بين depth - 1 عنصراً
+        self._weights = np.array([
+            factorial(k) * factorial(depth - k - 1) / factorial(depth) for k in range(depth)
+        ])
+        self._table: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_flat(cls, flat: FlatTreeEnsemble, table_max_bytes: int = None) -> "TreeExplainer":
+        """
+        بناء مسارات الأوراق والقيم المتوقعة لكل شجرة (وجدول المساهمات إذا كان ضمن الحد)
+        من المصفوفات المسطحة
+        """
+        if flat.cover is None:
+            raise ValueError("Flat ensemble has no node cover; re-export the model to enable attributions")
+
+        n_nodes, n_features = flat.feature.shape[0], flat.n_features
+        nodes = np.arange(n_nodes)
+        is_leaf = flat.left == nodes
+        cover = np.asarray(flat.cover, dtype=np.float64)
+
+        # حالة المسار لكل عقدة: مجال كل ميزة ونسبة العينات، تنتقل من الأب إلى الأبناء مستوى بمستوى
+        low = np.full((n_nodes, n_features), -np.inf)
+        high = np.full((n_nodes, n_features), np.inf)
+        zero = np.ones((n_nodes, n_features))
+        tree = np.empty(n_nodes, dtype=np.int32)
+        roots = np.asarray(flat.roots, dtype=np.intp)
+        tree[roots] = np.arange(roots.shape[0])
+
+        frontier = roots
+        while frontier.size:
+            parents = frontier[~is_leaf[frontier]]
+            if not parents.size:
+                break
+            split = flat.feature[parents]
+            threshold = flat.threshold[parents]
+            children = []
+            for child_ids, is_left in ((flat.left[parents], True), (flat.right[parents], False)):
+                child_ids = child_ids.astype(np.intp)
+                low[child_ids] = low[parents]
+                high[child_ids] = high[parents]
+                zero[child_ids] = zero[parents]
+                tree[child_ids] = tree[parents]
+                if is_left:
+                    high[child_ids, split] = np.minimum(high[parents, split], threshold)
+                else:
+                    low[child_ids, split] = np.maximum(low[parents, split], threshold)
+                ratio = np.divide(cover[child_ids], cover[parents], out=np.zeros(parents.shape[0]),
+                                  where=cover[parents] > 0)
+                zero[child_ids, split] *= ratio
+                children.append(child_ids)
+            frontier = np.concatenate(children)
+
+        leaves = nodes[is_leaf]
+        low, high, zero = low[leaves], high[leaves], zero[leaves]
+
+        # الاحتفاظ بالميزات التي تظهر على مسار كل ورقة فقط (أولاً)، وبطول موحد لكل الأوراق.
+        # الميزات الإضافية للتعبئة لا تؤثر (low=-inf، high=inf، z=1) فمساهمتها صفر.
+        used = np.isfinite(low) | np.isfinite(high)
+        depth = max(1, int(used.sum(axis=1).max()))
+        order = np.argsort(~used, axis=1, kind="stable")[:, :depth]
+
+        leaf_value = flat.value[leaves, 0] * flat.scale
+        leaf_tree = tree[leaves]
+        # نسبة الوصول إلى الورقة = cover(الورقة) / cover(الجذر) = حاصل ضرب النسب على المسار
+        reach = zero.prod(axis=1)
+        tree_expected = np.bincount(leaf_tree, weights=leaf_value * reach, minlength=roots.shape[0])
+
+        explainer = cls(
+            n_features,
+            order.astype(np.int32),
+            np.take_along_axis(low, order, axis=1),
+            np.take_along_axis(high, order, axis=1),
+            np.take_along_axis(zero, order, axis=1),
+            leaf_value,
+            leaf_tree,
+            tree_expected,
+            float(flat.base[0])
+        )
+        if table_max_bytes is None:
+            table_max_bytes = int(settings.ATTRIBUTION_TABLE_MAX_MB * 2 ** 20)
+        explainer.build_table(table_max_bytes)
+        return explainer
+
+    @classmethod
+    def try_from(cls, flat: Optional[FlatTreeEnsemble]) -> Optional["TreeExplainer"]:
+        """
+        محاولة البناء؛ يعيد None إذا لم تتوفر المصفوفات المسطحة أو cover
+        """
+        if flat is None:
+            return None
+        try:
+            return cls.from_flat(flat)
+        except Exception as e:
+            print(f"Error building tree explainer: {e}")
+            return None
+
+    @property
+    def n_leaves(self) -> int:
+        return self.path_feature.shape[0]
+
+    @property
+    def path_length(self) -> int:
+        return self.path_feature.shape[1]
+
+    def shap_values(self, X: Any) -> np.ndarray:
+        """
+        مساهمة كل ميزة في تنبؤ كل صف (صفوف × ميزات)؛
+        expected_value + مجموع المساهمات = تنبؤ النموذج
+        """
+        X = np.asarray(X, dtype=FEATURE_DTYPE)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features}")
+
+        values = np.empty((X.shape[0], self.n_features))
+        chunk = max(1, _CHUNK_BYTES // (self.n_leaves * (self.path_length + 1) * 8 * 4))
+        for start in range(0, X.shape[0], chunk):
+            values[start:start + chunk] = self._shap_chunk(X[start:start + chunk])
+        return values
+
+    def build_table(self, max_bytes: int) -> bool:
+        """
+        حساب مساهمات كل ورقة مسبقاً لكل نمط ممكن من (يتبع/لا يتبع) على مسارها (2^طول المسار نمطاً)،
+        فيصبح التفسير قراءة من الجدول بدلاً من حساب كثيرات الحدود، إذا كان حجمه ضمن الحد
+        """
+        depth = self.path_length
+        patterns = 2 ** depth
+        if depth * patterns * self.n_leaves * 8 > max_bytes:
+            return False
+        bits = (np.arange(patterns)[None, :] >> np.arange(depth)[:, None]) & 1
+        one = np.repeat(bits[:, :, None].astype(np.float64), self.n_leaves, axis=2)
+        # (أوراق × أنماط، عنصر المسار): مساهمات الورقة لنمط واحد متجاورة في الذاكرة
+        contributions = self._leaf_contributions(one)
+        self._table = np.ascontiguousarray(contributions.transpose(2, 1, 0)).reshape(-1, depth)
+        return True
+
+    @property
+    def table_bytes(self) -> int:
+        return self._table.nbytes if self._table is not None else 0
+
+    def _follows(self, X: np.ndarray) -> np.ndarray:
+        """
+        هل يتبع كل صف فرع المسار لكل عنصر من مسار كل ورقة (عنصر المسار، صفوف، أوراق)
+        """
+        x = X[:, self.path_feature.T].transpose(1, 0, 2)
+        return (x > self.path_low.T[:, None]) & (x <= self.path_high.T[:, None])
+
+    def _shap_chunk(self, X: np.ndarray) -> np.ndarray:
+        rows, depth = X.shape[0], self.path_length
+        one = self._follows(X)
+        if self._table is not None:
+            pattern = np.arange(self.n_leaves) << depth
+            for j in range(depth):
+                pattern = pattern | (one[j].astype(np.intp) << j)
+            contributions = self._table[pattern]  # (صفوف، أوراق، عنصر المسار)
+        else:
+            contributions = self._leaf_contributions(one.astype(np.float64)).transpose(1, 2, 0)
+
+        index = (np.arange(rows) * self.n_features)[:, None, None] + self.path_feature
+        return np.bincount(index.ravel(), weights=contributions.ravel(),
+                           minlength=rows * self.n_features).reshape(rows, self.n_features)
+
+    def _leaf_contributions(self, one: np.ndarray) -> np.ndarray:
+        """
+        مساهمة كل عنصر من مسار كل ورقة لكل صف (عنصر المسار، صفوف، أوراق).
+        المصفوفات بهذا الترتيب حتى تكون كل عملية على ذاكرة متجاورة.
+        """
+        depth, rows = one.shape[0], one.shape[1]
+        zero = self.path_zero.T
+
+        # معاملات ∏(z_j + o_j·t) لكل صف وكل ورقة
+        poly = np.zeros((depth + 1, rows, self.n_leaves))
+        poly[0] = 1.0
+        for j in range(depth):
+            z, o = zero[j], one[j]
+            for k in range(j + 1, 0, -1):
+                poly[k] *= z
+                poly[k] += poly[k - 1] * o
+            poly[0] *= z
+
+        weights = self._weights
+        # عندما لا يتبع الصف الفرع i تكون القسمة على z_i وحدها، والمجموع الموزون نفسه لكل i
+        weighted = np.tensordot(weights, poly[:depth], axes=1)
+        contributions = np.empty((depth, rows, self.n_leaves))
+        for i in range(depth):
+            z, o = zero[i], one[i]
+            # قسمة كثيرة الحدود على (z + t) عندما يتبع الصف الفرع
+            q = poly[depth].copy()
+            follow = q * weights[depth - 1]
+            for k in range(depth - 1, 0, -1):
+                q *= -z
+                q += poly[k]
+                follow += q * weights[k - 1]
+            leave = np.divide(weighted, z, out=np.zeros_like(weighted), where=z > 0)
+            contributions[i] = np.where(o > 0, follow, leave)
+            contributions[i] *= (o - z) * self.leaf_value
+        return contributions
+
+
+def explain_rows(entry: Dict[str, Any], X: Any) -> Optional[np.ndarray]:
+    """
+    مساهمات الميزات لمصفوفة صفوف بنموذج من سجل النماذج (None إذا لم يكن النموذج قابلاً للتفسير)
+    """
+    explainer = entry.get("explainer")
+    if explainer is None:
+        return None
+    return explainer.shap_values(X)
+
+
+def attribution_factors(entry: Dict[str, Any], contributions: np.ndarray, row: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    تحويل مساهمات صف واحد إلى قائمة عوامل مرتبة حسب حجم التأثير
+    """
+    schema = entry.get("schema")
+    names = schema.feature_names if schema is not None else [f"feature_{i}" for i in range(len(contributions))]
+    factors = [
+        {
+            "name": FEATURE_LABELS.get(name, name),
+            "feature": name,
+            "value": float(contribution),
+            "feature_value": float(row[column])
+        }
+        for column, (name, contribution) in enumerate(zip(names, contributions))
+    ]
+    factors.sort(key=lambda factor: abs(factor["value"]), reverse=True)
+    return factors
@@ -1,2 +1,4 @@
 from app.core.transparent_mentor.explainer import DecisionExplainer
 from app.core.transparent_mentor.visualizer import DataVisualizer
+from app.core.transparent_mentor.scenario_sweep import ScenarioSweep
+from app.core.transparent_mentor.partial_dependence import PartialDependence
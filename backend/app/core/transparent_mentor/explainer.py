@@ -6,6 +6,20 @@ import os
 from sqlalchemy.orm import Session
 
 from app.config import settings
+from app.core.strategic_mind import get_inference_engine
+from app.core.transparent_mentor.scenario_sweep import ScenarioSweep
+from app.core.transparent_mentor.partial_dependence import PartialDependence
+
+
+# نوع التنبؤ المطلوب تفسيره ومفتاح النموذج المقابل في سجل النماذج
+_MODEL_KEYS = {
+    "ctr": "ctr",
+    "ctr_prediction": "ctr",
+    "roi": "roi",
+    "roi_prediction": "roi",
+    "channel": "channel",
+    "channel_recommendation": "channel",
+}
 
 
 class DecisionExplainer:
@@ -23,6 +37,12 @@ class DecisionExplainer:
         """
         تفسير تنبؤ من نموذج التعلم الآلي
         """
+        # مساهمات الميزات الفعلية إذا كان النموذج محملاً وقابلاً للتفسير
+        if model_type in _MODEL_KEYS:
+            attributed = self.explain_predictions([prediction_data], model_type)
+            if attributed is not None:
+                return attributed[0]
+
         # استخراج الميزات من البيانات
         features = prediction_data.get("features", {})
         
@@ -73,6 +93,33 @@ class DecisionExplainer:
             "visualization_data": self._prepare_visualization_data(explanation, model_type)
         }
     
+    def explain_predictions(self, predictions_data: List[Dict[str, Any]], model_type: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        تفسير مجموعة تنبؤات دفعة واحدة بمساهمات الميزات (TreeSHAP) من نموذج الأشجار المحمل،
+        أو None إذا لم يكن النموذج متوفراً أو قابلاً للتفسير. نوع تنبؤ غير معروف يرفع ValueError
+        """
+        model_key = _MODEL_KEYS.get(model_type)
+        if model_key is None:
+            raise ValueError(f"Unknown model type: {model_type} (expected one of: {', '.join(_MODEL_KEYS)})")
+        campaigns = [self._campaign_fields(data) for data in predictions_data]
+        attributed = get_inference_engine(self.db).explain_predictions(campaigns, model_key)
+        if attributed is None:
+            return None
+
+        results = []
+        for item in attributed:
+            explanation = self._attribution_explanation(item["factors"])
+            visualization_data = self._prepare_visualization_data(explanation, f"{model_key}_prediction")
+            visualization_data["base_value"] = item["base_value"]
+            results.append({
+                "prediction": item["prediction"],
+                "base_value": item["base_value"],
+                "confidence": item["confidence"],
+                "explanation": explanation,
+                "visualization_data": visualization_data
+            })
+        return results
+
     def explain_recommendation(self, recommendation_data: Dict[str, Any], recommendation_type: str) -> Dict[str, Any]:
         """
         تفسير توصية من النظام
@@ -259,6 +306,48 @@ class DecisionExplainer:
         # اقتصار العدد على العدد المطلوب
         return scenarios[:num_scenarios]
     
+    def sweep_scenarios(self, base_data: Dict[str, Any], ranges: Dict[str, Any], max_results: int = 20) -> Dict[str, Any]:
+        """
+        مسح شبكة كاملة من السيناريوهات (الميزانية، توزيع القنوات، المدة، نوع المحتوى)
+        وإرجاع السيناريوهات المثلى (Pareto) حسب العائد والنقر والميزانية
+        """
+        return ScenarioSweep(self.db).run(base_data, ranges, max_results)
+
+    def partial_dependence(self, campaigns: List[Dict[str, Any]], model_type: str = "ctr",
+                           fields: Optional[List[str]] = None, ranges: Optional[Dict[str, Any]] = None,
+                           grid_points: int = None, include_ice: bool = True) -> Dict[str, Any]:
+        """
+        منحنيات الاعتماد الجزئي (PD) ومنحنيات كل حملة (ICE) للميزانية والمدة والفئة العمرية
+        """
+        return PartialDependence(self.db).run(campaigns, model_type, fields, ranges, grid_points, include_ice)
+
+    @staticmethod
+    def _campaign_fields(prediction_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        بيانات الحملة من طلب التفسير (داخل features أو في المستوى الأعلى)
+        """
+        features = prediction_data.get("features")
+        return features if isinstance(features, dict) else prediction_data
+
+    @staticmethod
+    def _attribution_explanation(factors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        تحويل مساهمات الميزات إلى عناصر التفسير (الأهمية = حصة المساهمة المطلقة)
+        """
+        total = sum(abs(factor["value"]) for factor in factors) or 1.0
+        return [
+            {
+                "source": "model",
+                "factor": factor["feature"],
+                "name": factor["name"],
+                "importance": abs(factor["value"]) / total,
+                "contribution": factor["value"],
+                "value": factor["feature_value"],
+                "description": f"تأثير {factor['name']} على التنبؤ: {factor['value']:+.4f}"
+            }
+            for factor in factors
+        ]
+
     def _generate_default_explanation(self, data: Dict[str, Any], explanation_type: str) -> List[Dict[str, Any]]:
         """
         توليد تفسير افتراضي بناءً على نوع التفسير
@@ -0,0 +1,201 @@
+from typing import Dict, Any, List, Optional, Sequence
+import time
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.strategic_mind.inference_engine import HybridInferenceEngine
+from app.core.strategic_mind.model_registry import model_registry, predict_rows
+from app.core.strategic_mind.prediction_cache import PredictionCache
+from app.core.transparent_mentor.scenario_sweep import parse_range
+from app.core.transparent_mentor.visualizer import DataVisualizer
+
+
+# الحقول التي يمكن رسم منحنياتها والنطاق الافتراضي لكل منها
+CURVE_RANGES = {
+    "budget": {"min": 500, "max": 50000},
+    "duration": {"min": 7, "max": 90},
+    "audience_age": {"min": 18, "max": 65},
+}
+CURVE_LABELS = {"budget": "الميزانية", "duration": "المدة", "audience_age": "الفئة العمرية"}
+
+# أقصى عدد من منحنيات الحملات (ICE) في تكوين المخطط (القيم الكاملة تبقى في الاستجابة)
+_MAX_ICE_SERIES = 20
+
+
+class PartialDependence:
+    """
+    منحنيات الاعتماد الجزئي (PD) ومنحنيات التوقع الفردي (ICE): تنبؤ النموذج لكل حملة عند تغيير
+    حقل واحد (الميزانية، المدة، الفئة العمرية) على شبكة من القيم مع تثبيت باقي الحقول.
+    يتم ترميز الحملات مرة واحدة وبناء مصفوفة ميزات واحدة لكل المنحنيات تُقيَّم في استدعاء دفعي واحد،
+    وتُحفظ النتائج مؤقتاً لكل إصدار نموذج.
+    """
+
+    def __init__(self, db: Session = None, engine: HybridInferenceEngine = None):
+        """
+        تهيئة الحساب (يستخدم نماذج محرك الاستدلال أو تنبؤاته الافتراضية)
+        """
+        self.engine = engine or HybridInferenceEngine(db)
+        self.visualizer = DataVisualizer()
+
+    def run(self, campaigns: List[Dict[str, Any]], kind: str = "ctr", fields: Optional[Sequence[str]] = None,
+            ranges: Optional[Dict[str, Any]] = None, grid_points: int = None, include_ice: bool = True) -> Dict[str, Any]:
+        """
+        حساب منحنى PD (ومنحنيات ICE) لكل حقل مطلوب
+        """
+        start = time.perf_counter()
+        if kind not in ("ctr", "roi"):
+            raise ValueError(f"Unknown model type: {kind}")
+        if not campaigns:
+            raise ValueError("At least one campaign is required")
+        fields = list(fields or CURVE_RANGES)
+        unknown = [field for field in fields if field not in CURVE_RANGES]
+        if unknown:
+            raise ValueError(f"Unsupported curve fields: {unknown}; supported: {list(CURVE_RANGES)}")
+
+        steps = grid_points or settings.PARTIAL_DEPENDENCE_GRID_POINTS
+        ranges = ranges or {}
+        grids = {
+            field: [float(value) for value in parse_range(ranges.get(field, {**CURVE_RANGES[field], "steps": steps}), None)]
+            for field in fields
+        }
+        rows = len(campaigns) * (1 + sum(len(grid) for grid in grids.values()))
+        if rows > settings.PARTIAL_DEPENDENCE_MAX_ROWS:
+            raise ValueError(
+                f"Curves need {rows} predictions; the maximum is {settings.PARTIAL_DEPENDENCE_MAX_ROWS}"
+            )
+
+        entry = self.engine.ml_models.get(kind)
+        if entry is not None and entry.get("schema") is None:
+            entry = None
+        version = entry["version"] if entry is not None else None
+        cache_key = PredictionCache.make_key(kind, version, campaigns, grids, include_ice)
+        cached = partial_dependence_cache.get(cache_key, model_registry.generation)
+        if cached is not None:
+            cached["cached"] = True
+            cached["elapsed_ms"] = (time.perf_counter() - start) * 1000
+            return cached
+
+        if entry is not None:
+            base, curves, used = self._model_curves(kind, entry, campaigns, grids)
+            method = "ml_model"
+        else:
+            base, curves, used = self._heuristic_curves(kind, campaigns, grids)
+            method = "heuristic"
+
+        result = {
+            "model_type": kind,
+            "method": method,
+            "model_version": version,
+            "campaign_count": len(campaigns),
+            "predictions": base.tolist(),
+            "curves": [
+                self._describe(kind, field, grids[field], curves[field], used[field], include_ice)
+                for field in fields
+            ],
+            "cached": False
+        }
+        partial_dependence_cache.set(cache_key, result, model_registry.generation)
+        result["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        return result
+
+    def _model_curves(self, kind: str, entry: Dict[str, Any], campaigns: List[Dict[str, Any]],
+                      grids: Dict[str, List[float]]):
+        """
+        تقييم كل المنحنيات باستدعاء واحد للنموذج: صفوف الحملات الأصلية ثم لكل حقل
+        نسخة من الصفوف لكل قيمة في شبكته مع تغيير أعمدة هذا الحقل فقط
+        """
+        schema = entry["schema"]
+        base = schema.encode_batch(campaigns)
+        blocks = [base]
+        spans: Dict[str, slice] = {}
+        used: Dict[str, bool] = {}
+        offset = base.shape[0]
+        for field, grid in grids.items():
+            columns, encoded = schema.encode_field(field, [self._field_value(field, value) for value in grid])
+            used[field] = bool(columns)
+            if not columns:
+                # الحقل لا يدخل في ميزات النموذج: المنحنى ثابت ولا حاجة لتقييمه
+                continue
+            block = np.repeat(base[None], len(grid), axis=0)  # (قيم الشبكة، حملات، ميزات)
+            block[:, :, columns] = encoded[:, None, :]
+            blocks.append(block.reshape(-1, schema.width))
+            spans[field] = slice(offset, offset + block.shape[0] * block.shape[1])
+            offset = spans[field].stop
+
+        predictions = self._clip(kind, np.asarray(predict_rows(entry, np.concatenate(blocks)), dtype=np.float64))
+        base_predictions = predictions[:base.shape[0]]
+        curves = {}
+        for field, grid in grids.items():
+            if field in spans:
+                # (قيم الشبكة، حملات) -> (حملات، قيم الشبكة)
+                curves[field] = predictions[spans[field]].reshape(len(grid), base.shape[0]).T
+            else:
+                curves[field] = np.repeat(base_predictions[:, None], len(grid), axis=1)
+        return base_predictions, curves, used
+
+    def _heuristic_curves(self, kind: str, campaigns: List[Dict[str, Any]], grids: Dict[str, List[float]]):
+        """
+        المنحنيات بالتنبؤ الافتراضي لكل حملة وقيمة (عند عدم توفر نموذج)
+        """
+        heuristic = self.engine._heuristic_ctr if kind == "ctr" else self.engine._heuristic_roi
+        base = np.array([heuristic(campaign)["prediction"] for campaign in campaigns], dtype=np.float64)
+        curves = {
+            field: np.array([
+                [heuristic({**campaign, field: self._field_value(field, value)})["prediction"] for value in grid]
+                for campaign in campaigns
+            ], dtype=np.float64)
+            for field, grid in grids.items()
+        }
+        used = {field: field in HybridInferenceEngine._HEURISTIC_FIELDS for field in grids}
+        return base, curves, used
+
+    def _describe(self, kind: str, field: str, grid: List[float], ice: np.ndarray, used: bool,
+                  include_ice: bool) -> Dict[str, Any]:
+        """
+        وصف منحنى حقل واحد مع تكوين مخطط الخط (PD ثم منحنيات الحملات)
+        """
+        label = CURVE_LABELS[field]
+        partial_dependence = ice.mean(axis=0)
+        y_data = [partial_dependence.tolist()]
+        series_names = ["متوسط التنبؤ (PD)"]
+        if include_ice and ice.shape[0] > 1:
+            y_data.extend(ice[:_MAX_ICE_SERIES].tolist())
+            series_names.extend(f"حملة {index + 1}" for index in range(min(ice.shape[0], _MAX_ICE_SERIES)))
+
+        curve = {
+            "field": field,
+            "name": label,
+            "used_by_model": used,
+            "grid": grid,
+            "partial_dependence": partial_dependence.tolist(),
+            "visualization": self.visualizer.generate_visualization_config({
+                "title": f"تأثير {label} على {kind.upper()}",
+                "x_data": [f"{value:g}" for value in grid],
+                "y_data": y_data,
+                "series_names": series_names
+            }, "line")
+        }
+        if include_ice:
+            curve["ice"] = ice.tolist()
+        return curve
+
+    @staticmethod
+    def _field_value(field: str, value: float) -> Any:
+        """
+        قيمة الحقل في بيانات الحملة (الفئة العمرية نطاق [من، إلى] متوسطه القيمة)
+        """
+        if field == "audience_age":
+            return [value, value]
+        return value
+
+    @staticmethod
+    def _clip(kind: str, predictions: np.ndarray) -> np.ndarray:
+        if kind == "ctr":
+            return np.clip(predictions, 0, 1)
+        return np.maximum(predictions, 0)
+
+
+# إنشاء instance عام
+partial_dependence_cache = PredictionCache(max_size=settings.PARTIAL_DEPENDENCE_CACHE_SIZE)
@@ -0,0 +1,237 @@
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import itertools
+import time
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.strategic_mind.inference_engine import HybridInferenceEngine
+from app.core.strategic_mind.model_registry import predict_rows
+
+
+# الأهداف المستخدمة لحساب الحد الأمثل (Pareto): العائد والنقر للأعلى، والميزانية للأقل
+SWEEP_OBJECTIVES = (("expected_roi", True), ("expected_ctr", True), ("budget", False))
+
+
+def parse_range(spec: Any, default: Any) -> List[Any]:
+    """
+    قيم محور السيناريو من قائمة، أو من {"min", "max", "steps"}، أو القيمة الأساسية وحدها
+    """
+    if spec is None:
+        return [default]
+    if isinstance(spec, dict):
+        steps = int(spec.get("steps", 5))
+        if steps < 1:
+            raise ValueError("Range steps must be at least 1")
+        return [float(value) for value in np.linspace(float(spec["min"]), float(spec["max"]), steps)]
+    if isinstance(spec, (list, tuple)):
+        if not spec:
+            raise ValueError("Range values must not be empty")
+        return list(spec)
+    return [spec]
+
+
+def parse_channel_mix(mix: Any) -> Dict[str, float]:
+    """
+    توزيع الميزانية على القنوات بنسب مجموعها 1 (اسم قناة واحد يعني 100% لها)
+    """
+    if isinstance(mix, str):
+        return {mix: 1.0}
+    if not isinstance(mix, dict) or not mix:
+        raise ValueError(f"Invalid channel mix: {mix}")
+    if any(float(share) < 0 for share in mix.values()):
+        raise ValueError(f"Channel shares must not be negative: {mix}")
+    total = sum(float(share) for share in mix.values())
+    if total <= 0:
+        raise ValueError(f"Channel shares must sum to a positive value: {mix}")
+    return {channel: float(share) / total for channel, share in mix.items()}
+
+
+def pareto_front(objectives: np.ndarray, maximize: Sequence[bool]) -> np.ndarray:
+    """
+    فهارس الصفوف غير المهيمن عليها (لا يوجد صف أفضل أو مساوٍ في كل الأهداف وأفضل في أحدها)
+    """
+    points = np.where(maximize, objectives, -objectives)
+    # الصفوف المتطابقة في كل الأهداف لها نفس الحكم، لذلك يتم فحص القيم الفريدة فقط
+    unique_points, inverse = np.unique(points, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    # ترتيب تنازلي معجمي: لا يمكن لصف لاحق أن يهيمن على صف سابق
+    order = np.lexsort(-unique_points[:, ::-1].T)
+    front = np.empty_like(unique_points)
+    kept = np.zeros(len(unique_points), dtype=bool)
+    size = 0
+    for index in order:
+        point = unique_points[index]
+        if size:
+            candidates = front[:size]
+            if np.any(np.all(candidates >= point, axis=1) & np.any(candidates > point, axis=1)):
+                continue
+        front[size] = point
+        size += 1
+        kept[index] = True
+
+    return np.flatnonzero(kept[inverse])
+
+
+class ScenarioSweep:
+    """
+    مسح سيناريوهات "ماذا لو" على شبكة كاملة من الميزانية وتوزيع القنوات والمدة ونوع المحتوى.
+    يتم تقييم كل خلية مميزة (ميزانية القناة × القناة × ...) مرة واحدة في استدعاء دفعي واحد للنموذج،
+    ثم تُجمع النتائج لكل سيناريو حسب نسب القنوات ويُحسب الحد الأمثل (Pareto).
+    """
+
+    def __init__(self, db: Session = None, engine: HybridInferenceEngine = None):
+        """
+        تهيئة المسح (يستخدم نماذج محرك الاستدلال أو تنبؤاته الافتراضية)
+        """
+        self.engine = engine or HybridInferenceEngine(db)
+
+    def run(self, base_data: Dict[str, Any], ranges: Dict[str, Any], max_results: int = 20) -> Dict[str, Any]:
+        """
+        تقييم كل السيناريوهات وإرجاع السيناريوهات المثلى مرتبة حسب العائد المتوقع
+        """
+        start = time.perf_counter()
+
+        budgets = np.asarray(parse_range(ranges.get("budget"), base_data.get("budget", 1000)), dtype=np.float64)
+        mix_specs = ranges.get("channel_mix") or [base_data.get("channel", "social_media")]
+        if not isinstance(mix_specs, list):
+            mix_specs = [mix_specs]
+        mixes = [parse_channel_mix(mix) for mix in mix_specs]
+        durations = parse_range(ranges.get("duration"), base_data.get("duration", 30))
+        content_types = parse_range(ranges.get("content_type"), base_data.get("content_type", "mixed"))
+
+        shape = (len(budgets), len(mixes), len(durations), len(content_types))
+        scenario_count = int(np.prod(shape))
+        if scenario_count > settings.SCENARIO_SWEEP_MAX_SIZE:
+            raise ValueError(
+                f"Scenario grid has {scenario_count} scenarios; the maximum is {settings.SCENARIO_SWEEP_MAX_SIZE}"
+            )
+
+        channels = sorted(set().union(*mixes))
+        shares = np.array([[mix.get(channel, 0.0) for channel in channels] for mix in mixes], dtype=np.float64)
+        grid = {"budgets": budgets, "channels": channels, "shares": shares,
+                "durations": durations, "content_types": content_types}
+
+        ctr, ctr_method = self._score("ctr", base_data, grid)
+        roi, roi_method = self._score("roi", base_data, grid)
+        ctr = np.broadcast_to(ctr, shape).reshape(-1)
+        roi = np.broadcast_to(roi, shape).reshape(-1)
+        budget_column = np.broadcast_to(budgets[:, None, None, None], shape).reshape(-1)
+
+        columns = {"expected_roi": roi, "expected_ctr": ctr, "budget": budget_column}
+        objectives = np.column_stack([columns[name] for name, _ in SWEEP_OBJECTIVES])
+        front = pareto_front(objectives, [maximize for _, maximize in SWEEP_OBJECTIVES])
+        # الأعلى عائداً أولاً، ثم الأعلى نقراً، ثم الأقل ميزانية
+        front = front[np.lexsort((budget_column[front], -ctr[front], -roi[front]))]
+
+        scenarios = []
+        for flat_index in front[:max_results]:
+            b, m, d, c = np.unravel_index(flat_index, shape)
+            scenarios.append(self._describe(
+                base_data, float(budgets[b]), mixes[m], durations[d], content_types[c],
+                float(ctr[flat_index]), float(roi[flat_index])
+            ))
+
+        return {
+            "scenario_count": scenario_count,
+            "pareto_count": int(len(front)),
+            "objectives": {name: "max" if maximize else "min" for name, maximize in SWEEP_OBJECTIVES},
+            "methods": {"ctr": ctr_method, "roi": roi_method},
+            "scenarios": scenarios,
+            "elapsed_ms": (time.perf_counter() - start) * 1000
+        }
+
+    def _score(self, kind: str, base_data: Dict[str, Any], grid: Dict[str, Any]) -> Tuple[np.ndarray, str]:
+        """
+        تقييم نوع واحد (ctr أو roi) على الشبكة وإرجاع مصفوفة (ميزانية × توزيع × مدة × محتوى)
+        قابلة للنشر، مع الطريقة المستخدمة
+        """
+        entry = self.engine.ml_models.get(kind)
+        if entry is not None and entry.get("schema") is not None:
+            fields, method = set(entry["schema"].fields), "ml_model"
+        else:
+            entry, fields, method = None, set(HybridInferenceEngine._HEURISTIC_FIELDS), "heuristic"
+
+        budgets, channels, shares = grid["budgets"], grid["channels"], grid["shares"]
+        by_channel = "channel" in fields
+
+        # إذا كان التنبؤ يعتمد على القناة، يتم تقييم كل قناة بحصتها من الميزانية
+        budget_index = None
+        budget_values = budgets
+        if by_channel and "budget" in fields:
+            allocated = budgets[:, None, None] * shares[None, :, :]
+            budget_values, budget_index = np.unique(allocated, return_inverse=True)
+            budget_index = budget_index.reshape(allocated.shape)
+
+        axes: Dict[str, Sequence[Any]] = {}
+        if "budget" in fields:
+            axes["budget"] = [float(value) for value in budget_values]
+        if by_channel:
+            axes["channel"] = channels
+        if "duration" in fields:
+            axes["duration"] = grid["durations"]
+        if "content_type" in fields:
+            axes["content_type"] = grid["content_types"]
+
+        table = self._score_cells(kind, entry, base_data, axes)
+        table = table.reshape(tuple(len(axes[name]) if name in axes else 1
+                                    for name in ("budget", "channel", "duration", "content_type")))
+
+        if not by_channel:
+            # (ميزانية، 1، مدة، محتوى) -> (ميزانية، توزيع، مدة، محتوى)
+            return table, method
+
+        if budget_index is None:
+            budget_index = np.zeros((len(budgets), shares.shape[0], len(channels)), dtype=np.intp)
+        cells = table[budget_index, np.arange(len(channels))[None, None, :]]  # ميزانية × توزيع × قناة × مدة × محتوى
+        return np.einsum("bmkdc,mk->bmdc", cells, shares), method
+
+    def _score_cells(self, kind: str, entry: Optional[Dict[str, Any]], base_data: Dict[str, Any],
+                     axes: Dict[str, Sequence[Any]]) -> np.ndarray:
+        """
+        تقييم كل خلية مميزة في الشبكة: استدعاء واحد للنموذج، أو التنبؤ الافتراضي لكل خلية
+        """
+        if entry is not None:
+            predictions = np.asarray(predict_rows(entry, entry["schema"].encode_grid(base_data, axes)), dtype=np.float64)
+            if kind == "ctr":
+                return np.clip(predictions, 0, 1)
+            return np.maximum(predictions, 0)
+
+        heuristic = self.engine._heuristic_ctr if kind == "ctr" else self.engine._heuristic_roi
+        names = list(axes)
+        return np.array([
+            heuristic({**base_data, **dict(zip(names, combination))})["prediction"]
+            for combination in itertools.product(*axes.values())
+        ], dtype=np.float64)
+
+    def _describe(self, base_data: Dict[str, Any], budget: float, mix: Dict[str, float], duration: Any,
+                  content_type: Any, ctr: float, roi: float) -> Dict[str, Any]:
+        """
+        وصف سيناريو واحد بنفس شكل السيناريوهات البديلة (مع قائمة التغييرات عن الحملة الأساسية)
+        """
+        changes = []
+        base_budget = base_data.get("budget")
+        if base_budget and budget != base_budget:
+            changes.append({"factor": "budget", "change": f"{(budget / base_budget - 1) * 100:+.0f}%"})
+        if mix != {base_data.get("channel"): 1.0}:
+            changes.append({"factor": "channel_mix", "change": ", ".join(f"{channel} {share:.0%}" for channel, share in mix.items())})
+        if duration != base_data.get("duration"):
+            changes.append({"factor": "duration", "change": str(duration)})
+        if content_type != base_data.get("content_type"):
+            changes.append({"factor": "content_type", "change": str(content_type)})
+
+        return {
+            "budget": budget,
+            "channel_mix": mix,
+            "channel_budgets": {channel: budget * share for channel, share in mix.items()},
+            "duration": duration,
+            "content_type": content_type,
+            "expected_ctr": ctr,
+            "expected_roi": roi,
+            "expected_return": budget * roi,
+            "description": f"Budget {budget:,.0f} over {duration} days, {content_type} content, "
+                           + ", ".join(f"{share:.0%} {channel}" for channel, share in mix.items()),
+            "changes": changes
+        }
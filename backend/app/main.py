@@ -1,12 +1,20 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 import os
+import time
 
 from app.api.api import api_router
 from app.config import settings
-from app.database import Base, engine
+from app.database import Base, engine, SessionLocal
+from app.core.learning_loop import sync_feedback_rollups
+from app.core.learning_loop.event_buffer import event_buffer, EventBufferFullError
+from app.core.learning_loop.prediction_log import prediction_log_buffer
+from app.core.strategic_mind.model_experiments import experiment_router
+from app.core.strategic_mind.feature_drift import drift_monitor
+from app.utils.metrics import metrics
+from app.utils.process_pool import process_pool, PoolSaturatedError, OffloadTimeoutError
 
 
 # إنشاء جداول قاعدة البيانات
@@ -27,6 +35,132 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+def _route_template(request: Request) -> str:
+    """
+    قالب المسار الكامل (مثل /api/v1/campaigns/{campaign_id}) لتجنب تسمية مقياس لكل معرف
+    """
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = request.url.path
+    try:
+        concrete = route.path_format.format(**request.path_params)
+    except (AttributeError, KeyError, IndexError):
+        return route.path
+    # المسار المطابق نسبي داخل الموجّه؛ البادئة هي ما يسبقه في الرابط
+    if path.endswith(concrete):
+        return path[:len(path) - len(concrete)] + route.path
+    return route.path
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """
+    تسجيل زمن كل طلب حسب قالب المسار (فقط عند تفعيل مراقبة الأداء)
+    """
+    if not metrics.enabled:
+        return await call_next(request)
+
+    start = time.perf_counter()
+    response = await call_next(request)
+    metrics.observe(
+        "http_request_seconds",
+        time.perf_counter() - start,
+        path=_route_template(request),
+        method=request.method,
+        status=response.status_code
+    )
+    return response
+
+
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated_handler(request: Request, exc: PoolSaturatedError):
+    """
+    رفض الطلب فوراً عندما يكون مجمع عمليات المعالجة الثقيلة ممتلئاً
+    """
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "الخادم مشغول بمعالجة طلبات أخرى، يرجى المحاولة لاحقاً"},
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(EventBufferFullError)
+async def event_buffer_full_handler(request: Request, exc: EventBufferFullError):
+    """
+    رفض دفعة الأحداث عندما لا تواكب الكتابة إلى قاعدة البيانات معدل الاستقبال
+    """
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "مخزن الأحداث ممتلئ، يرجى إعادة إرسال الأحداث لاحقاً"},
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(OffloadTimeoutError)
+async def offload_timeout_handler(request: Request, exc: OffloadTimeoutError):
+    """
+    انتهاء مهلة مهمة المعالجة الثقيلة
+    """
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": "تجاوزت المعالجة المهلة المحددة"}
+    )
+
+
+@app.on_event("startup")
+def start_process_pool():
+    """
+    تشغيل عمال مجمع العمليات مسبقاً (إذا كان مفعلاً) حتى لا يدفع أول طلب تكلفة التحميل
+    """
+    process_pool.warm_up()
+
+
+@app.on_event("startup")
+def check_feedback_rollups():
+    """
+    إعادة بناء إحصائيات التغذية الراجعة المجمعة إذا لم تطابق جدول التوصيات (مثلاً أول تشغيل بعد الترقية)
+    """
+    db = SessionLocal()
+    try:
+        sync_feedback_rollups(db)
+    except Exception as e:
+        print(f"Error checking feedback rollups: {e}")
+    finally:
+        db.close()
+
+
+@app.on_event("shutdown")
+def stop_process_pool():
+    process_pool.shutdown()
+
+
+@app.on_event("shutdown")
+def flush_event_buffer():
+    """
+    كتابة أحداث التفاعل المتبقية في الذاكرة قبل إيقاف العامل
+    """
+    event_buffer.close()
+
+
+@app.on_event("shutdown")
+def flush_prediction_logs():
+    """
+    انتظار تقييمات النماذج المرشحة في الخلفية وكتابة سجلات التنبؤ المتبقية قبل إيقاف العامل
+    """
+    experiment_router.close()
+    prediction_log_buffer.close()
+
+
+@app.on_event("shutdown")
+def flush_drift_sketches():
+    """
+    كتابة ملخصات توزيع الميزات المتراكمة قبل إيقاف العامل
+    """
+    drift_monitor.close()
+
+
 # إضافة مسارات API
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -71,6 +205,16 @@ def health_check():
     }
 
 
+@app.get("/metrics")
+def get_metrics(format: str = "prometheus"):
+    """
+    تصدير مقاييس الأداء (صيغة Prometheus أو JSON مع تقدير p50/p95/p99)
+    """
+    if format == "json":
+        return metrics.snapshot()
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
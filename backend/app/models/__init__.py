@@ -1,4 +1,9 @@
 from app.models.user import User
 from app.models.campaign import Campaign, Content, Recommendation
-from app.models.knowledge_base import KnowledgeRule, MLModel, TrendData, ContentTemplate
+from app.models.knowledge_base import KnowledgeRule, RuleSetVersion, MLModel, TrendData, ContentTemplate
 from app.models.achievement import Achievement, UserAchievement
+from app.models.job import Job, JobSchedule
+from app.models.feedback_rollup import FeedbackRollup
+from app.models.interaction import UserInteraction
+from app.models.experiment import ModelExperiment, PredictionLog
+from app.models.feature_drift import FeatureDriftSketch
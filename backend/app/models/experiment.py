@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Index
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class ModelExperiment(Base):
+    """
+    تجربة مقارنة إصدار مرشح من نموذج مع الإصدار النشط أثناء الاستدلال
+    """
+    __tablename__ = "model_experiments"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    model_type = Column(String, index=True)  # نفس model_type في ml_models
+    candidate_model_id = Column(Integer, ForeignKey("ml_models.id"))
+    mode = Column(String)  # shadow: تقييم المرشح في الخلفية، split: خدمة جزء من المستخدمين بالمرشح
+    fraction = Column(Float)  # نسبة الطلبات (shadow) أو المستخدمين (split)
+    status = Column(String, default="running", index=True)  # running, stopped
+    created_by = Column(Integer, ForeignKey("users.id"))
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    stopped_at = Column(DateTime(timezone=True))
+
+
+class PredictionLog(Base):
+    """
+    سجل تنبؤات التجارب (إضافة فقط، يُكتب على دفعات): التنبؤ المقدم للمستخدم وتنبؤ المرشح
+    مع زمن كل منهما، للمقارنة لاحقاً مع الأداء الفعلي في campaign_performance
+    """
+    __tablename__ = "prediction_logs"
+    __table_args__ = (
+        Index("ix_prediction_logs_experiment_campaign", "experiment_id", "campaign_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    experiment_id = Column(Integer, ForeignKey("model_experiments.id"))
+    metric_name = Column(String)  # ctr, roi (نفس metric_name في campaign_performance)
+    arm = Column(String)  # champion أو candidate: الإصدار الذي قُدم تنبؤه للمستخدم
+    user_id = Column(Integer)
+    campaign_id = Column(Integer)
+    served_version = Column(String)
+    served_prediction = Column(Float)
+    served_latency_ms = Column(Float)
+    candidate_version = Column(String)  # في وضع shadow فقط (تنبؤ لم يُقدم للمستخدم)
+    candidate_prediction = Column(Float)
+    candidate_latency_ms = Column(Float)
+    created_at = Column(DateTime)  # UTC
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
+
+from app.database import Base
+
+
+class FeatureDriftSketch(Base):
+    """
+    ملخص توزيع الميزات في طلبات التنبؤ خلال فترة قصيرة من عملية واحدة (إضافة فقط):
+    عدادات ثابتة الحجم لكل ميزة بنفس حدود ملخص بيانات التدريب للإصدار، تُجمع الصفوف عند فحص الانحراف
+    """
+    __tablename__ = "feature_drift_sketches"
+    __table_args__ = (
+        Index("ix_feature_drift_sketches_model_time", "model_type", "model_version", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    model_type = Column(String)
+    model_version = Column(String)
+    observations = Column(Integer)  # عدد الطلبات في الملخص
+    counts = Column(JSON)  # لكل عمود: عدادات الفئات أو فترات المدرج بترتيب ملخص التدريب
+    created_at = Column(DateTime, index=True)  # UTC
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Date, Float, UniqueConstraint
+
+from app.database import Base
+
+
+class FeedbackRollup(Base):
+    """
+    إحصائيات التغذية الراجعة المجمعة لكل حملة ونوع توصية ويوم (حسب تاريخ إنشاء التوصية)،
+    تُحدَّث مع كل كتابة على جدول التوصيات بدلاً من تجميع كل الصفوف عند كل استعلام
+    """
+    __tablename__ = "feedback_rollups"
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "recommendation_type", "day", name="uq_feedback_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, index=True)
+    recommendation_type = Column(String)
+    day = Column(Date, index=True)
+    total = Column(Integer, default=0, nullable=False)  # عدد التوصيات
+    applied = Column(Integer, default=0, nullable=False)  # عدد التوصيات المطبقة
+    rated = Column(Integer, default=0, nullable=False)  # عدد التوصيات المقيّمة
+    rating_sum = Column(Float, default=0.0, nullable=False)  # مجموع التقييمات
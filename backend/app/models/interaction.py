@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Index
+
+from app.database import Base
+
+
+class UserInteraction(Base):
+    """
+    سجل تفاعلات المستخدم مع الواجهة والتغذية الراجعة (إضافة فقط، يُكتب على دفعات)
+    """
+    __tablename__ = "user_interactions"
+    __table_args__ = (
+        Index("ix_user_interactions_user_time", "user_id", "occurred_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    event_type = Column(String, index=True)  # view, click, dismiss, feedback...
+    campaign_id = Column(Integer, ForeignKey("campaigns.id"))
+    recommendation_id = Column(Integer, ForeignKey("recommendations.id"))
+    payload = Column(JSON)  # بيانات إضافية حسب نوع الحدث
+    occurred_at = Column(DateTime)  # وقت الحدث عند العميل (UTC)
+    received_at = Column(DateTime)  # وقت استلام الخادم للحدث (UTC)
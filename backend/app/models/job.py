@@ -0,0 +1,55 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Boolean, ForeignKey, Index
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class Job(Base):
+    """
+    مهمة خلفية في الطابور (إعادة تدريب، تحليل ثقيل...) ينفذها عامل منفصل
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # استعلام اختيار المهمة التالية: الحالة ثم الأولوية ثم موعد التشغيل
+        Index("ix_jobs_claim", "status", "priority", "run_after"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, index=True)
+    payload = Column(JSON)  # مدخلات المهمة
+    status = Column(String, default="queued", nullable=False)  # queued, running, succeeded, failed, cancelled
+    priority = Column(Integer, default=0, nullable=False)  # الأعلى أولاً
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    run_after = Column(DateTime, nullable=False)  # لا تُنفذ قبل هذا الوقت (التأخير بين المحاولات)
+    lease_expires_at = Column(DateTime)  # إذا انتهى الإيجار دون تجديد تعود المهمة لعامل آخر
+    worker_id = Column(String)
+    dedupe_key = Column(String, index=True)  # مهمة واحدة نشطة فقط لكل مفتاح
+    result = Column(JSON)
+    error = Column(Text)
+    schedule_id = Column(Integer, ForeignKey("job_schedules.id"))
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
+class JobSchedule(Base):
+    """
+    جدول زمني متكرر (تعبير cron) ينشئ مهمة في الطابور عند كل موعد
+    """
+    __tablename__ = "job_schedules"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True)
+    job_type = Column(String)
+    payload = Column(JSON)
+    cron = Column(String)  # "دقيقة ساعة يوم شهر يوم_الأسبوع" أو @hourly/@daily/@weekly/@monthly
+    priority = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    is_active = Column(Boolean, default=True)
+    next_run_at = Column(DateTime, index=True)
+    last_run_at = Column(DateTime)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
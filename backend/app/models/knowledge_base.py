@@ -23,6 +23,20 @@ class KnowledgeRule(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 
+class RuleSetVersion(Base):
+    """
+    عداد إصدار مجموعة القواعد، يتم زيادته عند كل تعديل على القواعد
+    لتتمكن العمليات الأخرى من اكتشاف التغيير باستعلام بسيط
+    """
+    __tablename__ = "rule_set_versions"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True)
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 class MLModel(Base):
     """
     نموذج لتخزين معلومات نماذج التعلم الآلي
@@ -0,0 +1,273 @@
+from typing import Dict, Any, List, Optional, Tuple
+from bisect import bisect_left
+import json
+import logging
+import random
+import threading
+import time
+
+from app.config import settings
+
+
+# حدود مدرجات زمن التنفيذ بالثواني
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+# حدود مدرجات الأحجام والأعداد (حجم الدفعة، عمق الطابور)
+COUNT_BUCKETS: Tuple[float, ...] = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """
+    مدرج تراكمي بحدود ثابتة (متوافق مع صيغة Prometheus)
+    """
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # الخانة الأخيرة لـ +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        تقدير قيمة المئين من حدود المدرج (الحد الأعلى للخانة التي تحتويه)
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for position, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return self.buckets[position] if position < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class _Timer:
+    """
+    مؤقت مرحلة يسجل المدة في المدرج عند الخروج من الكتلة
+    """
+    __slots__ = ("_registry", "_name", "_labels", "_start")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: LabelKey):
+        self._registry = registry
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._registry._observe(self._name, self._labels, time.perf_counter() - self._start)
+
+
+class _NullTimer:
+    """
+    مؤقت لا يفعل شيئاً عندما تكون مراقبة الأداء معطلة
+    """
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """
+    سجل مقاييس بسيط داخل العملية (مدرجات زمنية وعدادات).
+    لا يتم تسجيل أي شيء إلا إذا كان ENABLE_PERFORMANCE_MONITORING مفعلاً.
+    """
+
+    def __init__(self, namespace: str = "maestro"):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ENABLE_PERFORMANCE_MONITORING
+
+    def describe(self, name: str, help_text: str, buckets: Optional[Tuple[float, ...]] = None) -> None:
+        """
+        تسجيل وصف المقياس الذي يظهر في مخرجات Prometheus (وحدود مدرجه إن لم يكن زمنياً)
+        """
+        self._help[name] = help_text
+        if buckets is not None:
+            self._buckets[name] = buckets
+
+    def timer(self, name: str, **labels: str):
+        """
+        مؤقت لكتلة with يسجل مدتها بالثواني
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, self._label_key(labels))
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        تسجيل قيمة في مدرج
+        """
+        if self.enabled:
+            self._observe(name, self._label_key(labels), value)
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        """
+        زيادة عداد
+        """
+        if not self.enabled:
+            return
+        key = self._label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def reset(self) -> None:
+        """
+        مسح كل القيم المسجلة
+        """
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        ملخص المقاييس بصيغة JSON (العدد والمتوسط وتقدير p50/p95/p99 لكل مدرج)
+        """
+        with self._lock:
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "mean": histogram.sum / histogram.count if histogram.count else None,
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                        "p99": histogram.quantile(0.99)
+                    }
+                    for labels, histogram in series.items()
+                ]
+                for name, series in self._histograms.items()
+            }
+            counters = {
+                name: [{"labels": dict(labels), "value": value} for labels, value in series.items()]
+                for name, series in self._counters.items()
+            }
+        return {"enabled": self.enabled, "histograms": histograms, "counters": counters}
+
+    def render_prometheus(self) -> str:
+        """
+        تصدير المقاييس بصيغة نص Prometheus
+        """
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                full_name = f"{self.namespace}_{name}"
+                self._header(lines, name, full_name, "histogram")
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f"{full_name}_bucket{self._format_labels(labels, le=repr(bound))} {cumulative}")
+                    lines.append(f"{full_name}_bucket{self._format_labels(labels, le='+Inf')} {histogram.count}")
+                    lines.append(f"{full_name}_sum{self._format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{full_name}_count{self._format_labels(labels)} {histogram.count}")
+
+            for name, series in sorted(self._counters.items()):
+                full_name = f"{self.namespace}_{name}"
+                self._header(lines, name, full_name, "counter")
+                for labels, value in series.items():
+                    lines.append(f"{full_name}{self._format_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def _observe(self, name: str, labels: LabelKey, value: float) -> None:
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(self._buckets.get(name, DEFAULT_BUCKETS))
+            histogram.observe(value)
+
+    def _header(self, lines: List[str], name: str, full_name: str, metric_type: str) -> None:
+        if name in self._help:
+            lines.append(f"# HELP {full_name} {self._help[name]}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+
+    @staticmethod
+    def _label_key(labels: Dict[str, str]) -> LabelKey:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def _format_labels(labels: LabelKey, **extra: str) -> str:
+        pairs = list(labels) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + "}"
+
+
+# إنشاء instance عام
+metrics = MetricsRegistry()
+
+metrics.describe("inference_stage_seconds", "Latency of each hybrid inference stage")
+metrics.describe("inference_seconds", "End-to-end latency of a hybrid inference call")
+metrics.describe("inference_method_total", "Predictions served per operation and method")
+metrics.describe("http_request_seconds", "HTTP request latency per route")
+metrics.describe("inference_batch_size", "Rows per coalesced model predict call", buckets=COUNT_BUCKETS)
+metrics.describe("inference_queue_depth", "Requests still queued when a micro-batch is dispatched", buckets=COUNT_BUCKETS)
+metrics.describe("inference_batch_wait_seconds", "Time a request waited in the micro-batch queue")
+metrics.describe("offload_seconds", "Wall time of tasks run in the processing pool, including queueing")
+metrics.describe("offload_in_flight", "Processing pool tasks in progress when a task is submitted", buckets=COUNT_BUCKETS)
+metrics.describe("offload_rejected_total", "Tasks rejected because the processing pool was saturated")
+metrics.describe("offload_timeouts_total", "Processing pool tasks that exceeded their timeout")
+metrics.describe("remote_inference_seconds", "Round trip of a call to the local inference server")
+metrics.describe("remote_inference_fallback_total", "Calls served by a local engine because the inference server was unreachable")
+metrics.describe("event_flush_size", "Interaction events written per bulk insert", buckets=COUNT_BUCKETS)
+metrics.describe("event_flush_seconds", "Time to write one batch of interaction events")
+metrics.describe("events_rejected_total", "Interaction events rejected because the event buffer was full")
+
+
+inference_logger = logging.getLogger("maestro.inference")
+if not inference_logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    inference_logger.addHandler(_handler)
+    inference_logger.propagate = False
+inference_logger.setLevel(getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
+
+
+def log_sampled(event: str, sample_rate: float = None, level: int = logging.INFO, **fields: Any) -> bool:
+    """
+    تسجيل حدث منظم (سطر JSON) لنسبة عشوائية فقط من الاستدعاءات
+    """
+    rate = settings.LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return False
+    if not inference_logger.isEnabledFor(level):
+        return False
+    fields["event"] = event
+    fields["sample_rate"] = rate
+    inference_logger.log(level, json.dumps(fields, default=str, ensure_ascii=False, sort_keys=True))
+    return True
@@ -0,0 +1,171 @@
+from typing import Dict, Any, Callable, Optional, Sequence
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import importlib
+import multiprocessing
+import threading
+import time
+
+from app.config import settings
+from app.utils.metrics import metrics
+
+
+class PoolSaturatedError(RuntimeError):
+    """
+    كل أماكن مجمع العمليات مشغولة (العمال والطابور المحدود)
+    """
+
+
+class OffloadTimeoutError(TimeoutError):
+    """
+    تجاوزت المهمة المنقولة إلى مجمع العمليات المهلة المحددة
+    """
+
+
+def _import_modules(modules: Sequence[str]) -> int:
+    """
+    استيراد الوحدات مسبقاً في عملية العامل (تحميل النماذج والقواعد قبل أول طلب)
+    """
+    for module in modules:
+        importlib.import_module(module)
+    return multiprocessing.current_process().pid
+
+
+class CPUProcessPool:
+    """
+    مجمع عمليات لمهام المعالجة الثقيلة (الاستدلال الدفعي والتفسير) حتى لا تحجز GIL
+    في خيوط الخادم المشتركة مع نقاط CRUD الخفيفة.
+    عدد المهام المتزامنة محدود (العمال + طابور محدود)، وعند امتلائه يتم الرفض فوراً.
+    """
+
+    def __init__(self, max_workers: int = None, max_pending: int = None, timeout_seconds: float = None,
+                 warm_modules: Sequence[str] = ()):
+        """
+        تهيئة المجمع (لا يتم إنشاء العمليات إلا عند أول استخدام)
+        """
+        self.max_workers = max(1, settings.PROCESS_POOL_WORKERS if max_workers is None else max_workers)
+        self.max_pending = max(0, settings.PROCESS_POOL_MAX_PENDING if max_pending is None else max_pending)
+        self.timeout_seconds = settings.PROCESS_POOL_TIMEOUT_SECONDS if timeout_seconds is None else timeout_seconds
+        self.warm_modules = tuple(warm_modules)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ENABLE_PROCESS_POOL
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_pending
+
+    def run(self, fn: Callable[..., Any], *args: Any, timeout: float = None, **kwargs: Any) -> Any:
+        """
+        تنفيذ دالة (على مستوى الوحدة وقابلة للتسلسل) في عملية منفصلة وانتظار نتيجتها.
+        إذا كان المجمع معطلاً يتم تنفيذها مباشرة في الخيط الحالي.
+        """
+        if not self.enabled:
+            return fn(*args, **kwargs)
+
+        task = getattr(fn, "__name__", "task")
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            metrics.increment("offload_rejected_total", task=task)
+            raise PoolSaturatedError(f"Processing pool is saturated ({self.capacity} tasks in progress)")
+
+        try:
+            future = self._get_executor().submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.in_flight += 1
+            in_flight = self.in_flight
+        metrics.observe("offload_in_flight", in_flight)
+        future.add_done_callback(self._task_done)
+
+        start = time.perf_counter()
+        try:
+            return future.result(timeout=self.timeout_seconds if timeout is None else timeout)
+        except FuturesTimeoutError:
+            # المهمة التي بدأت لا يمكن إيقافها؛ يبقى مكانها محجوزاً حتى تنتهي
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            metrics.increment("offload_timeouts_total", task=task)
+            raise OffloadTimeoutError(f"Task {task} did not finish within the time limit")
+        except BrokenProcessPool:
+            self._reset_executor()
+            raise
+        finally:
+            metrics.observe("offload_seconds", time.perf_counter() - start, task=task)
+
+    def warm_up(self) -> None:
+        """
+        تشغيل كل العمال مسبقاً واستيراد الوحدات المحددة فيها
+        """
+        if not self.enabled:
+            return
+        executor = self._get_executor()
+        for future in [executor.submit(_import_modules, self.warm_modules) for _ in range(self.max_workers)]:
+            future.result()
+
+    def shutdown(self) -> None:
+        """
+        إيقاف العمال
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        إحصائيات المجمع في هذه العملية
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "workers": self.max_workers,
+                "capacity": self.capacity,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "timeout_seconds": self.timeout_seconds,
+                "started": self._executor is not None
+            }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(settings.PROCESS_POOL_START_METHOD)
+                )
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        print("Processing pool worker died; the pool will be recreated")
+        self.shutdown()
+
+    def _task_done(self, future) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+        self._slots.release()
+
+
+# إنشاء instance عام
+process_pool = CPUProcessPool(warm_modules=("app.core.cpu_tasks",))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+قياس معدل استقبال أحداث التفاعل (حدث/ثانية) في قاعدة SQLite مؤقتة بثلاث طرق:
+  per_event:   إدخال والتزام (commit) لكل حدث، كما يفعل طلب HTTP لكل تقييم
+  per_request: إدخال مجمع واحد لكل دفعة واردة من العميل
+  buffered:    مخزن الأحداث المؤقت (EventBuffer) مع عدة منتجين متزامنين، يكتب بدفعات حسب الحجم/المهلة
+
+يتم أيضاً قياس زمن إضافة الدفعة إلى المخزن (ما ينتظره الطلب فعلياً).
+
+التشغيل من مجلد backend:
+    python -m benchmarks.event_ingestion --events 50000 --batch 100 --producers 4
+"""
+
+import os
+import tempfile
+
+# قاعدة بيانات مؤقتة قبل استيراد إعدادات التطبيق
+_DB_DIR = tempfile.mkdtemp(prefix="maestro-events-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'events.db')}"
+
+import argparse
+import threading
+import time
+from typing import Dict, Any, List
+
+import numpy as np
+from sqlalchemy import delete, insert
+
+from app.database import Base, SessionLocal, engine
+from app.models.interaction import UserInteraction
+import app.models  # noqa: F401
+from app.core.learning_loop.event_buffer import EventBuffer
+
+
+def make_events(count: int) -> List[Dict[str, Any]]:
+    return [{
+        "user_id": 1 + i % 50,
+        "type": ("view", "click", "dismiss")[i % 3],
+        "campaign_id": 1 + i % 20,
+        "payload": {"element": f"card-{i % 12}", "position": i % 10}
+    } for i in range(count)]
+
+
+def reset() -> None:
+    db = SessionLocal()
+    db.execute(delete(UserInteraction))
+    db.commit()
+    db.close()
+
+
+def run_per_event(events: List[Dict[str, Any]]) -> float:
+    start = time.perf_counter()
+    db = SessionLocal()
+    for event in events:
+        db.add(UserInteraction(user_id=event["user_id"], event_type=event["type"],
+                               campaign_id=event["campaign_id"], payload=event["payload"]))
+        db.commit()
+    db.close()
+    return time.perf_counter() - start
+
+
+def run_per_request(events: List[Dict[str, Any]], batch: int) -> float:
+    start = time.perf_counter()
+    db = SessionLocal()
+    for i in range(0, len(events), batch):
+        db.execute(insert(UserInteraction), [{
+            "user_id": event["user_id"], "event_type": event["type"],
+            "campaign_id": event["campaign_id"], "payload": event["payload"]
+        } for event in events[i:i + batch]])
+        db.commit()
+    db.close()
+    return time.perf_counter() - start
+
+
+def run_buffered(events: List[Dict[str, Any]], batch: int, producers: int, flush_size: int) -> Dict[str, float]:
+    buffer = EventBuffer(capacity=len(events) + batch, flush_size=flush_size, flush_interval_ms=100)
+    chunks = [events[i:i + batch] for i in range(0, len(events), batch)]
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def produce(worker: int) -> None:
+        local = []
+        for chunk in chunks[worker::producers]:
+            t0 = time.perf_counter()
+            buffer.add(chunk)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(producers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    accepted_at = time.perf_counter() - start
+    buffer.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed": elapsed,
+        "accepted": accepted_at,
+        "add_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "add_p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "flushes": buffer.stats()["flushes"]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Interaction event ingestion benchmark")
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=100, help="Events per client request")
+    parser.add_argument("--producers", type=int, default=4, help="Concurrent request threads for the buffered mode")
+    parser.add_argument("--flush-size", type=int, default=500)
+    parser.add_argument("--per-event-limit", type=int, default=2000,
+                        help="Events used for the per-event mode (it is much slower)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    events = make_events(args.events)
+    print(f"SQLite database: {_DB_DIR}")
+    print(f"{'mode':<12} {'events':>8} {'seconds':>9} {'events/s':>10}")
+
+    per_event = events[:args.per_event_limit]
+    reset()
+    elapsed = run_per_event(per_event)
+    print(f"{'per_event':<12} {len(per_event):>8} {elapsed:>9.2f} {len(per_event) / elapsed:>10.0f}")
+
+    reset()
+    elapsed = run_per_request(events, args.batch)
+    print(f"{'per_request':<12} {len(events):>8} {elapsed:>9.2f} {len(events) / elapsed:>10.0f}")
+
+    reset()
+    result = run_buffered(events, args.batch, args.producers, args.flush_size)
+    print(f"{'buffered':<12} {len(events):>8} {result['elapsed']:>9.2f} {len(events) / result['elapsed']:>10.0f}")
+    print(f"  accepted in {result['accepted']:.2f}s, add() p50 {result['add_p50_ms']:.3f} ms, "
+          f"p99 {result['add_p99_ms']:.3f} ms, {result['flushes']} bulk inserts")
+
+
+if __name__ == "__main__":
+    main()
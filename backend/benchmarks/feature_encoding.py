@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+قياس زمن ترميز الميزات: الاستخراج القديم (قوائم + DataFrame لكل حملة) مقابل مخطط الميزات المترجم
+
+التشغيل من مجلد backend:
+    python -m benchmarks.feature_encoding --campaigns 20000
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+from app.core.strategic_mind.feature_schema import CTR_SCHEMA, schema_from_names
+
+
+INDUSTRIES = ["technology", "fashion", "food", "automotive", "healthcare", "finance"]
+CHANNELS = ["social_media", "search", "display", "video", "email"]
+AGE_RANGES = ["18,24", "25,34", "35,44", "45,54", [25, 45], [18, 65]]
+
+
+def legacy_extract_ctr_features(campaign_data: Dict[str, Any]) -> List[float]:
+    """
+    نسخة من الاستخراج القديم لميزات CTR لاستخدامها كخط أساس
+    """
+    features = []
+    industry_map = {"technology": 1, "fashion": 2, "food": 3, "automotive": 4, "healthcare": 5}
+    features.append(industry_map.get(campaign_data.get("industry", "technology").lower(), 1))
+    channel_map = {"social_media": 1, "search": 2, "display": 3, "video": 4, "email": 5}
+    features.append(channel_map.get(campaign_data.get("channel", "social_media").lower(), 1))
+    features.append(campaign_data.get("budget", 1000) / 10000)
+    age_range = campaign_data.get("audience_age", [25, 45])
+    if isinstance(age_range, str):
+        age_parts = age_range.split(',')
+        if len(age_parts) >= 2:
+            avg_age = (int(age_parts[0]) + int(age_parts[1])) / 2
+        else:
+            avg_age = int(age_parts[0]) if age_parts else 30
+    elif isinstance(age_range, list):
+        avg_age = (age_range[0] + age_range[1]) / 2 if len(age_range) >= 2 else 30
+    else:
+        avg_age = 30
+    features.append(avg_age / 100)
+    return features
+
+
+def legacy_prepare_features(data: Dict[str, Any], required_features: List[str]) -> np.ndarray:
+    """
+    المسار القديم لـ _prepare_features: DataFrame من صف واحد لكل تنبؤ
+    """
+    df = pd.DataFrame([data])
+    return df[required_features].values
+
+
+def generate_campaigns(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    return [
+        {
+            "industry": rng.choice(INDUSTRIES),
+            "channel": rng.choice(CHANNELS),
+            "budget": rng.randrange(100, 20000),
+            "audience_age": rng.choice(AGE_RANGES),
+            "duration": rng.randrange(7, 90)
+        }
+        for _ in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark feature encoding")
+    parser.add_argument("--campaigns", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    campaigns = generate_campaigns(args.campaigns, random.Random(args.seed))
+
+    start = time.perf_counter()
+    legacy = np.asarray([legacy_extract_ctr_features(campaign) for campaign in campaigns], dtype=float)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [CTR_SCHEMA.encode(campaign) for campaign in campaigns]
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = CTR_SCHEMA.encode_batch(campaigns)
+    batch_seconds = time.perf_counter() - start
+
+    frame_campaigns = campaigns[:max(1, args.campaigns // 20)]
+    start = time.perf_counter()
+    for campaign in frame_campaigns:
+        legacy_prepare_features(campaign, ["budget", "duration"])
+    frame_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    out = np.empty((1, 2), dtype=np.float32)
+    passthrough = schema_from_names(["budget", "duration"])
+    for campaign in frame_campaigns:
+        passthrough.encode_batch([campaign], out=out)
+    passthrough_seconds = time.perf_counter() - start
+
+    mismatches = int(np.sum(~np.isclose(legacy.astype(np.float32), batch)))
+    mismatches += int(np.sum(~np.isclose(np.vstack(single), batch)))
+
+    def per_item(seconds: float, count: int) -> float:
+        return seconds / count * 1e6
+
+    print(f"campaigns: {args.campaigns}")
+    print(f"legacy extract (lists):      {per_item(legacy_seconds, len(campaigns)):8.2f} us/campaign")
+    print(f"schema encode (single):      {per_item(single_seconds, len(campaigns)):8.2f} us/campaign")
+    print(f"schema encode_batch:         {per_item(batch_seconds, len(campaigns)):8.2f} us/campaign")
+    print(f"legacy one-row DataFrame:    {per_item(frame_seconds, len(frame_campaigns)):8.2f} us/campaign")
+    print(f"passthrough schema (1 row):  {per_item(passthrough_seconds, len(frame_campaigns)):8.2f} us/campaign")
+    print(f"value mismatches:            {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+مقارنة خطأ النموذج بالإعدادات الثابتة في MLModelManager.train_and_save_model مع أفضل إعداد
+يجده البحث (random وhalving) ضمن ميزانية زمنية، على بيانات اصطناعية بنفس عدد الميزات.
+الخطأ يُقاس على مجموعة اختبار منفصلة لم يرها البحث.
+
+التشغيل من مجلد backend:
+    python -m benchmarks.hyperparameter_search --rows 20000 --budget 60 --workers 4
+"""
+
+import argparse
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+
+from app.core.strategic_mind.hyperparameter_search import HyperparameterSearch
+
+
+def make_data(rows: int, features: int, rng: np.random.Generator):
+    X = rng.random((rows, features))
+    y = np.sin(3 * X[:, 0]) + X[:, 1] * X[:, -1] + 0.5 * (X[:, 2] > 0.7) + rng.normal(0, 0.1, rows)
+    return X, y
+
+
+def test_mse(model, X_train, y_train, X_test, y_test) -> float:
+    model.fit(X_train, y_train)
+    return float(np.mean((y_test - model.predict(X_test)) ** 2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time-budgeted hyperparameter search benchmark")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--budget", type=float, default=60.0, help="Search budget in seconds")
+    parser.add_argument("--candidates", type=int, default=24)
+    parser.add_argument("--workers", type=int, default=0, help="Search processes (0 = all cores)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    X, y = make_data(args.rows, args.features, rng)
+    X_test, y_test = make_data(args.rows // 4, args.features, rng)
+
+    baselines = {
+        "ctr": RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42),
+        "roi": GradientBoostingRegressor(n_estimators=100, max_depth=5, random_state=42)
+    }
+    print(f"{'model':<6} {'config':<9} {'trials':>6} {'search s':>9} {'test MSE':>10}")
+    for name, baseline in baselines.items():
+        print(f"{name:<6} {'fixed':<9} {'-':>6} {'-':>9} {test_mse(clone(baseline), X, y, X_test, y_test):>10.5f}")
+        for mode in ("random", "halving"):
+            start = time.perf_counter()
+            result = HyperparameterSearch(
+                baseline, mode=mode, budget_seconds=args.budget, n_candidates=args.candidates,
+                max_workers=args.workers
+            ).run(X, y)
+            elapsed = time.perf_counter() - start
+            tuned = clone(baseline).set_params(**result["best_params"])
+            print(f"{name:<6} {mode:<9} {result['trials']:>6} {elapsed:>9.1f} "
+                  f"{test_mse(tuned, X, y, X_test, y_test):>10.5f}  ({result['stopped_by']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+مقارنة التنبؤ داخل عامل الـ API مع التنبؤ عبر خادم الاستدلال المحلي (مقبس Unix):
+  - تكلفة بدء عامل جديد: الزمن والذاكرة حتى أول تنبؤ (تحميل النماذج مقابل فتح اتصال فقط)
+  - زمن الطلب الواحد (p50/p99) محلياً وعبر المقبس
+  - الإنتاجية مع عملاء متزامنين يشاركون مجمع الاتصالات (pipelining)
+
+يتم تدريب نماذج CTR وROI اصطناعية وتسجيلها في قاعدة بيانات SQLite مؤقتة،
+وتشغيل الخادم كعملية فرعية.
+
+التشغيل من مجلد backend:
+    python -m benchmarks.inference_sidecar --clients 1 8 32 --requests 4000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# يتم تشغيله في عملية جديدة لقياس تكلفة بدء عامل حتى أول تنبؤ
+COLD_START = """
+import json, resource, time
+start = time.perf_counter()
+from app.database import SessionLocal
+from app.core.strategic_mind import get_inference_engine
+db = SessionLocal()
+get_inference_engine(db).predict_ctr({"industry": "technology", "channel": "search", "budget": 1234.5})
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def setup_models(workdir: str, rows: int, seed: int) -> None:
+    """
+    تدريب نماذج اصطناعية بمخططات ميزات CTR وROI وتسجيلها كنماذج نشطة
+    """
+    from app.database import Base, SessionLocal, engine
+    from app.models.knowledge_base import MLModel
+    from app.core.strategic_mind.feature_schema import CTR_SCHEMA, ROI_SCHEMA
+    from app.core.strategic_mind.tree_ensemble import export_ensemble
+
+    Base.metadata.create_all(bind=engine)
+    rng = np.random.default_rng(seed)
+    db = SessionLocal()
+    for model_type, schema, trees in (("ctr", CTR_SCHEMA, 100), ("roi", ROI_SCHEMA, 200)):
+        X = rng.random((rows, schema.width))
+        y = np.sin(3 * X[:, 0]) + X[:, 1] * X[:, -1] + rng.normal(0, 0.05, rows)
+        model = RandomForestRegressor(n_estimators=trees, max_depth=12, random_state=seed).fit(X, y)
+        path = os.path.join(workdir, f"{model_type}_model.pkl")
+        joblib.dump(model, path)
+        export_ensemble(model, path)
+        db.add(MLModel(name=f"{model_type}_bench", model_type=model_type, model_path=path,
+                       features=list(schema.feature_names), performance_metrics={"r2": 0.9},
+                       version="bench", is_active=True))
+    db.commit()
+    db.close()
+
+
+def campaigns(count: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    حملات بميزانيات مختلفة حتى لا تأتي النتائج من ذاكرة التنبؤ
+    """
+    rng = np.random.default_rng(seed)
+    industries = ["technology", "retail", "healthcare", "finance", "education"]
+    channels = ["search", "social_media", "video", "display", "email"]
+    return [
+        {
+            "industry": industries[i % len(industries)],
+            "channel": channels[i % len(channels)],
+            "budget": float(rng.uniform(500, 50000)),
+            "duration": int(rng.integers(7, 90)),
+            "content_type": "video"
+        }
+        for i in range(count)
+    ]
+
+
+def run_clients(predict: Callable[[Dict[str, Any]], Any], items: List[Dict[str, Any]], clients: int) -> Dict[str, float]:
+    """
+    تشغيل عملاء متزامنين حتى استهلاك كل الحملات
+    """
+    latencies: List[float] = []
+    lock = threading.Lock()
+    next_item = [0]
+
+    def client():
+        local = []
+        while True:
+            with lock:
+                index = next_item[0]
+                next_item[0] += 1
+            if index >= len(items):
+                break
+            start = time.perf_counter()
+            predict(items[index])
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "throughput": len(items) / elapsed,
+        "p50": float(np.percentile(latencies_ms, 50)),
+        "p99": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def cold_start(env: Dict[str, str]) -> Dict[str, float]:
+    output = subprocess.run([sys.executable, "-W", "ignore", "-c", COLD_START], env=env, cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the local inference server")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--server-threads", type=int, default=4)
+    parser.add_argument("--train-rows", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        socket_path = os.path.join(workdir, "inference.sock")
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{workdir}/bench.db", ENABLE_PREDICTION_CACHE="false")
+        os.environ.update(env)
+
+        from app.database import SessionLocal
+        from app.core.strategic_mind import HybridInferenceEngine
+        from app.core.strategic_mind.inference_client import InferenceClient, RemoteInferenceEngine
+
+        setup_models(workdir, args.train_rows, args.seed)
+        remote_env = dict(env, INFERENCE_SERVER_SOCKET=socket_path, INFERENCE_SERVER_THREADS=str(args.server_threads))
+        server = subprocess.Popen([sys.executable, "-W", "ignore", "-m", "app.core.strategic_mind.inference_server"],
+                                  env=remote_env, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL)
+        client = InferenceClient(socket_path, pool_size=args.pool_size)
+        try:
+            for _ in range(600):
+                try:
+                    client.call("ping")
+                    break
+                except Exception:
+                    time.sleep(0.1)
+
+            print(f"{'worker start':<14} {'seconds':>8} {'max RSS MiB':>12}")
+            for label, worker_env in (("local", env), ("sidecar", remote_env)):
+                result = cold_start(worker_env)
+                print(f"{label:<14} {result['seconds']:>8.2f} {result['max_rss_mb']:>12.1f}")
+
+            db = SessionLocal()
+            engines = {"local": HybridInferenceEngine(db), "sidecar": RemoteInferenceEngine(db, client)}
+            items = campaigns(args.requests, args.seed)
+            print(f"\n{'engine':<10} {'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+            for clients in args.clients:
+                for label, engine in engines.items():
+                    # تسخين (تحميل النماذج وفتح الاتصالات)
+                    run_clients(engine.predict_ctr, items[:100], clients)
+                    result = run_clients(engine.predict_ctr, items, clients)
+                    print(f"{label:<10} {clients:>7} {result['throughput']:>9.0f} "
+                          f"{result['p50']:>8.2f} {result['p99']:>8.2f}")
+            db.close()
+            print(f"\nclient: {client.stats()}")
+        finally:
+            client.close()
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+قياس الإنتاجية والزمن لطلبات تنبؤ متزامنة: استدعاء مباشر لكل طلب مقابل موزع الدفعات
+
+يحاكي كل خيط طلباً متزامناً لـ /predict-ctr (خيوط FastAPI للدوال المتزامنة).
+
+التشغيل من مجلد backend:
+    python -m benchmarks.micro_batching --clients 32 --requests 2000
+"""
+
+import argparse
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from app.core.strategic_mind.batch_dispatcher import MicroBatchDispatcher
+from app.core.strategic_mind.model_registry import predict_rows
+from app.core.strategic_mind.tree_ensemble import FlatTreeEnsemble
+
+
+def build_entry(n_features: int, rng: np.random.Generator) -> Dict[str, Any]:
+    """
+    نموذج CTR اصطناعي بنفس إعدادات MLModelManager.train_and_save_model
+    """
+    X = rng.random((5000, n_features))
+    y = np.sin(3 * X[:, 0]) + X[:, 1] * X[:, -1] + rng.normal(0, 0.05, 5000)
+    model = RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42).fit(X, y)
+    return {"model": model, "flat": FlatTreeEnsemble.try_from(model), "model_type": "ctr"}
+
+
+def run_clients(predict: Callable[[np.ndarray], Any], X: np.ndarray, clients: int) -> Dict[str, float]:
+    """
+    تشغيل عدد من العملاء المتزامنين حتى استهلاك كل الصفوف
+    """
+    latencies: List[float] = []
+    lock = threading.Lock()
+    next_row = [0]
+
+    def client():
+        local = []
+        while True:
+            with lock:
+                index = next_row[0]
+                next_row[0] += 1
+            if index >= len(X):
+                break
+            start = time.perf_counter()
+            predict(X[index])
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "throughput": len(X) / elapsed,
+        "p50": float(np.percentile(latencies_ms, 50)),
+        "p99": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched inference")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--features", type=int, default=11)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    entry = build_entry(args.features, rng)
+    X = rng.random((args.requests, args.features)).astype(np.float32)
+
+    print(f"{args.clients} clients, {args.requests} requests, {args.features} features")
+    print(f"{'mode':<28} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>11}")
+
+    for label, use_flat in (("direct sklearn", False), ("direct flat", True)):
+        direct_entry = dict(entry, flat=entry["flat"] if use_flat else None)
+        result = run_clients(lambda row: predict_rows(direct_entry, row.reshape(1, -1))[0], X, args.clients)
+        print(f"{label:<28} {result['throughput']:>9.0f} {result['p50']:>8.2f} {result['p99']:>8.2f} {1:>11.1f}")
+
+    for window_ms in (0.5, 2.0, 5.0):
+        for max_batch in (16, 64):
+            dispatcher = MicroBatchDispatcher(window_ms=window_ms, max_batch_size=max_batch)
+            result = run_clients(lambda row: dispatcher.predict(entry, row), X, args.clients)
+            stats = dispatcher.stats()
+            label = f"batched {window_ms}ms / {max_batch}"
+            print(f"{label:<28} {result['throughput']:>9.0f} {result['p50']:>8.2f} {result['p99']:>8.2f} {stats['mean_batch_size']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+قياس ذاكرة كل عامل (RSS وPSS وUSS) عند تشغيل 1 و4 و16 عاملاً بثلاثة أوضاع:
+  independent: كل عامل يحمّل نسخته من النماذج بعد التفرع (السلوك الافتراضي لـ gunicorn بدون preload)
+  preload:     النماذج محملة في العملية الرئيسية قبل التفرع (preload_app) مع gc.freeze
+  mmap:        كل عامل يفتح مصفوفات الأشجار المصدّرة (.npy) بـ mmap (MODEL_SHARING_MODE=mmap)
+
+PSS يقسم الصفحات المشتركة على عدد العمليات التي تستخدمها، لذلك يعكس التكلفة الحقيقية لكل عامل.
+يعمل على Linux فقط (/proc/self/smaps_rollup).
+
+التشغيل من مجلد backend:
+    python -m benchmarks.model_sharing --workers 1 4 16
+"""
+
+import argparse
+import gc
+import multiprocessing
+import os
+import tempfile
+from typing import Dict, List
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+
+from app.config import settings
+from app.core.strategic_mind.model_registry import ModelRegistry, model_registry, predict_rows
+from app.core.strategic_mind.tree_ensemble import export_ensemble
+
+
+MODEL_TYPES = {
+    "ctr": (lambda: RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42), 11),
+    "roi": (lambda: RandomForestRegressor(n_estimators=200, max_depth=12, random_state=42), 8),
+    "channel": (lambda: GradientBoostingRegressor(n_estimators=100, max_depth=5, random_state=42), 7),
+}
+
+
+def read_memory() -> Dict[str, int]:
+    """
+    ذاكرة العملية الحالية بالكيلوبايت من /proc/self/smaps_rollup
+    """
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    }
+
+
+def train_models(workdir: str, rows: int, seed: int) -> Dict[str, str]:
+    """
+    تدريب نماذج اصطناعية وحفظها (مع مصفوفاتها المسطحة) كما يفعل مسار التدريب
+    """
+    rng = np.random.default_rng(seed)
+    paths = {}
+    for model_type, (factory, n_features) in MODEL_TYPES.items():
+        X = rng.random((rows, n_features))
+        y = np.sin(3 * X[:, 0]) + X[:, 1] * X[:, -1] + rng.normal(0, 0.05, rows)
+        model = factory().fit(X, y)
+        path = os.path.join(workdir, f"{model_type}_model.pkl")
+        joblib.dump(model, path)
+        export_ensemble(model, path)
+        paths[model_type] = path
+    return paths
+
+
+def load_registry(registry: ModelRegistry, paths: Dict[str, str]) -> None:
+    for model_type, path in paths.items():
+        registry.load(model_type, path, version="bench", metadata={"name": model_type})
+
+
+def score_all(registry: ModelRegistry, rows: int) -> None:
+    """
+    تنبؤات بدفعات صغيرة (مسار الطلبات الفردية) تلمس معظم عقد الأشجار
+    """
+    rng = np.random.default_rng(os.getpid())
+    for model_type, entry in registry.snapshot().items():
+        X = rng.random((rows, MODEL_TYPES[model_type][1])).astype(np.float32)
+        for start in range(0, rows, 200):
+            predict_rows(entry, X[start:start + 200])
+
+
+def worker(mode: str, paths: Dict[str, str], rows: int, loaded: multiprocessing.Barrier,
+           measured: multiprocessing.Barrier, results: multiprocessing.Queue) -> None:
+    if mode == "preload":
+        registry = model_registry
+    else:
+        settings.MODEL_SHARING_MODE = "mmap" if mode == "mmap" else "none"
+        registry = ModelRegistry()
+        load_registry(registry, paths)
+
+    score_all(registry, rows)
+    loaded.wait()
+    results.put(read_memory())
+    measured.wait()
+
+
+def run_mode(mode: str, workers: int, paths: Dict[str, str], rows: int) -> Dict[str, float]:
+    context = multiprocessing.get_context("fork")
+    if mode == "preload":
+        settings.MODEL_SHARING_MODE = "none"
+        load_registry(model_registry, paths)
+        gc.collect()
+        gc.freeze()
+
+    loaded, measured = context.Barrier(workers), context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, paths, rows, loaded, measured, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    samples: List[Dict[str, int]] = [results.get() for _ in range(workers)]
+    for process in processes:
+        process.join()
+
+    if mode == "preload":
+        gc.unfreeze()
+        for model_type in paths:
+            model_registry.retire(model_type)
+        gc.collect()
+
+    return {
+        key: float(np.mean([sample[key] for sample in samples])) / 1024
+        for key in ("rss", "pss", "uss")
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-worker memory with shared models")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--train-rows", type=int, default=20000)
+    parser.add_argument("--score-rows", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = train_models(workdir, args.train_rows, args.seed)
+        pickle_mb = sum(os.path.getsize(path) for path in paths.values()) / 2 ** 20
+        print(f"models: {', '.join(paths)}  pickles on disk: {pickle_mb:.1f} MiB")
+        print(f"{'mode':<12} {'workers':>7} {'RSS MiB':>9} {'PSS MiB':>9} {'USS MiB':>9} {'total PSS MiB':>14}")
+        for mode in ("independent", "preload", "mmap"):
+            for workers in args.workers:
+                memory = run_mode(mode, workers, paths, args.score_rows)
+                print(f"{mode:<12} {workers:>7} {memory['rss']:>9.1f} {memory['pss']:>9.1f} "
+                      f"{memory['uss']:>9.1f} {memory['pss'] * workers:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+قياس استجابة نقطة خفيفة أثناء ضغط طلبات ثقيلة (مسح سيناريوهات) مع وبدون مجمع العمليات
+
+التشغيل من مجلد backend:
+    python -m benchmarks.process_pool --heavy-clients 6 --seconds 10
+"""
+
+import argparse
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+
+HEAVY_PAYLOAD = {
+    "base": {"industry": "technology", "budget": 5000, "channel": "search"},
+    "ranges": {
+        "budget": {"min": 500, "max": 50000, "steps": 400},
+        "channel_mix": ["search", "video", {"search": 0.3, "video": 0.3, "display": 0.4},
+                        {"social_media": 0.5, "email": 0.25, "search": 0.25}],
+        "duration": [14, 30, 60],
+        "content_type": ["video", "image", "text", "mixed"]
+    }
+}
+
+
+def run(client, heavy_clients: int, seconds: float) -> Dict[str, float]:
+    """
+    تشغيل عملاء ثقيلين باستمرار مع قياس زمن طلبات النقطة الخفيفة
+    """
+    stop = threading.Event()
+    heavy_done = [0]
+    status_codes: Dict[int, int] = {}
+    lock = threading.Lock()
+
+    def heavy():
+        while not stop.is_set():
+            response = client.post("/api/v1/transparent-mentor/scenario-sweep", json=HEAVY_PAYLOAD)
+            with lock:
+                heavy_done[0] += 1
+                status_codes[response.status_code] = status_codes.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=heavy) for _ in range(heavy_clients)]
+    for thread in threads:
+        thread.start()
+
+    light_latencies: List[float] = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        client.get("/api/v1/strategic-mind/prediction-cache/stats")
+        light_latencies.append(time.perf_counter() - start)
+        time.sleep(0.01)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies_ms = np.array(light_latencies) * 1000
+    return {
+        "light_p50": float(np.percentile(latencies_ms, 50)),
+        "light_p99": float(np.percentile(latencies_ms, 99)),
+        "light_max": float(latencies_ms.max()),
+        "heavy_per_second": heavy_done[0] / seconds,
+        "status_codes": status_codes
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark processing pool offload")
+    parser.add_argument("--heavy-clients", type=int, default=6)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from app.config import settings
+    from app.main import app
+    from app.api.endpoints.users import get_current_active_user
+    from app.utils.process_pool import process_pool
+
+    app.dependency_overrides[get_current_active_user] = lambda: None
+    process_pool.max_workers = args.workers
+    process_pool._slots = threading.BoundedSemaphore(process_pool.capacity)
+
+    print(f"{args.heavy_clients} heavy clients for {args.seconds:.0f}s, {args.workers} pool workers")
+    print(f"{'mode':<14} {'light p50 ms':>13} {'light p99 ms':>13} {'light max ms':>13} {'heavy/s':>8}  status codes")
+    for enabled in (False, True):
+        settings.ENABLE_PROCESS_POOL = enabled
+        with TestClient(app) as client:
+            result = run(client, args.heavy_clients, args.seconds)
+        process_pool.shutdown()
+        label = "process pool" if enabled else "in-process"
+        print(f"{label:<14} {result['light_p50']:>13.1f} {result['light_p99']:>13.1f} {result['light_max']:>13.1f} "
+              f"{result['heavy_per_second']:>8.1f}  {result['status_codes']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+قياس زمن مطابقة قواعد المعرفة: المفسّر الخطي القديم مقابل المطابق المترجم المفهرس
+
+التشغيل من مجلد backend:
+    python -m benchmarks.rule_matching --rules 10000 --contexts 2000
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, Any, List
+
+from app.core.strategic_mind.rule_matcher import CompiledRuleSet
+
+
+INDUSTRIES = ["technology", "fashion", "food", "automotive", "healthcare", "finance", "education", "travel"]
+CHANNELS = ["social_media", "search", "display", "video", "email"]
+CONTENT_TYPES = ["video", "image", "text", "mixed"]
+RULE_TYPES = ["ctr_prediction", "roi_prediction", "channel_recommendation"]
+
+
+def legacy_evaluate_conditions(conditions: Dict[str, Any], context: Dict[str, Any]) -> bool:
+    """
+    نسخة من المفسّر القديم (قبل الترجمة) لاستخدامها كخط أساس
+    """
+    if not isinstance(conditions, dict):
+        return False
+    if "field" in conditions and "value" in conditions:
+        context_value = context.get(conditions["field"])
+        value = conditions["value"]
+        if isinstance(value, dict):
+            for op, val in value.items():
+                if op == "$gte" and not (context_value >= val):
+                    return False
+                if op == "$lte" and not (context_value <= val):
+                    return False
+        elif context_value != value:
+            return False
+        return True
+    if "operator" in conditions and "conditions" in conditions:
+        operator = conditions["operator"].upper()
+        sub_conditions = conditions["conditions"]
+        if operator == "AND":
+            return all(legacy_evaluate_conditions(sub, context) for sub in sub_conditions)
+        if operator == "OR":
+            return any(legacy_evaluate_conditions(sub, context) for sub in sub_conditions)
+        if operator == "NOT":
+            return not legacy_evaluate_conditions(sub_conditions[0], context) if sub_conditions else True
+    return False
+
+
+def legacy_evaluate_rules(rules_cache: Dict[int, Dict[str, Any]], context: Dict[str, Any], rule_type: str) -> List[int]:
+    """
+    المسار القديم: نسخ القواعد وترتيبها ثم تفسير كل قاعدة
+    """
+    rules = []
+    for rule_id, rule_data in rules_cache.items():
+        if rule_data["rule_type"] == rule_type:
+            rule_copy = rule_data.copy()
+            rule_copy["id"] = rule_id
+            rules.append(rule_copy)
+    rules.sort(key=lambda x: x["priority"], reverse=True)
+    return [rule["id"] for rule in rules if legacy_evaluate_conditions(rule["conditions"], context)]
+
+
+def generate_rules(count: int, rng: random.Random) -> Dict[int, Dict[str, Any]]:
+    """
+    توليد قواعد عشوائية تستخدم فقط عمليات يفهمها المفسّر القديم (للمقارنة العادلة)
+    """
+    rules = {}
+    for rule_id in range(1, count + 1):
+        low = rng.randrange(0, 9000, 500)
+        conditions = {
+            "operator": "AND",
+            "conditions": [
+                {"field": "industry", "value": rng.choice(INDUSTRIES)},
+                {"field": "channel", "value": rng.choice(CHANNELS)},
+                {"field": "budget", "value": {"$gte": low, "$lte": low + rng.randrange(500, 5000, 500)}},
+            ]
+        }
+        if rng.random() < 0.05:
+            # نسبة صغيرة من القواعد بدون شرط مساواة (تُفحص دائماً)
+            conditions = {"field": "budget", "value": {"$gte": low}}
+        rules[rule_id] = {
+            "name": f"rule_{rule_id}",
+            "rule_type": rng.choice(RULE_TYPES),
+            "conditions": conditions,
+            "actions": {"ctr": round(rng.uniform(0.01, 0.2), 3)},
+            "priority": rng.randrange(0, 10)
+        }
+    return rules
+
+
+def generate_contexts(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    return [
+        {
+            "industry": rng.choice(INDUSTRIES),
+            "channel": rng.choice(CHANNELS),
+            "budget": rng.randrange(100, 15000),
+            "content_type": rng.choice(CONTENT_TYPES)
+        }
+        for _ in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark knowledge-rule matching")
+    parser.add_argument("--rules", type=int, default=10000)
+    parser.add_argument("--contexts", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules_cache = generate_rules(args.rules, rng)
+    contexts = generate_contexts(args.contexts, rng)
+
+    start = time.perf_counter()
+    compiled = CompiledRuleSet(rules_cache.items())
+    compile_seconds = time.perf_counter() - start
+
+    legacy_contexts = contexts[:max(1, args.contexts // 10)]
+    start = time.perf_counter()
+    legacy_results = [legacy_evaluate_rules(rules_cache, context, "ctr_prediction") for context in legacy_contexts]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled_results = [compiled.match(context, "ctr_prediction") for context in contexts]
+    compiled_seconds = time.perf_counter() - start
+
+    mismatches = sum(
+        1 for legacy, compiled_actions in zip(legacy_results, compiled_results)
+        if legacy != [action["rule_id"] for action in compiled_actions]
+    )
+
+    legacy_us = legacy_seconds / len(legacy_contexts) * 1e6
+    compiled_us = compiled_seconds / len(contexts) * 1e6
+    print(f"rules: {args.rules}  (ctr_prediction: {compiled.size('ctr_prediction')})")
+    print(f"compile time:          {compile_seconds * 1e3:10.1f} ms (once per rule-set version)")
+    print(f"legacy evaluate_rules: {legacy_us:10.1f} us/context  ({len(legacy_contexts)} contexts)")
+    print(f"compiled match:        {compiled_us:10.1f} us/context  ({len(contexts)} contexts)")
+    print(f"speedup:               {legacy_us / compiled_us:10.1f}x")
+    print(f"result mismatches:     {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
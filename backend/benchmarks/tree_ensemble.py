@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+قياس زمن وذاكرة تقييم الأشجار: model.predict من sklearn مقابل المصفوفات المسطحة
+
+يتم استخدام النماذج في app/ml_models إذا كانت مدربة، وإلا يتم تدريب نماذج بنفس
+إعدادات MLModelManager.train_and_save_model على بيانات اصطناعية بنفس عدد الميزات.
+
+يعرض العمود path المسار الذي يختاره predict_rows لكل حجم دفعة. على خادم بنواة واحدة:
+- الغابة العشوائية (100 شجرة، عمق 10): المصفوفات أسرع حتى نحو 256 صفاً (2.4x عند 100، 1.2x عند 256، 0.7x عند 1000)
+- التعزيز التدرجي (100 شجرة، عمق 5): أسرع حتى نحو 16 صفاً فقط (1.2-1.7x عند 10، نحو 1x عند 16، 0.7x عند 32، 0.4x عند 100)
+لذلك الحدان منفصلان: FLAT_ENSEMBLE_MAX_ROWS_FOREST وFLAT_ENSEMBLE_MAX_ROWS_BOOSTING.
+إذا تغير موضع التقاطع على خادم الإنتاج يتم ضبطهما حسب نتائج هذا القياس.
+
+التشغيل من مجلد backend:
+    python -m benchmarks.tree_ensemble --repeat 200
+"""
+
+import argparse
+import os
+import pickle
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Tuple
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+
+from app.core.strategic_mind.model_registry import flat_max_rows
+from app.core.strategic_mind.tree_ensemble import FlatTreeEnsemble, check_parity, flat_model_path
+
+
+MODELS_PATH = os.path.join(os.path.dirname(__file__), "..", "app", "ml_models")
+BATCH_SIZES = [1, 10, 16, 32, 100, 256, 1000]
+
+
+def load_or_train(model_type: str, rng: np.random.Generator) -> Tuple[Any, str]:
+    """
+    تحميل النموذج المحفوظ إن كان مدرباً، وإلا تدريب نموذج اصطناعي بنفس الإعدادات
+    """
+    model_file = os.path.join(MODELS_PATH, f"{model_type}_model.pkl")
+    feature_file = os.path.join(MODELS_PATH, f"{model_type}_features.pkl")
+    n_features = 8
+    if os.path.exists(feature_file):
+        with open(feature_file, "rb") as f:
+            n_features = len(pickle.load(f))
+
+    if os.path.exists(model_file):
+        try:
+            with open(model_file, "rb") as f:
+                model = pickle.load(f)
+            FlatTreeEnsemble.from_sklearn(model)
+            return model, "pickled"
+        except Exception:
+            pass
+
+    if model_type == "ctr":
+        model = RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42)
+    else:
+        model = GradientBoostingRegressor(n_estimators=100, max_depth=5, random_state=42)
+    X = rng.random((5000, n_features))
+    y = np.sin(3 * X[:, 0]) + X[:, 1] * X[:, -1] + rng.normal(0, 0.05, 5000)
+    model.fit(X, y)
+    return model, "synthetic (pickled model is not fitted)"
+
+
+def time_call(fn, repeat: int) -> float:
+    """
+    متوسط زمن الاستدعاء بالميكروثانية
+    """
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def traced_load(loader) -> Tuple[Any, int, float]:
+    """
+    تحميل مع قياس ذروة الذاكرة المخصصة والزمن
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = loader()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, peak, elapsed
+
+
+def benchmark_model(model_type: str, repeat: int, rng: np.random.Generator, workdir: str) -> None:
+    model, origin = load_or_train(model_type, rng)
+    flat = FlatTreeEnsemble.from_sklearn(model)
+    parity = check_parity(model, flat, n_samples=5000)
+
+    pickle_path = os.path.join(workdir, f"{model_type}_model.pkl")
+    with open(pickle_path, "wb") as f:
+        pickle.dump(model, f)
+    flat_path = flat.save(flat_model_path(pickle_path))
+
+    def load_pickle():
+        with open(pickle_path, "rb") as f:
+            return pickle.load(f)
+
+    _, pickle_peak, pickle_load = traced_load(load_pickle)
+    _, flat_peak, flat_load = traced_load(lambda: FlatTreeEnsemble.load(flat_path))
+
+    print(f"\n== {model_type}: {type(model).__name__} [{origin}]")
+    print(f"trees: {flat.n_trees}  nodes: {flat.feature.shape[0]}  max depth: {flat.max_depth}  features: {flat.n_features}")
+    print(f"parity: {parity['rows']} rows, {parity['mismatches']} mismatches, max |diff| {parity['max_abs_diff']:.2e}")
+    flat_size = sum(os.path.getsize(os.path.join(flat_path, name)) for name in os.listdir(flat_path))
+    print(f"file size:      pickle {os.path.getsize(pickle_path) / 1024:9.1f} KiB   flat {flat_size / 1024:9.1f} KiB")
+    print(f"load peak mem:  pickle {pickle_peak / 1024:9.1f} KiB   flat {flat_peak / 1024:9.1f} KiB")
+    print(f"load time:      pickle {pickle_load * 1e3:9.2f} ms    flat {flat_load * 1e3:9.2f} ms")
+    max_rows = flat_max_rows(flat)
+    print(f"flat path used up to {max_rows} rows ({flat.kind})")
+    print(f"{'rows':>6} {'sklearn us':>12} {'flat us':>12} {'speedup':>8} {'path':>8}")
+
+    X_all = rng.random((max(BATCH_SIZES), flat.n_features)).astype(np.float32)
+    for rows in BATCH_SIZES:
+        X = X_all[:rows]
+        runs = max(5, repeat // rows)
+        sklearn_us = time_call(lambda: model.predict(X), runs)
+        flat_us = time_call(lambda: flat.predict(X), runs)
+        path = "flat" if rows <= max_rows else "sklearn"
+        print(f"{rows:>6} {sklearn_us:>12.1f} {flat_us:>12.1f} {sklearn_us / flat_us:>7.1f}x {path:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark flat tree-ensemble scoring")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        for model_type in ["ctr", "roi", "channel"]:
+            benchmark_model(model_type, args.repeat, rng, workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+قياس زمن حساب مساهمات الميزات (TreeSHAP) على المصفوفات المسطحة:
+  - تكلفة البناء عند التحميل (مسارات الأوراق، القيم المتوقعة، وجدول الأنماط)
+  - زمن الصف الواحد ودفعات الصفوف بالجدول وبكثيرات الحدود
+  - المقارنة مع قيم Shapley بالقوة الغاشمة (كل المجموعات الجزئية مع بيانات خلفية)
+  - التحقق من الجمع: القيمة المتوقعة + مجموع المساهمات = تنبؤ النموذج
+
+التشغيل من مجلد backend:
+    python -m benchmarks.tree_shap --trees 100 --depth 10
+"""
+
+import argparse
+import itertools
+import time
+from math import factorial
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+
+from app.core.strategic_mind.tree_ensemble import FlatTreeEnsemble
+from app.core.strategic_mind.tree_shap import TreeExplainer
+
+
+BATCH_SIZES = [1, 10, 100]
+
+
+def brute_force(model, X: np.ndarray, background: np.ndarray) -> np.ndarray:
+    """
+    قيم Shapley بتقييم النموذج على كل مجموعة جزئية من الميزات (2^ميزات × صفوف الخلفية لكل صف)
+    """
+    n_features = X.shape[1]
+    subsets = list(itertools.product([0, 1], repeat=n_features))
+    values = np.zeros_like(X, dtype=np.float64)
+    for r, row in enumerate(X):
+        payoff = {}
+        for mask in subsets:
+            data = background.copy()
+            columns = np.array(mask, dtype=bool)
+            data[:, columns] = row[columns]
+            payoff[mask] = model.predict(data).mean()
+        for i in range(n_features):
+            for mask in subsets:
+                if mask[i]:
+                    continue
+                size = sum(mask)
+                weight = factorial(size) * factorial(n_features - size - 1) / factorial(n_features)
+                with_i = mask[:i] + (1,) + mask[i + 1:]
+                values[r, i] += weight * (payoff[with_i] - payoff[mask])
+    return values
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark TreeSHAP attributions on flat tree arrays")
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--features", type=int, default=4)
+    parser.add_argument("--train-rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--brute-rows", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    X = rng.random((args.train_rows, args.features))
+    y = np.sin(3 * X[:, 0]) + X[:, 1] * X[:, -1] + rng.normal(0, 0.05, args.train_rows)
+    models = {
+        "random_forest": RandomForestRegressor(n_estimators=args.trees, max_depth=args.depth,
+                                               random_state=args.seed),
+        "gradient_boosting": GradientBoostingRegressor(n_estimators=args.trees, max_depth=min(args.depth, 5),
+                                                       random_state=args.seed),
+    }
+
+    for label, model in models.items():
+        model.fit(X, y)
+        flat = FlatTreeEnsemble.from_sklearn(model)
+
+        start = time.perf_counter()
+        polynomial = TreeExplainer.from_flat(flat, table_max_bytes=0)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        table = TreeExplainer.from_flat(flat)
+        table_seconds = time.perf_counter() - start
+
+        print(f"\n{label}: {args.trees} trees, {polynomial.n_leaves} leaves, path length {polynomial.path_length}")
+        print(f"  build: {build_seconds * 1000:.0f} ms, with pattern table: {table_seconds * 1000:.0f} ms "
+              f"({table.table_bytes / 2 ** 20:.1f} MiB)")
+
+        rows = rng.random((max(BATCH_SIZES), args.features))
+        values = table.shap_values(rows)
+        additivity = np.abs(table.expected_value + values.sum(axis=1) - model.predict(rows)).max()
+        agreement = np.abs(values - polynomial.shap_values(rows)).max()
+        print(f"  max |expected + sum - predict|: {additivity:.2e}, table vs polynomial: {agreement:.2e}")
+
+        print(f"  {'batch':>6} {'table ms/row':>13} {'poly ms/row':>12}")
+        for batch in BATCH_SIZES:
+            sample = rows[:batch]
+            repeat = max(1, args.repeat // batch * 10) if batch < 100 else max(1, args.repeat // 10)
+            table_ms = timed(lambda: table.shap_values(sample), repeat) * 1000 / batch
+            poly_ms = timed(lambda: polynomial.shap_values(sample), repeat) * 1000 / batch
+            print(f"  {batch:>6} {table_ms:>13.3f} {poly_ms:>12.3f}")
+
+        background = X[rng.choice(args.train_rows, 100, replace=False)]
+        start = time.perf_counter()
+        brute_force(model, rows[:args.brute_rows], background)
+        brute_ms = (time.perf_counter() - start) * 1000 / args.brute_rows
+        print(f"  brute force (2^{args.features} subsets x 100 background rows): {brute_ms:.1f} ms/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+إعدادات gunicorn لتشغيل التطبيق في الإنتاج مع عمال uvicorn
+
+    cd backend
+    gunicorn -c gunicorn.conf.py app.main:app
+
+مع MODEL_PRELOAD=true (الافتراضي) يتم تحميل التطبيق والنماذج مرة واحدة في العملية الرئيسية
+قبل إنشاء العمال، فتتشارك العمال صفحات النماذج في الذاكرة (نسخ عند الكتابة).
+ومع MODEL_SHARING_MODE=mmap تُفتح مصفوفات الأشجار المصدّرة (.npy) بـ mmap في كل عامل،
+فتتشارك العمال صفحات الملفات حتى بدون preload أو بعد إعادة تشغيل عامل.
+"""
+import os
+
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+# تحميل التطبيق في العملية الرئيسية قبل التفرع
+preload_app = os.getenv("MODEL_PRELOAD", "true").lower() == "true"
+
+
+def when_ready(server):
+    """
+    تحميل كل النماذج في العملية الرئيسية بعد تحميل التطبيق وقبل إنشاء العمال
+    """
+    if not preload_app:
+        return
+
+    from app.core.strategic_mind.model_registry import preload_shared_models
+
+    versions = preload_shared_models()
+    for source, entries in versions.items():
+        for model_type, entry in entries.items():
+            server.log.info("Preloaded %s model %s (%s)", source, model_type, entry["version"])
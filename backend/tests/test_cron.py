@@ -0,0 +1,37 @@
+"""
+تحليل حقل يوم الأسبوع في تعبيرات cron (0 و7 = الأحد)
+
+التشغيل من مجلد backend:
+    python -m pytest -q tests
+"""
+from datetime import datetime
+
+import pytest
+
+from app.core.jobs.cron import CronSchedule
+
+
+@pytest.mark.parametrize("spec, weekdays", [
+    ("7", {0}),
+    ("0", {0}),
+    ("1-7", {0, 1, 2, 3, 4, 5, 6}),
+    ("5,7", {0, 5}),
+    ("5-7", {0, 5, 6}),
+    ("6-7,1", {0, 1, 6}),
+    ("*", {0, 1, 2, 3, 4, 5, 6}),
+    ("*/2", {0, 2, 4, 6}),
+])
+def test_sunday_as_seven_in_ranges_and_lists(spec, weekdays):
+    assert CronSchedule(f"0 3 * * {spec}").weekdays == weekdays
+
+
+def test_range_ending_on_seven_schedules_sunday():
+    # السبت 2026-10-17 ثم الأحد 2026-10-18
+    schedule = CronSchedule("0 3 * * 5-7")
+    assert schedule.next_after(datetime(2026, 10, 17, 4, 0)) == datetime(2026, 10, 18, 3, 0)
+
+
+@pytest.mark.parametrize("spec", ["8", "0-8", "7-1"])
+def test_rejects_out_of_range_weekdays(spec):
+    with pytest.raises(ValueError):
+        CronSchedule(f"0 3 * * {spec}")
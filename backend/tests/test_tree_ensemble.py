@@ -0,0 +1,94 @@
+"""
+تطابق تنبؤات المصفوفات المسطحة (في الذاكرة وبعد التحميل بـ mmap) مع model.predict من sklearn
+
+التشغيل من مجلد backend:
+    python -m pytest -q tests
+"""
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from app.core.strategic_mind.tree_ensemble import (
+    FlatTreeEnsemble, _parity_samples, export_ensemble, flat_model_path
+)
+
+
+TOLERANCE = 1e-9
+
+
+def _training_data(n_outputs: int = 1, n_features: int = 6, rows: int = 400):
+    rng = np.random.default_rng(7)
+    X = rng.random((rows, n_features))
+    targets = [np.sin(3 * X[:, 0]) + X[:, 1] * X[:, -1] + k * X[:, 2] for k in range(n_outputs)]
+    y = np.column_stack(targets) + rng.normal(0, 0.05, (rows, n_outputs))
+    return X, (y[:, 0] if n_outputs == 1 else y)
+
+
+def _fit(name: str):
+    if name == "forest":
+        model = RandomForestRegressor(n_estimators=15, max_depth=6, random_state=0)
+        X, y = _training_data()
+    elif name == "boosting":
+        model = GradientBoostingRegressor(n_estimators=25, max_depth=3, random_state=0)
+        X, y = _training_data()
+    elif name == "channel":
+        # نموذج القناة: مخرج لكل قناة
+        model = RandomForestRegressor(n_estimators=10, max_depth=5, random_state=0)
+        X, y = _training_data(n_outputs=4)
+    else:
+        model = DecisionTreeRegressor(max_depth=6, random_state=0)
+        X, y = _training_data(n_outputs=3)
+    return model.fit(X, y)
+
+
+def _samples(flat: FlatTreeEnsemble) -> np.ndarray:
+    # عينات على حدود الأشجار تماماً وحولها، مع صف واحد في البداية
+    return _parity_samples(flat, 500, np.random.default_rng(1))
+
+
+def _assert_parity(model, flat: FlatTreeEnsemble, X: np.ndarray) -> None:
+    expected = np.asarray(model.predict(X), dtype=np.float64)
+    actual = flat.predict(X)
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=TOLERANCE)
+    np.testing.assert_allclose(flat.predict(X[0]), expected[:1], rtol=0, atol=TOLERANCE)
+
+
+@pytest.mark.parametrize("name", ["forest", "boosting", "channel", "tree"])
+def test_in_memory_matches_sklearn(name):
+    model = _fit(name)
+    flat = FlatTreeEnsemble.from_sklearn(model)
+    _assert_parity(model, flat, _samples(flat))
+
+
+@pytest.mark.parametrize("name", ["forest", "boosting", "channel", "tree"])
+def test_export_and_mmap_load_round_trip(name, tmp_path):
+    model = _fit(name)
+    model_path = str(tmp_path / f"{name}.joblib")
+
+    exported = export_ensemble(model, model_path)
+    assert exported == flat_model_path(model_path)
+    assert os.path.isdir(exported)
+
+    in_memory = FlatTreeEnsemble.from_sklearn(model)
+    X = _samples(in_memory)
+    for mmap_mode in (None, "r"):
+        loaded = FlatTreeEnsemble.load(exported, mmap_mode=mmap_mode)
+        assert (loaded.kind, loaded.n_trees, loaded.n_outputs) == (in_memory.kind, in_memory.n_trees, in_memory.n_outputs)
+        _assert_parity(model, loaded, X)
+    assert isinstance(FlatTreeEnsemble.load(exported, mmap_mode="r").threshold, np.memmap)
+
+
+def test_rejects_wrong_feature_count():
+    flat = FlatTreeEnsemble.from_sklearn(_fit("forest"))
+    with pytest.raises(ValueError):
+        flat.predict(np.zeros((2, flat.n_features + 1)))
+
+
+def test_unsupported_models_are_not_exported(tmp_path):
+    unfitted = RandomForestRegressor(n_estimators=3)
+    assert FlatTreeEnsemble.try_from(unfitted) is None
+    assert export_ensemble(unfitted, str(tmp_path / "unfitted.joblib")) is None